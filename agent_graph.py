@@ -0,0 +1,122 @@
+# agent_graph.py
+# ReAct-style agent whose tool node runs independent tool calls concurrently.
+# When the model asks for several tools in one AIMessage (e.g. schema info plus
+# a query, or several queries), the calls run on a bounded thread pool instead
+# of one after another. Results keep the order of the tool calls, and each
+# ToolMessage records its own run time plus the wall-clock time of the step.
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Sequence
+
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+from langchain_core.tools import BaseTool
+from langgraph.graph import StateGraph, MessagesState, END
+from langgraph.prebuilt import tools_condition
+
+logger = logging.getLogger(__name__)
+
+# Tool calls run at the same time within one agent step
+DEFAULT_MAX_WORKERS = 4
+
+# One pool per size per process; every agent step with that max_workers shares
+# it, which bounds the total concurrency of those agents
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"tool-call-{max_workers}")
+            _executors[max_workers] = executor
+        return executor
+
+class ConcurrentToolNode:
+    """
+    Graph node that executes the tool calls of the last AIMessage concurrently
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], max_workers: int = DEFAULT_MAX_WORKERS):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.max_workers = max_workers
+
+    def _run_one(self, tool_call: Dict[str, Any]) -> ToolMessage:
+        start = time.perf_counter()
+        tool = self.tools_by_name.get(tool_call["name"])
+        try:
+            if tool is None:
+                raise ValueError(f"Unknown tool: {tool_call['name']}")
+            output = tool.invoke(tool_call["args"])
+            content, status = output if isinstance(output, str) else str(output), "success"
+        except Exception as e:
+            # Errors go back to the model as the tool result, like the prebuilt ToolNode does
+            content, status = f"Error: {e!r}\n Please fix your mistakes.", "error"
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        return ToolMessage(
+            content=content,
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+            status=status,
+            additional_kwargs={"elapsed_ms": elapsed_ms}
+        )
+
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, List[ToolMessage]]:
+        last_message = state["messages"][-1]
+        tool_calls = getattr(last_message, "tool_calls", None) or []
+
+        step_start = time.perf_counter()
+        if len(tool_calls) == 1:
+            outputs = [self._run_one(tool_calls[0])]
+        else:
+            # Each call runs in a copy of the current context, so context variables
+            # (e.g. the active trace) are visible inside the worker threads
+            executor = _get_executor(self.max_workers)
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._run_one, tool_call)
+                for tool_call in tool_calls
+            ]
+            outputs = [future.result() for future in futures]
+        wall_ms = round((time.perf_counter() - step_start) * 1000, 2)
+
+        for output in outputs:
+            output.additional_kwargs["step_wall_ms"] = wall_ms
+        logger.info(
+            "Ran %d tool calls in %.2f ms wall-clock (%s)", len(outputs), wall_ms,
+            ", ".join(f"{o.name}={o.additional_kwargs['elapsed_ms']} ms" for o in outputs)
+        )
+        return {"messages": outputs}
+
+def create_tool_agent(model, tools: Sequence[BaseTool], prompt: Optional[str] = None,
+                      max_workers: int = DEFAULT_MAX_WORKERS):
+    """
+    Create a ReAct agent (model -> tools -> model ...) with a concurrent tool node
+
+    Drop-in replacement for langgraph's create_react_agent(model=..., tools=..., prompt=...)
+    for the string-prompt case used in this project.
+
+    Args:
+        model: A chat model that supports bind_tools
+        tools: The tools the agent may call
+        prompt: System prompt placed before the conversation
+        max_workers: Size of the thread pool used for concurrent tool calls (shared
+            with every other agent of the same size)
+
+    Returns:
+        A compiled LangGraph graph that accepts {"messages": [...]}
+    """
+    model_with_tools = model.bind_tools(list(tools))
+    system_messages = [SystemMessage(content=prompt)] if prompt else []
+
+    def call_model(state: Dict[str, Any]) -> Dict[str, List[AIMessage]]:
+        return {"messages": [model_with_tools.invoke(system_messages + list(state["messages"]))]}
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("agent", call_model)
+    graph.add_node("tools", ConcurrentToolNode(tools, max_workers=max_workers))
+    graph.set_entry_point("agent")
+    graph.add_conditional_edges("agent", tools_condition, {"tools": "tools", END: END})
+    graph.add_edge("tools", "agent")
+    return graph.compile()
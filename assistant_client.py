@@ -0,0 +1,166 @@
+# assistant_client.py
+# Client used by the Streamlit apps to talk to the assistant services.
+# Without a URL it calls the in-process services from assistant_service; with
+# one (e.g. from the ASSISTANT_SERVICE_URL environment variable) it calls
+# assistant_server.py over HTTP, so the apps can stay thin while the agents
+# scale separately behind a load balancer. Both modes return the same events.
+# assistant_service is imported lazily, so an HTTP-only client does not load
+# the agent stack.
+import json
+import os
+import urllib.error
+import urllib.request
+from typing import List, Dict, Any, Optional, Iterator
+
+# Seconds to wait for an HTTP response
+DEFAULT_TIMEOUT = 300
+
+class AssistantClient:
+    """
+    Thin client for the SQL Assistant and Health Assistant services
+    """
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.timeout = timeout
+
+    # --- Transport ---
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                 api_key: Optional[str] = None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        request.add_header("Content-Type", "application/json")
+        request.add_header("Connection", "close")
+        if api_key:
+            request.add_header("X-Google-Api-Key", api_key)
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            # The server answers errors as {"error": ...}
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise RuntimeError(f"Assistant service error ({e.code}): {message}") from None
+
+    def _call(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+              api_key: Optional[str] = None) -> Any:
+        with self._request(method, path, payload, api_key) as response:
+            return json.loads(response.read())
+
+    def _stream(self, path: str, payload: Dict[str, Any], api_key: str) -> Iterator[Dict[str, Any]]:
+        with self._request("POST", path, {**payload, "stream": True}, api_key) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+
+    # --- SQL Assistant ---
+
+    def sql_stream(self, session_id: str, question: str, api_key: str, phrase_with_llm: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Ask the SQL Assistant a question; yields events ending with the "done" event
+        """
+        if self.base_url:
+            return self._stream("/v1/sql/ask", {"session_id": session_id, "question": question,
+                                                "phrase_with_llm": phrase_with_llm}, api_key)
+        from assistant_service import get_sql_service
+        return get_sql_service().stream_ask(session_id, question, api_key, phrase_with_llm)
+
+    def sql_ask(self, session_id: str, question: str, api_key: str, phrase_with_llm: bool = True,
+                use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Ask the SQL Assistant a question and return the "done" event
+        """
+        if self.base_url:
+            return self._call("POST", "/v1/sql/ask", {"session_id": session_id, "question": question,
+                                                     "phrase_with_llm": phrase_with_llm, "use_cache": use_cache}, api_key)
+        from assistant_service import get_sql_service
+        return get_sql_service().ask(session_id, question, api_key, phrase_with_llm, use_cache)
+
+    def sql_reset(self, session_id: str, api_key: Optional[str] = None) -> None:
+        """
+        Forget a SQL Assistant conversation (the server binds session ids to the API key that used them)
+        """
+        if self.base_url:
+            self._call("POST", "/v1/sql/reset", {"session_id": session_id}, api_key)
+        else:
+            from assistant_service import get_sql_service
+            get_sql_service().reset(session_id)
+
+    def sql_report_false_hit(self, session_id: str, api_key: Optional[str] = None) -> bool:
+        """
+        Drop the cached answer used for the session's last question
+        """
+        if self.base_url:
+            return self._call("POST", "/v1/sql/false-hit", {"session_id": session_id}, api_key)["dropped"]
+        from assistant_service import get_sql_service
+        return get_sql_service().report_false_hit(session_id)
+
+    def sql_init_database(self, api_key: Optional[str] = None) -> str:
+        """
+        Create and populate the sales database (the server requires an API key)
+        """
+        if self.base_url:
+            return self._call("POST", "/v1/sql/init", {}, api_key)["result"]
+        from assistant_service import get_sql_service
+        return get_sql_service().init_database()
+
+    def sql_stats(self) -> Dict[str, Any]:
+        """
+        Cache hit rates and agent cost per question
+        """
+        if self.base_url:
+            return self._call("GET", "/v1/stats")
+        from assistant_service import get_sql_service
+        return get_sql_service().stats()
+
+    # --- Health Assistant ---
+
+    def health_stream(self, session_id: str, message: str, api_key: str, profile: Optional[Dict[str, Any]] = None,
+                      temperature: float = 0.7) -> Iterator[Dict[str, Any]]:
+        """
+        Send the Health Assistant a message; yields events ending with the "done" event
+        """
+        if self.base_url:
+            return self._stream("/v1/health/ask", {"session_id": session_id, "message": message,
+                                                   "profile": profile, "temperature": temperature}, api_key)
+        from assistant_service import get_health_service
+        return get_health_service().stream_ask(session_id, message, api_key, profile, temperature)
+
+    def health_reset(self, session_id: str, api_key: Optional[str] = None) -> None:
+        """
+        Forget a Health Assistant conversation (the server binds session ids to the API key that used them)
+        """
+        if self.base_url:
+            self._call("POST", "/v1/health/reset", {"session_id": session_id}, api_key)
+        else:
+            from assistant_service import get_health_service
+            get_health_service().reset(session_id)
+
+def get_client() -> AssistantClient:
+    """
+    Client configured from the ASSISTANT_SERVICE_URL environment variable
+    (in-process services when it is not set)
+    """
+    return AssistantClient(os.environ.get("ASSISTANT_SERVICE_URL"))
+
+def collect_answer(events: Iterator[Dict[str, Any]], on_text=None) -> Dict[str, Any]:
+    """
+    Drain an event stream and return its "done" event
+
+    Args:
+        events: Events from sql_stream or health_stream
+        on_text: Called with the answer text received so far after every token
+
+    Returns:
+        The "done" event
+    """
+    text = ""
+    for event in events:
+        if event["event"] == "token" and on_text:
+            text += event["text"]
+            on_text(text)
+        elif event["event"] == "done":
+            return event
+    raise RuntimeError("The assistant stream ended without an answer")
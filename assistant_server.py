@@ -0,0 +1,345 @@
+# assistant_server.py
+# Lightweight HTTP/JSON server for the SQL Assistant and the Health Assistant.
+# Built on asyncio from the standard library: the event loop only parses requests
+# and writes responses, while questions run on a bounded worker pool. Requests
+# beyond the pool wait in a bounded queue; when that is full (or a request waits
+# too long) the server answers 503 so a load balancer can try another instance.
+#
+# Endpoints (JSON bodies; the API key goes in the X-Google-Api-Key header or
+# the GOOGLE_API_KEY environment variable):
+#   POST /v1/sql/ask          {"session_id", "question", "phrase_with_llm", "use_cache", "stream"}
+#   POST /v1/sql/reset        {"session_id"}
+#   POST /v1/sql/false-hit    {"session_id"}
+#   POST /v1/sql/init
+#   POST /v1/health/ask       {"session_id", "message", "profile", "temperature", "stream"}
+#   POST /v1/health/reset     {"session_id"}
+#   GET  /v1/health/recommendations?user_id=
+#   GET  /v1/stats
+#   GET  /healthz
+# With "stream": true the response is NDJSON (one event per line, chunked),
+# ending with the "done" event; otherwise it is the "done" event alone.
+# Session ids are bound to the API key that uses them: the same id sent with
+# another key names another session, so one client can't reset or read
+# another's conversation. Malformed fields are answered with 400 before a
+# request takes a worker or any response is sent.
+#
+# Usage: python assistant_server.py [--host 127.0.0.1] [--port 8080] [--workers 8] [--max-queue 32]
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, Any, Optional, Tuple, Callable
+from urllib.parse import urlsplit, parse_qs
+
+from assistant_service import get_sql_service, get_health_service
+
+logger = logging.getLogger("assistant_server")
+
+# Questions answered at the same time
+DEFAULT_WORKERS = 8
+
+# Requests allowed to wait for a worker
+DEFAULT_MAX_QUEUE = 32
+
+# Seconds a request may wait for a worker before it is rejected
+QUEUE_TIMEOUT = 30
+
+# Largest request body accepted
+MAX_BODY_BYTES = 1024 * 1024
+
+class HTTPError(Exception):
+    """
+    Error answered with a status code and a JSON {"error": ...} body
+    """
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+class AssistantServer:
+    """
+    asyncio HTTP server dispatching to the assistant services on a worker pool
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assistant-worker")
+        self.sql = get_sql_service()
+        self.health = get_health_service()
+        # Requests admitted (running or waiting for a worker) and the worker slots
+        self.pending = 0
+        self.slots: Optional[asyncio.Semaphore] = None
+
+    # --- HTTP plumbing ---
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, {"Connection": "close"})
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._dispatch(method, path, headers, body, writer)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, e.headers)
+                except Exception as e:
+                    logger.exception("Request failed: %s %s", method, path)
+                    await self._send_json(writer, 500, {"error": str(e)})
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        # readline raises ValueError for lines beyond the stream's limit
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return None
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+                raise HTTPError(400, "Malformed request line")
+            method, path, _ = parts
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            raise HTTPError(400, "Request line or header too long")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Any,
+                         headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, default=str).encode()
+        head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+    async def _send_stream(self, writer: asyncio.StreamWriter, events: "asyncio.Queue") -> None:
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            line = (json.dumps(event, default=str) + "\n").encode()
+            writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # --- Worker pool and queue limits ---
+
+    async def _admit(self) -> None:
+        # Reject right away when every worker is busy and the queue is full
+        if self.pending >= self.workers + self.max_queue:
+            raise HTTPError(503, "Server busy, try again later", {"Retry-After": "1"})
+        self.pending += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.pending -= 1
+            raise HTTPError(503, "Timed out waiting for a worker", {"Retry-After": "1"})
+
+    def _release(self) -> None:
+        self.pending -= 1
+        self.slots.release()
+
+    async def _run(self, function: Callable, *args) -> Any:
+        """
+        Run a blocking call on the worker pool
+        """
+        await self._admit()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self._release()
+
+    async def _run_stream(self, writer: asyncio.StreamWriter, events_factory: Callable, stream: bool) -> None:
+        """
+        Run an event-producing service call on the worker pool and send its events
+        """
+        await self._admit()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def produce():
+            done = None
+            try:
+                for event in events_factory():
+                    if event["event"] == "done":
+                        done = event
+                    if stream:
+                        loop.call_soon_threadsafe(queue.put_nowait, event)
+            except Exception as e:
+                if not stream:
+                    raise
+                # The 200 status line is already out, so the failure ends the stream instead
+                logger.exception("Streamed request failed")
+                loop.call_soon_threadsafe(queue.put_nowait, {"event": "done", "answer": None, "error": str(e)})
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+            return done
+
+        future = loop.run_in_executor(self.executor, produce)
+        try:
+            if stream:
+                await self._send_stream(writer, queue)
+        finally:
+            # Hold the worker slot until the call has really finished, even if the client went away
+            try:
+                done = await future
+            finally:
+                self._release()
+        if not stream:
+            await self._send_json(writer, 200, done)
+
+    # --- Routes ---
+
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes,
+                        writer: asyncio.StreamWriter) -> None:
+        url = urlsplit(path)
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        api_key = headers.get("x-google-api-key") or os.environ.get("GOOGLE_API_KEY", "")
+
+        if method == "GET" and url.path == "/healthz":
+            await self._send_json(writer, 200, {"status": "ok", "pending": self.pending, "workers": self.workers})
+        elif method == "GET" and url.path == "/v1/stats":
+            await self._send_json(writer, 200, {**self.sql.stats(), "pending": self.pending})
+        elif method == "GET" and url.path == "/v1/health/recommendations":
+            user_id = parse_qs(url.query).get("user_id", [None])[0]
+            try:
+                user_id = int(user_id) if user_id else None
+            except ValueError:
+                raise HTTPError(400, f"Invalid user_id: {user_id}")
+            payload = await self._run(self.health.recommendations, user_id)
+            await self._send_json(writer, 200, payload)
+        elif method != "POST":
+            raise HTTPError(404, f"No route for {method} {url.path}")
+        elif url.path == "/v1/sql/ask":
+            session_id, question = self._require(data, "session_id", "question")
+            phrase_with_llm = self._option(data, "phrase_with_llm", True, bool)
+            use_cache = self._option(data, "use_cache", True, bool)
+            stream = self._option(data, "stream", False, bool)
+            session_id = self._session(api_key, session_id)
+            await self._run_stream(writer, lambda: self.sql.stream_ask(
+                session_id, question, api_key, phrase_with_llm, use_cache
+            ), stream)
+        elif url.path == "/v1/health/ask":
+            session_id, message = self._require(data, "session_id", "message")
+            profile = self._option(data, "profile", None, dict)
+            temperature = self._option(data, "temperature", 0.7, (int, float))
+            stream = self._option(data, "stream", False, bool)
+            session_id = self._session(api_key, session_id)
+            await self._run_stream(writer, lambda: self.health.stream_ask(
+                session_id, message, api_key, profile, temperature
+            ), stream)
+        elif url.path == "/v1/sql/reset":
+            self.sql.reset(self._session(api_key, *self._require(data, "session_id")))
+            await self._send_json(writer, 200, {"reset": True})
+        elif url.path == "/v1/health/reset":
+            self.health.reset(self._session(api_key, *self._require(data, "session_id")))
+            await self._send_json(writer, 200, {"reset": True})
+        elif url.path == "/v1/sql/false-hit":
+            dropped = self.sql.report_false_hit(self._session(api_key, *self._require(data, "session_id")))
+            await self._send_json(writer, 200, {"dropped": dropped})
+        elif url.path == "/v1/sql/init":
+            self._require_key(api_key)
+            await self._send_json(writer, 200, {"result": await self._run(self.sql.init_database)})
+        else:
+            raise HTTPError(404, f"No route for {method} {url.path}")
+
+    @staticmethod
+    def _require(data: Dict[str, Any], *fields: str) -> Tuple[str, ...]:
+        """
+        The values of required string fields, or 400 if one is missing, empty or not a string
+        """
+        missing = [field for field in fields if field not in data or data[field] == ""]
+        if missing:
+            raise HTTPError(400, f"Missing field(s): {', '.join(missing)}")
+        invalid = [field for field in fields if not isinstance(data[field], str) or not data[field].strip()]
+        if invalid:
+            raise HTTPError(400, f"Field(s) must be non-empty strings: {', '.join(invalid)}")
+        return tuple(data[field] for field in fields)
+
+    @staticmethod
+    def _option(data: Dict[str, Any], field: str, default: Any, kind: Any) -> Any:
+        """
+        The value of an optional field (default when absent or null), or 400 if it has the wrong type
+        """
+        value = data.get(field)
+        if value is None:
+            return default
+        # bool is an int, but not a number here
+        if not isinstance(value, kind) or (isinstance(value, bool) and kind is not bool):
+            raise HTTPError(400, f"Invalid {field}: {value!r}")
+        return value
+
+    @staticmethod
+    def _require_key(api_key: str) -> None:
+        if not api_key:
+            raise HTTPError(401, "Missing Google AI API key (X-Google-Api-Key header)")
+
+    @classmethod
+    def _session(cls, api_key: str, session_id: str) -> str:
+        """
+        The service's session id for a client's session id, bound to the client's API key
+        """
+        cls._require_key(api_key)
+        return f"{hashlib.sha256(api_key.encode()).hexdigest()[:16]}:{session_id}"
+
+    async def serve(self, host: str, port: int) -> None:
+        self.slots = asyncio.Semaphore(self.workers)
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info("Assistant server listening on http://%s:%d (%d workers, queue %d)",
+                    host, port, self.workers, self.max_queue)
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON server for the SQL and Health Assistants")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Questions answered at the same time")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="Requests allowed to wait for a worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(AssistantServer(args.workers, args.max_queue).serve(args.host, args.port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,582 @@
+# assistant_service.py
+# Importable service behind the SQL Assistant and the Health Assistant.
+# The agent, the caches and each session's conversation state live here instead
+# of in Streamlit script reruns, so the same logic serves the Streamlit apps,
+# the HTTP server in assistant_server.py and batch jobs.
+#
+# Every question runs as a stream of events:
+#   {"event": "tool_call", "name": ..., "args": ...}     the agent called a tool
+#   {"event": "tool_result", "name": ..., "elapsed_ms": ...}
+#   {"event": "token", "text": ...}                       part of the answer
+#   {"event": "done", "answer": ..., ...}                 the final result (always last)
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterator, Callable
+
+from google.genai import types
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
+
+import gemini_client
+import health_database_tools
+import model_router
+import telemetry
+from agent_graph import create_tool_agent
+from database_tools import text_to_sql, init_database, get_database_version, get_schema_digest, get_schema_version
+from result_format import format_query_result
+from result_spool import spool_session
+from semantic_cache import SemanticCache, is_follow_up
+from sql_agent_tools import SQL_TOOLS, SQL_AGENT_PROMPT, RESULT_PAGE_SIZE
+from sql_plan_cache import SQLPlanCache, format_results_markdown, is_empty_result
+from state_compaction import compact_messages, state_stats
+
+logger = logging.getLogger("sql_assistant")
+
+# Gemini models used by the two assistants
+SQL_MODEL = "gemini-2.5-flash"
+HEALTH_MODEL = "gemini-2.5-flash"
+
+# Sessions not used for this many seconds are dropped
+SESSION_TTL = 60 * 60
+
+def default_llm_factory(api_key: str):
+    """
+    The chat model behind the SQL agent (rate limited and retried by gemini_client)
+    """
+    # Lower temperature for more deterministic responses
+    return gemini_client.get_chat_model(api_key, SQL_MODEL, temperature=0.2)
+
+def default_client_factory(api_key: str):
+    """
+    The google.genai client behind the Health Assistant (rate limited and retried by gemini_client)
+    """
+    return gemini_client.get_genai_client(api_key)
+
+class _Session:
+    """
+    Conversation state of one user; the lock keeps a session's turns in order
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self.agent_messages = []
+        self.last_cache_hit = None
+        self.chat = None
+
+class _SessionStore:
+    """
+    Thread-safe sessions by id, with idle sessions expiring after SESSION_TTL
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self._sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> _Session:
+        now = time.time()
+        with self._lock:
+            for expired in [key for key, session in self._sessions.items() if now - session.last_used > self.ttl]:
+                del self._sessions[expired]
+            session = self._sessions.setdefault(session_id, _Session())
+            session.last_used = now
+            return session
+
+    def reset(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+def _average(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+def _add_usage(usage: Dict[str, int], message) -> None:
+    """
+    Add a message's token usage (if the model reported it) to a running total
+    """
+    for key, value in (getattr(message, "usage_metadata", None) or {}).items():
+        if key in usage:
+            usage[key] += value
+
+class SQLAssistantService:
+    """
+    The SQL Assistant: similarity cache, question-to-SQL plan cache and the SQL agent
+    """
+
+    def __init__(self, llm_factory: Optional[Callable[[str], Any]] = None, page_size: int = RESULT_PAGE_SIZE,
+                 light_llm_factory: Optional[Callable[[str], Any]] = None):
+        self.llm_factory = llm_factory or default_llm_factory
+        # Small talk goes to the light model; with a custom llm_factory (e.g. a fake model) that one is used for both
+        self.light_llm_factory = light_llm_factory or (model_router.get_light_model if llm_factory is None else llm_factory)
+        self.page_size = page_size
+        self.semantic_cache = SemanticCache()
+        self.plan_cache = SQLPlanCache()
+        self.sessions = _SessionStore()
+        # API key -> {"llm", "agent", "schema_version"}; agents hold no conversation state
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._agents_lock = threading.Lock()
+        self._llm_calls: List[int] = []
+        self._retries: List[int] = []
+
+    def _agent(self, api_key: str) -> Dict[str, Any]:
+        """
+        The LLM and agent for an API key, rebuilt when the schema changes
+        """
+        schema_version = get_schema_version()
+        with self._agents_lock:
+            entry = self._agents.get(api_key)
+            if entry is None or entry["schema_version"] != schema_version:
+                llm = entry["llm"] if entry else self.llm_factory(api_key)
+                # The schema digest is baked into the prompt, so a new table means a new agent
+                entry = {
+                    "llm": llm,
+                    "agent": create_tool_agent(
+                        model=llm,
+                        tools=SQL_TOOLS,
+                        prompt=SQL_AGENT_PROMPT.format(schema_digest=get_schema_digest())
+                    ),
+                    "schema_version": schema_version
+                }
+                self._agents[api_key] = entry
+            return entry
+
+    def init_database(self) -> str:
+        """
+        Create and populate the sales database
+        """
+        return init_database()
+
+    def reset(self, session_id: str) -> None:
+        """
+        Forget a session's conversation
+        """
+        self.sessions.reset(session_id)
+
+    def restore_history(self, session_id: str, turns: List[Dict[str, Any]]) -> None:
+        """
+        Give a session earlier turns answered in another process (e.g. a resumed
+        batch), so follow-up questions can build on them
+
+        Args:
+            session_id: Conversation to restore
+            turns: Dictionaries with "question", "answer" and "sql_query", oldest first
+        """
+        session = self.sessions.get(session_id)
+        with session.lock:
+            for turn in turns:
+                self._remember_turn(session, turn["question"], turn["answer"], turn.get("sql_query"))
+
+    def report_false_hit(self, session_id: str) -> bool:
+        """
+        Drop the cached answer used for the session's last question
+
+        Returns:
+            True if the last answer came from the cache and was dropped
+        """
+        session = self.sessions.get(session_id)
+        if not session.last_cache_hit:
+            return False
+        self.semantic_cache.report_false_hit(session.last_cache_hit)
+        session.last_cache_hit = None
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache hit rates, live sessions, agent cost per question and Gemini gateway counters
+        """
+        return {
+            "cache": self.semantic_cache.stats(),
+            "plans": self.plan_cache.stats(),
+            "sessions": len(self.sessions),
+            "llm_calls_per_question": round(_average(self._llm_calls), 2),
+            "retries_per_question": round(_average(self._retries), 2),
+            "router": model_router.stats(),
+            "gemini": gemini_client.stats()
+        }
+
+    def ask(self, session_id: str, question: str, api_key: str, phrase_with_llm: bool = True,
+            use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Answer a question and return the "done" event (see stream_ask)
+        """
+        for event in self.stream_ask(session_id, question, api_key, phrase_with_llm, use_cache):
+            if event["event"] == "done":
+                return event
+
+    def stream_ask(self, session_id: str, question: str, api_key: str, phrase_with_llm: bool = True,
+                   use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a question, yielding progress events and finally a "done" event
+
+        Args:
+            session_id: Conversation the question belongs to
+            question: The user's question
+            api_key: Google AI API key
+            phrase_with_llm: Let the model word answers from a cached question-to-SQL
+                plan; when False they are answered with a results table and no model call
+            use_cache: When False the similarity and plan caches are neither read nor
+                updated, so every question runs the agent (e.g. for evaluations)
+
+        Returns:
+            Iterator of events. The "done" event has "answer", "source" ("chat"
+            for small talk answered by the light model, "cache", "plan" or "agent"), "sql_query", "sql_failed", "sql_repaired"
+            (the query only ran after a local repair, see sql_repair), "batch_queries",
+            "llm_calls", "retries", "usage" (token counts), "error" (None
+            unless the question failed) and "turn_id" (its telemetry record, None
+            if the turn could not be recorded).
+        """
+        result = {
+            "event": "done", "answer": None, "source": None, "sql_query": None, "sql_failed": False,
+            "sql_repaired": False,
+            "batch_queries": [], "llm_calls": 0, "retries": 0,
+            "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}, "error": None,
+            "turn_id": None
+        }
+        try:
+            session = self.sessions.get(session_id)
+            # Large results this turn spools can only be paged in by this session
+            with session.lock, spool_session(session_id), telemetry.turn("sql_assistant", session_id, question, SQL_MODEL) as turn:
+                result["turn_id"] = turn.turn_id
+                session.last_cache_hit = None
+                try:
+                    # Small talk needs neither the caches nor the tools
+                    decision = model_router.route(question, "sql_assistant")
+                    # The caches are shared by every session and know nothing of the conversation, so
+                    # follow-ups never use them, and only questions asked without earlier turns are
+                    # stored or answered from the similarity cache
+                    follow_up = is_follow_up(question)
+                    context_free = not session.agent_messages and not follow_up
+                    db_version = get_database_version()
+                    plan = query_result = cache_hit = None
+                    if decision["route"] == model_router.ROUTE_AGENT and use_cache:
+                        # A question phrased like an earlier one reuses its SQL with its own literals
+                        plan = self.plan_cache.match(question) if not follow_up else None
+                        query_result = self._run_plan(plan) if plan else None
+                        # Otherwise a paraphrase of an earlier question (with the same literals) can
+                        # reuse its answer, or its SQL if the data changed, without running the agent
+                        if query_result is None and context_free:
+                            cache_hit = self.semantic_cache.lookup(question, db_version)
+
+                    if decision["route"] == model_router.ROUTE_CHAT:
+                        result["source"] = "chat"
+                        turn.model = decision["model"]
+                        yield from self._chat(session, question, api_key, result)
+                        self._remember_turn(session, question, result["answer"], None)
+                    elif cache_hit:
+                        session.last_cache_hit = cache_hit["key"]
+                        result.update(source="cache", sql_query=cache_hit["sql"])
+                        if cache_hit["kind"] == "answer":
+                            result["answer"] = cache_hit["answer"]
+                        else:
+                            # The data changed since the cached answer, so re-run its SQL
+                            query_result = text_to_sql(cache_hit["sql"], page_size=self.page_size)
+                            result["answer"] = f"The data changed since a similar question was answered, so here are fresh results for the same query:\n\n{format_results_markdown(query_result['results'])}"
+                        self._remember_turn(session, question, result["answer"], cache_hit["sql"])
+                    else:
+                        if query_result is not None:
+                            result.update(source="plan", sql_query=plan["sql"])
+                            yield from self._answer_from_plan(question, query_result, api_key, phrase_with_llm, result)
+                            self._remember_turn(session, question, result["answer"], plan["sql"])
+                        else:
+                            result["source"] = "agent"
+                            yield from self._run_agent(session, question, api_key, result)
+                            # Remember the question-to-SQL mapping of a successful agent run
+                            if use_cache and context_free and result["sql_query"] and not result["sql_failed"] and not result["sql_repaired"]:
+                                self.plan_cache.learn(question, result["sql_query"])
+                        # Only cache answers backed by a read-only query that ran as written, without errors
+                        # (a locally repaired query is a guess at what the model meant)
+                        last_sql = result["sql_query"] or ""
+                        if (use_cache and context_free and last_sql.strip().upper().startswith("SELECT")
+                                and not result["sql_failed"] and not result["sql_repaired"]):
+                            self.semantic_cache.store(question, result["answer"], last_sql, db_version)
+                except Exception as e:
+                    logger.exception("Question failed: %s", question)
+                    result["error"] = str(e)
+                turn.source, turn.error = result["source"], result["error"]
+                if result["source"] in ("chat", "agent"):
+                    model_router.record_turn(turn, result["source"])
+        except Exception as e:
+            # The turn could not be started or recorded (e.g. its telemetry failed)
+            logger.exception("Question failed: %s", question)
+            result["error"] = result["error"] or str(e)
+        # The turn's record is stored before the answer is handed over
+        yield result
+
+    def _run_plan(self, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Run the SQL of a cached plan directly.
+        Returns None when the re-bound query fails, only runs after a local repair or
+        finds nothing (no rows, or an aggregate that is NULL because nothing
+        matched), so the agent can take over.
+        """
+        query_result = text_to_sql(plan["sql"], page_size=self.page_size)
+        results = query_result["results"]
+        failed = bool(results) and "error" in results[0] or "repair" in query_result
+        if failed or is_empty_result(results):
+            if failed:
+                self.plan_cache.forget(plan["template"])
+            return None
+        return query_result
+
+    def _answer_from_plan(self, question: str, query_result: Dict[str, Any], api_key: str,
+                          phrase_with_llm: bool, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if not phrase_with_llm:
+            result["answer"] = format_results_markdown(query_result["results"])
+            return
+
+        # A single model call to put the results into words
+        llm = self._agent(api_key)["llm"]
+        pieces = []
+        for chunk in llm.stream([
+            SystemMessage(content="You answer questions about sales data. Explain the SQL query results below in a clear and concise way."),
+            HumanMessage(content=f"Question: {question}\n\n{format_query_result(query_result)}")
+        ], config={"callbacks": telemetry.callbacks()}):
+            _add_usage(result["usage"], chunk)
+            if chunk.text:
+                pieces.append(chunk.text)
+                yield {"event": "token", "text": chunk.text}
+        result["answer"] = "".join(pieces)
+        result["llm_calls"] = 1
+
+    def _chat(self, session: _Session, question: str, api_key: str, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Answer small talk with the light model (no tools), keeping the conversation as context
+        """
+        llm = self.light_llm_factory(api_key)
+        pieces = []
+        for chunk in llm.stream(model_router.chat_messages(session.agent_messages, question), config={"callbacks": telemetry.callbacks()}):
+            _add_usage(result["usage"], chunk)
+            if chunk.text:
+                pieces.append(chunk.text)
+                yield {"event": "token", "text": chunk.text}
+        result["answer"] = "".join(pieces)
+        result["llm_calls"] = 1
+
+    def _remember_turn(self, session: _Session, question: str, answer: str, sql_query: Optional[str]) -> None:
+        """
+        Add a turn answered without the agent (from a cache) to the agent's state,
+        including the SQL behind the answer so follow-up questions can build on it
+        """
+        content = f"{answer}\n\n(SQL used: {sql_query})" if sql_query else answer
+        session.agent_messages = compact_messages(
+            session.agent_messages + [HumanMessage(content=question), AIMessage(content=content)]
+        )
+
+    def _run_agent(self, session: _Session, question: str, api_key: str, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Run the agent over the session's state plus the new question
+        """
+        agent = self._agent(api_key)["agent"]
+        # Carry the agent's own (compacted) state forward, so follow-up questions can refer
+        # to earlier queries and results, and add the new question
+        messages = session.agent_messages + [HumanMessage(content=question)]
+        new_messages = []
+
+        with telemetry.stage("agent", "agent.invoke", messages=len(messages)):
+            for mode, chunk in agent.stream({"messages": messages}, stream_mode=["updates", "messages"],
+                                            config={"callbacks": telemetry.callbacks()}):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if isinstance(message, AIMessageChunk) and message.text and metadata.get("langgraph_node") == "agent":
+                        yield {"event": "token", "text": message.text}
+                    continue
+                for update in chunk.values():
+                    for msg in (update or {}).get("messages", []):
+                        new_messages.append(msg)
+                        if isinstance(msg, AIMessage):
+                            for tool_call in msg.tool_calls:
+                                yield {"event": "tool_call", "name": tool_call["name"], "args": tool_call["args"]}
+                        elif isinstance(msg, ToolMessage):
+                            yield {"event": "tool_result", "name": msg.name, "elapsed_ms": msg.additional_kwargs.get("elapsed_ms")}
+
+        if not new_messages:
+            result["answer"] = "I'm sorry, I couldn't generate a response."
+            return
+        result["answer"] = new_messages[-1].text
+
+        # Count the model calls this question took (one per AIMessage the agent added)
+        result["llm_calls"] = sum(1 for msg in new_messages if isinstance(msg, AIMessage))
+        for msg in new_messages:
+            _add_usage(result["usage"], msg)
+        self._llm_calls.append(result["llm_calls"])
+        logger.info("Agent answered with %d LLM calls (average %.2f per question)", result["llm_calls"], _average(self._llm_calls))
+
+        # Count queries that failed or came back empty, each of which costs the agent a retry
+        result["retries"] = sum(
+            1 for msg in new_messages
+            if getattr(msg, "name", None) == "execute_sql"
+            and ("Query Error:" in msg.content or "Query Results (0 rows)" in msg.content)
+        )
+        self._retries.append(result["retries"])
+        logger.info("Agent needed %d query retries (average %.2f per question)", result["retries"], _average(self._retries))
+
+        # Keep the state for the next turn, with older tool outputs reduced to digests
+        session.agent_messages = compact_messages(messages + new_messages)
+        logger.info("Session state after compaction: %s", state_stats(session.agent_messages))
+
+        # Extract the SQL queries from this turn's tool messages
+        for msg in new_messages:
+            if isinstance(msg, ToolMessage) and msg.name == "execute_sql" and "```sql\n" in msg.content:
+                result["sql_query"] = msg.content.split("```sql\n")[1].split("\n```")[0].strip()
+                # Remember whether the query failed or was repaired, so such answers are not cached
+                result["sql_failed"] = "Query Error:" in msg.content
+                result["sql_repaired"] = "Auto-repaired from:" in msg.content
+            # Batch results hold one ```sql block per statement
+            elif isinstance(msg, ToolMessage) and msg.name == "execute_sql_batch":
+                result["batch_queries"] = [
+                    part.split("\n```")[0].strip() for part in msg.content.split("```sql\n")[1:]
+                ]
+
+def build_health_instruction(profile: Dict[str, Any]) -> str:
+    """
+    System instruction for the Health Assistant from a user's health profile
+
+    Args:
+        profile: Dictionary with the profile fields of the Health Assistant sidebar
+            (age, gender, height_cm, height_ft, weight_kg, weight_lbs, bmi,
+            blood_pressure_sys, blood_pressure_dia, resting_hr, sleep_hours,
+            activity, exercise_freq, diet_type, conditions, medications,
+            surgeries, goals, concerns, family_history). Missing fields are
+            reported as not specified.
+
+    Returns:
+        The system instruction
+    """
+    p = {key: profile.get(key, "not specified") for key in [
+        "age", "gender", "height_cm", "height_ft", "weight_kg", "weight_lbs", "bmi",
+        "blood_pressure_sys", "blood_pressure_dia", "resting_hr", "sleep_hours",
+        "activity", "exercise_freq", "diet_type"
+    ]}
+    conditions = profile.get("conditions") or []
+    family_history = profile.get("family_history") or []
+    goals = profile.get("goals") or []
+    health_conditions = ', '.join(conditions) if conditions and 'None' not in conditions else 'None'
+    family_conditions = ', '.join(family_history) if family_history and 'None' not in family_history else 'None'
+
+    return f"""You are a helpful health and wellness assistant, specialized in giving advice to people 30 and older.
+
+USER HEALTH PROFILE:
+- Demographics: {p['age']} years old, {p['gender']}
+- Physical: Height {p['height_cm']}cm ({p['height_ft']}ft), Weight {p['weight_kg']}kg ({p['weight_lbs']}lbs), BMI {p['bmi']}
+- Vital Signs: Blood Pressure {p['blood_pressure_sys']}/{p['blood_pressure_dia']}, Resting HR {p['resting_hr']} bpm
+- Sleep: {p['sleep_hours']} hours average per night
+- Activity: {p['activity']} level, Exercise {p['exercise_freq']}
+- Diet: {p['diet_type']}
+- Health Conditions: {health_conditions}
+- Medications: {profile.get('medications') or 'None reported'}
+- Recent Surgeries: {profile.get('surgeries') or 'None reported'}
+- Health Goals: {', '.join(goals) if goals else 'General wellness'}
+- Specific Concerns: {profile.get('concerns') or 'None specified'}
+- Family History: {family_conditions}
+
+Provide personalized, evidence-based health advice considering this comprehensive profile. Always recommend consulting healthcare professionals for medical concerns."""
+
+class HealthAdvisorService:
+    """
+    The Health Assistant: one Gemini chat per session, set up from the user's profile
+    """
+
+    def __init__(self, client_factory: Optional[Callable[[str], Any]] = None, model: str = HEALTH_MODEL):
+        self.client_factory = client_factory or default_client_factory
+        self.model = model
+        self.sessions = _SessionStore()
+        self._clients: Dict[str, Any] = {}
+        self._clients_lock = threading.Lock()
+
+    def _client(self, api_key: str):
+        with self._clients_lock:
+            if api_key not in self._clients:
+                self._clients[api_key] = self.client_factory(api_key)
+            return self._clients[api_key]
+
+    def reset(self, session_id: str) -> None:
+        """
+        Forget a session's conversation
+        """
+        self.sessions.reset(session_id)
+
+    def ask(self, session_id: str, message: str, api_key: str, profile: Optional[Dict[str, Any]] = None,
+            temperature: float = 0.7) -> Dict[str, Any]:
+        """
+        Answer a message and return the "done" event (see stream_ask)
+        """
+        for event in self.stream_ask(session_id, message, api_key, profile, temperature):
+            if event["event"] == "done":
+                return event
+
+    def stream_ask(self, session_id: str, message: str, api_key: str, profile: Optional[Dict[str, Any]] = None,
+                   temperature: float = 0.7) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a message, yielding "token" events and finally a "done" event
+
+        The profile and temperature are used when the session's chat is created
+        (on its first message); later messages continue the same chat.
+
+        Returns:
+            Iterator of events. The "done" event has "answer", "error"
+            (None unless the message failed) and "turn_id" (its telemetry record).
+        """
+        session = self.sessions.get(session_id)
+        with session.lock, telemetry.turn("health_assistant", session_id, message, self.model) as turn:
+            result = {"event": "done", "answer": None, "error": None, "turn_id": turn.turn_id}
+            try:
+                if session.chat is None:
+                    # Create a chat session with the profile as system instruction
+                    session.chat = self._client(api_key).chats.create(
+                        model=self.model,
+                        config=types.GenerateContentConfig(
+                            temperature=temperature,
+                            system_instruction=build_health_instruction(profile or {})
+                        )
+                    )
+                pieces = []
+                chunk = None
+                with telemetry.stage("llm", self.model):
+                    for chunk in session.chat.send_message_stream(message):
+                        if chunk.text:
+                            pieces.append(chunk.text)
+                            yield {"event": "token", "text": chunk.text}
+                # The last chunk carries the usage of the whole response
+                turn.add_response_usage(chunk)
+                result["answer"] = "".join(pieces)
+            except Exception as e:
+                logger.exception("Health question failed")
+                result["error"] = str(e)
+            turn.error = result["error"]
+        yield result
+
+    def recommendations(self, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Wellness tips, plus tips from the user's latest health metrics when user_id is given
+        """
+        return health_database_tools.get_health_recommendations(user_id)
+
+    def query(self, sql_query: str) -> Dict[str, Any]:
+        """
+        Run a SQL query against the health and wellness database
+        """
+        return health_database_tools.text_to_sql(sql_query)
+
+_services: Dict[str, Any] = {}
+_services_lock = threading.Lock()
+
+def get_sql_service() -> SQLAssistantService:
+    """
+    The process-wide SQL Assistant service (shared by every session in the process)
+    """
+    with _services_lock:
+        if "sql" not in _services:
+            _services["sql"] = SQLAssistantService()
+        return _services["sql"]
+
+def get_health_service() -> HealthAdvisorService:
+    """
+    The process-wide Health Assistant service
+    """
+    with _services_lock:
+        if "health" not in _services:
+            _services["health"] = HealthAdvisorService()
+        return _services["health"]
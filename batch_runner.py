@@ -0,0 +1,210 @@
+# batch_runner.py
+# Batch question answering for the SQL Assistant, without a browser.
+# Reads questions from a JSONL file and runs them through the same service,
+# agent and tools as streamlit_react_tools_app.py, several at a time. Starts
+# are paced by a rate limiter. Each answer is appended to the output JSONL
+# as soon as it is ready, so the output doubles as the checkpoint: running the
+# same command again skips every question that already has an answer (with
+# --retry-errors, failed ones run again and the latest line for an id wins).
+#
+# Input lines:  {"id": "q1", "question": "...", "session_id": "optional"}
+#   Questions sharing a session_id are asked in file order in one conversation,
+#   so follow-ups work; other questions each get their own session. On resume,
+#   the answered turns of a conversation are restored from the output file
+#   (question, answer and SQL) before its remaining questions run.
+# Output lines: {"id", "question", "answer", "source", "sql_query", "batch_queries",
+#   "sql_failed", "error", "tool_timings", "usage", "llm_calls", "elapsed_ms"}
+#
+# Usage: python batch_runner.py questions.jsonl answers.jsonl [--concurrency 4] [--rate 1.0] [--no-cache]
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from assistant_service import SQLAssistantService, get_sql_service
+from gemini_client import TokenBucket
+
+logger = logging.getLogger("batch_runner")
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the input JSONL; questions without an "id" are numbered by line
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item.setdefault("id", str(line_number))
+            item["id"] = str(item["id"])
+            questions.append(item)
+    return questions
+
+def load_checkpoint(path: str, retry_errors: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Questions that already have an answer in the output JSONL
+
+    Args:
+        path: The output file of an earlier (possibly interrupted) run
+        retry_errors: Leave out questions that failed, so they run again
+
+    Returns:
+        The latest record of each finished question, by id
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run; the question runs again
+                continue
+            if retry_errors and record.get("error"):
+                done.pop(record["id"], None)
+            else:
+                done[record["id"]] = record
+    return done
+
+def earlier_turns(questions: List[Dict[str, Any]], finished: Dict[str, Dict[str, Any]],
+                  session_id: str, first_pending: str) -> List[Dict[str, Any]]:
+    """
+    Answered turns of a conversation that come before its first pending question, in file order
+    """
+    turns = []
+    for item in questions:
+        if item["id"] == first_pending:
+            break
+        record = finished.get(item["id"])
+        if item.get("session_id") == session_id and record and record.get("answer") and not record.get("error"):
+            turns.append(record)
+    return turns
+
+def answer_question(service: SQLAssistantService, item: Dict[str, Any], session_id: str, api_key: str,
+                    use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Run one question through the service and build its output record
+    """
+    start = time.perf_counter()
+    tool_timings = []
+    done = None
+    try:
+        for event in service.stream_ask(session_id, item["question"], api_key, use_cache=use_cache):
+            if event["event"] == "tool_result":
+                tool_timings.append({"name": event["name"], "elapsed_ms": event["elapsed_ms"]})
+            elif event["event"] == "done":
+                done = event
+    except Exception as e:
+        done = {"error": str(e)}
+    return {
+        "id": item["id"],
+        "question": item["question"],
+        "answer": done.get("answer"),
+        "source": done.get("source"),
+        "sql_query": done.get("sql_query"),
+        "batch_queries": done.get("batch_queries", []),
+        "sql_failed": done.get("sql_failed", False),
+        "error": done.get("error"),
+        "tool_timings": tool_timings,
+        "usage": done.get("usage"),
+        "llm_calls": done.get("llm_calls", 0),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
+
+def run_batch(input_path: str, output_path: str, api_key: str, concurrency: int = 4, rate: float = 1.0,
+              use_cache: bool = True, retry_errors: bool = False,
+              service: Optional[SQLAssistantService] = None) -> Dict[str, Any]:
+    """
+    Answer every question of the input file that has no answer in the output file yet
+
+    Args:
+        input_path: JSONL file with questions
+        output_path: JSONL file the answers are appended to (also the checkpoint)
+        api_key: Google AI API key
+        concurrency: Questions (or conversations) answered at the same time
+        rate: Questions started per second at most
+        use_cache: Let the similarity and plan caches answer repeated questions
+        retry_errors: Run questions again whose earlier answer was an error
+        service: The SQL Assistant service (the process-wide one by default)
+
+    Returns:
+        Summary with the number of questions answered, skipped and failed
+    """
+    service = service or get_sql_service()
+    questions = load_questions(input_path)
+    finished = load_checkpoint(output_path, retry_errors)
+    pending = [item for item in questions if item["id"] not in finished]
+
+    # Questions of one conversation run in order on one worker
+    conversations: Dict[str, List[Dict[str, Any]]] = {}
+    for item in pending:
+        conversations.setdefault(item.get("session_id") or f"batch-{item['id']}", []).append(item)
+
+    limiter = TokenBucket(rate, burst=concurrency)
+    write_lock = threading.Lock()
+    counts = {"answered": 0, "failed": 0}
+
+    def run_conversation(session_id: str, items: List[Dict[str, Any]]) -> None:
+        # A resumed conversation continues from the turns the earlier run answered
+        history = earlier_turns(questions, finished, session_id, items[0]["id"])
+        if history:
+            service.restore_history(session_id, history)
+        for item in items:
+            limiter.acquire()
+            record = answer_question(service, item, session_id, api_key, use_cache)
+            with write_lock:
+                output.write(json.dumps(record, default=str) + "\n")
+                output.flush()
+                counts["answered"] += 1
+                counts["failed"] += 1 if record["error"] else 0
+                if counts["answered"] % 10 == 0 or counts["answered"] == len(pending):
+                    logger.info("Answered %d/%d questions (%d failed)", counts["answered"], len(pending), counts["failed"])
+
+    start = time.perf_counter()
+    with open(output_path, "a+", encoding="utf-8") as output:
+        # Start on a fresh line if an interrupted run left half a record behind
+        if output.tell() > 0:
+            output.seek(output.tell() - 1)
+            if output.read(1) != "\n":
+                output.write("\n")
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(run_conversation, session_id, items) for session_id, items in conversations.items()]
+            for future in futures:
+                future.result()
+
+    return {
+        "questions": len(questions),
+        "skipped": len(questions) - len(pending),
+        "answered": counts["answered"],
+        "failed": counts["failed"],
+        "elapsed_s": round(time.perf_counter() - start, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the SQL Assistant")
+    parser.add_argument("input", help="JSONL file with {\"id\", \"question\"} lines")
+    parser.add_argument("output", help="JSONL file for the answers (re-run to resume)")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"), help="Defaults to GOOGLE_API_KEY")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions answered at the same time")
+    parser.add_argument("--rate", type=float, default=1.0, help="Questions started per second at most")
+    parser.add_argument("--no-cache", action="store_true", help="Run the agent for every question")
+    parser.add_argument("--retry-errors", action="store_true", help="Run failed questions of an earlier run again")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("No API key: pass --api-key or set GOOGLE_API_KEY")
+
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    summary = run_batch(args.input, args.output, args.api_key, args.concurrency, args.rate,
+                        use_cache=not args.no_cache, retry_errors=args.retry_errors)
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# benchmark_agent.py
+# End-to-end benchmark of the SQL agent with the offline model stand-in.
+# The agent runs the real tools from sql_agent_tools against sales_data.db while
+# FakeChatModel replays scripted tool calls, so the reported overhead per turn
+# (turn time minus simulated model time) is the cost of our own code:
+# graph steps, tool execution, result formatting and state compaction.
+#
+# Usage: python benchmark_agent.py [--turns 50] [--token-delay 0.002] [--latency 0.05] [--agent both]
+import argparse
+import math
+import statistics
+import time
+from typing import List, Dict, Any
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.prebuilt import create_react_agent
+
+from agent_graph import create_tool_agent
+from database_tools import init_database, get_schema_digest
+from fake_llm import FakeChatModel
+from sql_agent_tools import SQL_TOOLS, SQL_AGENT_PROMPT
+from state_compaction import compact_messages
+
+# Each scenario is one turn: a question, the tool calls the model makes, then its answer
+SCENARIOS = [
+    {
+        "question": "Who are our top 5 customers by total spend?",
+        "steps": [
+            {"tool_calls": [{"name": "execute_sql", "args": {"sql_query": (
+                "SELECT c.name, SUM(si.quantity * si.price_per_unit) AS total_spent FROM customers c "
+                "JOIN sales s ON c.customer_id = s.customer_id JOIN sale_items si ON s.sale_id = si.sale_id "
+                "GROUP BY c.customer_id ORDER BY total_spent DESC LIMIT 5")}}]},
+            "Your top 5 customers by total spend are listed above, led by the first customer in the table."
+        ]
+    },
+    {
+        "question": "Show me every sale with its customer",
+        "steps": [
+            {"tool_calls": [{"name": "execute_sql", "args": {"sql_query": (
+                "SELECT s.sale_id, s.sale_date, c.name FROM sales s JOIN customers c ON c.customer_id = s.customer_id")}}]},
+            "Here are the sales with their customers; the first page of results is shown."
+        ]
+    },
+    {
+        "question": "Give me total revenue, revenue by month and the top 3 products",
+        "steps": [
+            {"tool_calls": [{"name": "execute_sql_batch", "args": {"sql_queries": [
+                "SELECT SUM(quantity * price_per_unit) AS revenue FROM sale_items",
+                "SELECT strftime('%Y-%m', s.sale_date) AS month, SUM(si.quantity * si.price_per_unit) AS revenue "
+                "FROM sale_items si JOIN sales s ON s.sale_id = si.sale_id GROUP BY month",
+                "SELECT p.name, SUM(si.quantity) AS sold FROM sale_items si JOIN products p "
+                "ON p.product_id = si.product_id GROUP BY p.product_id ORDER BY sold DESC LIMIT 3"
+            ]}}]},
+            "Total revenue, the monthly breakdown and the top 3 products are shown above."
+        ]
+    },
+    {
+        "question": "How many customers and products do we have?",
+        "steps": [
+            {"tool_calls": [
+                {"name": "execute_sql", "args": {"sql_query": "SELECT COUNT(*) AS customers FROM customers"}},
+                {"name": "execute_sql", "args": {"sql_query": "SELECT COUNT(*) AS products FROM products"}}
+            ]},
+            "We have the number of customers and products shown above."
+        ]
+    },
+    {
+        "question": "What is the average order value per month?",
+        "steps": [
+            # A misspelled column is fixed by the local repair pass
+            {"tool_calls": [{"name": "execute_sql", "args": {"sql_query": (
+                "SELECT strftime('%Y-%m', s.sale_datee) AS month, AVG(si.quantity * si.price_per_unit) AS avg_value "
+                "FROM sales s JOIN sale_items si ON s.sale_id = si.sale_id GROUP BY month")}}]},
+            "The average order value per month is shown above."
+        ]
+    }
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of values
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def check_tool_results(question: str, messages: List[Any]) -> None:
+    """
+    Raise if any tool call of a turn failed, so broken scenarios can't pass as fast ones
+    """
+    for msg in messages:
+        if isinstance(msg, ToolMessage) and (msg.status == "error" or "Query Error:" in msg.content
+                                             or "Batch error:" in msg.content):
+            raise RuntimeError(f"Tool {msg.name} failed for {question!r}:\n{msg.content}")
+
+def build_agent(kind: str, model: FakeChatModel):
+    """
+    Build the SQL agent with the prebuilt ReAct graph or our concurrent one
+    """
+    prompt = SQL_AGENT_PROMPT.format(schema_digest=get_schema_digest())
+    if kind == "prebuilt":
+        return create_react_agent(model=model, tools=SQL_TOOLS, prompt=prompt)
+    return create_tool_agent(model=model, tools=SQL_TOOLS, prompt=prompt)
+
+def run_benchmark(kind: str, turns: int, token_delay: float, latency: float, warmup: int = 1) -> Dict[str, Any]:
+    """
+    Run scripted turns through one agent and measure the time spent outside the model
+
+    Args:
+        kind: "prebuilt" (langgraph create_react_agent) or "concurrent" (agent_graph)
+        turns: Number of measured turns
+        token_delay: Simulated seconds per output token
+        latency: Simulated seconds per model call before the first token
+        warmup: Rounds over all scenarios run first and not measured
+
+    Returns:
+        Dictionary with per-turn timings in milliseconds
+
+    Raises:
+        RuntimeError: If a tool call of a scenario failed
+    """
+    script = [step for scenario in SCENARIOS for step in scenario["steps"]]
+    model = FakeChatModel(script=script, token_delay=token_delay, latency=latency)
+    agent = build_agent(kind, model)
+
+    state = []
+    samples = []
+    for turn in range(warmup * len(SCENARIOS) + turns):
+        scenario = SCENARIOS[turn % len(SCENARIOS)]
+        messages = state + [HumanMessage(content=scenario["question"])]
+
+        model_before = model.stats()["model_seconds"]
+        start = time.perf_counter()
+        response = agent.invoke({"messages": messages})
+        state = compact_messages(response["messages"])
+        wall = time.perf_counter() - start
+        model_seconds = model.stats()["model_seconds"] - model_before
+
+        check_tool_results(scenario["question"], response["messages"][len(messages):])
+        if turn < warmup * len(SCENARIOS):
+            continue
+        tool_ms = sum(
+            msg.additional_kwargs.get("elapsed_ms", 0)
+            for msg in response["messages"][len(messages):] if isinstance(msg, ToolMessage)
+        )
+        samples.append({"wall_ms": wall * 1000, "model_ms": model_seconds * 1000,
+                        "overhead_ms": (wall - model_seconds) * 1000, "tool_ms": tool_ms})
+
+    overhead = [sample["overhead_ms"] for sample in samples]
+    return {
+        "agent": kind,
+        "turns": len(samples),
+        "wall_ms_mean": statistics.mean(sample["wall_ms"] for sample in samples),
+        "model_ms_mean": statistics.mean(sample["model_ms"] for sample in samples),
+        "overhead_ms_mean": statistics.mean(overhead),
+        "overhead_ms_p50": percentile(overhead, 50),
+        "overhead_ms_p95": percentile(overhead, 95),
+        "tool_ms_mean": statistics.mean(sample["tool_ms"] for sample in samples),
+        "model_calls": model.stats()["calls"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQL agent with an offline model")
+    parser.add_argument("--turns", type=int, default=50, help="Measured turns per agent")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Simulated seconds per output token")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per model call")
+    parser.add_argument("--agent", choices=["prebuilt", "concurrent", "both"], default="both")
+    args = parser.parse_args()
+
+    init_database()
+    kinds = ["prebuilt", "concurrent"] if args.agent == "both" else [args.agent]
+
+    print(f"{'agent':<12} {'turns':>6} {'wall':>9} {'model':>9} {'overhead':>9} {'p50':>8} {'p95':>8} {'tools':>8}")
+    for kind in kinds:
+        result = run_benchmark(kind, args.turns, args.token_delay, args.latency)
+        # Only our tool node records per-call tool times
+        tools = f"{result['tool_ms_mean']:.1f}ms" if kind == "concurrent" else "n/a"
+        print(f"{result['agent']:<12} {result['turns']:>6} {result['wall_ms_mean']:>7.1f}ms {result['model_ms_mean']:>7.1f}ms "
+              f"{result['overhead_ms_mean']:>7.1f}ms {result['overhead_ms_p50']:>6.1f}ms {result['overhead_ms_p95']:>6.1f}ms "
+              f"{tools:>8}")
+
+if __name__ == "__main__":
+    main()
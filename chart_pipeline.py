@@ -0,0 +1,235 @@
+# chart_pipeline.py
+# Downsampled, cached charts for the Data Visualization tab.
+# Without it every rerun opened a new matplotlib figure that was never closed
+# (pyplot keeps a reference to each one, so memory grew with every rerun), and
+# line and bar charts sent every row of the file to the browser.
+#
+# Every chart is built once per (data hash, chart type, columns) and kept in a
+# small LRU cache:
+#   - line charts: each series is reduced to MAX_LINE_POINTS points with
+#     Largest-Triangle-Three-Buckets (LTTB), which keeps the peaks and dips a
+#     plain every-n-th-row sample loses
+#   - bar charts: consecutive rows are averaged into MAX_BAR_POINTS bars
+#   - histograms: binned with numpy, then drawn from the bin counts
+#   - scatter plots: up to MAX_SCATTER_POINTS points are drawn as they are;
+#     more are binned into a SCATTER_BINS x SCATTER_BINS density grid
+# Histograms and scatter plots are rendered to PNG bytes on a standalone
+# matplotlib Figure (not registered with pyplot) that is cleared as soon as
+# it is saved, so no figure outlives the call that drew it.
+#
+# Usage:
+#   chart = render_chart(df, digest, "Histogram", ["amount"])
+#   if chart["kind"] == "image": st.image(chart["png"])
+#   else: st.line_chart(chart["data"])
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+logger = logging.getLogger("chart_pipeline")
+
+# Points per line series sent to the browser at most
+MAX_LINE_POINTS = int(os.environ.get("CHART_MAX_POINTS", 2000))
+
+# Bars sent to the browser at most
+MAX_BAR_POINTS = 500
+
+# Scatter plots with more points are drawn as a density grid
+MAX_SCATTER_POINTS = 5000
+SCATTER_BINS = 200
+
+HISTOGRAM_BINS = 20
+
+# Charts kept in the cache
+MAX_CACHED_CHARTS = 64
+
+CHART_TYPES = ("Line Chart", "Bar Chart", "Histogram", "Scatter Plot")
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps
+
+    Args:
+        x: Increasing x values
+        y: y values (no NaN)
+        threshold: Points to keep
+
+    Returns:
+        Sorted indices into x and y, always including the first and last point
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # The first and last points stay; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # The next bucket's average point is the triangle's third corner
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        # Keep the point of this bucket that spans the largest triangle
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        keep[i + 1] = previous
+    return keep
+
+def _line_data(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    The selected columns reduced with LTTB; rows any series keeps are kept for all
+    """
+    if len(df) <= MAX_LINE_POINTS:
+        return df[columns]
+    x = np.arange(len(df), dtype=np.float64)
+    rows = set()
+    for column in columns:
+        y = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = np.flatnonzero(~np.isnan(y))
+        rows.update(valid[lttb(x[valid], y[valid], MAX_LINE_POINTS)].tolist())
+    return df[columns].iloc[sorted(rows)]
+
+def _bar_data(df: pd.DataFrame, column: str) -> pd.DataFrame:
+    """
+    The column averaged over runs of consecutive rows, indexed by each run's first row
+    """
+    if len(df) <= MAX_BAR_POINTS:
+        return df[[column]]
+    size = -(-len(df) // MAX_BAR_POINTS)
+    values = pd.to_numeric(df[column], errors="coerce").astype("float64").reset_index(drop=True)
+    averaged = values.groupby(values.index // size).mean()
+    averaged.index = averaged.index * size
+    return averaged.to_frame(column)
+
+def _png(figure: Figure) -> bytes:
+    """
+    Save a figure as PNG bytes and release what it holds
+    """
+    buffer = io.BytesIO()
+    try:
+        figure.savefig(buffer, format="png", bbox_inches="tight")
+    finally:
+        figure.clear()
+    return buffer.getvalue()
+
+def _histogram(df: pd.DataFrame, column: str) -> bytes:
+    values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    # A standalone Figure: pyplot never holds a reference to it
+    figure = Figure()
+    ax = figure.subplots()
+    ax.stairs(counts, edges, fill=True, alpha=0.7)
+    ax.set_xlabel(column)
+    ax.set_ylabel("Frequency")
+    return _png(figure)
+
+def _scatter(df: pd.DataFrame, x_column: str, y_column: str) -> bytes:
+    points = df[[x_column, y_column]].apply(pd.to_numeric, errors="coerce").dropna()
+    # By position: x and y may be the same column
+    x = points.iloc[:, 0].to_numpy(dtype=np.float64)
+    y = points.iloc[:, 1].to_numpy(dtype=np.float64)
+    figure = Figure()
+    ax = figure.subplots()
+    if len(points) <= MAX_SCATTER_POINTS:
+        ax.scatter(x, y, alpha=0.6)
+    else:
+        # Too many points to see individually: draw how many fall in each cell
+        counts, x_edges, y_edges = np.histogram2d(x, y, bins=SCATTER_BINS)
+        mesh = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap="viridis")
+        figure.colorbar(mesh, ax=ax, label="Points")
+    ax.set_xlabel(x_column)
+    ax.set_ylabel(y_column)
+    return _png(figure)
+
+class ChartCache:
+    """
+    LRU cache of built charts by (data hash, chart type, columns)
+    """
+
+    def __init__(self, max_charts: int = MAX_CACHED_CHARTS):
+        self.max_charts = max_charts
+        self._charts: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Any:
+        with self._lock:
+            chart = self._charts.get(key)
+            if chart is None:
+                self._misses += 1
+                return None
+            self._charts.move_to_end(key)
+            self._hits += 1
+            return chart
+
+    def put(self, key: Tuple, chart: Dict[str, Any]) -> None:
+        with self._lock:
+            self._charts[key] = chart
+            self._charts.move_to_end(key)
+            while len(self._charts) > self.max_charts:
+                self._charts.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._charts.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {"charts": len(self._charts), "hits": self._hits, "misses": self._misses,
+                    "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0}
+
+_cache = ChartCache()
+
+def get_chart_cache() -> ChartCache:
+    return _cache
+
+def render_chart(df: pd.DataFrame, data_key: str, chart_type: str, columns: List[str]) -> Dict[str, Any]:
+    """
+    Build (or fetch from the cache) a chart of a DataFrame
+
+    Args:
+        df: The data (read-only)
+        data_key: Hash identifying df's content, e.g. the upload digest
+        chart_type: One of CHART_TYPES
+        columns: Line chart: the series; bar chart and histogram: one column;
+            scatter plot: the x and y columns
+
+    Returns:
+        {"kind": "line" | "bar", "data": DataFrame, "points": rows sent} for
+        Streamlit's native charts, or {"kind": "image", "png": bytes, "points": rows drawn}
+    """
+    if chart_type not in CHART_TYPES:
+        raise ValueError(f"Unknown chart type {chart_type!r}")
+    key = (data_key, chart_type, tuple(columns))
+    chart = _cache.get(key)
+    if chart is not None:
+        return chart
+
+    if chart_type == "Line Chart":
+        data = _line_data(df, columns)
+        chart = {"kind": "line", "data": data, "points": len(data)}
+    elif chart_type == "Bar Chart":
+        data = _bar_data(df, columns[0])
+        chart = {"kind": "bar", "data": data, "points": len(data)}
+    elif chart_type == "Histogram":
+        chart = {"kind": "image", "png": _histogram(df, columns[0]), "points": len(df)}
+    else:
+        chart = {"kind": "image", "png": _scatter(df, columns[0], columns[1]),
+                 "points": min(len(df), MAX_SCATTER_POINTS) if len(df) <= MAX_SCATTER_POINTS else SCATTER_BINS ** 2}
+    chart["rows"] = len(df)
+    logger.info("Built %s of %s (%s): %d rows -> %d points", chart_type, data_key[:12], ", ".join(columns),
+                len(df), chart["points"])
+    _cache.put(key, chart)
+    return chart
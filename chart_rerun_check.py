@@ -0,0 +1,123 @@
+# chart_rerun_check.py
+# Headless check that the Data Visualization tab of the comprehensive chatbot
+# doesn't leak with every rerun. A Streamlit AppTest session gets a generated
+# CSV upload (put straight into the upload cache) and then reruns the app
+# --reruns times, switching the chart type each time. Every --every reruns it
+# reports the open pyplot figures, the peak resident memory (ru_maxrss) and
+# the chart cache, and at the end it fails if a figure was left open, the app
+# raised, or peak memory grew by more than --max-growth-mb between the first
+# sample and the end. The first --every reruns settle Streamlit's own caches,
+# so only growth that keeps going with the reruns counts.
+#
+# Usage: python chart_rerun_check.py [--reruns 1000] [--rows 200000] [--every 100] [--max-growth-mb 20]
+import argparse
+import gc
+import logging
+import os
+import resource
+from typing import Dict, Any, Optional, Callable
+from unittest.mock import patch
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+import chart_pipeline
+from fake_llm import FakeChatModel
+from upload_cache import get_upload_cache
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_comprehensive_chatbot.py")
+
+# Seconds one rerun of the app may take
+RUN_TIMEOUT = 120
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident memory of this process in MB (ru_maxrss is in KB on Linux)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def upload_frame(rows: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    A generated CSV upload in the shared upload cache, as the session stores it
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"trend": np.cumsum(rng.normal(size=rows)), "noise": rng.normal(size=rows),
+                       "units": rng.integers(0, 100, size=rows)})
+    data = df.to_csv(index=False).encode()
+    digest = get_upload_cache().put(data, "chart_check.csv", "csv")
+    return {"name": "chart_check.csv", "digest": digest, "file_id": "chart-check", "size": len(data),
+            "type": "csv", "upload_id": f"f_{digest[:8]}"}
+
+def run_check(reruns: int, rows: int, every: int = 100,
+              report: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Rerun the app's Data Visualization tab, cycling through the chart types
+
+    Args:
+        reruns: Reruns of the app
+        rows: Rows of the generated upload
+        every: Reruns between progress samples
+        report: Called with each sample
+
+    Returns:
+        Dictionary with the samples, the open figures and app exceptions at the
+        end, the peak memory at the first sample and at the end, and the chart cache stats
+    """
+    upload = upload_frame(rows)
+    samples = []
+    with patch("gemini_client.get_chat_model", return_value=FakeChatModel(script=["ok"])):
+        at = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT)
+        at.session_state["uploaded_file"] = upload
+        at.run()
+        at.sidebar.text_input[0].set_value("offline-chart-check").run()
+
+        def select(chart_type: str) -> None:
+            next(box for box in at.selectbox if box.label == "Chart Type").set_value(chart_type).run()
+
+        for i in range(1, reruns + 1):
+            select(chart_pipeline.CHART_TYPES[i % len(chart_pipeline.CHART_TYPES)])
+            if i % every == 0 or i == reruns:
+                gc.collect()
+                sample = {"rerun": i, "figures": len(plt.get_fignums()), "peak_rss_mb": round(peak_rss_mb(), 1),
+                          "cache": chart_pipeline.get_chart_cache().stats()}
+                samples.append(sample)
+                if report:
+                    report(sample)
+    return {"samples": samples, "figures": plt.get_fignums(), "exceptions": [e.value for e in at.exception],
+            "errors": [e.value for e in at.error], "baseline_mb": samples[0]["peak_rss_mb"],
+            "peak_rss_mb": round(peak_rss_mb(), 1), "cache": chart_pipeline.get_chart_cache().stats()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that chart reruns don't leak figures or memory")
+    parser.add_argument("--reruns", type=int, default=1000, help="Reruns of the app")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows of the generated CSV upload")
+    parser.add_argument("--every", type=int, default=100, help="Reruns between progress lines")
+    parser.add_argument("--max-growth-mb", type=float, default=20,
+                        help="Allowed peak memory growth after the first sample")
+    args = parser.parse_args()
+
+    # Keep the app's per-rerun INFO logs out of the report
+    logging.basicConfig(level=logging.WARNING)
+    print(f"{'rerun':>6} {'figures':>7} {'peak MB':>8} {'charts':>6} {'hit rate':>8}")
+    result = run_check(args.reruns, args.rows, args.every, report=lambda sample: print(
+        f"{sample['rerun']:>6} {sample['figures']:>7} {sample['peak_rss_mb']:>8.1f} "
+        f"{sample['cache']['charts']:>6} {sample['cache']['hit_rate']:>8.3f}"))
+
+    growth = result["peak_rss_mb"] - result["baseline_mb"]
+    print(f"Peak memory {result['baseline_mb']:.1f} MB at rerun {result['samples'][0]['rerun']}, "
+          f"{result['peak_rss_mb']:.1f} MB at the end ({growth:+.1f} MB)")
+    problems = []
+    if result["figures"]:
+        problems.append(f"{len(result['figures'])} pyplot figures left open")
+    if result["exceptions"] or result["errors"]:
+        problems.append(f"the app failed: {(result['exceptions'] + result['errors'])[0]}")
+    if growth > args.max_growth_mb:
+        problems.append(f"peak memory grew by {growth:.1f} MB (allowed {args.max_growth_mb:.0f} MB)")
+    if problems:
+        raise SystemExit("FAILED: " + "; ".join(problems))
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# column_stats.py
+# Per-column statistics for the schema payload given to the SQL agents.
+# Distinct counts, min/max, the most common values and the null fraction tell
+# the model which literals actually exist (e.g. 'Moderate', not 'moderate'),
+# which avoids queries that fail or come back empty and need another turn.
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
+
+# Number of most common values reported per column
+DEFAULT_TOP_K = 5
+
+# Longer text values are cut to this length in the payload
+MAX_VALUE_LENGTH = 40
+
+# Cached statistics per (database path, table): {"version": ..., "stats": ...}
+_stats_cache = {}
+_stats_lock = threading.Lock()
+
+def _short(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + "..."
+    return value
+
+def _compute_table_stats(cursor: sqlite3.Cursor, table_name: str, top_k: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute statistics for every column of one table
+    """
+    columns = [col[1] for col in cursor.execute(f'PRAGMA table_info("{table_name}")').fetchall()]
+    row_count = cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+
+    table_stats = {}
+    for column in columns:
+        distinct, minimum, maximum, nulls = cursor.execute(
+            f'SELECT COUNT(DISTINCT "{column}"), MIN("{column}"), MAX("{column}"), '
+            f'SUM(CASE WHEN "{column}" IS NULL THEN 1 ELSE 0 END) FROM "{table_name}"'
+        ).fetchone()
+        top_values = cursor.execute(
+            f'SELECT "{column}", COUNT(*) AS n FROM "{table_name}" WHERE "{column}" IS NOT NULL '
+            f'GROUP BY "{column}" ORDER BY n DESC, "{column}" LIMIT ?',
+            (top_k,)
+        ).fetchall()
+
+        column_stats = {
+            "distinct": distinct,
+            "min": _short(minimum),
+            "max": _short(maximum),
+            "null_fraction": round((nulls or 0) / row_count, 3) if row_count else 0.0
+        }
+        # Top values only help for repeated values; unique columns (ids, names) skip them
+        if distinct and distinct < row_count:
+            column_stats["top_values"] = [[_short(value), count] for value, count in top_values]
+        table_stats[column] = column_stats
+
+    return table_stats
+
+def get_column_stats(db_path: str, top_k: int = DEFAULT_TOP_K) -> Dict[str, Any]:
+    """
+    Get per-column statistics for every table in a SQLite database
+
+    Statistics are cached per table and only recomputed after something was
+    committed to the database (see database_tools.get_database_version), so
+    in-place UPDATEs are picked up as well as inserts and deletes.
+    The database is opened read-only: reading statistics never writes to it.
+
+    Args:
+        db_path: Path to the SQLite database file
+        top_k: Number of most common values to report per column
+
+    Returns:
+        Dictionary mapping table name to {column name: statistics}, or {"error": ...}
+    """
+    # database_tools imports this module
+    from database_tools import get_database_version
+
+    try:
+        version = (get_database_version(db_path), top_k)
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        cursor = conn.cursor()
+        tables = [
+            row[0] for row in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+        ]
+
+        stats = {}
+        with _stats_lock:
+            for table_name in tables:
+                key = (db_path, table_name)
+                cached = _stats_cache.get(key)
+                if cached is None or cached["version"] != version:
+                    cached = {
+                        "version": version,
+                        "stats": _compute_table_stats(cursor, table_name, top_k)
+                    }
+                    _stats_cache[key] = cached
+                stats[table_name] = cached["stats"]
+
+            # Forget tables that were dropped
+            for key in [k for k in _stats_cache if k[0] == db_path and k[1] not in tables]:
+                del _stats_cache[key]
+
+        conn.close()
+        return stats
+
+    except sqlite3.Error as e:
+        return {"error": str(e)}
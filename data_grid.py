@@ -0,0 +1,311 @@
+# data_grid.py
+# Server-side pagination for the data tables shown in the chatbot, so a table
+# (or uploaded file) of any size is displayed one page at a time instead of
+# being sent to the browser whole.
+#
+# Two sources share one page format:
+#   - sql_page() reads a page of a SQLite table. Sorting and filters become
+#     ORDER BY and WHERE clauses (pushed down to SQLite), so only the visible
+#     rows are ever fetched. Moving to the next page continues from the last
+#     row of the previous one (keyset pagination on (sort column, rowid)),
+#     which costs the same on page 1 and page 200,000; jumping to an arbitrary
+#     page falls back to LIMIT/OFFSET. Row counts are cached until something
+#     is committed to the database (database_tools.get_database_version).
+#   - frame_page() pages a cached DataFrame (e.g. an upload from upload_cache).
+#     The row order for a sort or filter is computed once and cached per
+#     (data hash, sort, filters); without either, a page is a plain slice.
+#
+# Filters are (column, operator, value) tuples with an operator from
+# FILTER_OPS; column names are checked against the table, values are bound.
+#
+# Usage:
+#   page = sql_page("sales_data.db", "sales", page=0, sort="total_amount", descending=True)
+#   page["data"]        # DataFrame of the page's rows
+#   sql_page(..., page=1, after=page["last_key"])   # next page by keyset
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from database_tools import get_database_version
+
+# Rows per page unless asked otherwise, and at most
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+FILTER_OPS = ("=", "!=", "<", "<=", ">", ">=", "contains", "starts with", "is null", "is not null")
+
+# Cached row counts (SQL) and row orders (DataFrames)
+MAX_CACHED_COUNTS = 256
+MAX_CACHED_ORDERS = 8
+
+_ROWID = "__grid_rowid__"
+
+Filter = Tuple[str, str, Any]
+
+class _LRU:
+    """
+    Small thread-safe LRU dictionary
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+_counts = _LRU(MAX_CACHED_COUNTS)
+_orders = _LRU(MAX_CACHED_ORDERS)
+
+def _page_bounds(total: int, page: int, page_size: int) -> Tuple[int, int, int]:
+    """
+    (page clamped to the existing pages, page count, page size clamped to MAX_PAGE_SIZE)
+    """
+    page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+    pages = max(math.ceil(total / page_size), 1)
+    return min(max(int(page), 0), pages - 1), pages, page_size
+
+def _connect_read_only(db_path: str) -> sqlite3.Connection:
+    if not os.path.exists(db_path):
+        raise ValueError(f"Database not found: {db_path}")
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=10)
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def table_columns(db_path: str, table: str) -> List[str]:
+    """
+    Column names of a table or view (ValueError if there is no such table)
+    """
+    with closing(_connect_read_only(db_path)) as conn:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+                              (table,)).fetchone()
+        if not exists:
+            raise ValueError(f"No such table: {table}")
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+
+def _where(filters: List[Filter], columns: List[str]) -> Tuple[List[str], List[Any]]:
+    """
+    WHERE conditions and their parameters for the filters
+    """
+    conditions, params = [], []
+    for column, op, value in filters:
+        if column not in columns:
+            raise ValueError(f"Unknown column {column!r}")
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unknown filter operator {op!r}")
+        if op == "is null":
+            conditions.append(f"{_quote(column)} IS NULL")
+        elif op == "is not null":
+            conditions.append(f"{_quote(column)} IS NOT NULL")
+        elif op in ("contains", "starts with"):
+            pattern = str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append(f"{_quote(column)} LIKE ? ESCAPE '\\'")
+            params.append(f"%{pattern}%" if op == "contains" else f"{pattern}%")
+        else:
+            # A bound value has no type affinity, so a numeric column compares '5' as 5
+            conditions.append(f"{_quote(column)} {op} ?")
+            params.append(value)
+    return conditions, params
+
+def _keyset(sort: Optional[str], descending: bool, after: Tuple) -> Tuple[str, List[Any]]:
+    """
+    Condition for the rows after (sort value, rowid) in the grid's order.
+    SQLite sorts NULLs first ascending and last descending.
+    """
+    value, rowid = after
+    if sort is None:
+        return ("rowid < ?", [rowid]) if descending else ("rowid > ?", [rowid])
+    column = _quote(sort)
+    if descending:
+        if value is None:
+            return f"({column} IS NULL AND rowid < ?)", [rowid]
+        return f"({column} < ? OR ({column} = ? AND rowid < ?) OR {column} IS NULL)", [value, value, rowid]
+    if value is None:
+        return f"(({column} IS NULL AND rowid > ?) OR {column} IS NOT NULL)", [rowid]
+    return f"({column} > ? OR ({column} = ? AND rowid > ?))", [value, value, rowid]
+
+def sql_page(db_path: str, table: str, page: int = 0, page_size: int = PAGE_SIZE, sort: Optional[str] = None,
+             descending: bool = False, filters: Optional[List[Filter]] = None,
+             after: Optional[Tuple] = None) -> Dict[str, Any]:
+    """
+    One page of a SQLite table
+
+    Args:
+        db_path: Database file
+        table: Table name
+        page: Page number (0-based; clamped to the last page)
+        page_size: Rows per page
+        sort: Column to sort by (table order if None)
+        descending: Sort descending
+        filters: (column, operator, value) tuples, all of which must match
+        after: "last_key" of the previous page, to continue from it instead of
+            skipping page * page_size rows
+
+    Returns:
+        Dictionary with "data" (DataFrame), "page", "pages", "page_size",
+        "total_rows", "last_key" (for the next page; None for tables without a
+        rowid), "method" ("keyset" or "offset") and "elapsed_ms",
+        or {"error": ...}
+    """
+    start = time.perf_counter()
+    filters = list(filters or [])
+    try:
+        columns = table_columns(db_path, table)
+        if sort is not None and sort not in columns:
+            raise ValueError(f"Unknown column {sort!r}")
+        conditions, params = _where(filters, columns)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with closing(_connect_read_only(db_path)) as conn:
+            count_key = (db_path, get_database_version(db_path), table, where, tuple(params))
+            total = _counts.get(count_key)
+            if total is None:
+                total = conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}{where}", params).fetchone()[0]
+                _counts.put(count_key, total)
+            page, pages, page_size = _page_bounds(total, page, page_size)
+
+            try:
+                conn.execute(f"SELECT rowid FROM {_quote(table)} LIMIT 0")
+                has_rowid = True
+            except sqlite3.OperationalError:
+                has_rowid = False
+
+            direction = "DESC" if descending else "ASC"
+            if has_rowid:
+                order = f"{_quote(sort)} {direction}, rowid {direction}" if sort else f"rowid {direction}"
+                select = f"SELECT rowid AS {_ROWID}, * FROM {_quote(table)}"
+            else:
+                order = f"{_quote(sort)} {direction}" if sort else "1"
+                select = f"SELECT * FROM {_quote(table)}"
+
+            if has_rowid and after is not None:
+                keyset, keyset_params = _keyset(sort, descending, tuple(after))
+                sql = f"{select} WHERE {' AND '.join(conditions + [keyset])} ORDER BY {order} LIMIT ?"
+                cursor = conn.execute(sql, params + keyset_params + [page_size])
+                method = "keyset"
+            else:
+                sql = f"{select}{where} ORDER BY {order} LIMIT ? OFFSET ?"
+                cursor = conn.execute(sql, params + [page_size, page * page_size])
+                method = "offset"
+            names = [description[0] for description in cursor.description]
+            data = pd.DataFrame(cursor.fetchall(), columns=names)
+    except (sqlite3.Error, ValueError) as e:
+        return {"error": str(e)}
+
+    last_key = None
+    if has_rowid:
+        if len(data):
+            last = data.iloc[-1]
+            sort_value = last[sort] if sort else None
+            if pd.isna(sort_value):
+                sort_value = None
+            elif hasattr(sort_value, "item"):
+                # A numpy scalar (numpy.int64 binds as a BLOB, which never equals an INTEGER)
+                sort_value = sort_value.item()
+            last_key = (sort_value, int(last[_ROWID]))
+        data = data.drop(columns=[_ROWID])
+    return {"data": data, "page": page, "pages": pages, "page_size": page_size, "total_rows": total,
+            "last_key": last_key, "method": method, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+def _frame_mask(df: pd.DataFrame, filters: List[Filter]) -> np.ndarray:
+    """
+    Rows matching every filter, with the same semantics as the SQL filters
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, value in filters:
+        if column not in df.columns:
+            raise ValueError(f"Unknown column {column!r}")
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unknown filter operator {op!r}")
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(series.cat.categories.dtype)
+        if op == "is null":
+            matched = series.isna()
+        elif op == "is not null":
+            matched = series.notna()
+        elif op == "contains":
+            matched = series.astype(str).str.contains(str(value), case=False, regex=False) & series.notna()
+        elif op == "starts with":
+            matched = series.astype(str).str.lower().str.startswith(str(value).lower()) & series.notna()
+        else:
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                value = pd.to_numeric(value)
+            matched = {"=": series.eq, "!=": series.ne, "<": series.lt, "<=": series.le,
+                       ">": series.gt, ">=": series.ge}[op](value)
+            if op == "!=":
+                # NULL != x is not true in SQL either
+                matched = matched & series.notna()
+        mask &= matched.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+def _frame_order(df: pd.DataFrame, data_key: str, sort: Optional[str], descending: bool,
+                 filters: List[Filter]) -> Optional[np.ndarray]:
+    """
+    Row positions of df in the grid's order (None: all rows in their own order)
+    """
+    if sort is None and not filters and not descending:
+        return None
+    key = (data_key, len(df), sort, descending, tuple((column, op, str(value)) for column, op, value in filters))
+    positions = _orders.get(key)
+    if positions is not None:
+        return positions
+    positions = np.flatnonzero(_frame_mask(df, filters)) if filters else np.arange(len(df))
+    if descending:
+        # Ties (and the unsorted order) run backwards too, like "ORDER BY ... DESC, rowid DESC"
+        positions = positions[::-1]
+    if sort is not None:
+        if sort not in df.columns:
+            raise ValueError(f"Unknown column {sort!r}")
+        values = df[sort].iloc[positions].reset_index(drop=True)
+        ordered = values.sort_values(ascending=not descending, kind="stable",
+                                     na_position="last" if descending else "first")
+        positions = positions[ordered.index.to_numpy()]
+    _orders.put(key, positions)
+    return positions
+
+def frame_page(df: pd.DataFrame, data_key: str, page: int = 0, page_size: int = PAGE_SIZE,
+               sort: Optional[str] = None, descending: bool = False, filters: Optional[List[Filter]] = None,
+               after: Optional[Tuple] = None) -> Dict[str, Any]:
+    """
+    One page of a DataFrame, in the same format as sql_page
+
+    Args:
+        df: The data (read-only)
+        data_key: Hash identifying df's content, e.g. the upload digest
+        after: Ignored; pages of a DataFrame are addressed directly
+        (the other arguments are those of sql_page)
+    """
+    start = time.perf_counter()
+    try:
+        positions = _frame_order(df, data_key, sort, descending, list(filters or []))
+    except (ValueError, TypeError) as e:
+        return {"error": str(e)}
+    total = len(df) if positions is None else len(positions)
+    page, pages, page_size = _page_bounds(total, page, page_size)
+    window = slice(page * page_size, (page + 1) * page_size)
+    data = df.iloc[window] if positions is None else df.iloc[positions[window]]
+    return {"data": data, "page": page, "pages": pages, "page_size": page_size, "total_rows": total,
+            "last_key": None, "method": "slice" if positions is None else "cached order",
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
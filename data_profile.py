@@ -0,0 +1,304 @@
+# data_profile.py
+# Approximate profiling of uploaded datasets in a single chunked pass, so large
+# files get column statistics without describe(), head() and
+# memory_usage(deep=True) running over the full data on every rerun.
+#
+# For every column, DataProfiler keeps mergeable per-chunk accumulators:
+#   - count and nulls, min and max
+#   - mean and variance, merged chunk by chunk (Chan et al.'s parallel
+#     form of Welford's algorithm), so they are exact without a second pass
+#   - approximate distinct count: a k-minimum-values sketch of 64-bit hashes
+#     (exact below KMV_SIZE distinct values, about 3% error above)
+#   - approximate quantiles and top values from a uniform reservoir sample of
+#     RESERVOIR_ROWS rows (Algorithm R)
+# From these it derives compact dtypes: the smallest integer type that holds
+# min..max, nullable integers for whole-number floats with gaps, float32 where
+# every value round-trips exactly, and category for repetitive text. read_csv_compact() reads
+# a file straight into those dtypes.
+#
+# Profiles and compact DataFrames are cached per file hash by upload_cache.
+#
+# Usage:
+#   profile = profile_csv("big.csv")
+#   df = read_csv_compact("big.csv", profile)
+import logging
+import math
+import time
+from typing import List, Dict, Any, Optional, Union, IO
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("data_profile")
+
+# Rows read at a time
+PROFILE_CHUNK_ROWS = 100_000
+
+# Rows kept in the uniform sample (quantiles, top values, memory estimate)
+RESERVOIR_ROWS = 10_000
+
+# Hashes kept per column by the distinct-count sketch
+KMV_SIZE = 1024
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_RATIO = 0.5
+
+# First rows kept as a preview
+HEAD_ROWS = 5
+
+# Column kinds from narrowest to widest; a column takes the widest kind seen in any chunk
+_KINDS = ("bool", "int", "float", "text")
+_SLOT = "__reservoir_slot__"
+
+def _kind(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "int"
+    if pd.api.types.is_float_dtype(dtype):
+        return "float"
+    return "text"
+
+def _smallest_int(low: float, high: float, nullable: bool) -> str:
+    """
+    Smallest integer dtype that holds low..high ("uint8", "int16", "Int32", ...)
+    """
+    for bits in (8, 16, 32, 64):
+        if low >= 0 and high <= np.iinfo(f"uint{bits}").max:
+            name = f"uint{bits}"
+            break
+        if np.iinfo(f"int{bits}").min <= low and high <= np.iinfo(f"int{bits}").max:
+            name = f"int{bits}"
+            break
+    else:
+        name = "int64"
+    return name.capitalize().replace("Uint", "UInt") if nullable else name
+
+class ColumnStats:
+    """
+    Streaming statistics of one column, updated chunk by chunk
+    """
+
+    def __init__(self):
+        self.kind: Optional[str] = None
+        self.count = 0
+        self.nulls = 0
+        # Numeric accumulators (parallel Welford)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.integral = True
+        self.float32_ok = True
+        # Text accumulators
+        self.max_length = 0
+        # Distinct-count sketch: the KMV_SIZE smallest hashes seen
+        self.kmv = np.empty(0, dtype=np.uint64)
+
+    def update(self, series: pd.Series) -> None:
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        self.count += len(values)
+        kind = _kind(series.dtype)
+        self.kind = kind if self.kind is None else max(self.kind, kind, key=_KINDS.index)
+        if len(values) == 0:
+            return
+
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        if len(self.kmv) == KMV_SIZE:
+            hashes = hashes[hashes < self.kmv[-1]]
+        if len(hashes):
+            self.kmv = np.unique(np.concatenate([self.kmv, hashes]))[:KMV_SIZE]
+
+        if kind == "text":
+            self.max_length = max(self.max_length, int(values.astype(str).str.len().max()))
+            return
+        numbers = values.to_numpy(dtype=np.float64)
+        chunk_n = len(numbers)
+        chunk_mean = float(numbers.mean())
+        chunk_m2 = float(((numbers - chunk_mean) ** 2).sum())
+        # Combine this chunk's mean and squared deviations with the running ones
+        total = self.n + chunk_n
+        delta = chunk_mean - self.mean
+        self.mean += delta * chunk_n / total
+        self.m2 += chunk_m2 + delta * delta * self.n * chunk_n / total
+        self.n = total
+        self.min = min(self.min, float(numbers.min()))
+        self.max = max(self.max, float(numbers.max()))
+        if kind == "float":
+            finite = numbers[np.isfinite(numbers)]
+            self.integral = self.integral and bool((finite % 1 == 0).all())
+            # Only when every value survives the round trip unchanged
+            self.float32_ok = self.float32_ok and bool((finite.astype(np.float32).astype(np.float64) == finite).all())
+
+    def distinct(self) -> int:
+        """
+        Approximate number of distinct values (exact below KMV_SIZE)
+        """
+        if len(self.kmv) < KMV_SIZE:
+            return len(self.kmv)
+        # The k-th smallest of n uniform hashes sits near k / n of the hash range
+        return int((KMV_SIZE - 1) / (float(self.kmv[-1]) / 2 ** 64))
+
+    def compact_dtype(self) -> Optional[str]:
+        """
+        The most compact dtype that keeps every value (None to keep pandas' own)
+        """
+        if self.count == 0:
+            return None
+        if self.kind == "bool":
+            return "bool" if self.nulls == 0 else "boolean"
+        if self.kind == "int" or (self.kind == "float" and self.integral):
+            return _smallest_int(self.min, self.max, nullable=self.nulls > 0 or self.kind == "float")
+        if self.kind == "float":
+            return "float32" if self.float32_ok else "float64"
+        if self.distinct() <= self.count * CATEGORY_RATIO:
+            return "category"
+        return None
+
+class DataProfiler:
+    """
+    One-pass, chunked profile of a dataset: feed chunks to update(), then call result()
+    """
+
+    def __init__(self, reservoir_rows: int = RESERVOIR_ROWS, seed: int = 0):
+        self.reservoir_rows = reservoir_rows
+        self.rows = 0
+        self.columns: Dict[str, ColumnStats] = {}
+        self.head: Optional[pd.DataFrame] = None
+        self.sample: Optional[pd.DataFrame] = None
+        self.original_bytes = 0
+        self._rng = np.random.default_rng(seed)
+        self._start = time.perf_counter()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        chunk.columns = [str(column) for column in chunk.columns]
+        if self.head is None:
+            self.head = chunk.head(HEAD_ROWS)
+        for column in chunk.columns:
+            self.columns.setdefault(column, ColumnStats()).update(chunk[column])
+        self.original_bytes += int(chunk.memory_usage(deep=True, index=False).sum())
+        self._sample(chunk)
+        self.rows += len(chunk)
+
+    def _sample(self, chunk: pd.DataFrame) -> None:
+        """
+        Algorithm R over the chunk: row i fills slot i until the reservoir is
+        full, then replaces a random slot with probability reservoir_rows / (i + 1)
+        """
+        positions = np.arange(self.rows, self.rows + len(chunk))
+        slots = np.where(positions < self.reservoir_rows, positions, self._rng.integers(0, positions + 1))
+        keep = slots < self.reservoir_rows
+        if not keep.any():
+            return
+        picked = chunk.iloc[np.flatnonzero(keep)].assign(**{_SLOT: slots[keep]})
+        combined = picked if self.sample is None else pd.concat([self.sample, picked], ignore_index=True)
+        # A later row replaces an earlier one in the same slot
+        self.sample = combined.drop_duplicates(_SLOT, keep="last")
+
+    def result(self) -> Dict[str, Any]:
+        """
+        The profile: row count, per-column statistics, compact dtypes, preview
+        rows, the sample size and the memory the data takes in pandas before and
+        after the compact dtypes (estimated from the sample)
+        """
+        sample = self.sample.drop(columns=[_SLOT]) if self.sample is not None else pd.DataFrame()
+        dtypes = {name: stats.compact_dtype() for name, stats in self.columns.items()}
+        dtypes = {name: dtype for name, dtype in dtypes.items() if dtype}
+        columns = {name: self._column_result(name, stats, sample) for name, stats in self.columns.items()}
+        compact_bytes = self.original_bytes
+        if len(sample):
+            compact_sample = apply_dtypes(sample, dtypes)
+            compact_bytes = int(compact_sample.memory_usage(deep=True, index=False).sum() * self.rows / len(sample))
+        return {
+            "rows": self.rows,
+            "columns": columns,
+            "dtypes": dtypes,
+            "head": self.head.astype(object).where(self.head.notna(), None).to_dict("records") if self.head is not None else [],
+            "sample_rows": len(sample),
+            "memory": {"original_bytes": self.original_bytes, "compact_bytes": min(compact_bytes, self.original_bytes)},
+            "elapsed_ms": round((time.perf_counter() - self._start) * 1000, 2)
+        }
+
+    def _column_result(self, name: str, stats: ColumnStats, sample: pd.DataFrame) -> Dict[str, Any]:
+        total = stats.count + stats.nulls
+        column = {
+            "kind": stats.kind, "count": stats.count, "nulls": stats.nulls,
+            "null_pct": round(100 * stats.nulls / total, 2) if total else 0.0,
+            "distinct": stats.distinct(), "distinct_exact": len(stats.kmv) < KMV_SIZE,
+            "compact_dtype": stats.compact_dtype()
+        }
+        values = sample[name].dropna() if name in sample else pd.Series(dtype=object)
+        if stats.kind != "text" and stats.n:
+            column.update(
+                mean=stats.mean, std=math.sqrt(stats.m2 / (stats.n - 1)) if stats.n > 1 else 0.0,
+                min=stats.min, max=stats.max
+            )
+            if len(values):
+                quantiles = values.astype(np.float64).quantile(list(QUANTILES))
+                column["quantiles"] = {f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, quantiles)}
+        elif stats.kind == "text":
+            column["max_length"] = stats.max_length
+            if len(values):
+                top = values.astype(str).value_counts(normalize=True).head(5)
+                column["top"] = {str(value): round(float(share), 4) for value, share in top.items()}
+        return column
+
+def apply_dtypes(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """
+    A copy of df with the given dtypes; columns that don't convert keep their dtype
+    """
+    converted = {}
+    for name, dtype in dtypes.items():
+        if name not in df:
+            continue
+        try:
+            converted[name] = df[name].astype(dtype)
+        except (TypeError, ValueError):
+            continue
+    return df.assign(**converted) if converted else df
+
+def profile_csv(source: Union[str, IO], chunksize: int = PROFILE_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Profile a CSV file in one chunked pass (see DataProfiler.result for the fields)
+    """
+    profiler = DataProfiler()
+    for chunk in pd.read_csv(source, chunksize=chunksize, low_memory=False):
+        profiler.update(chunk)
+    profile = profiler.result()
+    logger.info("Profiled %d rows x %d columns in %.0f ms (%.1f MB in pandas, %.1f MB compact)",
+                profile["rows"], len(profile["columns"]), profile["elapsed_ms"],
+                profile["memory"]["original_bytes"] / 1e6, profile["memory"]["compact_bytes"] / 1e6)
+    return profile
+
+def read_csv_compact(source: Union[str, IO], profile: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Read a CSV file straight into the compact dtypes of its profile
+    """
+    try:
+        return pd.read_csv(source, dtype=profile["dtypes"], low_memory=False)
+    except (TypeError, ValueError) as e:
+        # A value the profile didn't foresee: read normally and convert what converts
+        logger.warning("Compact read failed (%s); converting after reading instead", e)
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return apply_dtypes(pd.read_csv(source, low_memory=False), profile["dtypes"])
+
+def profile_table(profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    One row per column, for display
+    """
+    rows = []
+    for name, column in profile["columns"].items():
+        quantiles = column.get("quantiles", {})
+        rows.append({
+            "column": name, "type": column["compact_dtype"] or column["kind"], "nulls %": column["null_pct"],
+            "distinct": f"{column['distinct']:,}" + ("" if column["distinct_exact"] else " (approx.)"),
+            "mean": column.get("mean"), "std": column.get("std"), "min": column.get("min"),
+            "p50": quantiles.get("p50"), "max": column.get("max"),
+            "top": ", ".join(list(column.get("top", {}))[:3])
+        })
+    return rows
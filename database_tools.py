@@ -1,11 +1,63 @@
 # database_tools.py
 import sqlite3
+import itertools
 import os
-from typing import List, Dict, Any, Optional
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Optional, Iterator
+
+import sql_profiler
+import telemetry
+from column_stats import get_column_stats
+from sql_repair import repair_query, is_read_only
+from result_spool import spool_results
+from result_format import summarize_numeric_columns
 
 # Database file path
 DB_PATH = "sales_data.db"
 
+# Number of idle read-only connections kept open for batch queries
+READ_POOL_SIZE = 4
+
+# Extra databases attached to the connections of the SQL tools in the current
+# context, as schema name -> file (e.g. a session's uploads, see upload_ingest)
+_attached_databases: ContextVar[Dict[str, str]] = ContextVar("attached_databases", default={})
+_SCHEMA_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+@contextmanager
+def attach_databases(databases: Dict[str, str]) -> Iterator[None]:
+    """
+    Make other SQLite databases queryable by the SQL tools within the block,
+    as schema.table (tools running in worker threads inherit the context)
+
+    Args:
+        databases: Schema name -> database file
+    """
+    for name in databases:
+        if not _SCHEMA_NAME.match(name):
+            raise ValueError(f"Invalid schema name: {name}")
+    token = _attached_databases.set({**_attached_databases.get(), **databases})
+    try:
+        yield
+    finally:
+        _attached_databases.reset(token)
+
+def _attach(conn: sqlite3.Connection) -> List[str]:
+    """
+    Attach the databases of the current context to a connection; returns their schema names
+    """
+    attached = []
+    for name, path in _attached_databases.get().items():
+        if os.path.exists(path):
+            conn.execute(f"ATTACH DATABASE ? AS {name}", (path,))
+            attached.append(name)
+    return attached
+
 def init_database():
     """
     Initialize the database with sample tables if they don't exist
@@ -118,38 +170,180 @@ def init_database():
             ]
         )
     
+    # Statistics for the query planner, gathered once here rather than on every
+    # schema read (the first ANALYZE creates sqlite_stat1, a schema change)
+    if not cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        cursor.execute("ANALYZE")
+    
     conn.commit()
     conn.close()
     
     return "Database initialized with sample data."
 
+def _trace_result(span, results: List[Dict[str, Any]], profile: Optional[sql_profiler.StatementProfile] = None) -> List[Dict[str, Any]]:
+    """
+    Add a statement's row count (or error) to its telemetry/trace span, and
+    its VM steps when the SQL profiler is on
+    """
+    if results and "error" in results[0]:
+        span.record_error(results[0]["error"])
+    else:
+        span.set_attribute("db.rows", len(results))
+    if profile is not None and profile.vm_steps:
+        span.set_attribute("db.vm_steps", profile.vm_steps)
+    return results
+
 def execute_sql_query(query: str) -> List[Dict[str, Any]]:
     """
     Execute an SQL query and return the results as a list of dictionaries
     """
+    with telemetry.stage("sql", "execute_sql_query", **{"db.system": "sqlite", "db.statement": query}) as span:
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            _attach(conn)
+            # Set row_factory to sqlite3.Row to access columns by name
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            # Timing, VM steps and plan are only collected when the profiler is on
+            with sql_profiler.profile(conn, query) as profile:
+                cursor.execute(query)
+
+                # Check if this is a SELECT query
+                if query.strip().upper().startswith("SELECT"):
+                    # Fetch all rows and convert to list of dictionaries
+                    rows = cursor.fetchall()
+                    result = [{k: row[k] for k in row.keys()} for row in rows]
+                    profile.rows = len(rows)
+                else:
+                    # For non-SELECT queries, return affected row count
+                    result = [{"affected_rows": cursor.rowcount}]
+                    conn.commit()
+                    profile.rows = cursor.rowcount
+
+            conn.close()
+            return _trace_result(span, result, profile)
+
+        except sqlite3.Error as e:
+            return _trace_result(span, [{"error": str(e)}])
+
+# Pool of idle read-only connections: (database path, connection)
+_read_pool = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+
+def _acquire_read_connection() -> sqlite3.Connection:
+    """
+    Take an idle read-only connection from the pool, or open a new one
+    """
+    while True:
+        try:
+            path, conn = _read_pool.get_nowait()
+        except queue.Empty:
+            break
+        if path == DB_PATH:
+            return conn
+        conn.close()
+
+    # isolation_level=None lets us control the read transaction ourselves
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def _release_read_connection(conn: sqlite3.Connection) -> None:
+    """
+    Return a connection to the pool, closing it if the pool is full
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        # Set row_factory to sqlite3.Row to access columns by name
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute(query)
-        
-        # Check if this is a SELECT query
-        if query.strip().upper().startswith("SELECT"):
-            # Fetch all rows and convert to list of dictionaries
-            rows = cursor.fetchall()
-            result = [{k: row[k] for k in row.keys()} for row in rows]
-        else:
-            # For non-SELECT queries, return affected row count
-            result = [{"affected_rows": cursor.rowcount}]
-            conn.commit()
-            
+        _read_pool.put_nowait((DB_PATH, conn))
+    except queue.Full:
         conn.close()
-        return result
-    
+
+def execute_sql_batch(queries: List[str], page_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Execute several read-only SQL queries on one connection and one snapshot
+
+    All queries run inside a single read transaction, so they see the same
+    data even if another session writes in between. Failed queries get the
+    same local repair pass as text_to_sql.
+
+    Args:
+        queries: The SELECT (or WITH ... SELECT) queries to execute
+        page_size: If given, each statement returns at most this many rows and
+            spools the rest, as in text_to_sql
+
+    Returns:
+        Dictionary with a "statements" list (query, results and elapsed_ms per
+        query, plus "repair" if a query was fixed) and the batch "total_ms"
+    """
+    # Make sure the database exists
+    if not os.path.exists(DB_PATH):
+        init_database()
+
+    batch_start = time.perf_counter()
+    statements = []
+    conn = _acquire_read_connection()
+    try:
+        attached = _attach(conn)
+        conn.execute("BEGIN")
+        for query in queries:
+            start = time.perf_counter()
+            statement = {"query": query}
+            if not is_read_only(query):
+                statement["results"] = [{"error": "Only read-only SELECT queries are allowed in a batch"}]
+            else:
+                statement["results"] = _run_read_query(conn, query)
+                if statement["results"] and "error" in statement["results"][0]:
+                    repair = repair_query(query, statement["results"][0]["error"], get_cached_schema())
+                    if repair:
+                        repaired_results = _run_read_query(conn, repair["query"])
+                        if not (repaired_results and "error" in repaired_results[0]):
+                            statement["repair"] = {
+                                "original_query": query,
+                                "error": statement["results"][0]["error"],
+                                "changes": repair["changes"]
+                            }
+                            statement["query"] = repair["query"]
+                            statement["results"] = repaired_results
+            if page_size:
+                _paginate(statement, page_size)
+            statement["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            statements.append(statement)
+        conn.execute("ROLLBACK")
+        # Pooled connections go back without the context's databases
+        for name in attached:
+            conn.execute(f"DETACH DATABASE {name}")
+    except sqlite3.Error as e:
+        conn.close()
+        return {"statements": statements, "error": str(e), "total_ms": round((time.perf_counter() - batch_start) * 1000, 2)}
+
+    _release_read_connection(conn)
+    return {"statements": statements, "total_ms": round((time.perf_counter() - batch_start) * 1000, 2)}
+
+def _run_read_query(conn: sqlite3.Connection, query: str) -> List[Dict[str, Any]]:
+    with telemetry.stage("sql", "execute_sql_batch statement", **{"db.system": "sqlite", "db.statement": query}) as span:
+        try:
+            with sql_profiler.profile(conn, query) as profile:
+                rows = conn.execute(query).fetchall()
+                profile.rows = len(rows)
+            return _trace_result(span, [{k: row[k] for k in row.keys()} for row in rows], profile)
+        except sqlite3.Error as e:
+            return _trace_result(span, [{"error": str(e)}])
+
+def _execute_read_only(query: str) -> List[Dict[str, Any]]:
+    """
+    Execute one query on a pooled query_only connection, where any write fails
+    """
+    conn = _acquire_read_connection()
+    try:
+        attached = _attach(conn)
+        results = _run_read_query(conn, query)
+        for name in attached:
+            conn.execute(f"DETACH DATABASE {name}")
     except sqlite3.Error as e:
+        conn.close()
         return [{"error": str(e)}]
+    _release_read_connection(conn)
+    return results
 
 def get_table_schema() -> Dict[str, List[Dict[str, str]]]:
     """
@@ -160,7 +354,7 @@ def get_table_schema() -> Dict[str, List[Dict[str, str]]]:
         cursor = conn.cursor()
         
         # Get all table names
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
         tables = cursor.fetchall()
         
         schema = {}
@@ -187,15 +381,20 @@ def get_table_schema() -> Dict[str, List[Dict[str, str]]]:
         return {"error": str(e)}
 
 # Function to be used as a tool in the LangGraph agent
-def text_to_sql(sql_query: str) -> Dict[str, Any]:
+def text_to_sql(sql_query: str, page_size: Optional[int] = None) -> Dict[str, Any]:
     """
     Execute a SQL query against the database
     
     Args:
         sql_query: The SQL query to execute
+        page_size: If given, return at most this many rows and spool the rest
+            (see result_spool); the result then also has "total_rows" and a
+            "next_token" for fetch_more
         
     Returns:
-        Dictionary with SQL query and results
+        Dictionary with SQL query and results. If the query failed but could be
+        repaired locally (see sql_repair), the repaired query and its results are
+        returned along with a "repair" entry describing the changes.
     """
     # Make sure the database exists
     if not os.path.exists(DB_PATH):
@@ -204,22 +403,56 @@ def text_to_sql(sql_query: str) -> Dict[str, Any]:
     # Execute the SQL query
     try:
         results = execute_sql_query(sql_query)
-        return {
+
+        # Try a local repair before the error goes back to the model
+        if results and "error" in results[0]:
+            repair = repair_query(sql_query, results[0]["error"], get_cached_schema())
+            if repair:
+                # A guessed query must never write, whatever it turned out to be
+                repaired_results = _execute_read_only(repair["query"])
+                if not (repaired_results and "error" in repaired_results[0]):
+                    result = {
+                        "query": repair["query"],
+                        "results": repaired_results,
+                        "repair": {
+                            "original_query": sql_query,
+                            "error": results[0]["error"],
+                            "changes": repair["changes"]
+                        }
+                    }
+                    if page_size:
+                        _paginate(result, page_size)
+                    return result
+
+        result = {
             "query": sql_query,
             "results": results
         }
+        if page_size:
+            _paginate(result, page_size)
+        return result
     except Exception as e:
         return {
             "query": sql_query,
             "results": [{"error": str(e)}]
         }
 
+def _paginate(result: Dict[str, Any], page_size: int) -> None:
+    """
+    Cut a result down to its first page, spooling the rest.
+    Numeric summaries are computed over all rows before they are spooled.
+    """
+    rows = result["results"]
+    result.update(spool_results(rows, page_size))
+    if result["next_token"]:
+        result["summary"] = summarize_numeric_columns(rows)
+
 def get_database_info() -> Dict[str, Any]:
     """
     Get information about the database schema to help with query construction
     
     Returns:
-        Dictionary with database schema and sample data
+        Dictionary with database schema, sample data and per-column statistics
     """
     # Make sure the database exists
     if not os.path.exists(DB_PATH):
@@ -239,9 +472,160 @@ def get_database_info() -> Dict[str, Any]:
     
     return {
         "schema": schema,
-        "sample_data": sample_data
+        "sample_data": sample_data,
+        "column_stats": get_column_stats(DB_PATH)
     }
 
+def get_schema_version() -> int:
+    """
+    Get SQLite's schema version, which changes whenever a table or index is created, altered or dropped
+    """
+    # Make sure the database exists (connecting would otherwise create an empty file)
+    if not os.path.exists(DB_PATH):
+        init_database()
+
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        conn.close()
+        return version
+    except sqlite3.Error:
+        return -1
+
+# Cached table schema, reloaded when the database or its schema version changes
+_schema_cache = {"key": None, "schema": None}
+
+def get_cached_schema() -> Dict[str, List[Dict[str, str]]]:
+    """
+    Get the table schema, reusing the last result until the database path or
+    its schema version changes
+    """
+    key = (DB_PATH, get_schema_version())
+    if _schema_cache["key"] != key or _schema_cache["schema"] is None:
+        _schema_cache["schema"] = get_table_schema()
+        _schema_cache["key"] = key
+    return _schema_cache["schema"]
+
+# Cached schema digest, regenerated when the database, its schema version or
+# its data (the row counts) changes
+_schema_digest_cache = {"key": None, "digest": None}
+
+def get_schema_digest() -> str:
+    """
+    Get a compact, prompt-ready description of the database schema
+
+    Each table is listed on one line with its row count and its columns,
+    including types, primary keys, NOT NULL constraints and foreign keys.
+
+    Returns:
+        The schema digest as a string
+    """
+    # Make sure the database exists
+    if not os.path.exists(DB_PATH):
+        init_database()
+
+    key = (DB_PATH, get_schema_version(), get_database_version())
+    if _schema_digest_cache["key"] == key and _schema_digest_cache["digest"]:
+        return _schema_digest_cache["digest"]
+
+    schema = get_cached_schema()
+    if "error" in schema:
+        return f"Schema unavailable: {schema['error']}"
+
+    lines = []
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        for table_name, columns in schema.items():
+            # Skip SQLite's internal tables (sqlite_sequence, sqlite_stat1, ...)
+            if table_name.startswith("sqlite_"):
+                continue
+
+            row_count = cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+            foreign_keys = {
+                fk[3]: f"{fk[2]}.{fk[4]}"
+                for fk in cursor.execute(f'PRAGMA foreign_key_list("{table_name}")').fetchall()
+            }
+
+            column_parts = []
+            for col in columns:
+                part = f"{col['name']} {col['type'] or 'ANY'}"
+                if col["pk"]:
+                    part += " PK"
+                if col["notnull"]:
+                    part += " NOT NULL"
+                if col["name"] in foreign_keys:
+                    part += f" -> {foreign_keys[col['name']]}"
+                column_parts.append(part)
+
+            lines.append(f"{table_name} ({row_count} rows): " + ", ".join(column_parts))
+        conn.close()
+    except sqlite3.Error as e:
+        return f"Schema unavailable: {e}"
+
+    digest = "\n".join(lines)
+    _schema_digest_cache["key"] = key
+    _schema_digest_cache["digest"] = digest
+    return digest
+
+# Number of databases watched for commits at once; the least recently used
+# watcher's connection is closed beyond it (e.g. with many test databases)
+MAX_VERSION_WATCHERS = 8
+
+# Long-lived read-only connections that watch databases for commits, by path
+_version_watchers: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_version_lock = threading.Lock()
+# Numbers each watcher, so a path watched again never repeats an old version
+_watcher_ids = itertools.count()
+
+def get_database_version(db_path: Optional[str] = None) -> str:
+    """
+    Get a version string that changes whenever data is committed to the database
+
+    Uses PRAGMA data_version on a read-only connection kept open per database
+    (for the MAX_VERSION_WATCHERS most recently used databases), which changes when any other connection (in any process) commits, but not
+    when only the file's modification time moves.
+
+    Args:
+        db_path: Database file (defaults to DB_PATH)
+
+    Returns:
+        Version string, or "missing" if the database does not exist
+    """
+    path = db_path or DB_PATH
+    try:
+        inode = os.stat(path).st_ino
+    except OSError:
+        return "missing"
+
+    with _version_lock:
+        watcher = _version_watchers.get(path)
+        try:
+            # A replaced file needs a new connection (and starts a new version series)
+            if watcher is None or watcher["inode"] != inode:
+                if watcher is not None:
+                    watcher["conn"].close()
+                watcher = {
+                    "conn": sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False),
+                    "inode": inode,
+                    "data_version": None,
+                    "id": next(_watcher_ids),
+                    "version": 0
+                }
+                _version_watchers[path] = watcher
+                while len(_version_watchers) > MAX_VERSION_WATCHERS:
+                    _version_watchers.popitem(last=False)[1]["conn"].close()
+            _version_watchers.move_to_end(path)
+            data_version = watcher["conn"].execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            _version_watchers.pop(path, None)
+            # Unknown: a version that matches nothing cached
+            return f"unknown:{time.time_ns()}"
+        if watcher["data_version"] is not None and data_version != watcher["data_version"]:
+            watcher["version"] += 1
+        watcher["data_version"] = data_version
+        return f"{watcher['id']}.{watcher['version']}"
+
 # Script to create the database when run directly
 if __name__ == "__main__":
     print(init_database())
@@ -0,0 +1,259 @@
+# fake_llm.py
+# Offline, deterministic stand-ins for the Gemini clients used by the apps.
+# FakeChatModel replaces ChatGoogleGenerativeAI (including bind_tools, so it can
+# drive a LangGraph agent) and FakeGenaiClient replaces google.genai.Client.
+# Both replay a script of text and tool calls, with a configurable delay per
+# output token, so benchmarks measure our own code instead of network variance.
+import itertools
+import json
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Optional, Iterator, Union, Callable
+
+from google.genai import types
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from result_format import estimate_tokens
+
+# A script step is either the text of an answer, a dict with "tool_calls"
+# (a list of {"name": ..., "args": {...}}) and optionally "content", or a
+# function that receives the conversation and returns one of those
+ScriptStep = Union[str, Dict[str, Any], Callable[[List[BaseMessage]], Union[str, Dict[str, Any]]]]
+
+def _message_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that replays a script instead of calling Gemini
+
+    Each call consumes the next script step (the script starts over when it runs
+    out, unless cycle is False). Time spent "generating" is latency plus
+    token_delay per output token, and is added up in stats() so a benchmark can
+    subtract it from the measured turn time.
+    """
+
+    script: List[Any] = []
+    token_delay: float = 0.0
+    latency: float = 0.0
+    cycle: bool = True
+
+    _position: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+    _model_seconds: float = PrivateAttr(default=0.0)
+    _input_tokens: int = PrivateAttr(default=0)
+    _output_tokens: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def bind_tools(self, tools, **kwargs):
+        # Same shape as a real binding, so create_react_agent accepts the model as bound
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _next_step(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        with self._lock:
+            if not self.script:
+                raise ValueError("FakeChatModel has an empty script")
+            if self._position >= len(self.script):
+                if not self.cycle:
+                    raise IndexError("FakeChatModel script exhausted")
+                self._position = 0
+            step = self.script[self._position]
+            self._position += 1
+        if callable(step):
+            step = step(messages)
+        return {"content": step} if isinstance(step, str) else step
+
+    def _build_message(self, messages: List[BaseMessage]) -> AIMessage:
+        step = self._next_step(messages)
+        tool_calls = [
+            {"name": call["name"], "args": call.get("args", {}), "id": call.get("id") or f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+            for call in step.get("tool_calls", [])
+        ]
+        content = step.get("content", "")
+        input_tokens = sum(estimate_tokens(_message_text(message)) for message in messages)
+        output_tokens = estimate_tokens(content) + sum(estimate_tokens(json.dumps(call["args"])) for call in tool_calls)
+        return AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        )
+
+    def _record(self, message: AIMessage, seconds: float) -> None:
+        with self._lock:
+            self._calls += 1
+            self._model_seconds += seconds
+            self._input_tokens += message.usage_metadata["input_tokens"]
+            self._output_tokens += message.usage_metadata["output_tokens"]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        message = self._build_message(messages)
+        delay = self.latency + self.token_delay * message.usage_metadata["output_tokens"]
+        time.sleep(delay)
+        self._record(message, delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message = self._build_message(messages)
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        # Text arrives word by word; tool calls arrive whole in the last chunk
+        words = message.content.split(" ") if message.content else []
+        for index, word in enumerate(words):
+            text = word if index == 0 else " " + word
+            time.sleep(self.token_delay * estimate_tokens(text))
+            chunk = AIMessageChunk(content=text)
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+        tool_tokens = message.usage_metadata["output_tokens"] - estimate_tokens(message.content)
+        time.sleep(self.token_delay * max(tool_tokens, 0))
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index, "type": "tool_call_chunk"}
+                for index, call in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata
+        ))
+        self._record(message, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Calls, simulated model time and token counts so far
+        """
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "model_seconds": round(self._model_seconds, 4),
+                "input_tokens": self._input_tokens,
+                "output_tokens": self._output_tokens
+            }
+
+def _genai_response(text: str, input_tokens: int) -> types.GenerateContentResponse:
+    output_tokens = estimate_tokens(text)
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=input_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=input_tokens + output_tokens
+        )
+    )
+
+class _FakeResponder:
+    """
+    Shared script state of a FakeGenaiClient
+    """
+
+    def __init__(self, script: List[str], token_delay: float, latency: float):
+        self.script = itertools.cycle(script or ["OK"])
+        self.token_delay = token_delay
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.model_seconds = 0.0
+
+    def next_text(self) -> str:
+        with self.lock:
+            return next(self.script)
+
+    def record(self, seconds: float) -> None:
+        with self.lock:
+            self.calls += 1
+            self.model_seconds += seconds
+
+    def respond(self, prompt: str) -> types.GenerateContentResponse:
+        text = self.next_text()
+        delay = self.latency + self.token_delay * estimate_tokens(text)
+        time.sleep(delay)
+        self.record(delay)
+        return _genai_response(text, estimate_tokens(prompt))
+
+    def respond_stream(self, prompt: str) -> Iterator[types.GenerateContentResponse]:
+        text = self.next_text()
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        words = text.split(" ")
+        for index, word in enumerate(words):
+            piece = word if index == 0 else " " + word
+            time.sleep(self.token_delay * estimate_tokens(piece))
+            yield _genai_response(piece, estimate_tokens(prompt))
+        self.record(time.perf_counter() - start)
+
+class FakeChat:
+    """
+    Stand-in for the chat object returned by genai.Client().chats.create()
+    """
+
+    def __init__(self, responder: _FakeResponder, model: str, config: Any = None):
+        self._responder = responder
+        self.model = model
+        self.config = config
+        self.history: List[Dict[str, str]] = []
+
+    def _prompt(self, message: str) -> str:
+        return "\n".join(turn["text"] for turn in self.history) + "\n" + str(message)
+
+    def send_message(self, message: str, config: Any = None) -> types.GenerateContentResponse:
+        response = self._responder.respond(self._prompt(message))
+        self.history += [{"role": "user", "text": str(message)}, {"role": "model", "text": response.text}]
+        return response
+
+    def send_message_stream(self, message: str, config: Any = None) -> Iterator[types.GenerateContentResponse]:
+        pieces = []
+        for chunk in self._responder.respond_stream(self._prompt(message)):
+            pieces.append(chunk.text)
+            yield chunk
+        self.history += [{"role": "user", "text": str(message)}, {"role": "model", "text": "".join(pieces)}]
+
+    def get_history(self) -> List[Dict[str, str]]:
+        return list(self.history)
+
+class _FakeChats:
+    def __init__(self, responder: _FakeResponder):
+        self._responder = responder
+
+    def create(self, model: str, config: Any = None, history: Any = None) -> FakeChat:
+        return FakeChat(self._responder, model, config)
+
+class _FakeModels:
+    def __init__(self, responder: _FakeResponder):
+        self._responder = responder
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        return self._responder.respond(str(contents))
+
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[types.GenerateContentResponse]:
+        return self._responder.respond_stream(str(contents))
+
+class FakeGenaiClient:
+    """
+    Stand-in for google.genai.Client (chats.create / models.generate_content)
+
+    Responses are real google.genai response objects, so .text and
+    .candidates[0].content.parts[0].text work as they do against the API.
+    """
+
+    def __init__(self, script: Optional[List[str]] = None, token_delay: float = 0.0,
+                 latency: float = 0.0, api_key: Optional[str] = None):
+        self._responder = _FakeResponder(script, token_delay, latency)
+        self.chats = _FakeChats(self._responder)
+        self.models = _FakeModels(self._responder)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Calls and simulated model time so far
+        """
+        with self._responder.lock:
+            return {"calls": self._responder.calls, "model_seconds": round(self._responder.model_seconds, 4)}
@@ -0,0 +1,460 @@
+# gemini_client.py
+# Shared gateway for every Gemini call the apps make, through google.genai or
+# through LangChain's ChatGoogleGenerativeAI. Within one process it provides:
+#   - a token-bucket rate limiter per (API key, model), so bursts from many
+#     sessions are paced instead of failing with 429 RESOURCE_EXHAUSTED
+#   - retries with jittered exponential backoff on 429 and 5xx errors
+#     (honouring the server's retryDelay hint when it sends one)
+#   - single-flight coalescing: identical requests that are in flight at the
+#     same time run once, and the other callers get a copy of the result
+# Chat sessions (chats.create) are rate limited and retried but not coalesced,
+# because each chat carries its own history.
+#
+# Limits come from the GEMINI_RPM and GEMINI_BURST environment variables
+# (GEMINI_RPM=0 turns the rate limiter off).
+#
+# Usage:
+#   client = get_genai_client(api_key)              # instead of genai.Client(api_key=...)
+#   llm = get_chat_model(api_key, temperature=0.2)   # instead of ChatGoogleGenerativeAI(...)
+import copy
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Any, Optional, Iterator, Callable, Tuple
+
+from google import genai
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+logger = logging.getLogger("gemini_client")
+
+# Default model when a caller does not pick one
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Requests per minute allowed per (API key, model) (0: unlimited), and the burst size
+REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_RPM", 60))
+BURST = int(os.environ.get("GEMINI_BURST", 10))
+
+# Retry policy for rate-limit and server errors
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0  # Seconds before the first retry (before jitter)
+BACKOFF_CAP = 30.0  # Longest wait between two attempts
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Token bucket: at most `rate` acquisitions per second, with bursts of up to `burst`
+    (a rate of 0 or less means no limit)
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Block until a token is available, then take it
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+class _Flight:
+    """
+    One in-flight request that identical requests can wait for
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Runs identical concurrent calls once; the callers that join later share the result
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key: str) -> Tuple[_Flight, bool]:
+        """
+        Join the flight for `key`, starting it if there is none
+
+        Returns:
+            The flight and whether this caller leads it (and must call finish)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def finish(self, key: str, flight: _Flight, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """
+        Publish the leader's result (None when it gave up) and release the waiting callers
+        """
+        flight.result, flight.error = result, error
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    @staticmethod
+    def wait(flight: _Flight) -> Any:
+        """
+        Wait for the leader; raises its error, or returns None if it gave up
+        """
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def do(self, key: str, function: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run `function` unless an identical call is in flight
+
+        Returns:
+            The result and whether it was shared from another caller's call
+        """
+        flight, leader = self.begin(key)
+        if not leader:
+            result = self.wait(flight)
+            if result is not None:
+                return result, True
+            return function(), False
+        try:
+            result = function()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result)
+        return result, False
+
+# --- Process-wide state ---
+
+_limiters: Dict[Tuple[str, str], TokenBucket] = {}
+_flights = SingleFlight()
+_state_lock = threading.Lock()
+_stats = {"requests": 0, "retries": 0, "coalesced": 0, "throttled_s": 0.0, "failures": 0}
+
+def _key_id(api_key: str) -> str:
+    # Limiters and request keys hold a hash, never the key itself
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+def _count(name: str, amount: float = 1) -> None:
+    with _state_lock:
+        _stats[name] += amount
+
+def get_rate_limiter(api_key: str, model: str) -> TokenBucket:
+    """
+    The token bucket shared by all calls with this API key and model
+    """
+    key = (_key_id(api_key), model)
+    with _state_lock:
+        if key not in _limiters:
+            _limiters[key] = TokenBucket(REQUESTS_PER_MINUTE / 60, burst=BURST)
+        return _limiters[key]
+
+def stats() -> Dict[str, Any]:
+    """
+    Requests, retries, coalesced requests and time spent waiting on the rate limiters
+    """
+    with _state_lock:
+        return {**_stats, "throttled_s": round(_stats["throttled_s"], 2), "limiters": len(_limiters)}
+
+def request_key(api_key: str, model: str, *parts: Any) -> str:
+    """
+    Hash identifying a request, for single-flight coalescing
+    """
+    payload = json.dumps([_key_id(api_key), model, *parts], default=repr, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+# --- Retries ---
+
+def status_code(error: BaseException) -> Optional[int]:
+    """
+    HTTP status of a Gemini error, looking through wrapped exceptions
+    (LangChain re-raises google.genai errors with the original as __cause__)
+    """
+    while error is not None:
+        code = getattr(error, "code", None)
+        if isinstance(code, int):
+            return code
+        error = error.__cause__ or error.__context__
+    return None
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether another attempt could succeed (rate limits and server errors)
+    """
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    return "RESOURCE_EXHAUSTED" in str(error) or "UNAVAILABLE" in str(error)
+
+def backoff_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (1-based)
+
+    Uses the server's retryDelay when the error carries one, otherwise
+    exponential backoff with full jitter, so callers throttled together
+    do not all retry at the same moment.
+    """
+    hint = re.search(r"retryDelay\W+(\d+(?:\.\d+)?)s", str(error)) if error else None
+    if hint:
+        return min(float(hint.group(1)) + random.uniform(0, 1), BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+def call_with_retry(api_key: str, model: str, function: Callable[[], Any]) -> Any:
+    """
+    Run one Gemini call through the rate limiter, retrying rate-limit and server errors
+
+    Args:
+        api_key: Key the call is billed to (selects the rate limiter)
+        model: Model the call goes to (selects the rate limiter)
+        function: Makes the call
+
+    Returns:
+        The call's result
+    """
+    limiter = get_rate_limiter(api_key, model)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        _count("throttled_s", limiter.acquire())
+        _count("requests")
+        try:
+            return function()
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS or not is_retryable(e):
+                _count("failures")
+                raise
+            delay = backoff_delay(attempt, e)
+            _count("retries")
+            logger.warning("Gemini call failed (%s), retry %d in %.1fs", status_code(e) or e, attempt, delay)
+            time.sleep(delay)
+
+def stream_with_retry(api_key: str, model: str, function: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+    """
+    Like call_with_retry for a streaming call
+
+    A stream is only retried until its first chunk arrives; after that the
+    caller has already seen part of the answer, so errors are raised.
+    """
+    limiter = get_rate_limiter(api_key, model)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        _count("throttled_s", limiter.acquire())
+        _count("requests")
+        started = False
+        try:
+            for chunk in function():
+                started = True
+                yield chunk
+            return
+        except Exception as e:
+            if started or attempt == MAX_ATTEMPTS or not is_retryable(e):
+                _count("failures")
+                raise
+            delay = backoff_delay(attempt, e)
+            _count("retries")
+            logger.warning("Gemini stream failed (%s), retry %d in %.1fs", status_code(e) or e, attempt, delay)
+            time.sleep(delay)
+
+# --- google.genai ---
+
+def _shared_response(response):
+    # Like _shared_copy below: callers of a coalesced request get their own copy
+    # of the leader's response, without the token usage it already reported
+    shared = response.model_copy(deep=True) if hasattr(response, "model_copy") else copy.deepcopy(response)
+    if getattr(shared, "usage_metadata", None) is not None:
+        shared.usage_metadata = None
+    return shared
+
+class _Models:
+    """
+    client.models with rate limiting, retries and (for generate_content) coalescing
+    """
+
+    def __init__(self, client: "GeminiClient"):
+        self._client = client
+        self._models = client.raw.models
+
+    def generate_content(self, *, model: str, contents: Any, config: Any = None, **kwargs):
+        api_key = self._client.api_key
+        key = request_key(api_key, model, contents, config, kwargs)
+        response, shared = _flights.do(key, lambda: call_with_retry(
+            api_key, model, lambda: self._models.generate_content(model=model, contents=contents, config=config, **kwargs)
+        ))
+        if shared:
+            _count("coalesced")
+            return _shared_response(response)
+        return response
+
+    def generate_content_stream(self, *, model: str, contents: Any, config: Any = None, **kwargs):
+        return stream_with_retry(self._client.api_key, model, lambda: self._models.generate_content_stream(
+            model=model, contents=contents, config=config, **kwargs
+        ))
+
+    def __getattr__(self, name: str):
+        return getattr(self._models, name)
+
+class _Chat:
+    """
+    A chat session whose messages go through the rate limiter and retries
+    (google.genai only records history once a message succeeds, so retrying is safe)
+    """
+
+    def __init__(self, chat, api_key: str, model: str):
+        self._chat = chat
+        self._api_key = api_key
+        self._model = model
+
+    def send_message(self, message, config=None):
+        return call_with_retry(self._api_key, self._model, lambda: self._chat.send_message(message, config=config))
+
+    def send_message_stream(self, message, config=None):
+        return stream_with_retry(self._api_key, self._model, lambda: self._chat.send_message_stream(message, config=config))
+
+    def __getattr__(self, name: str):
+        return getattr(self._chat, name)
+
+class _Chats:
+    def __init__(self, client: "GeminiClient"):
+        self._client = client
+
+    def create(self, *, model: str, **kwargs) -> _Chat:
+        return _Chat(self._client.raw.chats.create(model=model, **kwargs), self._client.api_key, model)
+
+class GeminiClient:
+    """
+    Drop-in wrapper around google.genai.Client routing calls through the gateway
+    """
+
+    def __init__(self, api_key: str, raw: Any = None):
+        self.api_key = api_key
+        # The wrapped client; tests and benchmarks can pass a fake one
+        self.raw = raw if raw is not None else genai.Client(api_key=api_key)
+        self.models = _Models(self)
+        self.chats = _Chats(self)
+
+    def __getattr__(self, name: str):
+        return getattr(self.raw, name)
+
+_clients: Dict[str, GeminiClient] = {}
+
+def get_genai_client(api_key: str) -> GeminiClient:
+    """
+    The shared gateway client for an API key (use instead of genai.Client)
+    """
+    with _state_lock:
+        if api_key not in _clients:
+            _clients[api_key] = GeminiClient(api_key)
+        return _clients[api_key]
+
+# --- LangChain ---
+
+def _shared_copy(generation):
+    # Callers of a coalesced request get their own copy, without the token
+    # usage (it was only spent once, by the leader)
+    copy = generation.model_copy(deep=True)
+    copy.message.id = None
+    copy.message.usage_metadata = None
+    copy.message.response_metadata = {**copy.message.response_metadata, "coalesced": True}
+    return copy
+
+class GeminiChatModel(ChatGoogleGenerativeAI):
+    """
+    ChatGoogleGenerativeAI whose requests go through the gateway
+
+    The model's own retries are turned off by get_chat_model (max_retries=1),
+    so attempts are counted and paced in one place.
+    """
+
+    def _request_key(self, messages, stop, kwargs) -> str:
+        return request_key(self._api_key(), self.model, [message.model_dump() for message in messages],
+                           stop, self.temperature, kwargs)
+
+    def _api_key(self) -> str:
+        return self.google_api_key.get_secret_value() if self.google_api_key else ""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._request_key(messages, stop, kwargs)
+        result, shared = _flights.do(key, lambda: call_with_retry(
+            self._api_key(), self.model, lambda: super(GeminiChatModel, self)._generate(messages, stop, run_manager, **kwargs)
+        ))
+        if shared:
+            _count("coalesced")
+            return ChatResult(generations=[_shared_copy(generation) for generation in result.generations])
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        key = self._request_key(messages, stop, kwargs)
+        flight, leader = _flights.begin(key)
+        if not leader:
+            merged = _flights.wait(flight)
+            if merged is not None:
+                # The same request just finished streaming elsewhere: replay it as one chunk
+                _count("coalesced")
+                chunk = _shared_copy(merged)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                return
+            # The leader gave up part way; make the request after all
+            yield from stream_with_retry(self._api_key(), self.model, lambda: super(GeminiChatModel, self)._stream(
+                messages, stop, run_manager, **kwargs
+            ))
+            return
+
+        merged = None
+        try:
+            for chunk in stream_with_retry(self._api_key(), self.model, lambda: super(GeminiChatModel, self)._stream(
+                messages, stop, run_manager, **kwargs
+            )):
+                merged = chunk if merged is None else merged + chunk
+                yield chunk
+        except BaseException as e:
+            # GeneratorExit means our caller stopped reading; waiting callers retry on their own
+            _flights.finish(key, flight, error=None if isinstance(e, GeneratorExit) else e)
+            raise
+        _flights.finish(key, flight, merged)
+
+def get_chat_model(api_key: str, model: str = DEFAULT_MODEL, temperature: float = 0.7, **kwargs) -> GeminiChatModel:
+    """
+    A LangChain chat model for Gemini that goes through the gateway
+    (use instead of ChatGoogleGenerativeAI)
+
+    Args:
+        api_key: Google AI API key
+        model: Gemini model name
+        temperature: Sampling temperature
+        **kwargs: Other ChatGoogleGenerativeAI settings
+
+    Returns:
+        The chat model
+    """
+    return GeminiChatModel(model=model, google_api_key=api_key, temperature=temperature,
+                           max_retries=kwargs.pop("max_retries", 1), **kwargs)
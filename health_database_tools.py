@@ -4,6 +4,8 @@ import os
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from column_stats import get_column_stats
+
 # Database file path
 DB_PATH = "health_wellness.db"
 
@@ -221,6 +223,11 @@ def init_database():
             health_articles
         )
     
+    # Statistics for the query planner, gathered once here rather than on every
+    # schema read (the first ANALYZE creates sqlite_stat1, a schema change)
+    if not cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        cursor.execute("ANALYZE")
+    
     conn.commit()
     conn.close()
     
@@ -258,7 +265,7 @@ def get_table_schema() -> Dict[str, List[Dict[str, str]]]:
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
         tables = cursor.fetchall()
         
         schema = {}
@@ -314,7 +321,7 @@ def get_database_info() -> Dict[str, Any]:
     Get information about the database schema to help with query construction
     
     Returns:
-        Dictionary with database schema and sample data
+        Dictionary with database schema, sample data and per-column statistics
     """
     if not os.path.exists(DB_PATH):
         init_database()
@@ -331,7 +338,8 @@ def get_database_info() -> Dict[str, Any]:
     
     return {
         "schema": schema,
-        "sample_data": sample_data
+        "sample_data": sample_data,
+        "column_stats": get_column_stats(DB_PATH)
     }
 
 def get_health_recommendations(user_id: int = None) -> Dict[str, Any]:
@@ -0,0 +1,292 @@
+# load_test.py
+# Headless load test of streamlit_react_tools_app.py.
+# Each simulated user is a Streamlit AppTest session that enters an API key and
+# asks a series of questions. Many sessions run at once in one process, which
+# is how a single Streamlit server shares its caches and SQLite files. The
+# offline FakeChatModel replaces Gemini, so the numbers show how far our own
+# code scales. For each concurrency level the report lists throughput,
+# p50/p95/p99 turn latency, memory per session and SQLite lock contention.
+#
+# Usage: python load_test.py [--levels 1,4,8,16] [--turns 5] [--token-delay 0.002] [--latency 0.05]
+import argparse
+import contextlib
+import logging
+import os
+import resource
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator
+from unittest.mock import MagicMock
+
+import streamlit
+from langchain_core.messages import HumanMessage, ToolMessage
+from streamlit.testing.v1 import AppTest
+
+
+from assistant_service import get_sql_service
+from benchmark_agent import SCENARIOS, percentile
+from database_tools import init_database
+from fake_llm import FakeChatModel
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_react_tools_app.py")
+
+# share_app_test_runtime() patches Streamlit internals (the mock runtime AppTest
+# installs, its script cache and config override, the v2 component registry)
+# that change between releases, so the load test only runs on the release line
+# it was written against (pinned in requirements-dev.txt)
+TESTED_STREAMLIT = "1.66"
+
+# Seconds AppTest waits for one script run
+RUN_TIMEOUT = 120
+
+# SQLite calls slower than this are counted as lock waits
+LOCK_WAIT_MS = 50
+
+# Questions are varied per session so the similarity cache doesn't answer every repeat
+QUESTION_VARIANTS = ["", " Please be brief.", " I need this for a report.", " Thanks!"]
+
+def _scenario_for(question: str) -> Dict[str, Any]:
+    for scenario in SCENARIOS:
+        if question.startswith(scenario["question"]):
+            return scenario
+    return SCENARIOS[0]
+
+def sql_agent_step(messages) -> Any:
+    """
+    Script step for FakeChatModel that answers any scenario question:
+    tool calls after the question, the scenario's answer after the tool results
+    """
+    question = next(msg.content for msg in reversed(messages) if isinstance(msg, HumanMessage))
+    steps = _scenario_for(question)["steps"]
+    # Answer questions that don't go through the agent (cached-plan phrasing) directly
+    if isinstance(messages[-1], ToolMessage) or len(steps) == 1 or "Question:" in question:
+        return steps[-1]
+    return steps[0]
+
+class LockStats:
+    """
+    Counts SQLite statements, slow statements and busy/locked errors across threads
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.statements = 0
+            self.slow = 0
+            self.locked_errors = 0
+            self.total_ms = 0.0
+
+    def record(self, elapsed_ms: float, locked: bool = False) -> None:
+        with self.lock:
+            self.statements += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms >= LOCK_WAIT_MS:
+                self.slow += 1
+            if locked:
+                self.locked_errors += 1
+
+lock_stats = LockStats()
+
+def _timed(method):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            lock_stats.record((time.perf_counter() - start) * 1000, locked="locked" in str(e) or "busy" in str(e))
+            raise
+        lock_stats.record((time.perf_counter() - start) * 1000)
+        return result
+    return wrapper
+
+class TimedCursor(sqlite3.Cursor):
+    execute = _timed(sqlite3.Cursor.execute)
+    executemany = _timed(sqlite3.Cursor.executemany)
+
+class TimedConnection(sqlite3.Connection):
+    execute = _timed(sqlite3.Connection.execute)
+    executemany = _timed(sqlite3.Connection.executemany)
+    commit = _timed(sqlite3.Connection.commit)
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+def check_streamlit_version() -> None:
+    """
+    Exit with an install hint unless Streamlit is the release the load test patches
+    """
+    if ".".join(streamlit.__version__.split(".")[:2]) != TESTED_STREAMLIT:
+        raise SystemExit(f"load_test.py needs streamlit {TESTED_STREAMLIT}.x (found {streamlit.__version__}): "
+                         f"pip install -r requirements-dev.txt")
+
+@contextlib.contextmanager
+def install_instrumentation(token_delay: float, latency: float) -> Iterator[None]:
+    """
+    Route the app's Gemini model to FakeChatModel and time every SQLite call,
+    until the block ends
+    """
+    connect = sqlite3.connect
+    service = get_sql_service()
+    llm_factory = service.llm_factory
+
+    def timed_connect(*args, **kwargs):
+        kwargs.setdefault("factory", TimedConnection)
+        return connect(*args, **kwargs)
+
+    def fake_model(api_key):
+        return FakeChatModel(script=[sql_agent_step], token_delay=token_delay, latency=latency)
+
+    sqlite3.connect = timed_connect
+    # The app's in-process service builds its model through this factory
+    service.llm_factory = fake_model
+    try:
+        yield
+    finally:
+        sqlite3.connect = connect
+        service.llm_factory = llm_factory
+
+class _RuntimeSlot:
+    """
+    Receives the per-run runtime AppTest would otherwise install globally
+    """
+    _instance = None
+
+@contextlib.contextmanager
+def share_app_test_runtime() -> Iterator[None]:
+    """
+    Let AppTest sessions run at the same time, like sessions of one server,
+    until the block ends
+
+    Each AppTest run installs a fresh mock Runtime as the global instance and
+    clears it when the run ends, so concurrent runs break each other. Instead,
+    one shared mock runtime (with one cache storage, as in a real server
+    process) is installed once, and the per-run assignments go to a slot that
+    nothing reads. The test-mode config override is set once for the same reason,
+    and all runs share one script cache, so the app is compiled once as in a server.
+    """
+    # Internals of the tested release (see check_streamlit_version)
+    from streamlit import config
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    saved = (Runtime._instance, app_test.Runtime, app_test.ScriptCache, local_script_runner.ScriptCache,
+             app_test.patch_config_options, config.get_option("global.appTest"))
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    components = BidiComponentManager()
+    components.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = components
+    Runtime._instance = runtime
+
+    script_cache = ScriptCache()
+    app_test.Runtime = _RuntimeSlot
+    app_test.ScriptCache = lambda: script_cache
+    local_script_runner.ScriptCache = lambda: script_cache
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+    config.set_option("global.appTest", True)
+    try:
+        yield
+    finally:
+        (Runtime._instance, app_test.Runtime, app_test.ScriptCache, local_script_runner.ScriptCache,
+         app_test.patch_config_options, app_test_option) = saved
+        config.set_option("global.appTest", app_test_option)
+
+def rss_mb() -> float:
+    """
+    Current resident memory of this process in MB (peak memory where /proc is unavailable)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_session(session_id: int, turns: int) -> Dict[str, Any]:
+    """
+    Simulate one user: open the app, enter a key and ask `turns` questions
+
+    Returns:
+        Dictionary with the AppTest (kept alive for the memory measurement),
+        the turn latencies in milliseconds and the number of failed turns
+    """
+    at = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT)
+    at.run()
+    at.sidebar.text_input[0].set_value("offline-load-test").run()
+
+    latencies, errors = [], 0
+    for turn in range(turns):
+        scenario = SCENARIOS[(session_id + turn) % len(SCENARIOS)]
+        question = scenario["question"] + QUESTION_VARIANTS[session_id % len(QUESTION_VARIANTS)]
+        start = time.perf_counter()
+        at.chat_input[0].set_value(question).run()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if at.exception or any("An error occurred" in md.value for md in at.markdown):
+            errors += 1
+    return {"app": at, "latencies": latencies, "errors": errors}
+
+def run_level(sessions: int, turns: int) -> Dict[str, Any]:
+    """
+    Run `sessions` simulated users at the same time and summarize the results
+    """
+    lock_stats.reset()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(lambda session_id: run_session(session_id, turns), range(sessions)))
+    elapsed = time.perf_counter() - start
+    # Sessions are still referenced here, so their state counts towards memory
+    rss_after = rss_mb()
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": sum(result["errors"] for result in results),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mb_per_session": max(rss_after - rss_before, 0) / sessions,
+        "sql_statements": lock_stats.statements,
+        "sql_slow": lock_stats.slow,
+        "sql_locked": lock_stats.locked_errors
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the SQL Assistant app with simulated sessions")
+    parser.add_argument("--levels", default="1,4,8,16", help="Comma-separated numbers of concurrent sessions")
+    parser.add_argument("--turns", type=int, default=5, help="Questions per session")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Simulated seconds per output token")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per model call")
+    args = parser.parse_args()
+    check_streamlit_version()
+
+    # Keep the app's per-turn INFO logs out of the report
+    logging.basicConfig(level=logging.WARNING)
+    init_database()
+
+    print(f"{'sessions':>8} {'turns':>6} {'errors':>6} {'turns/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'MB/sess':>8} {'sql':>7} {'slow':>5} {'locked':>6}")
+    with install_instrumentation(args.token_delay, args.latency), share_app_test_runtime():
+        for sessions in [int(level) for level in args.levels.split(",")]:
+            result = run_level(sessions, args.turns)
+            print(f"{result['sessions']:>8} {result['turns']:>6} {result['errors']:>6} {result['throughput']:>8.2f} "
+                  f"{result['p50_ms']:>6.0f}ms {result['p95_ms']:>6.0f}ms {result['p99_ms']:>6.0f}ms "
+                  f"{result['mb_per_session']:>8.2f} {result['sql_statements']:>7} {result['sql_slow']:>5} "
+                  f"{result['sql_locked']:>6}")
+
+if __name__ == "__main__":
+    main()
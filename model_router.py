@@ -0,0 +1,208 @@
+# model_router.py
+# Local, rule-based router that decides which model tier a turn needs:
+#   - "chat":  greetings, thanks, acknowledgements and questions about the
+#              assistant itself; answered by a lighter model configuration
+#              (LIGHT_MODEL, no thinking, short replies) with no tools bound
+#   - "agent": everything else, in particular anything that mentions data,
+#              numbers, files or charts; handled by the tool-capable agent
+# When in doubt the router picks "agent", so a data question is never answered
+# without its tools. Every decision is logged, and record_turn() logs the
+# latency and estimated cost of each routed turn next to what the agent route
+# costs on average, so the savings per route can be read from the log (and
+# from stats(), which the service includes in /v1/stats).
+#
+# Set MODEL_ROUTER=0 to send every turn to the agent.
+#
+# Usage:
+#   decision = route(prompt)
+#   if decision["route"] == ROUTE_CHAT:
+#       answer = get_light_model(api_key).invoke(chat_messages(history, prompt)).text
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+import gemini_client
+import telemetry
+
+logger = logging.getLogger("model_router")
+
+ROUTE_CHAT = "chat"
+ROUTE_AGENT = "agent"
+
+ROUTER_ENABLED = os.environ.get("MODEL_ROUTER", "1") not in ("", "0")
+
+# Models of the two routes, and the light configuration
+AGENT_MODEL = gemini_client.DEFAULT_MODEL
+LIGHT_MODEL = os.environ.get("ROUTER_LIGHT_MODEL", "gemini-2.5-flash-lite")
+LIGHT_MAX_OUTPUT_TOKENS = 512
+
+# Longer messages always go to the agent
+MAX_CHAT_WORDS = 12
+
+# Earlier messages the light model sees
+CHAT_HISTORY_MESSAGES = 6
+
+LIGHT_PROMPT = ("You are a helpful, friendly assistant. Reply briefly and naturally. "
+                "If the user asks about data, files or numbers, say you can look that up for them.")
+
+# Anything that looks like a data, file or chart request
+_DATA_HINTS = re.compile(
+    r"\d|\b(sql|quer(y|ies)|tables?|database|columns?|rows?|data|dataset|records?|sales?|customers?|products?|"
+    r"orders?|revenue|profit|price|amount|region|total|sum|average|avg|mean|median|count|how (many|much)|top|"
+    r"most|least|list|show|find|compare|trend|month|year|week|chart|plot|graph|visuali[sz]e|file|upload|csv|"
+    r"json|analy[sz]e|analysis|report|statistics|stats)\b",
+    re.IGNORECASE
+)
+
+# Whole messages that are small talk (after punctuation and emoji are stripped)
+_SMALL_TALK = re.compile(
+    r"(hi|hello|hey|hiya|yo|howdy|greetings|good (morning|afternoon|evening|night)|"
+    r"thanks?|thank you|thx|ty|cheers|much appreciated|"
+    r"ok|okay|k|cool|great|nice|awesome|perfect|wonderful|got it|understood|sounds good|makes sense|"
+    r"bye|goodbye|see you|see ya|later|"
+    r"how are you|how are you doing|how's it going|what's up|"
+    r"who are you|what are you|what can you do|what do you do|help)"
+    r"( (there|again|so much|very much|a lot|everyone|all|friend|buddy))*",
+    re.IGNORECASE
+)
+_NOISE = re.compile(r"[^\w\s']+")
+
+def classify(text: str) -> Dict[str, str]:
+    """
+    Pick the route for a message
+
+    Returns:
+        {"route": ROUTE_CHAT or ROUTE_AGENT, "reason": why}
+    """
+    normalized = " ".join(_NOISE.sub(" ", text).split()).lower()
+    if not normalized:
+        return {"route": ROUTE_CHAT, "reason": "empty message"}
+    hint = _DATA_HINTS.search(text)
+    if hint:
+        return {"route": ROUTE_AGENT, "reason": f"data hint '{hint.group(0)}'"}
+    if len(normalized.split()) > MAX_CHAT_WORDS:
+        return {"route": ROUTE_AGENT, "reason": "long message"}
+    # Small talk may come in pairs ("hi, thanks!"), so match each clause
+    clauses = [clause.strip() for clause in re.split(r"[,.!?;]+", text) if _NOISE.sub("", clause).strip()]
+    if clauses and all(_SMALL_TALK.fullmatch(" ".join(_NOISE.sub(" ", clause).split())) for clause in clauses):
+        return {"route": ROUTE_CHAT, "reason": "small talk"}
+    return {"route": ROUTE_AGENT, "reason": "default"}
+
+def route(text: str, app: str = "", enabled: Optional[bool] = None) -> Dict[str, str]:
+    """
+    Route a message and log the decision
+
+    Args:
+        text: The user's message
+        app: Name of the calling app, for the log
+        enabled: Override MODEL_ROUTER (False sends everything to the agent)
+
+    Returns:
+        {"route", "reason", "model"}
+    """
+    enabled = ROUTER_ENABLED if enabled is None else enabled
+    decision = classify(text) if enabled else {"route": ROUTE_AGENT, "reason": "router disabled"}
+    decision["model"] = LIGHT_MODEL if decision["route"] == ROUTE_CHAT else AGENT_MODEL
+    logger.info("Routed %s turn to %s (%s, %s): %s", app or "a", decision["route"], decision["reason"],
+                decision["model"], text[:80])
+    return decision
+
+@lru_cache(maxsize=32)
+def get_light_model(api_key: str, temperature: float = 0.7):
+    """
+    The chat model of the "chat" route: LIGHT_MODEL without thinking and with short
+    replies, going through the gateway like every other Gemini call
+    """
+    return gemini_client.get_chat_model(api_key, LIGHT_MODEL, temperature=temperature,
+                                        thinking_budget=0, max_output_tokens=LIGHT_MAX_OUTPUT_TOKENS)
+
+def chat_messages(history: List[BaseMessage], text: str) -> List[BaseMessage]:
+    """
+    Messages for the light model: its prompt, the recent plain conversation
+    (tool calls and results left out, since it has no tools) and the new message
+    """
+    plain = [
+        msg for msg in history
+        if isinstance(msg, HumanMessage) or (isinstance(msg, AIMessage) and not msg.tool_calls and msg.text)
+    ]
+    return [SystemMessage(content=LIGHT_PROMPT)] + plain[-CHAT_HISTORY_MESSAGES:] + [HumanMessage(content=text)]
+
+class RouterStats:
+    """
+    Turns, latency and estimated cost per route, and what the "chat" route saved
+    compared to the average agent turn
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self._saved = {"ms": 0.0, "cost_usd": 0.0}
+        self._lock = threading.Lock()
+
+    def record(self, route_name: str, elapsed_ms: float, model: Optional[str],
+               input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+        """
+        Add a finished turn
+
+        Returns:
+            The turn's latency and cost, and for "chat" turns the latency and cost
+            saved (None until an agent turn has been seen to compare against)
+        """
+        cost = telemetry.estimate_cost(model, input_tokens, output_tokens) or 0.0
+        with self._lock:
+            totals = self._routes.setdefault(route_name, {"turns": 0, "total_ms": 0.0, "cost_usd": 0.0})
+            agent = self._routes.get(ROUTE_AGENT)
+            saved_ms = saved_cost = None
+            if route_name == ROUTE_CHAT and agent and agent["turns"]:
+                saved_ms = agent["total_ms"] / agent["turns"] - elapsed_ms
+                saved_cost = agent["cost_usd"] / agent["turns"] - cost
+                self._saved["ms"] += saved_ms
+                self._saved["cost_usd"] += saved_cost
+            elif route_name == ROUTE_CHAT:
+                # No agent turn yet: at least the price difference for the same tokens
+                saved_cost = (telemetry.estimate_cost(AGENT_MODEL, input_tokens, output_tokens) or 0.0) - cost
+                self._saved["cost_usd"] += saved_cost
+            totals["turns"] += 1
+            totals["total_ms"] += elapsed_ms
+            totals["cost_usd"] += cost
+
+        outcome = {"route": route_name, "elapsed_ms": round(elapsed_ms, 1), "cost_usd": round(cost, 6),
+                   "saved_ms": None if saved_ms is None else round(saved_ms, 1),
+                   "saved_cost_usd": None if saved_cost is None else round(saved_cost, 6)}
+        if route_name == ROUTE_CHAT:
+            logger.info("Route %s: %.0f ms, $%.6f (saved %s ms, $%s vs the average agent turn)", route_name,
+                        elapsed_ms, cost, outcome["saved_ms"], outcome["saved_cost_usd"])
+        else:
+            logger.info("Route %s: %.0f ms, $%.6f", route_name, elapsed_ms, cost)
+        return outcome
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {
+                name: {"turns": int(totals["turns"]),
+                       "mean_ms": round(totals["total_ms"] / totals["turns"], 1),
+                       "mean_cost_usd": round(totals["cost_usd"] / totals["turns"], 6)}
+                for name, totals in self._routes.items()
+            }
+            return {"routes": routes, "saved_ms": round(self._saved["ms"], 1),
+                    "saved_cost_usd": round(self._saved["cost_usd"], 6)}
+
+_stats = RouterStats()
+
+def record_turn(turn: telemetry.Turn, route_name: str) -> Dict[str, Any]:
+    """
+    Add a telemetry turn (its time so far and its tokens) to the route statistics
+    """
+    elapsed_ms = (time.perf_counter() - turn.start) * 1000
+    return _stats.record(route_name, elapsed_ms, turn.model, turn.input_tokens, turn.output_tokens)
+
+def stats() -> Dict[str, Any]:
+    """
+    Turns, mean latency and mean cost per route, and the totals saved by the "chat" route
+    """
+    return _stats.stats()
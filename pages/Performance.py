@@ -0,0 +1,125 @@
+# Performance page
+# Shows the per-turn telemetry recorded by telemetry.py: latency histograms,
+# where the time goes (model, tools, SQL, rendering), token use and the slowest turns.
+# Streamlit lists it in the sidebar of whichever app is running from this folder.
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+import telemetry
+
+st.title("📈 Performance")
+st.caption("Per-turn latency, stage timings and token use of the assistants")
+
+# --- Sidebar filters ---
+
+with st.sidebar:
+    st.subheader("Filters")
+    limit = st.slider("Turns to load", min_value=50, max_value=5000, value=1000, step=50,
+                      help="The most recent turns are loaded")
+    st.button("Refresh")
+
+if not telemetry.TELEMETRY_DB:
+    st.info("Telemetry is off. Start the app with `TELEMETRY_DB=telemetry.db` to record every turn.", icon="⏱️")
+    st.stop()
+
+turns = pd.DataFrame(telemetry.load_turns(limit))
+if turns.empty:
+    st.info("No turns recorded yet. Ask one of the assistants a question, then come back here.", icon="⏱️")
+    st.stop()
+
+apps = sorted(turns["app"].dropna().unique())
+with st.sidebar:
+    selected_apps = st.multiselect("Apps", apps, default=apps)
+turns = turns[turns["app"].isin(selected_apps)]
+if turns.empty:
+    st.warning("No turns for the selected apps.")
+    st.stop()
+
+turns["time"] = pd.to_datetime(turns["ts"], unit="s")
+stage_columns = [f"{stage}_ms" for stage in telemetry.STAGES]
+
+# --- Summary ---
+
+col1, col2, col3, col4, col5 = st.columns(5)
+with col1:
+    st.metric("Turns", len(turns))
+with col2:
+    st.metric("p50 latency", f"{turns['total_ms'].quantile(0.5) / 1000:.2f} s")
+with col3:
+    st.metric("p95 latency", f"{turns['total_ms'].quantile(0.95) / 1000:.2f} s")
+with col4:
+    st.metric("Tokens per turn", f"{(turns['input_tokens'] + turns['output_tokens']).mean():.0f}")
+with col5:
+    st.metric("Estimated cost", f"${turns['cost_usd'].fillna(0).sum():.4f}")
+
+error_rate = turns["error"].notna().mean()
+if error_rate:
+    st.caption(f"{error_rate:.1%} of turns ended with an error")
+
+# --- Latency histograms ---
+
+st.subheader("Latency distribution")
+tab_total, tab_stages = st.tabs(["Turn latency", "By stage"])
+with tab_total:
+    st.altair_chart(
+        alt.Chart(turns).mark_bar().encode(
+            x=alt.X("total_ms:Q", bin=alt.Bin(maxbins=40), title="Turn latency (ms)"),
+            y=alt.Y("count():Q", title="Turns"),
+            color=alt.Color("app:N", title="App"),
+            tooltip=["app:N", "count():Q"]
+        ),
+        use_container_width=True
+    )
+with tab_stages:
+    stages = turns.melt(id_vars=["turn_id"], value_vars=stage_columns, var_name="stage", value_name="ms")
+    stages["stage"] = stages["stage"].str.replace("_ms", "", regex=False)
+    stages = stages[stages["ms"].fillna(0) > 0]
+    st.altair_chart(
+        alt.Chart(stages).mark_bar(opacity=0.7).encode(
+            x=alt.X("ms:Q", bin=alt.Bin(maxbins=40), title="Time in stage per turn (ms)"),
+            y=alt.Y("count():Q", stack=None, title="Turns"),
+            color=alt.Color("stage:N", title="Stage")
+        ),
+        use_container_width=True
+    )
+
+# --- Where the time goes ---
+
+st.subheader("Average time per stage")
+averages = turns[["app"] + stage_columns].groupby("app").mean().reset_index().melt(
+    id_vars="app", var_name="stage", value_name="ms"
+)
+averages["stage"] = averages["stage"].str.replace("_ms", "", regex=False)
+st.altair_chart(
+    alt.Chart(averages).mark_bar().encode(
+        x=alt.X("ms:Q", title="Average ms per turn"),
+        y=alt.Y("app:N", title=None),
+        color=alt.Color("stage:N", title="Stage"),
+        tooltip=["app:N", "stage:N", alt.Tooltip("ms:Q", format=".1f")]
+    ),
+    use_container_width=True
+)
+st.caption("Stages can overlap (tools run concurrently and SQL runs inside tools), so they may add up to more than the turn.")
+
+# --- Slowest turns ---
+
+st.subheader("Slowest turns")
+slowest = turns.sort_values("total_ms", ascending=False).head(20)
+st.dataframe(
+    slowest[["time", "app", "question", "source", "total_ms"] + stage_columns +
+            ["llm_calls", "tool_calls", "sql_queries", "input_tokens", "output_tokens", "cost_usd", "error"]],
+    use_container_width=True,
+    hide_index=True
+)
+
+# Spans of one turn, in the order they started
+labels = {row.turn_id: f"{row.total_ms:,.0f} ms · {row.app} · {row.question[:60]}" for row in slowest.itertuples()}
+selected = st.selectbox("Spans of turn", list(labels), format_func=labels.get)
+if selected:
+    spans = pd.DataFrame(slowest.set_index("turn_id").loc[selected, "spans"])
+    if spans.empty:
+        st.caption("No spans were recorded for this turn.")
+    else:
+        st.dataframe(spans.sort_values("start_ms"), use_container_width=True, hide_index=True)
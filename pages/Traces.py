@@ -0,0 +1,101 @@
+# Traces page
+# Waterfall view of the traces written by tracing.py: for one turn, which agent
+# step, model call, tool call and SQL statement ran when, and for how long.
+# Streamlit lists it in the sidebar of whichever app is running from this folder.
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+import tracing
+
+st.title("🧵 Traces")
+st.caption("Where the time of a single turn went: agent steps, model calls, tools and SQL")
+
+# --- Sidebar ---
+
+with st.sidebar:
+    st.subheader("Traces")
+    limit = st.slider("Traces to load", min_value=10, max_value=500, value=100, step=10,
+                      help="The most recent traces are loaded")
+    min_ms = st.number_input("Slower than (ms)", min_value=0, value=0, step=100)
+    st.button("Refresh")
+
+if not tracing.TRACE_FILE:
+    st.info("Tracing is off. Start the app with `TRACE_FILE=traces.jsonl` to record a trace per turn.", icon="🧵")
+    st.stop()
+
+traces = [trace for trace in tracing.load_traces(limit=limit) if trace["duration_ms"] >= min_ms]
+if not traces:
+    st.info(f"No traces found in `{tracing.TRACE_FILE}`. Ask one of the assistants a question, then come back here.", icon="🧵")
+    st.stop()
+
+# --- Trace list ---
+
+overview = pd.DataFrame([{
+    "trace_id": trace["trace_id"],
+    "time": pd.to_datetime(trace["start"], unit="s"),
+    "turn": trace["name"],
+    "question": trace["attributes"].get("question", ""),
+    "duration_ms": trace["duration_ms"],
+    "spans": len(trace["spans"]),
+    "errors": sum(1 for span in trace["spans"] if span["status"] == tracing.STATUS_ERROR)
+} for trace in traces])
+st.dataframe(overview, use_container_width=True, hide_index=True)
+
+by_id = {trace["trace_id"]: trace for trace in traces}
+sort_slowest = st.toggle("Slowest first", value=False)
+choices = sorted(by_id, key=lambda trace_id: by_id[trace_id]["duration_ms"], reverse=True) if sort_slowest else list(by_id)
+selected = st.selectbox(
+    "Trace", choices,
+    format_func=lambda trace_id: f"{by_id[trace_id]['duration_ms']:,.0f} ms · {by_id[trace_id]['name']} · "
+                                 f"{by_id[trace_id]['attributes'].get('question', '')[:60]}"
+)
+trace = by_id[selected]
+
+# --- Waterfall ---
+
+st.subheader("Waterfall")
+spans = pd.DataFrame(trace["spans"])
+# One row per span, indented by depth and numbered so identical names stay separate rows
+spans["label"] = [f"{number:02d} {'  ' * depth}{name}" for number, (depth, name) in enumerate(zip(spans["depth"], spans["name"]))]
+spans["end_ms"] = spans["start_ms"] + spans["duration_ms"]
+spans["stage"] = [attributes.get("stage", "turn") for attributes in spans["attributes"]]
+spans["statement"] = [attributes.get("db.statement", "") for attributes in spans["attributes"]]
+spans["rows"] = [attributes.get("db.rows") for attributes in spans["attributes"]]
+spans["failed"] = spans["status"] == tracing.STATUS_ERROR
+
+chart = alt.Chart(spans.drop(columns=["attributes"])).mark_bar(cornerRadius=2).encode(
+    x=alt.X("start_ms:Q", title="ms since the turn started"),
+    x2="end_ms:Q",
+    y=alt.Y("label:N", sort=list(spans["label"]), title=None, axis=alt.Axis(labelLimit=400)),
+    color=alt.Color("stage:N", title="Stage"),
+    stroke=alt.condition("datum.failed", alt.value("red"), alt.value(None)),
+    tooltip=["name:N", "stage:N", alt.Tooltip("start_ms:Q", format=".1f"), alt.Tooltip("duration_ms:Q", format=".1f"),
+             "statement:N", "rows:Q", "error:N"]
+).properties(height=max(120, 22 * len(spans)))
+st.altair_chart(chart, use_container_width=True)
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("Duration", f"{trace['duration_ms']:,.0f} ms")
+with col2:
+    st.metric("Spans", len(spans))
+with col3:
+    sql = spans[spans["stage"] == "sql"]
+    st.metric("SQL time", f"{sql['duration_ms'].sum():,.1f} ms", help=f"{len(sql)} statements")
+
+# --- Span details ---
+
+st.subheader("Slowest spans")
+leaves = spans[~spans["span_id"].isin(spans["parent_span_id"].dropna())]
+st.dataframe(
+    leaves.sort_values("duration_ms", ascending=False)[["name", "stage", "duration_ms", "start_ms", "rows", "statement", "error"]],
+    use_container_width=True,
+    hide_index=True
+)
+
+with st.expander("All span attributes"):
+    for span in trace["spans"]:
+        st.markdown(f"**{'  ' * span['depth']}{span['name']}** · {span['duration_ms']:.2f} ms")
+        st.json(span["attributes"], expanded=False)
@@ -0,0 +1,176 @@
+# result_format.py
+# Compact encoding of query results for the LLM.
+# The Python repr of a list of dicts repeats every column name on every row;
+# a header line plus tab-separated rows (or a Markdown table) carries the same
+# data in far fewer tokens, which also shortens every later agent step.
+import math
+from typing import List, Dict, Any, Optional
+
+# Floats keep this many significant digits (but never lose integer digits), so
+# 0.0042 stays 0.0042 and 1299.99 stays 1299.99
+FLOAT_DIGITS = 6
+
+# Integer-valued floats below this are written as integers ("150", not "150.0")
+EXACT_INTEGER_LIMIT = 2 ** 53
+
+# Numeric summaries are added when a result has more rows than this
+SUMMARY_THRESHOLD = 20
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about four characters per token for Gemini-style tokenizers)
+    """
+    return math.ceil(len(text) / 4)
+
+def _format_float(value: float, float_digits: int) -> str:
+    if value.is_integer() and abs(value) < EXACT_INTEGER_LIMIT:
+        return str(int(value))
+    if not math.isfinite(value):
+        return str(value)
+    # Significant digits, widened to cover the integer part (1234567.891 -> 1234568)
+    # up to the 17 digits a double holds
+    integer_digits = len(str(int(abs(value)))) if abs(value) >= 1 else 0
+    return f"{value:.{min(max(float_digits, integer_digits), 17)}g}"
+
+def _format_value(value: Any, float_digits: int) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, float):
+        return _format_float(value, float_digits)
+    # Keep each row on one line
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+def summarize_numeric_columns(rows: List[Dict[str, Any]], float_digits: int = FLOAT_DIGITS) -> Dict[str, Dict[str, Any]]:
+    """
+    Count, min, max and mean for every numeric column
+
+    Min and max are the column's own values; the mean keeps float_digits
+    significant digits.
+
+    Args:
+        rows: Query result rows
+        float_digits: Significant digits kept for the mean
+
+    Returns:
+        Dictionary mapping column name to its summary
+    """
+    if not rows:
+        return {}
+    summary = {}
+    for column in rows[0].keys():
+        values = [row[column] for row in rows if isinstance(row.get(column), (int, float)) and not isinstance(row.get(column), bool)]
+        if not values:
+            continue
+        summary[column] = {
+            "count": len(values),
+            "min": min(values),
+            "max": max(values),
+            "mean": float(_format_float(math.fsum(values) / len(values), float_digits))
+        }
+    return summary
+
+def encode_rows(rows: List[Dict[str, Any]], style: str = "tsv", float_digits: int = FLOAT_DIGITS) -> str:
+    """
+    Encode rows as a header line plus one line per row
+
+    Args:
+        rows: Query result rows
+        style: "tsv" (tab-separated, the most compact) or "markdown" (aligned table)
+        float_digits: Significant digits kept for floats
+
+    Returns:
+        The encoded table
+    """
+    if not rows:
+        return ""
+    columns = list(rows[0].keys())
+    cells = [[_format_value(row.get(column), float_digits) for column in columns] for row in rows]
+
+    if style == "markdown":
+        widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+        lines = [
+            "| " + " | ".join(column.ljust(widths[i]) for i, column in enumerate(columns)) + " |",
+            "| " + " | ".join("-" * width for width in widths) + " |"
+        ]
+        lines += ["| " + " | ".join(cell.ljust(widths[i]) for i, cell in enumerate(line)) + " |" for line in cells]
+        return "\n".join(lines)
+
+    return "\n".join(["\t".join(columns)] + ["\t".join(line) for line in cells])
+
+def format_query_result(result: Dict[str, Any], style: str = "tsv") -> str:
+    """
+    Format a text_to_sql (or batch statement) result for a ToolMessage
+
+    Args:
+        result: Dictionary with "query", "results" and optionally "total_rows",
+            "next_token", "summary" and "repair"
+        style: Table style passed to encode_rows
+
+    Returns:
+        The SQL query in a ```sql block followed by the compact results
+    """
+    rows = result.get("results") or []
+    parts = [f"```sql\n{result['query']}\n```"]
+
+    if rows and "error" in rows[0]:
+        parts.append(f"Query Error: {rows[0]['error']}")
+    elif rows and "affected_rows" in rows[0] and len(rows[0]) == 1:
+        parts.append(f"Query Results: {rows[0]['affected_rows']} rows affected")
+    else:
+        total_rows = result.get("total_rows", len(rows))
+        shown = f"{len(rows)} of {total_rows} rows" if total_rows > len(rows) else f"{total_rows} rows"
+        parts.append(f"Query Results ({shown}):")
+        if rows:
+            parts.append(encode_rows(rows, style))
+
+        # Numeric summaries cover every row, not just the page shown
+        summary = result.get("summary")
+        if summary is None and len(rows) > SUMMARY_THRESHOLD:
+            summary = summarize_numeric_columns(rows)
+        if summary:
+            parts.append("Summary: " + "; ".join(
+                f"{column} count={s['count']} min={_format_value(s['min'], FLOAT_DIGITS)} "
+                f"max={_format_value(s['max'], FLOAT_DIGITS)} mean={_format_value(s['mean'], FLOAT_DIGITS)}"
+                for column, s in summary.items()
+            ))
+        if result.get("next_token"):
+            parts.append(f"More rows available: fetch_more(token=\"{result['next_token']}\")")
+
+    if result.get("repair"):
+        repair = result["repair"]
+        parts.append(f"Auto-repaired from: {repair['original_query']} ({'; '.join(repair['changes'])})")
+
+    return "\n".join(parts)
+
+def format_more_rows(page: Dict[str, Any], style: str = "tsv") -> str:
+    """
+    Format a page returned by result_spool.fetch_more for a ToolMessage
+    """
+    if "error" in page:
+        return f"Query Error: {page['error']}"
+    rows = page["results"]
+    parts = [f"More Query Results ({len(rows)} rows, {page['total_rows']} in total):"]
+    if rows:
+        parts.append(encode_rows(rows, style))
+    if page.get("next_token"):
+        parts.append(f"More rows available: fetch_more(token=\"{page['next_token']}\")")
+    return "\n".join(parts)
+
+if __name__ == "__main__":
+    # Compare the old repr-based tool output with the compact encoding
+    from database_tools import text_to_sql
+
+    sample_queries = [
+        "SELECT * FROM customers",
+        "SELECT * FROM sales",
+        "SELECT p.name, SUM(si.quantity) AS total_sold, SUM(si.quantity * si.price_per_unit) AS revenue "
+        "FROM sale_items si JOIN products p ON si.product_id = p.product_id GROUP BY p.product_id ORDER BY revenue DESC",
+        "SELECT s.sale_id, c.name, s.sale_date, si.quantity, si.price_per_unit * 1.0825 AS price_with_tax "
+        "FROM sales s JOIN customers c ON c.customer_id = s.customer_id JOIN sale_items si ON si.sale_id = s.sale_id"
+    ]
+    print(f"{'query':<60} {'before':>8} {'after':>8} {'saved':>7}")
+    for query in sample_queries:
+        result = text_to_sql(query)
+        before = estimate_tokens(f"```sql\n{query}\n```\n\nQuery Results:\n{result}")
+        after = estimate_tokens(format_query_result(result))
+        print(f"{query[:60]:<60} {before:>8} {after:>8} {1 - after / before:>7.0%}")
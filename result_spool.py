@@ -0,0 +1,167 @@
+# result_spool.py
+# Server-side spool for large query results.
+# Tools return only the first page of rows plus a continuation token; the rest
+# is parked in a local SQLite file until the model asks for it with fetch_more
+# or the spool expires. This keeps thousands of rows out of the LLM context.
+# Spools belong to the session that created them (see spool_session): a token
+# from another conversation is treated like an unknown one.
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Optional, Iterator
+
+# Spool database file (shared by every session in the process)
+SPOOL_PATH = os.path.join(tempfile.gettempdir(), "chatbot_result_spool.db")
+
+# Rows returned to the model per page, and at most per fetch_more call
+DEFAULT_PAGE_SIZE = 50
+MAX_FETCH_ROWS = DEFAULT_PAGE_SIZE
+
+# Spooled results expire after this many seconds
+SPOOL_TTL = 15 * 60
+
+_spool_lock = threading.Lock()
+_spool_ready = False
+
+# Session that spools created in the current context belong to (tools running
+# in worker threads inherit the context)
+_spool_owner: ContextVar[Optional[str]] = ContextVar("spool_owner", default=None)
+
+@contextmanager
+def spool_session(session_id: Optional[str]) -> Iterator[None]:
+    """
+    Spool results within the block for this session; only it can fetch them
+
+    Args:
+        session_id: Conversation the queries run for
+    """
+    token = _spool_owner.set(session_id)
+    try:
+        yield
+    finally:
+        _spool_owner.reset(token)
+
+def _connect() -> sqlite3.Connection:
+    global _spool_ready
+    conn = sqlite3.connect(SPOOL_PATH, timeout=10)
+    if not _spool_ready:
+        with _spool_lock:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS spools (
+                spool_id TEXT PRIMARY KEY,
+                total_rows INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                owner TEXT
+            )
+            """)
+            # Spool files from before spools had owners
+            if "owner" not in [col[1] for col in conn.execute("PRAGMA table_info(spools)")]:
+                conn.execute("ALTER TABLE spools ADD COLUMN owner TEXT")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool_rows (
+                spool_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                row_json TEXT NOT NULL,
+                PRIMARY KEY (spool_id, position)
+            ) WITHOUT ROWID
+            """)
+            conn.commit()
+            _spool_ready = True
+    return conn
+
+def _purge_expired(conn: sqlite3.Connection) -> None:
+    expired = [row[0] for row in conn.execute("SELECT spool_id FROM spools WHERE expires_at < ?", (time.time(),))]
+    for spool_id in expired:
+        conn.execute("DELETE FROM spool_rows WHERE spool_id = ?", (spool_id,))
+        conn.execute("DELETE FROM spools WHERE spool_id = ?", (spool_id,))
+
+def spool_results(rows: List[Dict[str, Any]], page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Return the first page of rows and spool the rest
+
+    Args:
+        rows: All result rows
+        page_size: Number of rows to return now
+
+    Returns:
+        Dictionary with "results" (the first page), "total_rows" and
+        "next_token" (None when every row fits on the first page)
+    """
+    if len(rows) <= page_size:
+        return {"results": rows, "total_rows": len(rows), "next_token": None}
+
+    spool_id = uuid.uuid4().hex
+    conn = _connect()
+    try:
+        _purge_expired(conn)
+        conn.execute(
+            "INSERT INTO spools (spool_id, total_rows, expires_at, owner) VALUES (?, ?, ?, ?)",
+            (spool_id, len(rows), time.time() + SPOOL_TTL, _spool_owner.get())
+        )
+        conn.executemany(
+            "INSERT INTO spool_rows (spool_id, position, row_json) VALUES (?, ?, ?)",
+            ((spool_id, position, json.dumps(row, default=str)) for position, row in enumerate(rows))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "results": rows[:page_size],
+        "total_rows": len(rows),
+        "next_token": f"{spool_id}:{page_size}"
+    }
+
+def fetch_more(token: str, n: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Fetch the next rows of a spooled result
+
+    Args:
+        token: Continuation token returned with the previous page
+        n: Number of rows to fetch (clamped to 1..MAX_FETCH_ROWS)
+
+    Returns:
+        Dictionary with "results", "total_rows" and "next_token" (None after
+        the last page), or {"error": ...} for an unknown or expired token, or
+        one that belongs to another session
+    """
+    try:
+        spool_id, offset = token.rsplit(":", 1)
+        offset = max(int(offset), 0)
+        n = min(max(int(n), 1), MAX_FETCH_ROWS)
+    except (AttributeError, TypeError, ValueError):
+        return {"error": f"Invalid continuation token or row count: {token}, {n}"}
+
+    conn = _connect()
+    try:
+        spool = conn.execute(
+            "SELECT total_rows, expires_at, owner FROM spools WHERE spool_id = ?", (spool_id,)
+        ).fetchone()
+        if spool is None or spool[1] < time.time() or spool[2] != _spool_owner.get():
+            return {"error": "Continuation token expired or unknown; run the query again"}
+
+        total_rows = spool[0]
+        rows = [
+            json.loads(row[0]) for row in conn.execute(
+                "SELECT row_json FROM spool_rows WHERE spool_id = ? AND position >= ? ORDER BY position LIMIT ?",
+                (spool_id, offset, n)
+            )
+        ]
+        # Reading a page keeps the spool alive for another TTL
+        conn.execute("UPDATE spools SET expires_at = ? WHERE spool_id = ?", (time.time() + SPOOL_TTL, spool_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+    next_offset = offset + len(rows)
+    return {
+        "results": rows,
+        "total_rows": total_rows,
+        "next_token": f"{spool_id}:{next_offset}" if next_offset < total_rows else None
+    }
@@ -0,0 +1,319 @@
+# semantic_cache.py
+# Local similarity cache for paraphrased questions to the SQL Assistant.
+# Prompts are indexed with TF-IDF weighted word and character n-grams, so no
+# network call or embedding API is needed to find a previous, similar prompt.
+#
+# Filler words ("the", "has") are left out of the index, plural "s" is
+# dropped, "who" stands for "customer", and words that only say which end of a ranking or comparison is
+# meant are folded into one token per direction ("biggest", "top" and "most"
+# all become max), so "Which customer spent the most?" and "Who has spent the
+# most?" land close together.
+#
+# Similar wording is not enough for a hit: "top 5 customers" and "top 3
+# customers" are near-identical to TF-IDF but need different answers. A
+# previous prompt only counts when its literals (numbers, quoted text,
+# comparison, direction and negation words, see extract_literals) are the same
+# and its names appear in the new prompt, in any case ("jane" matches "Jane").
+# Follow-up questions ("what about Jane?") depend on the conversation, so
+# callers should neither look them up nor store them (see is_follow_up).
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity a previous prompt must reach to count as a hit
+DEFAULT_THRESHOLD = 0.82
+
+# Maximum number of prompts kept in the index (least recently used are evicted)
+DEFAULT_MAX_ENTRIES = 500
+
+# Character n-gram size used next to the word tokens
+NGRAM_SIZE = 3
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Lowercase a prompt and strip punctuation and repeated whitespace
+    """
+    text = re.sub(r"[^\w\s]", " ", prompt.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+# Words that only say which end of a ranking, or which side of a comparison, is
+# meant; each group counts as one literal ("biggest" and "top" ask the same)
+DIRECTION_WORDS = {
+    **dict.fromkeys("top highest largest biggest most best max maximum greatest".split(), "max"),
+    **dict.fromkeys("bottom lowest smallest least worst min minimum fewest".split(), "min"),
+    **dict.fromkeys("more greater higher larger bigger above over exceeding".split(), "more"),
+    **dict.fromkeys("less fewer smaller lower below under".split(), "less"),
+}
+
+# Other words that change what a question asks for even when the rest of it matches
+LITERAL_WORDS = frozenset("""
+    first last before after since until between
+    ascending descending increase decrease increased decreased up down not no without except exclude excluding
+    only never all none average sum total count median
+    january february march april may june july august september october november december
+    jan feb mar apr jun jul aug sep sept oct nov dec monday tuesday wednesday thursday friday saturday sunday
+    today yesterday tomorrow week month quarter year daily weekly monthly quarterly yearly
+""".split())
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_QUOTED_RE = re.compile(r"\"([^\"]+)\"|(?:^|\s)'([^']+)'")
+_COMPARISON_RE = re.compile(r"[<>]=?|!=|=")
+_NAME_RE = re.compile(r"\b[A-Z][\w'-]*")
+
+# Words left out of the similarity features: they rarely change what is asked
+# ("who spent the most money" asks what "who spent the most" asks)
+STOP_WORDS = frozenset("""
+    a an the of for in on at to from with me us i we you my our your please can could would will
+    show list give tell find get display what which whose is are was were be been has have had
+    do does did there that this money
+""".split())
+
+# Words indexed as another word: in the sales data the people are the customers
+SYNONYMS = {"who": "customer", "whom": "customer", "client": "customer", "buyer": "customer"}
+
+# Questions that lean on an earlier turn. Only the start of a question counts:
+# "what about Jane?", "and their emails?", "same for 2023", "show them by month",
+# "what is its total?" - but not "List all customers and their emails"
+_PRONOUN = r"(?:it|its|they|them|their|those|these|he|she|him|her|his)\b"
+_FOLLOW_UP_RE = re.compile(
+    r"^\s*(?:(?:what|how)\s+about\b|(?:and|also|same|instead|now|then|ok|okay|but)\b"
+    rf"|(?:(?:what|who|where|when|how|which)(?:'s|\s+(?:is|are|was|were|do|does|did))\s+|[\w']+\s+)?{_PRONOUN})",
+    re.IGNORECASE
+)
+
+def extract_literals(prompt: str) -> tuple:
+    """
+    The parts of a prompt that must match for a cached answer to apply:
+    numbers (limits, years, amounts), quoted text, capitalized names after the
+    first word, comparison operators, the direction of DIRECTION_WORDS and
+    LITERAL_WORDS. Names are compared case-insensitively against the other
+    prompt's words (see literals_match); everything else must be equal.
+
+    Returns:
+        Sorted tuple of the lowercased literals (repeats included)
+    """
+    literals = [number.replace(",", "") for number in _NUMBER_RE.findall(prompt)]
+    literals += [(double or single).strip().lower() for double, single in _QUOTED_RE.findall(prompt)]
+    literals += ["op:" + op for op in _COMPARISON_RE.findall(prompt)]
+    words = prompt.split()
+    # The first word is capitalized anyway; later capitalized words are names ("Jane", "Laptop")
+    literals += ["name:" + name.lower() for name in _NAME_RE.findall(" ".join(words[1:]))]
+    for word in normalize_prompt(prompt).split():
+        if word in DIRECTION_WORDS:
+            literals.append("dir:" + DIRECTION_WORDS[word])
+        elif word in LITERAL_WORDS:
+            literals.append("word:" + word)
+    return tuple(sorted(literals))
+
+def literals_match(literals: tuple, words: set, other_literals: tuple, other_words: set) -> bool:
+    """
+    Whether two prompts agree on their literals: the same literals apart from
+    names, and each prompt's names among the other prompt's words (so "jane"
+    matches "Jane", but "Bob" never matches "Jane")
+    """
+    names = {literal[5:] for literal in literals if literal.startswith("name:")}
+    other_names = {literal[5:] for literal in other_literals if literal.startswith("name:")}
+    strict = [literal for literal in literals if not literal.startswith("name:")]
+    other_strict = [literal for literal in other_literals if not literal.startswith("name:")]
+    return strict == other_strict and names <= other_words and other_names <= words
+
+def is_follow_up(prompt: str) -> bool:
+    """
+    Whether a prompt looks like it depends on an earlier turn of the conversation
+    (it starts with a reference to something said before)
+    """
+    return bool(_FOLLOW_UP_RE.search(prompt))
+
+def extract_features(prompt: str) -> Counter:
+    """
+    Turn a prompt into a bag of word tokens and character n-grams
+
+    Args:
+        prompt: The raw user prompt
+
+    Returns:
+        Counter mapping each feature to its term frequency
+    """
+    text = normalize_prompt(prompt)
+    features = Counter()
+    for word in text.split():
+        if word in STOP_WORDS:
+            continue
+        # One token per direction, and no plural "s" ("customers" is "customer")
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        word = DIRECTION_WORDS.get(word) or SYNONYMS.get(word, word)
+        features["w:" + word] += 1
+        # Pad each word so prefixes and suffixes get their own n-grams
+        padded = f" {word} "
+        for i in range(max(len(padded) - NGRAM_SIZE + 1, 1)):
+            features["c:" + padded[i:i + NGRAM_SIZE]] += 1
+    return features
+
+class SemanticCache:
+    """
+    In-process TF-IDF index over previous prompts and their answers.
+
+    Each entry remembers the database version it was answered against. A
+    lookup only returns the cached answer while that version is unchanged;
+    once the data has changed the cached SQL is returned instead, so the
+    caller can re-run it without asking the model again.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._doc_freq = Counter()
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "answer_hits": 0, "sql_hits": 0, "misses": 0, "false_hits": 0}
+
+    def _idf(self, feature: str) -> float:
+        # Smoothed IDF so features seen in every prompt keep a small weight
+        return math.log((1 + len(self._entries)) / (1 + self._doc_freq[feature])) + 1.0
+
+    def _vector(self, features: Counter) -> Dict[str, float]:
+        vector = {f: (1 + math.log(tf)) * self._idf(f) for f, tf in features.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {f: v / norm for f, v in vector.items()}
+
+    def _similarity(self, query: Dict[str, float], features: Counter) -> float:
+        entry_vector = self._vector(features)
+        return sum(weight * entry_vector.get(f, 0.0) for f, weight in query.items())
+
+    def lookup(self, prompt: str, db_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the most similar previous prompt with the same literals
+
+        Args:
+            prompt: The new user prompt
+            db_version: Current version of the database (see get_database_version)
+
+        Returns:
+            None on a miss, otherwise a dictionary with "kind" ("answer" when the
+            database is unchanged, "sql" when only the cached SQL can be reused),
+            "key", "prompt", "answer", "sql" and "similarity"
+        """
+        features = extract_features(prompt)
+        literals = extract_literals(prompt)
+        words = set(normalize_prompt(prompt).split())
+        with self._lock:
+            self._stats["lookups"] += 1
+            best_key, best_score = None, 0.0
+            if features and self._entries:
+                query = self._vector(features)
+                for key, entry in self._entries.items():
+                    # "top 5" is never a paraphrase of "top 3", however similar the wording
+                    if not literals_match(entry["literals"], entry["words"], literals, words):
+                        continue
+                    score = self._similarity(query, entry["features"])
+                    if score > best_score:
+                        best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self._stats["misses"] += 1
+                self._log_stats("miss", prompt, best_score)
+                return None
+
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            if entry["db_version"] == db_version:
+                kind = "answer"
+            elif entry["sql"]:
+                kind = "sql"
+            else:
+                # Answer is stale and there is no SQL to re-run
+                self._stats["misses"] += 1
+                self._log_stats("stale", prompt, best_score)
+                return None
+
+            self._stats[f"{kind}_hits"] += 1
+            self._log_stats(f"{kind} hit", prompt, best_score)
+            return {
+                "kind": kind,
+                "key": best_key,
+                "prompt": entry["prompt"],
+                "answer": entry["answer"],
+                "sql": entry["sql"],
+                "similarity": round(best_score, 3)
+            }
+
+    def store(self, prompt: str, answer: str, sql: Optional[str], db_version: str) -> None:
+        """
+        Add (or replace) the answer for a prompt
+
+        Args:
+            prompt: The user prompt that was answered
+            answer: The final answer shown to the user
+            sql: The SQL query used to produce the answer, if any
+            db_version: Version of the database the answer was computed against
+        """
+        key = normalize_prompt(prompt)
+        if not key:
+            return
+        features = extract_features(prompt)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = {
+                "prompt": prompt,
+                "answer": answer,
+                "sql": sql,
+                "db_version": db_version,
+                "features": features,
+                "literals": extract_literals(prompt),
+                "words": set(key.split()),
+                "created": time.time()
+            }
+            self._doc_freq.update(features.keys())
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._doc_freq.subtract(entry["features"].keys())
+        self._doc_freq += Counter()  # Drop features whose count reached zero
+
+    def report_false_hit(self, key: str) -> None:
+        """
+        Record that a returned hit did not answer the prompt and drop that entry
+        """
+        with self._lock:
+            self._stats["false_hits"] += 1
+            if key in self._entries:
+                self._remove(key)
+            logger.info("Semantic cache false hit on %r (%s)", key, self._format_stats())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit-rate and false-hit metrics for the cache
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        hits = stats["answer_hits"] + stats["sql_hits"]
+        stats["hit_rate"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+        stats["false_hit_rate"] = stats["false_hits"] / hits if hits else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._doc_freq.clear()
+
+    def _format_stats(self) -> str:
+        hits = self._stats["answer_hits"] + self._stats["sql_hits"]
+        lookups = self._stats["lookups"]
+        return (
+            f"hit_rate={hits / lookups if lookups else 0.0:.2%} "
+            f"false_hits={self._stats['false_hits']}/{hits} entries={len(self._entries)}"
+        )
+
+    def _log_stats(self, outcome: str, prompt: str, score: float) -> None:
+        logger.info("Semantic cache %s for %r (similarity=%.3f, %s)", outcome, prompt, score, self._format_stats())
@@ -0,0 +1,114 @@
+# sql_agent_tools.py
+# The LangChain tools and instructions of the SQL Assistant agent.
+# They live outside the Streamlit script so benchmarks and other front ends can
+# build exactly the same agent without running the app.
+from typing import List
+
+from langchain_core.tools import tool  # For creating tools
+
+from database_tools import execute_sql_batch as run_sql_batch
+from database_tools import text_to_sql, get_database_info
+from result_spool import fetch_more as fetch_spooled_rows
+from result_format import format_query_result, format_more_rows
+
+# Rows of a query result that go into the model's context at once; the rest can be paged in with fetch_more
+RESULT_PAGE_SIZE = 50
+
+# Define the tools using the LangChain tool decorator
+@tool
+def execute_sql(sql_query: str):
+    """
+    Execute a SQL query against the sales database.
+    
+    Args:
+        sql_query: The SQL query to execute. Must be a valid SQL query string.
+              For example: "SELECT * FROM customers", "SELECT p.name, SUM(si.quantity) as total_sold FROM sale_items si JOIN products p ON si.product_id = p.product_id GROUP BY p.product_id ORDER BY total_sold DESC", etc.
+    """
+    result = text_to_sql(sql_query, page_size=RESULT_PAGE_SIZE)
+    # Format the result to clearly show the executed SQL query (the repaired one, if it was fixed locally),
+    # followed by a compact header-plus-rows table instead of the repr of every row dict
+    formatted_result = format_query_result(result)
+    return formatted_result
+
+@tool
+def execute_sql_batch(sql_queries: List[str]):
+    """
+    Execute several read-only SQL queries against the sales database in one call.
+    Use this instead of several execute_sql calls when you need more than one result,
+    e.g. a total, a breakdown and a top-N list. All queries see the same snapshot of the data.
+    
+    Args:
+        sql_queries: The SELECT queries to execute, in order.
+    """
+    batch = run_sql_batch(sql_queries, page_size=RESULT_PAGE_SIZE)
+    # Format each statement like execute_sql does, with its own timing
+    parts = []
+    for number, statement in enumerate(batch["statements"], start=1):
+        parts.append(f"Statement {number} ({statement['elapsed_ms']} ms):\n{format_query_result(statement)}")
+    if "error" in batch:
+        parts.append(f"Batch error: {batch['error']}")
+    parts.append(f"Batch total: {batch['total_ms']} ms")
+    return "\n\n".join(parts)
+
+@tool
+def fetch_more(token: str, n: int = RESULT_PAGE_SIZE):
+    """
+    Fetch more rows of a large query result.
+    Query results only include the first rows; when a result has a "next_token", pass it here
+    to get the next n rows. Only do this if you actually need more rows to answer.
+    
+    Args:
+        token: The "next_token" of the previous page.
+        n: How many rows to fetch.
+    """
+    return format_more_rows(fetch_spooled_rows(token, n))
+
+@tool
+def get_schema_info():
+    """
+    Get information about the database schema and sample data to help with query construction.
+    This tool returns the schema of all tables, sample data (first 3 rows) from each table and
+    per-column statistics (distinct count, min/max, most common values, null fraction).
+    The schema is already part of your instructions; only use this tool if you need sample
+    data or the schema there looks incomplete.
+    """
+    return get_database_info()
+
+# The agent's instructions. The schema digest is baked in so the agent can write
+# queries straight away instead of spending a tool round-trip on get_schema_info.
+SQL_AGENT_PROMPT = """You are a helpful assistant that can answer questions about sales data using SQL.
+            
+            DATABASE SCHEMA (table (row count): column TYPE [PK] [NOT NULL] [-> foreign key]):
+            {schema_digest}
+            
+            IMPORTANT: When a user asks a question about sales data, follow these steps:
+            1. Write a SQL query based on the user's question and the database schema above
+            2. Execute the SQL query using the execute_sql tool
+            3. Explain the results in a clear and concise way
+            
+            If you need several results (e.g. a total, a breakdown and a top-N list), run all of
+            those queries in a single execute_sql_batch call instead of several execute_sql calls.
+            
+            Large results only include the first rows, with "total_rows" and a "next_token".
+            Prefer aggregating in SQL; use the fetch_more tool only if you really need more rows.
+            
+            Only use the get_schema_info tool if you need sample data, or if a table or column
+            you expect is missing from the schema above.
+            
+            When writing SQL queries:
+            - Use proper SQL syntax for SQLite
+            - Use appropriate JOINs when querying across multiple tables
+            - Use aliases for table names in complex queries (e.g., 'customers AS c')
+            - Use aggregation functions (COUNT, SUM, AVG, etc.) when appropriate
+            - Format the SQL query to be readable
+            
+            If you encounter any errors:
+            - Explain what went wrong
+            - Fix the SQL query and try again
+            
+            Remember: You must generate the SQL query yourself based on the user's question and the database schema.
+            Do not ask the user to provide SQL queries.
+            """
+
+# Every tool the SQL agent can call
+SQL_TOOLS = [get_schema_info, execute_sql, execute_sql_batch, fetch_more]
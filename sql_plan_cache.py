@@ -0,0 +1,258 @@
+# sql_plan_cache.py
+# Question-to-SQL plan cache for the SQL Assistant.
+# When the agent answers a question with a query that runs cleanly, the pair is
+# stored as a template: literals that appear both in the question and in the
+# SQL (customer names, dates, limits, ...) become slots. A later question with
+# the same wording but different literals re-binds the slots and runs the SQL
+# directly, skipping the schema and query-writing turns of the agent.
+#
+# A literal only becomes a slot when it appears exactly once in the question
+# and exactly once in the SQL; a number that shows up twice may play two roles
+# ("top 5 products with over 5 sales"), so re-binding it would be a guess.
+# Plans are shared by every session, so follow-up questions, whose SQL
+# depends on earlier turns, are not learned (see semantic_cache.is_follow_up).
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from semantic_cache import is_follow_up
+
+# Maximum number of question templates kept (least recently used are evicted)
+DEFAULT_MAX_PLANS = 200
+
+# SQL string literals ('...' with '' escapes) and bare numeric literals
+SQL_STRING_RE = re.compile(r"'((?:[^']|'')*)'")
+SQL_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+QUESTION_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+
+# Slot placeholder used inside templates
+SLOT_RE = re.compile(r"\{slot(\d+)\}")
+
+def normalize_question(question: str) -> str:
+    """
+    Collapse whitespace and strip trailing punctuation, keeping the case of literals
+    """
+    question = re.sub(r"\s+", " ", question).strip()
+    return question.rstrip("?!. ")
+
+def _find_slots(question: str, sql: str) -> List[Dict[str, Any]]:
+    """
+    Find literals that appear both in the question and in the SQL.
+    Each slot remembers where it sits in the question and how it is written in the SQL.
+    """
+    slots = []
+    taken = []  # Character spans of the question already used by a slot
+
+    def overlaps(start, end):
+        return any(start < t_end and end > t_start for t_start, t_end in taken)
+
+    def occurrences(pattern: str, text: str) -> int:
+        return len(re.findall(r"(?<![\w.])" + re.escape(pattern) + r"(?![\w.])", text, re.IGNORECASE))
+
+    # String literals: the text inside the quotes (minus LIKE wildcards) must appear in the question
+    sql_strings = [match.group(0) for match in SQL_STRING_RE.finditer(sql)]
+    for match in SQL_STRING_RE.finditer(sql):
+        literal = match.group(1).replace("''", "'")
+        value = literal.strip("%")
+        if not value:
+            continue
+        # Exactly once on each side, or it is unclear which occurrence the slot stands for
+        if occurrences(value, question) != 1 or sql_strings.count(match.group(0)) != 1:
+            continue
+        position = question.lower().find(value.lower())
+        if position < 0 or overlaps(position, position + len(value)):
+            continue
+        prefix = literal[:literal.lower().find(value.lower())]
+        suffix = literal[len(prefix) + len(value):]
+        slots.append({
+            "kind": "text",
+            "start": position,
+            "end": position + len(value),
+            "value": question[position:position + len(value)],
+            "sql_literal": match.group(0),
+            "prefix": prefix,
+            "suffix": suffix
+        })
+        taken.append((position, position + len(value)))
+
+    # Numeric literals outside of strings (e.g. LIMIT 5) that also appear in the question
+    sql_without_strings = SQL_STRING_RE.sub(lambda m: " " * len(m.group(0)), sql)
+    sql_numbers = [m.group(0) for m in SQL_NUMBER_RE.finditer(sql_without_strings)]
+    question_numbers = [m.group(0) for m in QUESTION_NUMBER_RE.finditer(question)]
+    for match in QUESTION_NUMBER_RE.finditer(question):
+        number = match.group(0)
+        # The number must play a single role: once in the question, once in the SQL and in no string
+        if question_numbers.count(number) != 1 or sql_numbers.count(number) != 1 or occurrences(number, sql) != 1:
+            continue
+        if not overlaps(match.start(), match.end()):
+            slots.append({
+                "kind": "number",
+                "start": match.start(),
+                "end": match.end(),
+                "value": match.group(0),
+                "sql_literal": match.group(0)
+            })
+            taken.append((match.start(), match.end()))
+
+    return sorted(slots, key=lambda slot: slot["start"])
+
+def _template_sql(sql: str, slots: List[Dict[str, Any]]) -> str:
+    """
+    Replace the SQL literals of each slot with its placeholder
+    """
+    def replace_strings(match):
+        for index, slot in enumerate(slots):
+            if slot["kind"] == "text" and slot["sql_literal"] == match.group(0):
+                return f"{{slot{index}}}"
+        return match.group(0)
+
+    templated = SQL_STRING_RE.sub(replace_strings, sql)
+
+    # Numbers are only replaced outside of (remaining) string literals
+    parts = re.split(r"('(?:[^']|'')*')", templated)
+    for index, slot in enumerate(slots):
+        if slot["kind"] != "number":
+            continue
+        pattern = re.compile(r"(?<![\w.{])" + re.escape(slot["sql_literal"]) + r"(?![\w.}])")
+        parts = [part if part.startswith("'") else pattern.sub(f"{{slot{index}}}", part) for part in parts]
+    return "".join(parts)
+
+def _template_question(question: str, slots: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """
+    Build the template key and the matching regular expression for a question
+    """
+    key_parts, regex_parts, cursor = [], [], 0
+    for index, slot in enumerate(slots):
+        fixed = question[cursor:slot["start"]]
+        key_parts.append(fixed.lower())
+        regex_parts.append(re.escape(fixed))
+        key_parts.append(f"{{slot{index}}}")
+        regex_parts.append(r"(\d+(?:\.\d+)?)" if slot["kind"] == "number" else r"(.+?)")
+        cursor = slot["end"]
+    key_parts.append(question[cursor:].lower())
+    regex_parts.append(re.escape(question[cursor:]))
+    return "".join(key_parts), "".join(regex_parts)
+
+class SQLPlanCache:
+    """
+    Cache of validated (question template, SQL template) pairs
+    """
+
+    def __init__(self, max_plans: int = DEFAULT_MAX_PLANS):
+        self.max_plans = max_plans
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "learned": 0}
+
+    def learn(self, question: str, sql: str) -> Optional[str]:
+        """
+        Store a question and the SQL query that answered it
+
+        Args:
+            question: The user question
+            sql: A read-only SQL query that ran without errors for this question
+
+        Returns:
+            The question template that was stored, or None if the SQL was not
+            cacheable or the question is a follow-up
+        """
+        if not sql.strip().upper().startswith("SELECT") or is_follow_up(question):
+            return None
+        question = normalize_question(question)
+        slots = _find_slots(question, sql)
+        template, pattern = _template_question(question, slots)
+        plan = {
+            "template": template,
+            "pattern": re.compile(pattern, re.IGNORECASE),
+            "sql_template": _template_sql(sql, slots),
+            "slots": [{k: slot[k] for k in ("kind", "prefix", "suffix") if k in slot} for slot in slots],
+            "example_question": question,
+            "example_sql": sql
+        }
+        with self._lock:
+            self._plans.pop(template, None)
+            while len(self._plans) >= self.max_plans:
+                self._plans.popitem(last=False)
+            self._plans[template] = plan
+            self._stats["learned"] += 1
+        return template
+
+    def match(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a stored plan for a question and bind its slots
+
+        Args:
+            question: The new user question
+
+        Returns:
+            None if no template matches, otherwise a dictionary with the
+            "template", the bound "sql" and the slot "values"
+        """
+        question = normalize_question(question)
+        with self._lock:
+            self._stats["lookups"] += 1
+            plans = list(reversed(self._plans.values()))
+        for plan in plans:
+            found = plan["pattern"].fullmatch(question)
+            if not found:
+                continue
+            values = list(found.groups())
+            with self._lock:
+                self._stats["hits"] += 1
+                if plan["template"] in self._plans:
+                    self._plans.move_to_end(plan["template"])
+            return {
+                "template": plan["template"],
+                "sql": self._bind(plan, values),
+                "values": values
+            }
+        return None
+
+    def forget(self, template: str) -> None:
+        """
+        Drop a plan, e.g. when its re-bound SQL failed
+        """
+        with self._lock:
+            self._plans.pop(template, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["plans"] = len(self._plans)
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+    @staticmethod
+    def _bind(plan: Dict[str, Any], values: List[str]) -> str:
+        def bind(match):
+            slot = plan["slots"][int(match.group(1))]
+            value = values[int(match.group(1))]
+            if slot["kind"] == "number":
+                return value
+            literal = slot["prefix"] + value + slot["suffix"]
+            return "'" + literal.replace("'", "''") + "'"
+        return SLOT_RE.sub(bind, plan["sql_template"])
+
+def is_empty_result(results: List[Dict[str, Any]]) -> bool:
+    """
+    Whether a query found nothing: no rows, or only NULLs (an aggregate over no rows)
+    """
+    return all(value is None for row in results for value in row.values())
+
+def format_results_markdown(results: List[Dict[str, Any]], max_rows: int = 20) -> str:
+    """
+    Render query results as a Markdown table (used when no model phrases the answer)
+    """
+    if not results:
+        return "The query returned no rows."
+    columns = list(results[0].keys())
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "| " + " | ".join("---" for _ in columns) + " |"
+    ]
+    for row in results[:max_rows]:
+        lines.append("| " + " | ".join(str(row.get(column, "")) for column in columns) + " |")
+    if len(results) > max_rows:
+        lines.append(f"\n_Showing {max_rows} of {len(results)} rows._")
+    return "\n".join(lines)
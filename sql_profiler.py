@@ -0,0 +1,254 @@
+# sql_profiler.py
+# Opt-in statement-level profiler for the SQLite queries run by database_tools.
+# For every profiled statement it records:
+#   - wall time
+#   - VM steps: the SQLite progress handler fires every PROGRESS_STEPS
+#     virtual-machine instructions, which approximates how much work the
+#     statement did independent of machine load
+#   - rows returned
+#   - the statements SQLite actually ran (set_trace_callback)
+#   - the query plan (EXPLAIN QUERY PLAN), captured once per fingerprint and
+#     for every slow statement
+# Statements are grouped by a normalized fingerprint (literals replaced by ?,
+# whitespace and case folded), so the same query with different values adds up
+# under one entry. Statements slower than the threshold are appended to a
+# slow-query log (JSON lines) when SLOW_QUERY_LOG names one.
+#
+# Off by default; turn it on for the whole process with SQL_PROFILE=1
+# (threshold SLOW_QUERY_MS) or with enable(). The profiler is shared by every
+# session of an app, so the Database Explorer tab of the comprehensive chatbot
+# only shows its state and statistics.
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator
+
+logger = logging.getLogger("sql_profiler")
+
+# Statements at least this slow go to the slow-query log
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+# Slow-query log file (JSON lines); nothing is written unless it is set
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG") or None
+
+# The progress handler runs every this many VM instructions (lower is more precise but slower)
+PROGRESS_STEPS = 100
+
+# Distinct fingerprints kept; the least used are dropped beyond this
+MAX_FINGERPRINTS = 500
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+def fingerprint(sql: str) -> str:
+    """
+    Normalized form of a statement: literals replaced by ?, IN lists collapsed,
+    whitespace and case folded
+
+    Example: "SELECT * FROM sales WHERE id IN (1, 2) AND region = 'North'"
+          -> "select * from sales where id in (?+) and region = ?"
+    """
+    normalized = _STRING.sub("?", sql)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _SPACE.sub(" ", normalized).strip().rstrip(";").strip().lower()
+    return _IN_LIST.sub("in (?+)", normalized)
+
+def fingerprint_id(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+class StatementProfile:
+    """
+    Measurements of one statement; callers set `rows` once the results are fetched
+    """
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.rows: Optional[int] = None
+        self.elapsed_ms = 0.0
+        self.vm_steps = 0
+        self.traced: List[str] = []
+        self.plan: Optional[List[str]] = None
+        self.error: Optional[str] = None
+
+    def _progress(self) -> int:
+        self.vm_steps += PROGRESS_STEPS
+        return 0  # Returning non-zero would abort the statement
+
+class SQLProfiler:
+    """
+    Per-fingerprint statement statistics and the slow-query log
+    """
+
+    def __init__(self, enabled: bool = False, slow_ms: float = SLOW_QUERY_MS, log_path: Optional[str] = SLOW_QUERY_LOG):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, conn: sqlite3.Connection, sql: str) -> Iterator[StatementProfile]:
+        """
+        Profile the statement run on `conn` inside the block
+
+        Set `rows` on the yielded profile after fetching. When the profiler is
+        off this only creates the (empty) profile object.
+        """
+        profile = StatementProfile(sql)
+        if not self.enabled:
+            yield profile
+            return
+        conn.set_trace_callback(profile.traced.append)
+        conn.set_progress_handler(profile._progress, PROGRESS_STEPS)
+        start = time.perf_counter()
+        try:
+            yield profile
+        except Exception as e:
+            profile.error = str(e)
+            raise
+        finally:
+            profile.elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+            # The connection may be pooled; leave no hooks behind
+            conn.set_trace_callback(None)
+            conn.set_progress_handler(None, PROGRESS_STEPS)
+            self._record(conn, profile)
+
+    def _record(self, conn: sqlite3.Connection, profile: StatementProfile) -> None:
+        normalized = fingerprint(profile.sql)
+        key = fingerprint_id(normalized)
+        slow = profile.elapsed_ms >= self.slow_ms
+        with self._lock:
+            entry = self._stats.get(key)
+            need_plan = entry is None or entry["plan"] is None or slow
+        if need_plan:
+            profile.plan = explain(conn, profile.sql)
+
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    least_used = min(self._stats, key=lambda k: self._stats[k]["calls"])
+                    del self._stats[least_used]
+                entry = self._stats[key] = {
+                    "fingerprint_id": key, "fingerprint": normalized, "example": profile.sql, "calls": 0,
+                    "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "vm_steps": 0, "errors": 0, "slow": 0, "plan": None
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += profile.elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], profile.elapsed_ms)
+            entry["rows"] += profile.rows or 0
+            entry["vm_steps"] += profile.vm_steps
+            entry["errors"] += 1 if profile.error else 0
+            entry["slow"] += 1 if slow else 0
+            if profile.plan is not None:
+                entry["plan"] = profile.plan
+            if profile.elapsed_ms >= entry["max_ms"]:
+                # Keep the slowest variant as the example
+                entry["example"] = profile.sql
+
+        if slow:
+            self._log_slow(key, normalized, profile)
+
+    def _log_slow(self, key: str, normalized: str, profile: StatementProfile) -> None:
+        logger.warning("Slow query (%.1f ms, %d VM steps): %s", profile.elapsed_ms, profile.vm_steps, normalized[:200])
+        if not self.log_path:
+            return
+        record = {
+            "ts": time.time(), "fingerprint_id": key, "fingerprint": normalized, "elapsed_ms": profile.elapsed_ms,
+            "vm_steps": profile.vm_steps, "rows": profile.rows, "error": profile.error, "sql": profile.sql,
+            "statements": profile.traced, "plan": profile.plan
+        }
+        try:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError:
+            logger.exception("Could not write the slow-query log")
+
+    def top_queries(self, n: int = 10, by: str = "total_ms") -> List[Dict[str, Any]]:
+        """
+        The n fingerprints with the highest `by` (total_ms, calls, max_ms, vm_steps or rows)
+
+        Returns:
+            Entries with fingerprint, example SQL, calls, total/mean/max ms,
+            rows, VM steps, errors, slow count and the query plan
+        """
+        with self._lock:
+            entries = [dict(entry) for entry in self._stats.values()]
+        for entry in entries:
+            entry["total_ms"] = round(entry["total_ms"], 3)
+            entry["mean_ms"] = round(entry["total_ms"] / entry["calls"], 3)
+        entries.sort(key=lambda entry: entry[by], reverse=True)
+        return entries[:n]
+
+    def reset(self) -> None:
+        """
+        Forget the collected statistics (the slow-query log is kept)
+        """
+        with self._lock:
+            self._stats.clear()
+
+def explain(conn: sqlite3.Connection, sql: str) -> Optional[List[str]]:
+    """
+    SQLite's query plan for a statement, one line per step (None if it can't be explained)
+    """
+    if not sql.strip().upper().startswith(("SELECT", "WITH")):
+        return None
+    try:
+        return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+    except sqlite3.Error:
+        return None
+
+def load_slow_log(path: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    The most recent entries of the slow-query log, newest first
+    """
+    path = _profiler.log_path if path is None else path
+    if not path or not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries[::-1][:limit]
+
+# --- Process-wide profiler ---
+
+_profiler = SQLProfiler(enabled=os.environ.get("SQL_PROFILE", "") not in ("", "0"))
+
+def get_profiler() -> SQLProfiler:
+    return _profiler
+
+def enable(slow_ms: Optional[float] = None, log_path: Optional[str] = None) -> None:
+    """
+    Turn profiling on, optionally with a new slow-query threshold and log file
+    """
+    if slow_ms is not None:
+        _profiler.slow_ms = slow_ms
+    if log_path is not None:
+        _profiler.log_path = log_path
+    _profiler.enabled = True
+
+def disable() -> None:
+    _profiler.enabled = False
+
+def is_enabled() -> bool:
+    return _profiler.enabled
+
+def profile(conn: sqlite3.Connection, sql: str):
+    """
+    Profile one statement with the process-wide profiler (see SQLProfiler.profile)
+    """
+    return _profiler.profile(conn, sql)
+
+def top_queries(n: int = 10, by: str = "total_ms") -> List[Dict[str, Any]]:
+    return _profiler.top_queries(n, by)
@@ -0,0 +1,221 @@
+# sql_repair.py
+# Local repair pass for failed SQL queries.
+# Common mistakes (a misspelled column or table, an ambiguous column in a JOIN,
+# syntax from another SQL dialect) are fixed here using the cached schema, so a
+# failed query costs milliseconds instead of another LLM round-trip.
+# Only read-only queries (a SELECT, or WITH ... SELECT) are repaired, the
+# repaired query runs on a query_only connection, and an identifier is only
+# replaced when exactly one schema name is close to it and both name the same
+# kind of thing: a guessed fix is never allowed to delete or update rows, or to
+# answer with customer ids where names were asked for.
+import difflib
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+# Minimum difflib similarity for an identifier to be replaced
+MATCH_CUTOFF = 0.8
+
+# Comments, string literals and quoted identifiers, blanked out before the
+# statement's keywords are read
+SKIPPED_RE = re.compile(r"--[^\n]*|/\*.*?(?:\*/|$)|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]", re.DOTALL)
+
+# Parentheses, statement separators and words
+TOKEN_RE = re.compile(r"[();]|[A-Za-z_]\w*")
+
+# Keywords that start the main statement after a WITH clause's CTEs
+MAIN_STATEMENTS = ("SELECT", "VALUES", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Identifier suffixes that give a column its meaning; a repair never swaps one kind for another
+IDENTIFIER_KINDS = ("id", "name", "date", "amount", "price", "quantity", "count", "email", "phone")
+
+# String literals are never rewritten
+STRING_LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+
+# FROM/JOIN clauses with an optional alias: "FROM customers c", "JOIN sales AS s"
+TABLE_ALIAS_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w]*)(?:\s+(?:AS\s+)?(?!(?:ON|USING|WHERE|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|NATURAL|GROUP|ORDER|LIMIT|HAVING|UNION)\b)([A-Za-z_][\w]*))?",
+    re.IGNORECASE
+)
+
+# Rewrites for syntax SQLite does not support: (pattern, replacement, description)
+DIALECT_FIXES = [
+    (re.compile(r"\bILIKE\b", re.IGNORECASE), "LIKE", "ILIKE -> LIKE (LIKE is case-insensitive in SQLite)"),
+    (re.compile(r"\bNOW\s*\(\s*\)", re.IGNORECASE), "CURRENT_TIMESTAMP", "NOW() -> CURRENT_TIMESTAMP"),
+    (re.compile(r"\bCURDATE\s*\(\s*\)|\bCURRENT_DATE\s*\(\s*\)", re.IGNORECASE), "date('now')", "CURDATE() -> date('now')"),
+    (re.compile(r"\bEXTRACT\s*\(\s*YEAR\s+FROM\s+([^)]+)\)", re.IGNORECASE), r"CAST(strftime('%Y', \1) AS INTEGER)", "EXTRACT(YEAR ...) -> strftime('%Y', ...)"),
+    (re.compile(r"\bEXTRACT\s*\(\s*MONTH\s+FROM\s+([^)]+)\)", re.IGNORECASE), r"CAST(strftime('%m', \1) AS INTEGER)", "EXTRACT(MONTH ...) -> strftime('%m', ...)"),
+    (re.compile(r"\bEXTRACT\s*\(\s*DAY\s+FROM\s+([^)]+)\)", re.IGNORECASE), r"CAST(strftime('%d', \1) AS INTEGER)", "EXTRACT(DAY ...) -> strftime('%d', ...)"),
+    (re.compile(r"\bYEAR\s*\(([^()]+)\)", re.IGNORECASE), r"CAST(strftime('%Y', \1) AS INTEGER)", "YEAR(...) -> strftime('%Y', ...)"),
+    (re.compile(r"\bMONTH\s*\(([^()]+)\)", re.IGNORECASE), r"CAST(strftime('%m', \1) AS INTEGER)", "MONTH(...) -> strftime('%m', ...)"),
+    (re.compile(r"\bDATE_TRUNC\s*\(\s*'month'\s*,\s*([^)]+)\)", re.IGNORECASE), r"strftime('%Y-%m-01', \1)", "DATE_TRUNC('month', ...) -> strftime('%Y-%m-01', ...)"),
+    (re.compile(r"\bDATE_TRUNC\s*\(\s*'year'\s*,\s*([^)]+)\)", re.IGNORECASE), r"strftime('%Y-01-01', \1)", "DATE_TRUNC('year', ...) -> strftime('%Y-01-01', ...)"),
+    (re.compile(r"\b(?:NVL|ISNULL)\s*\(", re.IGNORECASE), "COALESCE(", "NVL()/ISNULL() -> COALESCE()"),
+]
+
+# "SELECT TOP 5 ..." (SQL Server) becomes "SELECT ... LIMIT 5"
+TOP_RE = re.compile(r"^\s*SELECT\s+(DISTINCT\s+)?TOP\s+(\d+)\s+", re.IGNORECASE)
+
+def _split_literals(sql: str) -> List[str]:
+    """
+    Split SQL into parts; odd indexes are string literals
+    """
+    return STRING_LITERAL_RE.split(sql)
+
+def _rewrite_outside_literals(sql: str, rewrite) -> str:
+    parts = _split_literals(sql)
+    return "".join(part if i % 2 else rewrite(part) for i, part in enumerate(parts))
+
+def _table_aliases(sql: str, schema: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[str, str]]:
+    """
+    List (table, alias) pairs from the FROM and JOIN clauses, in query order
+    """
+    code = "".join("''" if i % 2 else part for i, part in enumerate(_split_literals(sql)))
+    aliases = []
+    for match in TABLE_ALIAS_RE.finditer(code):
+        table, alias = match.group(1), match.group(2) or match.group(1)
+        if table in schema:
+            aliases.append((table, alias))
+    return aliases
+
+def _columns(schema: Dict[str, List[Dict[str, Any]]], table: str) -> List[str]:
+    return [col["name"] for col in schema.get(table, [])]
+
+def _kind(name: str) -> Optional[str]:
+    """
+    What an identifier holds, from its last word: customer_id -> "id", name -> "name"
+    """
+    last = name.lower().rsplit("_", 1)[-1]
+    return last if last in IDENTIFIER_KINDS else None
+
+def _closest(name: str, candidates: List[str]) -> Optional[str]:
+    """
+    The one candidate close to name, or None if there is none or more than one
+    """
+    lowered = {candidate.lower(): candidate for candidate in candidates}
+    if name.lower() in lowered:
+        return lowered[name.lower()]
+    matches = [match for match in difflib.get_close_matches(name.lower(), list(lowered), n=max(len(lowered), 1),
+                                                             cutoff=MATCH_CUTOFF)
+               if None in (_kind(match), _kind(name)) or _kind(match) == _kind(name)]
+    return lowered[matches[0]] if len(matches) == 1 else None
+
+def _replace_identifier(sql: str, old: str, new: str, qualifier: Optional[str] = None) -> str:
+    """
+    Replace an identifier (optionally "qualifier.old") outside of string literals
+    """
+    if qualifier:
+        pattern = re.compile(r"\b" + re.escape(qualifier) + r"\s*\.\s*" + re.escape(old) + r"\b")
+        replacement = f"{qualifier}.{new}"
+    else:
+        pattern = re.compile(r"(?<![\w.])" + re.escape(old) + r"\b")
+        replacement = new
+    return _rewrite_outside_literals(sql, lambda part: pattern.sub(replacement, part))
+
+def _fix_column(sql: str, column: str, schema: Dict[str, List[Dict[str, Any]]]) -> Optional[Tuple[str, str]]:
+    aliases = _table_aliases(sql, schema)
+    if "." in column:
+        qualifier, name = column.split(".", 1)
+        tables = [table for table, alias in aliases if alias.lower() == qualifier.lower()]
+        if not tables and qualifier in schema:
+            tables = [qualifier]
+        candidates = _columns(schema, tables[0]) if tables else []
+    else:
+        qualifier, name = None, column
+        tables = [table for table, _ in aliases] or list(schema)
+        candidates = [c for table in tables for c in _columns(schema, table)]
+
+    replacement = _closest(name, candidates)
+    if not replacement or replacement == name:
+        return None
+    return _replace_identifier(sql, name, replacement, qualifier), f"column {column} -> {replacement}"
+
+def _fix_table(sql: str, table: str, schema: Dict[str, List[Dict[str, Any]]]) -> Optional[Tuple[str, str]]:
+    replacement = _closest(table, list(schema))
+    if not replacement or replacement == table:
+        return None
+    return _replace_identifier(sql, table, replacement), f"table {table} -> {replacement}"
+
+def _fix_ambiguous(sql: str, column: str, schema: Dict[str, List[Dict[str, Any]]]) -> Optional[Tuple[str, str]]:
+    # Qualify the column with the first table in the FROM/JOIN list that has it
+    for table, alias in _table_aliases(sql, schema):
+        if column in _columns(schema, table):
+            pattern = re.compile(r"(?<![\w.])" + re.escape(column) + r"\b(?!\s*\()")
+            fixed = _rewrite_outside_literals(sql, lambda part: pattern.sub(f"{alias}.{column}", part))
+            return fixed, f"ambiguous column {column} -> {alias}.{column}"
+    return None
+
+def _fix_dialect(sql: str) -> Tuple[str, List[str]]:
+    changes = []
+    top = TOP_RE.match(sql)
+    if top:
+        sql = sql[:top.start()] + "SELECT " + (top.group(1) or "") + sql[top.end():]
+        sql = sql.rstrip().rstrip(";") + f" LIMIT {top.group(2)}"
+        changes.append("TOP n -> LIMIT n")
+    for pattern, replacement, description in DIALECT_FIXES:
+        fixed = _rewrite_outside_literals(sql, lambda part: pattern.sub(replacement, part))
+        if fixed != sql:
+            sql = fixed
+            changes.append(description)
+    return sql, changes
+
+def is_read_only(sql: str) -> bool:
+    """
+    Whether a query is a single SELECT, or a WITH clause whose main statement
+    is a SELECT ("WITH t AS (...) DELETE FROM ..." is not)
+    """
+    code = SKIPPED_RE.sub(" ", sql)
+    depth, base, first, main, ended = 0, 0, None, None, False
+    for token in TOKEN_RE.findall(code):
+        if ended:
+            # Anything after the first statement
+            return False
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif token == ";":
+            ended = depth == 0
+        elif first is None:
+            first, base = token.upper(), depth
+            if first not in ("SELECT", "WITH"):
+                return False
+            main = "SELECT" if first == "SELECT" else None
+        elif main is None and depth == base and token.upper() in MAIN_STATEMENTS:
+            main = token.upper()
+    return main in ("SELECT", "VALUES")
+
+def repair_query(sql: str, error: str, schema: Dict[str, List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Try to fix a failed read-only SQL query without asking the model
+
+    Args:
+        sql: The query that failed
+        error: The SQLite error message
+        schema: Table schema as returned by get_table_schema()
+
+    Returns:
+        None if nothing could be fixed (or the query is not read-only, see is_read_only),
+        otherwise {"query": fixed query, "changes": [descriptions]}
+    """
+    if not is_read_only(sql):
+        return None
+    fixed, changes = _fix_dialect(sql)
+
+    result = None
+    no_column = re.search(r"no such column: ([\w.]+)", error)
+    no_table = re.search(r"no such table: ([\w.]+)", error)
+    ambiguous = re.search(r"ambiguous column name: ([\w.]+)", error)
+    if no_column:
+        result = _fix_column(fixed, no_column.group(1), schema)
+    elif no_table:
+        result = _fix_table(fixed, no_table.group(1).split(".")[-1], schema)
+    elif ambiguous:
+        result = _fix_ambiguous(fixed, ambiguous.group(1), schema)
+
+    if result:
+        fixed = result[0]
+        changes.append(result[1])
+
+    if not changes or fixed == sql:
+        return None
+    return {"query": fixed, "changes": changes}
@@ -0,0 +1,144 @@
+# state_compaction.py
+# Compaction of the LangGraph message state carried between turns.
+# Tool outputs from earlier turns (full query results, the schema payload) are
+# replaced by short digests that keep the SQL, the row count and a few sample
+# rows: enough for follow-up questions, without resending everything each turn.
+from typing import List, Dict, Any, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+
+# Sample rows kept per result in a digest
+DIGEST_SAMPLE_ROWS = 3
+
+# Upper bound on the characters of message content kept per session
+DEFAULT_MAX_STATE_CHARS = 20000
+
+# Tool outputs that can always be fetched again and are dropped entirely
+REFETCHABLE_TOOLS = {"get_schema_info"}
+
+def digest_tool_output(content: str, name: Optional[str] = None) -> str:
+    """
+    Shorten a tool output to its SQL, result header lines and a few sample rows
+
+    Args:
+        content: The ToolMessage content (as produced by result_format)
+        name: The tool name
+
+    Returns:
+        The digest
+    """
+    if name in REFETCHABLE_TOOLS:
+        return "[schema info from an earlier turn omitted; call the tool again if needed]"
+
+    lines = content.split("\n")
+    kept = []
+    rows_left = 0
+    in_sql = False
+    for line in lines:
+        if line.startswith("```"):
+            in_sql = not in_sql
+            kept.append(line)
+        elif in_sql:
+            kept.append(line)
+        elif line.startswith(("Query Results", "More Query Results")):
+            kept.append(line)
+            # Header row plus sample rows follow
+            rows_left = DIGEST_SAMPLE_ROWS + 1
+        elif line.startswith(("Statement ", "Query Error", "Summary:", "Auto-repaired")):
+            kept.append(line)
+            rows_left = 0
+        elif rows_left > 0:
+            kept.append(line)
+            rows_left -= 1
+            if rows_left == 0:
+                kept.append("[remaining rows omitted]")
+
+    digest = "\n".join(kept)
+    # Fall back to a plain cut for outputs that don't follow the result format
+    return digest if kept else content[:300] + ("..." if len(content) > 300 else "")
+
+def _truncate(content: str, limit: int) -> str:
+    """
+    Cut content to at most limit characters, marking the cut
+    """
+    marker = "\n[output truncated]"
+    if len(content) <= limit:
+        return content
+    if limit < len(marker):
+        return content[:max(limit, 0)]
+    return content[:limit - len(marker)] + marker
+
+def _compact_tool_message(msg: ToolMessage) -> ToolMessage:
+    return msg.model_copy(update={
+        "content": digest_tool_output(str(msg.content), msg.name),
+        "additional_kwargs": {**msg.additional_kwargs, "compacted": True}
+    })
+
+def _turn_starts(messages: List[BaseMessage]) -> List[int]:
+    return [i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)]
+
+def _size(messages: List[BaseMessage]) -> int:
+    return sum(len(str(msg.content)) for msg in messages)
+
+def compact_messages(messages: List[BaseMessage], keep_turns: int = 1,
+                     max_chars: int = DEFAULT_MAX_STATE_CHARS) -> List[BaseMessage]:
+    """
+    Compact the message state of a session
+
+    Tool outputs older than the last keep_turns turns are replaced by digests.
+    If the state is still larger than max_chars, whole turns are dropped from
+    the start of the conversation. If the latest turn alone is too large, its
+    tool outputs are digested too, and then cut, largest first, until the
+    state fits (questions and answers are never cut).
+
+    Args:
+        messages: The messages of the agent state
+        keep_turns: Number of most recent turns whose tool outputs are kept in full
+        max_chars: Upper bound on the total message content size
+
+    Returns:
+        The compacted list of messages
+    """
+    starts = _turn_starts(messages)
+    cutoff = starts[-keep_turns] if len(starts) >= keep_turns else 0
+
+    compacted = []
+    for index, msg in enumerate(messages):
+        if index < cutoff and isinstance(msg, ToolMessage) and not msg.additional_kwargs.get("compacted"):
+            msg = _compact_tool_message(msg)
+        compacted.append(msg)
+
+    # Drop the oldest turns until the state fits
+    starts = _turn_starts(compacted)
+    while _size(compacted) > max_chars and len(starts) > 1:
+        compacted = compacted[starts[1]:]
+        starts = _turn_starts(compacted)
+
+    # The latest turn alone is too large: digest its tool outputs as well
+    if _size(compacted) > max_chars:
+        compacted = [
+            _compact_tool_message(msg) if isinstance(msg, ToolMessage) and not msg.additional_kwargs.get("compacted") else msg
+            for msg in compacted
+        ]
+
+    # Still too large: cut the largest tool outputs by the overflow
+    tools = sorted((i for i, msg in enumerate(compacted) if isinstance(msg, ToolMessage)),
+                   key=lambda i: len(str(compacted[i].content)), reverse=True)
+    for index in tools:
+        overflow = _size(compacted) - max_chars
+        if overflow <= 0:
+            break
+        content = str(compacted[index].content)
+        compacted[index] = compacted[index].model_copy(update={"content": _truncate(content, len(content) - overflow)})
+
+    return compacted
+
+def state_stats(messages: List[BaseMessage]) -> Dict[str, Any]:
+    """
+    Size of a message state, for logging
+    """
+    return {
+        "messages": len(messages),
+        "turns": len(_turn_starts(messages)),
+        "chars": _size(messages)
+    }
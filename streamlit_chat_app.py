@@ -1,6 +1,7 @@
 # Import the necessary libraries
 import streamlit as st  # For creating the web app interface
-from google import genai  # For interacting with the Google Gemini API
+from gemini_client import get_genai_client  # Shared, rate-limited client for the Google Gemini API
+import telemetry  # For recording how long each turn takes (see the Performance page)
 
 # --- 1. Page Configuration and Title ---
 
@@ -49,7 +50,7 @@ if not google_api_key:
 if ("genai_client" not in st.session_state) or (getattr(st.session_state, "_last_key", None) != google_api_key):
     try:
         # If the conditions are met, create a new client.
-        st.session_state.genai_client = genai.Client(api_key=google_api_key)
+        st.session_state.genai_client = get_genai_client(google_api_key)
         # Store the new key in session state to compare against later.
         st.session_state._last_key = google_api_key
         # Since the key changed, we must clear the old chat and message history.
@@ -104,27 +105,33 @@ if prompt:
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # 3. Get the assistant's response.
-    # Use a 'try...except' block to gracefully handle potential errors (e.g., network issues, API errors).
-    try:
-        # Send the user's prompt to the Gemini API.
-        response = st.session_state.chat.send_message(prompt)
-        
-        # Safely get the text from the response object.
-        # `hasattr(object, 'attribute_name')` checks if an object has a specific property.
-        # This prevents an error if the API response object doesn't have a '.text' attribute.
-        if hasattr(response, "text"):
-            answer = response.text
-        else:
-            # If there's no '.text', convert the whole response to a string as a fallback.
-            answer = str(response)
-
-    except Exception as e:
-        # If any error occurs, create an error message to display to the user.
-        answer = f"An error occurred: {e}"
-
-    # 4. Display the assistant's response.
-    with st.chat_message("assistant"):
-        st.markdown(answer)
+    # Everything inside this 'with' block is timed and stored as one turn record.
+    with telemetry.turn("chat_app", None, prompt, "gemini-2.5-flash") as turn:
+        # 3. Get the assistant's response.
+        # Use a 'try...except' block to gracefully handle potential errors (e.g., network issues, API errors).
+        try:
+            # Send the user's prompt to the Gemini API (timed as the "llm" stage).
+            with telemetry.stage("llm", "gemini-2.5-flash"):
+                response = st.session_state.chat.send_message(prompt)
+            turn.add_response_usage(response)
+
+            # Safely get the text from the response object.
+            # `hasattr(object, 'attribute_name')` checks if an object has a specific property.
+            # This prevents an error if the API response object doesn't have a '.text' attribute.
+            if hasattr(response, "text"):
+                answer = response.text
+            else:
+                # If there's no '.text', convert the whole response to a string as a fallback.
+                answer = str(response)
+
+        except Exception as e:
+            # If any error occurs, create an error message to display to the user.
+            turn.error = str(e)
+            answer = f"An error occurred: {e}"
+
+        # 4. Display the assistant's response (timed as the "render" stage).
+        with telemetry.stage("render"):
+            with st.chat_message("assistant"):
+                st.markdown(answer)
     # 5. Add the assistant's response to the message history list.
     st.session_state.messages.append({"role": "assistant", "content": answer})
\ No newline at end of file
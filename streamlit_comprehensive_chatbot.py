@@ -8,19 +8,33 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
-import json
 import io
-from typing import Dict, List, Any, Optional
+import functools
+import json
+import uuid
+from typing import Dict, List, Any, Optional, Callable
 
 # AI Model Imports
-from langchain_google_genai import ChatGoogleGenerativeAI
+from gemini_client import get_chat_model, get_genai_client
 from langgraph.prebuilt import create_react_agent
+from agent_graph import create_tool_agent
+import model_router
+import sql_profiler
+import data_profile
+from chart_pipeline import render_chart, CHART_TYPES
+from data_grid import sql_page, frame_page, table_columns, FILTER_OPS, PAGE_SIZE
+from upload_cache import get_upload_cache
+from upload_ingest import ingest_csv, session_db_path, get_upload_digest, list_tables, UPLOAD_SCHEMA
+from upload_registry import get_registry, use_session, describe_uploads
+from upload_tools import UPLOAD_TOOLS
+import telemetry
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.tools import tool
-from google import genai
 
 # Database tools
-from database_tools import text_to_sql, init_database, get_database_info
+from database_tools import attach_databases
+from result_spool import spool_session
+from sql_agent_tools import SQL_TOOLS, SQL_AGENT_PROMPT
+from database_tools import text_to_sql, init_database, get_database_info, get_schema_digest, get_schema_version, DB_PATH
 
 # Page Configuration
 st.set_page_config(
@@ -159,88 +173,124 @@ if not google_api_key:
     st.info("🔑 Please add your Google AI API key in the sidebar to start chatting.", icon="🗝️")
     st.stop()
 
-# Initialize AI Models
-@tool
-def execute_sql_tool(sql_query: str):
-    """Execute a SQL query against the sales database."""
-    result = text_to_sql(sql_query)
-    formatted_result = f"```sql\n{sql_query}\n```\n\nQuery Results:\n{result}"
-    return formatted_result
-
-@tool
-def get_schema_info_tool():
-    """Get information about the database schema and sample data."""
-    return get_database_info()
-
-@tool
-def analyze_uploaded_file(file_content: str, file_type: str):
-    """Analyze uploaded file content."""
-    try:
-        if file_type == 'csv':
-            df = pd.read_csv(io.StringIO(file_content))
-            analysis = {
-                "shape": df.shape,
-                "columns": df.columns.tolist(),
-                "dtypes": df.dtypes.to_dict(),
-                "head": df.head().to_dict(),
-                "summary": df.describe().to_dict()
-            }
-        elif file_type == 'json':
-            data = json.loads(file_content)
-            analysis = {
-                "type": type(data).__name__,
-                "keys": list(data.keys()) if isinstance(data, dict) else f"List with {len(data)} items",
-                "sample": str(data)[:500] + "..." if len(str(data)) > 500 else str(data)
-            }
-        else:
-            analysis = {
-                "content_length": len(file_content),
-                "lines": len(file_content.split('\n')),
-                "preview": file_content[:500] + "..." if len(file_content) > 500 else file_content
-            }
-        return f"File Analysis:\n{json.dumps(analysis, indent=2)}"
-    except Exception as e:
-        return f"Error analyzing file: {str(e)}"
+# Uploaded CSV files are loaded into this session's own SQLite database
+if "upload_session" not in st.session_state:
+    st.session_state.upload_session = uuid.uuid4().hex
+
+def upload_db_path() -> str:
+    return session_db_path(st.session_state.upload_session)
+
+def build_sql_agent(llm):
+    """Create the SQL Assistant agent with the current schema digest (and the uploaded tables) baked into its prompt."""
+    st.session_state._schema_version = get_schema_version()
+    st.session_state._uploads_version = st.session_state.get("uploads_version", 0)
+    upload_digest = get_upload_digest(upload_db_path())
+    # The uploaded tables follow the schema digest in SQL_AGENT_PROMPT
+    uploads_section = f"""
+            
+            UPLOADED TABLES (the user's own files, in the {UPLOAD_SCHEMA} schema; always qualify them, e.g. {UPLOAD_SCHEMA}.table_name):
+            {upload_digest}""" if upload_digest else ""
+    return create_tool_agent(
+        model=llm,
+        tools=SQL_TOOLS,
+        prompt=SQL_AGENT_PROMPT.format(schema_digest=get_schema_digest() + uploads_section)
+    )
+
+def build_react_agent(llm):
+    """Create the ReAct agent, with the IDs of the session's uploads in its prompt."""
+    st.session_state._uploads_version = st.session_state.get("uploads_version", 0)
+    uploads = describe_uploads(st.session_state.upload_session)
+    uploads_section = f"\n\nThe user uploaded these files; refer to them by ID with the upload tools:\n{uploads}" if uploads else ""
+    return create_react_agent(
+        model=llm,
+        tools=UPLOAD_TOOLS,
+        prompt="You are a helpful, friendly assistant. Respond concisely and clearly. You can analyze uploaded files and help with various tasks." + uploads_section
+    )
+
+def answer_small_talk(messages: List[Any], prompt: str, turn, decision: Dict[str, str]) -> str:
+    """
+    Answer a turn the router sent to the light model (no tools)
+    """
+    turn.model = decision["model"]
+    light_llm = model_router.get_light_model(google_api_key, temperature)
+    reply = light_llm.invoke(model_router.chat_messages(messages[:-1], prompt), config={"callbacks": turn.callbacks})
+    return reply.text
+
+def _grid_go_to(key: str, page: int) -> None:
+    st.session_state[key]["page"] = max(page, 0)
+
+def show_data_grid(key: str, columns: List[str], fetch: Callable[..., Dict[str, Any]]) -> None:
+    """
+    Paginated table: only the visible page is fetched (see data_grid), with
+    sorting and a filter applied at the source
+
+    Args:
+        key: Unique widget key prefix; the grid's state lives in st.session_state[key]
+        columns: Column names, for the sort and filter choices
+        fetch: data_grid.sql_page or frame_page with the source bound,
+            taking page, page_size, sort, descending, filters and after
+    """
+    state = st.session_state.setdefault(key, {"page": 0, "query": None, "keys": {}})
+    col1, col2, col3, col4, col5 = st.columns([2, 1, 2, 1, 2])
+    with col1:
+        sort = st.selectbox("Sort by", ["(table order)"] + columns, key=f"{key}_sort")
+    with col2:
+        descending = st.toggle("Descending", key=f"{key}_desc")
+    with col3:
+        filter_column = st.selectbox("Filter", ["(no filter)"] + columns, key=f"{key}_filter_column")
+    with col4:
+        filter_op = st.selectbox("Operator", FILTER_OPS, key=f"{key}_filter_op")
+    with col5:
+        filter_value = st.text_input("Value", key=f"{key}_filter_value")
+    page_size = st.session_state.get(f"{key}_page_size", PAGE_SIZE)
+
+    sort = None if sort == "(table order)" else sort
+    filters = []
+    if filter_column != "(no filter)" and (filter_value or filter_op in ("is null", "is not null")):
+        filters.append((filter_column, filter_op, filter_value))
+    # A new sort, filter or page size starts again from the first page
+    query = (sort, descending, tuple(filters), page_size)
+    if query != state["query"]:
+        state.update(page=0, query=query, keys={})
+
+    result = fetch(page=state["page"], page_size=page_size, sort=sort, descending=descending,
+                   filters=filters, after=state["keys"].get(state["page"]))
+    if "error" in result:
+        st.error(f"Could not load the table: {result['error']}")
+        return
+    state["page"] = result["page"]
+    if result["last_key"] is not None:
+        # The next page continues after this page's last row
+        state["keys"][result["page"] + 1] = result["last_key"]
+    st.dataframe(result["data"], use_container_width=True, hide_index=True)
+
+    col1, col2, col3, col4 = st.columns([1, 1, 4, 2])
+    with col1:
+        st.button("◀ Previous", key=f"{key}_previous", disabled=result["page"] == 0,
+                  on_click=_grid_go_to, args=(key, result["page"] - 1))
+    with col2:
+        st.button("Next ▶", key=f"{key}_next", disabled=result["page"] >= result["pages"] - 1,
+                  on_click=_grid_go_to, args=(key, result["page"] + 1))
+    with col3:
+        st.caption(f"Page {result['page'] + 1:,} of {result['pages']:,} · {result['total_rows']:,} rows "
+                   f"· {result['elapsed_ms']:.0f} ms")
+    with col4:
+        st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key=f"{key}_page_size",
+                     label_visibility="collapsed")
 
 # Initialize models based on selection
 if ("current_model" not in st.session_state) or (st.session_state.current_model != model_type) or (getattr(st.session_state, "_last_key", None) != google_api_key):
     try:
         if model_type == "LangGraph ReAct Agent":
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                google_api_key=google_api_key,
-                temperature=temperature
-            )
-            st.session_state.agent = create_react_agent(
-                model=llm,
-                tools=[analyze_uploaded_file],
-                prompt="You are a helpful, friendly assistant. Respond concisely and clearly. You can analyze uploaded files and help with various tasks."
-            )
+            llm = get_chat_model(google_api_key, "gemini-2.5-flash", temperature=temperature)
+            st.session_state.llm = llm
+            st.session_state.agent = build_react_agent(llm)
         elif model_type == "Google Gemini Direct":
-            st.session_state.genai_client = genai.Client(api_key=google_api_key)
+            st.session_state.genai_client = get_genai_client(google_api_key)
         elif model_type == "SQL Assistant":
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                google_api_key=google_api_key,
-                temperature=temperature
-            )
-            st.session_state.agent = create_react_agent(
-                model=llm,
-                tools=[get_schema_info_tool, execute_sql_tool],
-                prompt="""You are a helpful assistant that can answer questions about sales data using SQL.
-                
-                IMPORTANT: When a user asks a question about sales data, follow these steps:
-                1. FIRST, use the get_schema_info_tool to understand the database structure
-                2. THEN, write a SQL query based on the user's question and execute it
-                3. Explain the results in a clear and concise way
-                
-                When writing SQL queries:
-                - Use proper SQL syntax for SQLite
-                - Use appropriate JOINs when querying across multiple tables
-                - Use aliases for table names in complex queries
-                - Use aggregation functions when appropriate
-                """
-            )
+            llm = get_chat_model(google_api_key, "gemini-2.5-flash", temperature=temperature)
+            st.session_state.llm = llm
+            st.session_state.agent = build_sql_agent(llm)
         
         st.session_state.current_model = model_type
         st.session_state._last_key = google_api_key
@@ -249,6 +299,13 @@ if ("current_model" not in st.session_state) or (st.session_state.current_model
     except Exception as e:
         st.error(f"❌ Error initializing model: {e}")
         st.stop()
+elif model_type == "SQL Assistant" and (st.session_state.get("_schema_version") != get_schema_version() or
+                                        st.session_state.get("_uploads_version") != st.session_state.get("uploads_version", 0)):
+    # Rebuild the agent with a fresh schema digest (or new uploaded tables), keeping the conversation
+    st.session_state.agent = build_sql_agent(st.session_state.llm)
+elif model_type == "LangGraph ReAct Agent" and st.session_state.get("_uploads_version") != st.session_state.get("uploads_version", 0):
+    # A new upload: rebuild the agent so its prompt lists the new upload ID
+    st.session_state.agent = build_react_agent(st.session_state.llm)
 
 # Initialize message history
 if "messages" not in st.session_state:
@@ -256,17 +313,42 @@ if "messages" not in st.session_state:
 
 # File Processing
 if uploaded_file is not None:
-    file_content = uploaded_file.read().decode('utf-8')
     file_type = uploaded_file.type.split('/')[-1]
     
     st.success(f"📁 File uploaded: {uploaded_file.name}")
     
-    # Store file info in session state
-    st.session_state.uploaded_file = {
-        "name": uploaded_file.name,
-        "content": file_content,
-        "type": file_type
-    }
+    # The bytes live in the shared upload cache (once per content, across sessions);
+    # the session only keeps the digest. They are hashed again only for a new
+    # upload, or if the cache dropped the file to make room.
+    previous = st.session_state.get("uploaded_file", {})
+    if previous.get("file_id") != uploaded_file.file_id or not get_upload_cache().contains(previous.get("digest")):
+        st.session_state.uploaded_file = {
+            "name": uploaded_file.name,
+            "digest": get_upload_cache().put(uploaded_file.getvalue(), uploaded_file.name, file_type),
+            "file_id": uploaded_file.file_id,
+            "size": uploaded_file.size,
+            "type": file_type
+        }
+        # CSV files are also loaded into a SQL table, chunk by chunk, so the SQL Assistant can query them
+        if file_type == "csv":
+            digest = st.session_state.uploaded_file["digest"]
+            with st.spinner(f"Loading {uploaded_file.name} into a SQL table..."):
+                loaded = ingest_csv(io.BytesIO(get_upload_cache().get_bytes(digest)), upload_db_path(),
+                                    uploaded_file.name, digest)
+            st.session_state.uploaded_file["sql_table"] = loaded
+        # The agents get a short ID for the file instead of its content
+        st.session_state.uploaded_file["upload_id"] = get_registry().register(
+            st.session_state.upload_session, st.session_state.uploaded_file["digest"], uploaded_file.name,
+            file_type, size=uploaded_file.size, sql_table=st.session_state.uploaded_file.get("sql_table")
+        )
+        st.session_state.uploads_version = st.session_state.get("uploads_version", 0) + 1
+
+    st.caption(f"🆔 Upload ID: `{st.session_state.uploaded_file['upload_id']}`")
+    loaded = st.session_state.uploaded_file.get("sql_table")
+    if loaded and "error" in loaded:
+        st.warning(f"Could not load the file into SQL: {loaded['error']}")
+    elif loaded:
+        st.caption(f"🗃️ Queryable as `{loaded['table']}` ({loaded['rows']:,} rows) in SQL Assistant mode")
 
 # Main Chat Interface
 tab1, tab2, tab3, tab4 = st.tabs(["💬 Chat", "📊 Data Visualization", "🗄️ Database Explorer", "📈 Analytics"])
@@ -287,52 +369,81 @@ with tab1:
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Generate response
-        try:
-            with st.spinner("🤔 Thinking..."):
-                if model_type == "LangGraph ReAct Agent":
-                    messages = []
-                    for msg in st.session_state.messages:
-                        if msg["role"] == "user":
-                            messages.append(HumanMessage(content=msg["content"]))
-                        elif msg["role"] == "assistant":
-                            messages.append(AIMessage(content=msg["content"]))
-                    
-                    response = st.session_state.agent.invoke({"messages": messages})
-                    answer = response["messages"][-1].content
-                
-                elif model_type == "Google Gemini Direct":
-                    if "chat" not in st.session_state:
-                        st.session_state.chat = st.session_state.genai_client.chats.create(model="gemini-2.5-flash")
-                    
-                    response = st.session_state.chat.send_message(prompt)
-                    answer = response.text if hasattr(response, "text") else str(response)
-                
-                elif model_type == "SQL Assistant":
-                    messages = []
-                    for msg in st.session_state.messages:
-                        if msg["role"] == "user":
-                            messages.append(HumanMessage(content=msg["content"]))
-                        elif msg["role"] == "assistant":
-                            messages.append(AIMessage(content=msg["content"]))
-                    
-                    response = st.session_state.agent.invoke({"messages": messages})
-                    answer = response["messages"][-1].content
-                    
-                    # Extract and display SQL queries
-                    for msg in response["messages"]:
-                        if hasattr(msg, "tool_calls") and msg.tool_calls:
-                            for tool_call in msg.tool_calls:
-                                if tool_call.get("name") == "execute_sql_tool":
-                                    sql_query = tool_call["args"]["sql_query"]
-                                    st.code(sql_query, language="sql")
-        
-        except Exception as e:
-            answer = f"❌ An error occurred: {e}"
-        
-        # Display assistant response
-        with st.chat_message("assistant"):
-            st.markdown(answer)
+        # Generate response, recording timings and tokens for the Performance page
+        with telemetry.turn(f"comprehensive: {model_type}", None, prompt, "gemini-2.5-flash") as turn:
+            try:
+                with st.spinner("🤔 Thinking..."):
+                    if model_type == "LangGraph ReAct Agent":
+                        messages = []
+                        for msg in st.session_state.messages:
+                            if msg["role"] == "user":
+                                messages.append(HumanMessage(content=msg["content"]))
+                            elif msg["role"] == "assistant":
+                                messages.append(AIMessage(content=msg["content"]))
+
+                        # Small talk goes to the light model, everything else to the agent
+                        decision = model_router.route(prompt, "comprehensive")
+                        turn.source = decision["route"]
+                        if decision["route"] == model_router.ROUTE_CHAT:
+                            answer = answer_small_talk(messages, prompt, turn, decision)
+                        else:
+                            # The upload tools look up upload IDs in this session
+                            with telemetry.stage("agent", "agent.invoke"), use_session(st.session_state.upload_session):
+                                response = st.session_state.agent.invoke({"messages": messages}, config={"callbacks": turn.callbacks})
+                            answer = response["messages"][-1].content
+                        model_router.record_turn(turn, decision["route"])
+
+                    elif model_type == "Google Gemini Direct":
+                        if "chat" not in st.session_state:
+                            st.session_state.chat = st.session_state.genai_client.chats.create(model="gemini-2.5-flash")
+
+                        with telemetry.stage("llm", "gemini-2.5-flash"):
+                            response = st.session_state.chat.send_message(prompt)
+                        turn.add_response_usage(response)
+                        answer = response.text if hasattr(response, "text") else str(response)
+
+                    elif model_type == "SQL Assistant":
+                        messages = []
+                        for msg in st.session_state.messages:
+                            if msg["role"] == "user":
+                                messages.append(HumanMessage(content=msg["content"]))
+                            elif msg["role"] == "assistant":
+                                messages.append(AIMessage(content=msg["content"]))
+
+                        decision = model_router.route(prompt, "comprehensive")
+                        turn.source = decision["route"]
+                        if decision["route"] == model_router.ROUTE_CHAT:
+                            answer = answer_small_talk(messages, prompt, turn, decision)
+                            response = {"messages": []}
+                        else:
+                            # The SQL tools can read this session's uploaded tables as uploads.<table>,
+                            # and only this session can page in the results they spool
+                            with telemetry.stage("agent", "agent.invoke"), attach_databases({UPLOAD_SCHEMA: upload_db_path()}), \
+                                    spool_session(st.session_state.upload_session):
+                                response = st.session_state.agent.invoke({"messages": messages}, config={"callbacks": turn.callbacks})
+                            answer = response["messages"][-1].content
+                        model_router.record_turn(turn, decision["route"])
+
+                        # Extract and display SQL queries
+                        with telemetry.stage("render"):
+                            for msg in response["messages"]:
+                                if hasattr(msg, "tool_calls") and msg.tool_calls:
+                                    for tool_call in msg.tool_calls:
+                                        if tool_call.get("name") == "execute_sql":
+                                            sql_query = tool_call["args"]["sql_query"]
+                                            st.code(sql_query, language="sql")
+                                        elif tool_call.get("name") == "execute_sql_batch":
+                                            for sql_query in tool_call["args"].get("sql_queries", []):
+                                                st.code(sql_query, language="sql")
+
+            except Exception as e:
+                turn.error = str(e)
+                answer = f"❌ An error occurred: {e}"
+
+            # Display assistant response
+            with telemetry.stage("render"):
+                with st.chat_message("assistant"):
+                    st.markdown(answer)
         
         # Add assistant message to history
         st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -345,16 +456,29 @@ with tab2:
         
         if file_data["type"] == "csv":
             try:
-                df = pd.read_csv(io.StringIO(file_data["content"]))
+                # Profiled (one chunked pass) and parsed into compact dtypes once per
+                # file content, not on every rerun
+                profile = get_upload_cache().profile(file_data["digest"])
+                df = get_upload_cache().dataframe(file_data["digest"])
+                if df is None or profile is None:
+                    raise ValueError("the file is no longer cached, please upload it again")
                 
                 st.subheader("📈 Data Overview")
+                memory = profile["memory"]
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Rows", df.shape[0])
+                    st.metric("Rows", f"{profile['rows']:,}")
                 with col2:
-                    st.metric("Columns", df.shape[1])
+                    st.metric("Columns", len(profile["columns"]))
                 with col3:
-                    st.metric("Memory Usage", f"{df.memory_usage(deep=True).sum() / 1024:.1f} KB")
+                    st.metric("Memory Usage", f"{memory['compact_bytes'] / 1024:,.1f} KB",
+                              delta=f"-{100 * (1 - memory['compact_bytes'] / max(memory['original_bytes'], 1)):.0f}% with compact types",
+                              delta_color="off")
+                
+                with st.expander("🧮 Column profile (approximate)"):
+                    st.caption(f"Quantiles and top values from a {profile['sample_rows']:,}-row sample; "
+                               f"distinct counts are estimated above {data_profile.KMV_SIZE:,} values")
+                    st.dataframe(pd.DataFrame(data_profile.profile_table(profile)), use_container_width=True)
                 
                 # Column selection for visualization
                 numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
@@ -363,42 +487,37 @@ with tab2:
                 if numeric_columns:
                     st.subheader("📊 Numeric Data Visualization")
                     
-                    chart_type = st.selectbox("Chart Type", ["Line Chart", "Bar Chart", "Histogram", "Scatter Plot"])
+                    chart_type = st.selectbox("Chart Type", CHART_TYPES)
                     
+                    # Charts are downsampled and built once per (file, chart type, columns);
+                    # histograms and scatter plots come back as PNG bytes, with their figure already closed
                     if chart_type == "Line Chart":
-                        selected_cols = st.multiselect("Select columns", numeric_columns, default=numeric_columns[:2])
-                        if selected_cols:
-                            st.line_chart(df[selected_cols])
-                    
-                    elif chart_type == "Bar Chart":
-                        selected_col = st.selectbox("Select column", numeric_columns)
-                        st.bar_chart(df[selected_col])
-                    
-                    elif chart_type == "Histogram":
-                        selected_col = st.selectbox("Select column", numeric_columns)
-                        fig, ax = plt.subplots()
-                        ax.hist(df[selected_col].dropna(), bins=20, alpha=0.7)
-                        ax.set_xlabel(selected_col)
-                        ax.set_ylabel("Frequency")
-                        st.pyplot(fig)
-                    
-                    elif chart_type == "Scatter Plot":
+                        chart_columns = st.multiselect("Select columns", numeric_columns, default=numeric_columns[:2])
+                    elif chart_type in ("Bar Chart", "Histogram"):
+                        chart_columns = [st.selectbox("Select column", numeric_columns)]
+                    else:
                         col1, col2 = st.columns(2)
                         with col1:
                             x_col = st.selectbox("X-axis", numeric_columns)
                         with col2:
                             y_col = st.selectbox("Y-axis", numeric_columns)
-                        
-                        if x_col and y_col:
-                            fig, ax = plt.subplots()
-                            ax.scatter(df[x_col], df[y_col], alpha=0.6)
-                            ax.set_xlabel(x_col)
-                            ax.set_ylabel(y_col)
-                            st.pyplot(fig)
+                        chart_columns = [x_col, y_col]
+                    
+                    if chart_columns and all(chart_columns):
+                        chart = render_chart(df, file_data["digest"], chart_type, chart_columns)
+                        if chart["kind"] == "line":
+                            st.line_chart(chart["data"])
+                        elif chart["kind"] == "bar":
+                            st.bar_chart(chart["data"])
+                        else:
+                            st.image(chart["png"])
+                        if chart["points"] < chart["rows"]:
+                            st.caption(f"Showing {chart['points']:,} points summarizing {chart['rows']:,} rows")
                 
-                # Data table
+                # Data table: one page at a time from the cached DataFrame
                 st.subheader("📋 Data Table")
-                st.dataframe(df, use_container_width=True)
+                show_data_grid(f"grid_upload_{file_data['digest'][:12]}", [str(column) for column in df.columns],
+                               functools.partial(frame_page, df, file_data["digest"]))
                 
             except Exception as e:
                 st.error(f"Error processing CSV file: {e}")
@@ -422,16 +541,61 @@ with tab3:
                 schema_df = pd.DataFrame(schema)
                 st.dataframe(schema_df, use_container_width=True)
         
-        st.subheader("📊 Sample Data")
-        for table_name, sample_data in db_info["sample_data"].items():
-            if sample_data:
-                with st.expander(f"Sample data from {table_name}"):
-                    sample_df = pd.DataFrame(sample_data)
-                    st.dataframe(sample_df, use_container_width=True)
+        # Browse any table page by page, including the session's uploaded tables;
+        # rows are read from SQLite one page at a time
+        st.subheader("📊 Browse Data")
+        tables = {name: (DB_PATH, name) for name in db_info["schema"] if isinstance(db_info["schema"][name], list)}
+        for uploaded in list_tables(upload_db_path()):
+            tables[uploaded["table"]] = (upload_db_path(), uploaded["table"].split(".", 1)[1])
+        if tables:
+            browse_table = st.selectbox("Table", list(tables), key="browse_table")
+            db_path, table_name = tables[browse_table]
+            show_data_grid(f"grid_{browse_table}", table_columns(db_path, table_name),
+                           functools.partial(sql_page, db_path, table_name))
     
     except Exception as e:
         st.error(f"Error accessing database: {e}")
 
+    # Statement-level profiler: which queries cost the most in total
+    st.subheader("⏱️ Query Profiler")
+    # One profiler serves every session, so it is set for the app, not from here
+    profiling = sql_profiler.is_enabled()
+    if profiling:
+        st.caption(f"Profiling is on for this app; statements slower than "
+                   f"{sql_profiler.get_profiler().slow_ms:,.0f} ms are logged.")
+    else:
+        st.caption("Profiling is off. Start the app with `SQL_PROFILE=1` to turn it on.")
+
+    top_n = st.slider("Top queries", min_value=5, max_value=50, value=10)
+    top = sql_profiler.top_queries(top_n)
+    if top:
+        top_df = pd.DataFrame(top)
+        st.dataframe(
+            top_df[["fingerprint", "calls", "total_ms", "mean_ms", "max_ms", "rows", "vm_steps", "slow", "errors"]],
+            use_container_width=True,
+            hide_index=True
+        )
+        # Query plan and slowest example of each fingerprint
+        for entry in top:
+            with st.expander(f"{entry['total_ms']:,.1f} ms · {entry['calls']} calls · {entry['fingerprint'][:80]}"):
+                st.code(entry["example"], language="sql")
+                if entry["plan"]:
+                    st.text("\n".join(entry["plan"]))
+        if st.button("🧹 Reset profiler statistics"):
+            sql_profiler.get_profiler().reset()
+            st.rerun()
+    else:
+        st.caption("No statements profiled yet." if profiling else "Start the app with SQL_PROFILE=1, then ask a question.")
+
+    slow_queries = sql_profiler.load_slow_log(limit=20)
+    if slow_queries:
+        with st.expander(f"Slow-query log ({len(slow_queries)} most recent)"):
+            st.dataframe(
+                pd.DataFrame(slow_queries)[["elapsed_ms", "vm_steps", "rows", "fingerprint", "error"]],
+                use_container_width=True,
+                hide_index=True
+            )
+
 with tab4:
     st.header("📈 Analytics Dashboard")
     
@@ -471,6 +635,7 @@ with tab4:
             ax.set_ylabel('Sales Amount ($)')
             plt.xticks(rotation=45)
             st.pyplot(fig)
+            plt.close(fig)
             
             # Top customers
             st.subheader("👥 Top Customers")
@@ -3,12 +3,16 @@
 
 import streamlit as st
 import os
+import uuid
 from datetime import datetime
 import json
 from typing import Dict, List, Any, Optional
 
 
-import google.genai as genai_core # Use an alias for the module
+# The Gemini chat and the health prompt builder live in the assistant service; this app only talks to it.
+# Set ASSISTANT_SERVICE_URL to use a running assistant_server.py instead of the in-process service.
+from assistant_client import get_client, collect_answer
+import telemetry  # Per-turn timings; the time spent drawing answers is added here
 
 
 # Page Configuration
@@ -161,6 +165,8 @@ with st.sidebar:
     # Reset Controls
     st.subheader("🔄 Controls")
     if st.button("Reset Conversation", help="Clear all messages and start fresh"):
+        if "session_id" in st.session_state:
+            get_client().health_reset(st.session_state.session_id, google_api_key)
         for key in list(st.session_state.keys()):
             if key not in ['_last_key']:
                 del st.session_state[key]
@@ -222,20 +228,17 @@ if not google_api_key:
     st.stop()
 
 
-# Initialize models based on selection
-if "genai_client" not in st.session_state or getattr(st.session_state, "_last_key", None) != google_api_key:
-    try:
-        # Initialize the Google GenAI client
-        st.session_state.genai_client = genai_core.Client(api_key=google_api_key)
-        
-        st.session_state.current_model = model_type
-        st.session_state._last_key = google_api_key
-        st.session_state.pop("messages", None)
-        st.session_state.pop("chat_session", None) # Clear chat session if API key changes
-        
-    except Exception as e:
-        st.error(f"❌ Error initializing model: {e}")
-        st.stop()
+# The service keeps one Gemini chat per session id
+assistant = get_client()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Start a fresh conversation when the API key changes
+if getattr(st.session_state, "_last_key", None) != google_api_key:
+    assistant.health_reset(st.session_state.session_id, google_api_key)
+    st.session_state.current_model = model_type
+    st.session_state._last_key = google_api_key
+    st.session_state.pop("messages", None)
 
 # Initialize message history
 if "messages" not in st.session_state:
@@ -256,60 +259,36 @@ if prompt:
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Generate response
-    try:
-        with st.spinner("🌱 Getting health advice..."):
-            if "chat_session" not in st.session_state:
-                # Initialize chat session with system instruction
-                # Create comprehensive health profile for context
-                health_conditions = ', '.join(user_conditions) if user_conditions and 'None' not in user_conditions else 'None'
-                family_conditions = ', '.join(family_history) if family_history and 'None' not in family_history else 'None'
-                
-                system_instruction = f"""You are a helpful health and wellness assistant, specialized in giving advice to people 30 and older.
-
-USER HEALTH PROFILE:
-- Demographics: {user_age} years old, {user_gender}
-- Physical: Height {user_height_cm}cm ({user_height_ft}ft), Weight {user_weight_kg}kg ({user_weight_lbs}lbs), BMI {user_bmi}
-- Vital Signs: Blood Pressure {user_blood_pressure_sys}/{user_blood_pressure_dia}, Resting HR {user_resting_hr} bpm
-- Sleep: {user_sleep_hours} hours average per night
-- Activity: {user_activity} level, Exercise {user_exercise_freq}
-- Diet: {user_diet_type}
-- Health Conditions: {health_conditions}
-- Medications: {user_medications if user_medications else 'None reported'}
-- Recent Surgeries: {user_surgeries if user_surgeries else 'None reported'}
-- Health Goals: {', '.join(user_goals) if user_goals else 'General wellness'}
-- Specific Concerns: {user_concerns if user_concerns else 'None specified'}
-- Family History: {family_conditions}
-
-Provide personalized, evidence-based health advice considering this comprehensive profile. Always recommend consulting healthcare professionals for medical concerns."""
-                
-                # Create a chat session using the google.genai API
-                st.session_state.chat_session = st.session_state.genai_client.chats.create(
-                    model="gemini-2.5-flash",
-                    config=genai_core.types.GenerateContentConfig(
-                        temperature=temperature,
-                        system_instruction=system_instruction
-                    )
-                )
+    # The health profile the service turns into the chat's system instruction
+    # (used when the conversation starts)
+    profile = {
+        "age": user_age, "gender": user_gender,
+        "height_cm": user_height_cm, "height_ft": user_height_ft,
+        "weight_kg": user_weight_kg, "weight_lbs": user_weight_lbs, "bmi": user_bmi,
+        "blood_pressure_sys": user_blood_pressure_sys, "blood_pressure_dia": user_blood_pressure_dia,
+        "resting_hr": user_resting_hr, "sleep_hours": user_sleep_hours,
+        "activity": user_activity, "exercise_freq": user_exercise_freq, "diet_type": user_diet_type,
+        "conditions": user_conditions, "medications": user_medications, "surgeries": user_surgeries,
+        "goals": user_goals, "concerns": user_concerns, "family_history": family_history
+    }
 
-                # Send the first message
-                response = st.session_state.chat_session.send_message(prompt)
-            else:
-                # Send subsequent messages
-                response = st.session_state.chat_session.send_message(prompt)
-            
-            # Extract the response text
-            if hasattr(response, 'candidates') and response.candidates:
-                answer = response.candidates[0].content.parts[0].text
-            else:
-                answer = str(response)
-        
-    except Exception as e:
-        answer = f"❌ An error occurred: {e}"
-    
-    # Display assistant response
+    # Generate and display the response as it streams in
     with st.chat_message("assistant"):
-        st.markdown(answer)
+        streaming = st.empty()
+        render_timer = telemetry.RenderTimer()
+        try:
+            with st.spinner("🌱 Getting health advice..."):
+                result = collect_answer(
+                    assistant.health_stream(st.session_state.session_id, prompt, google_api_key, profile, temperature),
+                    on_text=render_timer.wrap(streaming.markdown)
+                )
+            answer = f"❌ An error occurred: {result['error']}" if result["error"] else result["answer"]
+        except Exception as e:
+            result = {"turn_id": None}
+            answer = f"❌ An error occurred: {e}"
+        with render_timer.time():
+            streaming.markdown(answer)
+        render_timer.report(result.get("turn_id"))
     
     # Add assistant message to history
     st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -1,8 +1,10 @@
 # Import the necessary libraries
 import streamlit as st  # For creating the web app interface
-from langchain_google_genai import ChatGoogleGenerativeAI  # For interacting with Google Gemini via LangChain
+from gemini_client import get_chat_model  # For interacting with Google Gemini via LangChain (rate limited, with retries)
 from langgraph.prebuilt import create_react_agent  # For creating a ReAct agent
 from langchain_core.messages import HumanMessage, AIMessage  # For message formatting
+import telemetry  # For recording how long each turn takes (see the Performance page)
+import model_router  # For sending small talk to a lighter, cheaper model
 
 # --- 1. Page Configuration and Title ---
 
@@ -42,11 +44,7 @@ if not google_api_key:
 if ("agent" not in st.session_state) or (getattr(st.session_state, "_last_key", None) != google_api_key):
     try:
         # Initialize the LLM with the API key
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=google_api_key,
-            temperature=0.7
-        )
+        llm = get_chat_model(google_api_key, "gemini-2.5-flash", temperature=0.7)
         
         # Create a simple ReAct agent with the LLM
         st.session_state.agent = create_react_agent(
@@ -101,32 +99,50 @@ if prompt:
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # 3. Get the assistant's response.
-    # Use a 'try...except' block to gracefully handle potential errors (e.g., network issues, API errors).
-    try:
-        # Convert the message history to the format expected by the agent
-        messages = []
-        for msg in st.session_state.messages:
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                messages.append(AIMessage(content=msg["content"]))
-        
-        # Send the user's prompt to the agent
-        response = st.session_state.agent.invoke({"messages": messages})
-        
-        # Extract the answer from the response
-        if "messages" in response and len(response["messages"]) > 0:
-            answer = response["messages"][-1].content
-        else:
-            answer = "I'm sorry, I couldn't generate a response."
-
-    except Exception as e:
-        # If any error occurs, create an error message to display to the user.
-        answer = f"An error occurred: {e}"
-
-    # 4. Display the assistant's response.
-    with st.chat_message("assistant"):
-        st.markdown(answer)
+    # Everything inside this 'with' block is timed and stored as one turn record.
+    with telemetry.turn("react_app", None, prompt, "gemini-2.5-flash") as turn:
+        # 3. Get the assistant's response.
+        # Use a 'try...except' block to gracefully handle potential errors (e.g., network issues, API errors).
+        try:
+            # Convert the message history to the format expected by the agent
+            messages = []
+            for msg in st.session_state.messages:
+                if msg["role"] == "user":
+                    messages.append(HumanMessage(content=msg["content"]))
+                elif msg["role"] == "assistant":
+                    messages.append(AIMessage(content=msg["content"]))
+
+            # Greetings, thanks and the like don't need the agent: the router sends
+            # them to a lighter model, which answers faster and costs less.
+            decision = model_router.route(prompt, "react_app")
+            turn.source = decision["route"]
+            if decision["route"] == model_router.ROUTE_CHAT:
+                turn.model = decision["model"]
+                light_llm = model_router.get_light_model(google_api_key)
+                reply = light_llm.invoke(model_router.chat_messages(messages[:-1], prompt), config={"callbacks": turn.callbacks})
+                answer = reply.text
+            else:
+                # Send the user's prompt to the agent.
+                # The callbacks record each model call (time and tokens) in the turn.
+                with telemetry.stage("agent", "agent.invoke"):
+                    response = st.session_state.agent.invoke({"messages": messages}, config={"callbacks": turn.callbacks})
+
+                # Extract the answer from the response
+                if "messages" in response and len(response["messages"]) > 0:
+                    answer = response["messages"][-1].content
+                else:
+                    answer = "I'm sorry, I couldn't generate a response."
+            # Log how long the route took and what it cost
+            model_router.record_turn(turn, decision["route"])
+
+        except Exception as e:
+            # If any error occurs, create an error message to display to the user.
+            turn.error = str(e)
+            answer = f"An error occurred: {e}"
+
+        # 4. Display the assistant's response (timed as the "render" stage).
+        with telemetry.stage("render"):
+            with st.chat_message("assistant"):
+                st.markdown(answer)
     # 5. Add the assistant's response to the message history list.
     st.session_state.messages.append({"role": "assistant", "content": answer})
\ No newline at end of file
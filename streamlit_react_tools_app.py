@@ -1,13 +1,15 @@
 # Import the necessary libraries
 import streamlit as st  # For creating the web app interface
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI  # For interacting with Google Gemini via LangChain
-from langgraph.prebuilt import create_react_agent  # For creating a ReAct agent
-from langchain_core.messages import HumanMessage, AIMessage  # For message formatting
-from langchain_core.tools import tool  # For creating tools
+import logging
+import uuid
 
-# Import our database tools
-from database_tools import text_to_sql, init_database, get_database_info
+import telemetry  # Per-turn timings; the time spent drawing answers is added here
+
+# The agent, its tools and the caches live in the assistant service; this app only talks to it.
+# Set ASSISTANT_SERVICE_URL to use a running assistant_server.py instead of the in-process service.
+from assistant_client import get_client, collect_answer
+
+logging.basicConfig(level=logging.INFO)
 
 # --- 1. Page Configuration and Title ---
 
@@ -15,31 +17,61 @@ from database_tools import text_to_sql, init_database, get_database_info
 st.title("💬 SQL Assistant with LangGraph")
 st.caption("A chatbot that can answer questions about sales data using SQL")
 
+# One client per Streamlit process; the conversation state is kept by the service, keyed by this session's id
+@st.cache_resource
+def get_assistant():
+    return get_client()
+
+assistant = get_assistant()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # --- 2. Sidebar for Settings ---
 
 # Create a sidebar section for app settings using 'with st.sidebar:'
 with st.sidebar:
     # Add a subheader to organize the settings
     st.subheader("Settings")
-    
+
     # Create a text input field for the Google AI API Key.
     # 'type="password"' hides the key as the user types it.
     google_api_key = st.text_input("Google AI API Key", type="password")
-    
+
     # Create a button to reset the conversation.
     # 'help' provides a tooltip that appears when hovering over the button.
     reset_button = st.button("Reset Conversation", help="Clear all messages and start fresh")
-    
+
     # Add a button to initialize the database
     init_db_button = st.button("Initialize Database", help="Create and populate the database with sample data")
-    
+
     # Initialize database if button is clicked
     if init_db_button:
         with st.spinner("Initializing database..."):
-            result = init_database()
+            result = assistant.sql_init_database(google_api_key)
             st.success(result)
 
-# --- 3. API Key and Agent Initialization ---
+    # Let the user flag a cached answer that did not match their question
+    if st.session_state.get("last_cache_hit"):
+        if st.button("Cached answer was wrong", help="Drop the cached answer used for the last question"):
+            st.session_state.pop("last_cache_hit")
+            assistant.sql_report_false_hit(st.session_state.session_id, google_api_key)
+            st.toast("Thanks! That cached answer won't be reused.")
+
+    # Answers from a cached question-to-SQL plan only need the model for wording
+    phrase_with_llm = st.checkbox("Phrase cached-plan answers with Gemini", value=True,
+                                  help="When off, repeat questions are answered with a results table and no model call")
+
+    # Show how often the caches save an agent run
+    stats = assistant.sql_stats()
+    st.caption(f"Cache hit rate: {stats['cache']['hit_rate']:.0%} ({stats['cache']['entries']} cached questions)")
+    st.caption(f"Plan hit rate: {stats['plans']['hit_rate']:.0%} ({stats['plans']['plans']} question templates)")
+    if st.session_state.get("llm_call_counts"):
+        llm_call_counts = st.session_state.llm_call_counts
+        st.caption(f"LLM calls per agent question: {sum(llm_call_counts) / len(llm_call_counts):.2f}")
+        retry_counts = st.session_state.get("retry_counts", [])
+        st.caption(f"Query retries per agent question: {sum(retry_counts) / max(len(retry_counts), 1):.2f}")
+
+# --- 3. API Key Check ---
 
 # Check if the user has provided an API key.
 # If not, display an informational message and stop the app from running further.
@@ -47,78 +79,12 @@ if not google_api_key:
     st.info("Please add your Google AI API key in the sidebar to start chatting.", icon="🗝️")
     st.stop()
 
-# Define the tools using the LangChain tool decorator
-@tool
-def execute_sql(sql_query: str):
-    """
-    Execute a SQL query against the sales database.
-    
-    Args:
-        sql_query: The SQL query to execute. Must be a valid SQL query string.
-              For example: "SELECT * FROM customers", "SELECT p.name, SUM(si.quantity) as total_sold FROM sale_items si JOIN products p ON si.product_id = p.product_id GROUP BY p.product_id ORDER BY total_sold DESC", etc.
-    """
-    result = text_to_sql(sql_query)
-    # Format the result to clearly show the executed SQL query
-    formatted_result = f"```sql\n{sql_query}\n```\n\nQuery Results:\n{result}"
-    return formatted_result
-
-@tool
-def get_schema_info():
-    """
-    Get information about the database schema and sample data to help with query construction.
-    This tool returns the schema of all tables and sample data (first 3 rows) from each table.
-    Use this tool before writing SQL queries to understand the database structure.
-    """
-    return get_database_info()
-
-# This block of code handles the creation of the LangGraph agent.
-# It's designed to be efficient: it only creates a new agent if one doesn't exist
-# or if the user has changed the API key in the sidebar.
-if ("agent" not in st.session_state) or (getattr(st.session_state, "_last_key", None) != google_api_key):
-    try:
-        # Initialize the LLM with the API key
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=google_api_key,
-            temperature=0.2  # Lower temperature for more deterministic responses
-        )
-        
-        # Create a ReAct agent with the LLM and our SQL tools
-        st.session_state.agent = create_react_agent(
-            model=llm,
-            tools=[get_schema_info, execute_sql],
-            prompt="""You are a helpful assistant that can answer questions about sales data using SQL.
-            
-            IMPORTANT: When a user asks a question about sales data, follow these steps:
-            1. FIRST, use the get_schema_info tool to understand the database structure and see sample data
-            2. THEN, write a SQL query based on the user's question and the database schema
-            3. Execute the SQL query using the execute_sql tool
-            4. Explain the results in a clear and concise way
-            
-            When writing SQL queries:
-            - Use proper SQL syntax for SQLite
-            - Use appropriate JOINs when querying across multiple tables
-            - Use aliases for table names in complex queries (e.g., 'customers AS c')
-            - Use aggregation functions (COUNT, SUM, AVG, etc.) when appropriate
-            - Format the SQL query to be readable
-            
-            If you encounter any errors:
-            - Explain what went wrong
-            - Fix the SQL query and try again
-            
-            Remember: You must generate the SQL query yourself based on the user's question and the database schema.
-            Do not ask the user to provide SQL queries.
-            """
-        )
-        
-        # Store the new key in session state to compare against later.
-        st.session_state._last_key = google_api_key
-        # Since the key changed, we must clear the old message history.
-        st.session_state.pop("messages", None)
-    except Exception as e:
-        # If the key is invalid, show an error and stop.
-        st.error(f"Invalid API Key or configuration error: {e}")
-        st.stop()
+# The service builds (and caches) the agent for each API key. When the user changes
+# the key, start a fresh conversation.
+if getattr(st.session_state, "_last_key", None) != google_api_key:
+    assistant.sql_reset(st.session_state.session_id, google_api_key)
+    st.session_state._last_key = google_api_key
+    st.session_state.pop("messages", None)
 
 # --- 4. Chat History Management ---
 
@@ -128,8 +94,8 @@ if "messages" not in st.session_state:
 
 # Handle the reset button click.
 if reset_button:
-    # If the reset button is clicked, clear the agent and message history from memory.
-    st.session_state.pop("agent", None)
+    # If the reset button is clicked, clear the conversation on the service and the message history from memory.
+    assistant.sql_reset(st.session_state.session_id, google_api_key)
     st.session_state.pop("messages", None)
     # st.rerun() tells Streamlit to refresh the page from the top.
     st.rerun()
@@ -157,66 +123,49 @@ if prompt:
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # 3. Get the assistant's response.
-    # Use a 'try...except' block to gracefully handle potential errors (e.g., network issues, API errors).
-    try:
-        # Convert the message history to the format expected by the agent
-        messages = []
-        for msg in st.session_state.messages:
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                messages.append(AIMessage(content=msg["content"]))
-        
-        # Show a spinner while waiting for the response
-        with st.spinner("Thinking..."):
-            # Send the user's prompt to the agent
-            response = st.session_state.agent.invoke({"messages": messages})
-            
-            # Extract the answer from the response
-            if "messages" in response and len(response["messages"]) > 0:
-                answer = response["messages"][-1].content
-                
-                # Extract SQL query from tool messages if present
-                sql_query = None
-                for i, msg in enumerate(response["messages"]):
-                    # Check if this is a ToolMessage with execute_sql
-                    if hasattr(msg, "tool_call_id") and hasattr(msg, "name") and msg.name == "execute_sql":
-                        # Extract SQL query from the tool message content
-                        if hasattr(msg, "content") and "```sql\n" in msg.content:
-                            sql_parts = msg.content.split("```sql\n")
-                            if len(sql_parts) > 1:
-                                sql_query = sql_parts[1].split("\n```")[0].strip()
-                                # Store the SQL query in session state for display
-                                st.session_state.last_sql_query = sql_query
-                    # Also check for tool calls in AIMessage
-                    elif hasattr(msg, "tool_calls") and msg.tool_calls:
-                        for tool_call in msg.tool_calls:
-                            if tool_call.get("name") == "execute_sql" and "sql_query" in tool_call.get("args", {}):
-                                sql_query = tool_call["args"]["sql_query"]
-                                st.session_state.last_sql_query = sql_query
-            else:
-                answer = "I'm sorry, I couldn't generate a response."
-
-    except Exception as e:
-        # If any error occurs, create an error message to display to the user.
-        answer = f"An error occurred: {e}"
-
-    # 4. Display the assistant's response.
+    # 3. Get and display the assistant's response.
+    # The service checks its caches first and only runs the agent when they can't answer.
     with st.chat_message("assistant"):
-        # Check if we have a SQL query from the tool message
-        sql_query = None
-        if hasattr(st.session_state, "last_sql_query"):
-            sql_query = st.session_state.last_sql_query
-            # Clear it after use
-            del st.session_state.last_sql_query
-
-        # Display the extracted SQL query in a code block if found
-        if sql_query:
-            st.code(sql_query, language="sql")
-        
-        # Display the full answer
-        st.markdown(answer)
-    
-    # 5. Add the assistant's response to the message history list.
-    st.session_state.messages.append({"role": "assistant", "content": answer})
\ No newline at end of file
+        # The answer is shown as it streams in, then replaced by the final version below
+        streaming = st.empty()
+        # Time spent drawing the answer, reported to the Performance page
+        render_timer = telemetry.RenderTimer()
+        # Use a 'try...except' block to gracefully handle potential errors (e.g., network issues, API errors).
+        try:
+            with st.spinner("Thinking..."):
+                result = collect_answer(
+                    assistant.sql_stream(st.session_state.session_id, prompt, google_api_key, phrase_with_llm),
+                    on_text=render_timer.wrap(streaming.markdown)
+                )
+            answer = f"An error occurred: {result['error']}" if result["error"] else result["answer"]
+        except Exception as e:
+            # If any error occurs, create an error message to display to the user.
+            result = {"source": None, "sql_query": None, "batch_queries": [], "turn_id": None}
+            answer = f"An error occurred: {e}"
+        streaming.empty()
+
+        # Remember cache hits so the user can flag a wrong cached answer
+        if result["source"] == "cache":
+            st.session_state.last_cache_hit = True
+        else:
+            st.session_state.pop("last_cache_hit", None)
+        # Track the agent's cost per question for the sidebar
+        if result["source"] == "agent":
+            st.session_state.llm_call_counts = st.session_state.get("llm_call_counts", []) + [result["llm_calls"]]
+            st.session_state.retry_counts = st.session_state.get("retry_counts", []) + [result["retries"]]
+
+        with render_timer.time():
+            # Display the SQL query behind the answer in a code block if there is one
+            if result["sql_query"]:
+                st.code(result["sql_query"], language="sql")
+
+            # Display the queries of a batch call, if the agent used one
+            for batch_query in result["batch_queries"]:
+                st.code(batch_query, language="sql")
+
+            # Display the full answer
+            st.markdown(answer)
+        render_timer.report(result.get("turn_id"))
+
+    # 4. Add the assistant's response to the message history list.
+    st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -0,0 +1,422 @@
+# telemetry.py
+# Per-turn performance records for the assistants (each turn is also traced, see tracing.py).
+# A turn is one question and its answer. While a turn is open, the time spent
+# in each stage is recorded as spans:
+#   llm     model calls (with token usage), via TelemetryCallback or stage()
+#   tool    agent tool calls, via TelemetryCallback
+#   sql     database statements, via stage("sql") in database_tools (with the SQL and row count)
+#   render  drawing the answer in Streamlit, reported by the app (record_render)
+# When the turn ends, one record with stage totals, counts, tokens, estimated
+# cost and the spans is written to a local SQLite database if TELEMETRY_DB is
+# set and, if TELEMETRY_NDJSON is set, appended to that file as one JSON line.
+# Both are off by default.
+# Stages can overlap (concurrent tool calls, SQL inside a tool), so stage
+# totals are busy time and may add up to more than the turn's total.
+#
+# The same hooks create the trace spans: the turn is the root span (its trace id
+# is the turn id) and every stage, model call, tool call and agent step is a child.
+#
+# Usage:
+#   with telemetry.turn("sql_assistant", session_id, question) as t:
+#       agent.invoke(inputs, config={"callbacks": t.callbacks})
+#       with telemetry.stage("llm", "gemini-2.5-flash"):
+#           ...
+import contextvars
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, closing
+from typing import List, Dict, Any, Optional, Iterator, Callable
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import tracing
+
+logger = logging.getLogger("telemetry")
+
+# Where turn records go (e.g. TELEMETRY_DB=telemetry.db); nothing is recorded unless set
+TELEMETRY_DB = os.environ.get("TELEMETRY_DB") or None
+TELEMETRY_NDJSON = os.environ.get("TELEMETRY_NDJSON") or None
+
+# USD per million input and output tokens, for the cost estimate
+MODEL_PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+STAGES = ("llm", "tool", "sql", "render")
+
+# Questions are stored shortened
+MAX_QUESTION_CHARS = 200
+
+class Turn:
+    """
+    Spans, counters and token usage of one question-and-answer turn
+    """
+
+    def __init__(self, app: str, session_id: Optional[str], question: str, model: Optional[str] = None):
+        # Also the id of the turn's trace
+        self.turn_id = tracing.new_trace_id()
+        self.app = app
+        # Stored as text whatever a caller passed in
+        self.session_id = None if session_id is None else str(session_id)
+        self.question = str(question)[:MAX_QUESTION_CHARS]
+        self.model = model
+        self.source = None
+        self.error = None
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.callbacks = [TelemetryCallback(self)]
+
+    def add_span(self, stage: str, name: str, start: float, end: Optional[float] = None, **attributes) -> None:
+        """
+        Record a span of a stage
+
+        Args:
+            stage: One of STAGES
+            name: What ran (model, tool or function name)
+            start: time.perf_counter() when it started
+            end: time.perf_counter() when it ended (now by default)
+            **attributes: Extra details stored with the span
+        """
+        end = time.perf_counter() if end is None else end
+        span = {"stage": stage, "name": name, "start_ms": round((start - self.start) * 1000, 2),
+                "elapsed_ms": round((end - start) * 1000, 2), **attributes}
+        with self._lock:
+            self.spans.append(span)
+
+    def add_usage(self, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.input_tokens += input_tokens or 0
+            self.output_tokens += output_tokens or 0
+
+    def add_response_usage(self, response) -> None:
+        """
+        Add the token usage of a google.genai response (or the last chunk of a stream)
+        """
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.add_usage(usage.prompt_token_count, usage.candidates_token_count)
+
+    def record(self) -> Dict[str, Any]:
+        """
+        The turn as a flat record (stage totals in ms, counts, tokens, cost and spans)
+        """
+        with self._lock:
+            spans = list(self.spans)
+        record = {
+            "turn_id": self.turn_id, "ts": self.started, "app": self.app, "session_id": self.session_id,
+            "question": self.question, "source": self.source, "model": self.model,
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 2),
+        }
+        for stage in STAGES:
+            record[f"{stage}_ms"] = round(sum(span["elapsed_ms"] for span in spans if span["stage"] == stage), 2)
+        record.update({
+            "llm_calls": sum(1 for span in spans if span["stage"] == "llm"),
+            "tool_calls": sum(1 for span in spans if span["stage"] == "tool"),
+            "sql_queries": sum(1 for span in spans if span["stage"] == "sql"),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": estimate_cost(self.model, self.input_tokens, self.output_tokens),
+            "error": self.error,
+            "spans": spans
+        })
+        return record
+
+def estimate_cost(model: Optional[str], input_tokens: int, output_tokens: int) -> Optional[float]:
+    """
+    Estimated USD cost of the tokens at MODEL_PRICES (None for unknown models)
+    """
+    prices = MODEL_PRICES.get(model or "")
+    if not prices:
+        return None
+    return round((input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000, 6)
+
+class TelemetryCallback(BaseCallbackHandler):
+    """
+    LangChain callback recording model and tool calls as spans of a turn,
+    and LangGraph node runs ("agent step N") as trace spans around them
+    """
+
+    def __init__(self, turn: Turn):
+        self.turn = turn
+        self._starts: Dict[Any, Any] = {}
+
+    def _begin(self, run_id, stage_name: str, name: str, attributes: Dict[str, Any], activate: bool = False) -> None:
+        span = tracing.begin_span(name if stage_name == "step" else f"{stage_name} {name}",
+                                  {"stage": stage_name, **attributes}, activate=activate)
+        self._starts[run_id] = (time.perf_counter(), name, span)
+
+    def _end(self, run_id, stage_name: str, error: Any = None, **attributes) -> None:
+        start, name, span = self._starts.pop(run_id, (None, None, None))
+        if start is None:
+            return
+        span.set_attributes(attributes)
+        tracing.finish_span(span, error)
+        if stage_name != "step":
+            self.turn.add_span(stage_name, name, start, **attributes, **({"error": str(error)} if error else {}))
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        # A LangGraph node run; its model and tool calls become its children
+        node = (metadata or {}).get("langgraph_node")
+        if node and name == node:
+            step = metadata.get("langgraph_step")
+            self._begin(run_id, "step", f"agent step {step} ({node})",
+                        {"langgraph.node": node, "langgraph.step": step}, activate=True)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id, "step")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "step", error=repr(error))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or "llm"
+        self._begin(run_id, "llm", model, {"gen_ai.request.model": model})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or "llm"
+        self._begin(run_id, "llm", model, {"gen_ai.request.model": model})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        message = getattr(response.generations[0][0], "message", None) if response.generations and response.generations[0] else None
+        usage = getattr(message, "usage_metadata", None) or {}
+        if run_id in self._starts:
+            self.turn.add_usage(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        self._end(run_id, "llm", input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "llm", error=repr(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        # Activated, so the tool's SQL statements become its children
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._begin(run_id, "tool", name, {"tool.input": input_str}, activate=True)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, "tool")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "tool", error=repr(error))
+
+# --- Sink ---
+
+class TelemetrySink:
+    """
+    Stores turn records in SQLite (and optionally an NDJSON file)
+    """
+
+    COLUMNS = ["turn_id", "ts", "app", "session_id", "question", "source", "model", "total_ms",
+               "llm_ms", "tool_ms", "sql_ms", "render_ms", "llm_calls", "tool_calls", "sql_queries",
+               "input_tokens", "output_tokens", "cost_usd", "error", "spans"]
+
+    def __init__(self, db_path: Optional[str] = TELEMETRY_DB, ndjson_path: Optional[str] = TELEMETRY_NDJSON):
+        self.db_path = db_path
+        self.ndjson_path = ndjson_path
+        self._lock = threading.Lock()
+        if self.db_path:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS turns (
+                    turn_id TEXT PRIMARY KEY, ts REAL, app TEXT, session_id TEXT, question TEXT,
+                    source TEXT, model TEXT, total_ms REAL, llm_ms REAL, tool_ms REAL, sql_ms REAL,
+                    render_ms REAL, llm_calls INTEGER, tool_calls INTEGER, sql_queries INTEGER,
+                    input_tokens INTEGER, output_tokens INTEGER, cost_usd REAL, error TEXT, spans TEXT
+                )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS turns_ts ON turns (ts)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """
+        Store one turn record; failures are logged, never raised into the turn
+        """
+        try:
+            with self._lock:
+                if self.db_path:
+                    with closing(self._connect()) as conn, conn:
+                        conn.execute(
+                            f"INSERT OR REPLACE INTO turns ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                            [json.dumps(record["spans"]) if column == "spans" else record.get(column) for column in self.COLUMNS]
+                        )
+                if self.ndjson_path:
+                    with open(self.ndjson_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, default=str) + "\n")
+        except Exception:
+            logger.exception("Could not store telemetry for turn %s", record.get("turn_id"))
+
+    def add_render(self, turn_id: str, elapsed_ms: float) -> None:
+        """
+        Add the time the front end spent drawing a turn's answer
+        """
+        if not self.db_path:
+            return
+        try:
+            with self._lock, closing(self._connect()) as conn, conn:
+                conn.execute("UPDATE turns SET render_ms = ? WHERE turn_id = ?", (round(elapsed_ms, 2), turn_id))
+        except sqlite3.Error:
+            logger.exception("Could not store render time for turn %s", turn_id)
+
+    def load(self, limit: int = 1000, app: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        The most recent turn records, newest first
+        """
+        if not self.db_path or not os.path.exists(self.db_path):
+            return []
+        query = "SELECT * FROM turns" + (" WHERE app = ?" if app else "") + " ORDER BY ts DESC LIMIT ?"
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(query, ([app] if app else []) + [limit]).fetchall()
+        records = []
+        for row in rows:
+            record = dict(row)
+            record["spans"] = json.loads(record["spans"] or "[]")
+            records.append(record)
+        return records
+
+_sink: Optional[TelemetrySink] = None
+_sink_lock = threading.Lock()
+
+def get_sink() -> TelemetrySink:
+    """
+    The process-wide sink, configured from TELEMETRY_DB and TELEMETRY_NDJSON
+    """
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = TelemetrySink()
+        return _sink
+
+# --- Recording ---
+
+_current: contextvars.ContextVar[Optional[Turn]] = contextvars.ContextVar("telemetry_turn", default=None)
+
+def current_turn() -> Optional[Turn]:
+    """
+    The turn being recorded in this context, if any
+    """
+    return _current.get()
+
+def callbacks() -> List[BaseCallbackHandler]:
+    """
+    LangChain callbacks of the current turn, for config={"callbacks": ...}
+    """
+    current = _current.get()
+    return current.callbacks if current is not None else []
+
+@contextmanager
+def turn(app: str, session_id: Optional[str], question: str, model: Optional[str] = None) -> Iterator[Turn]:
+    """
+    Record a turn: spans recorded until the block ends belong to it, and its
+    record is stored when the block ends (with the error, if it raised)
+    """
+    current = Turn(app, session_id, question, model)
+    previous = _current.get()
+    _current.set(current)
+    root = tracing.begin_span(f"turn {app}", {"app": app, "session.id": current.session_id or "", "question": current.question,
+                                              "gen_ai.request.model": model or ""}, trace_id=current.turn_id)
+    try:
+        yield current
+    except GeneratorExit:
+        current.error = current.error or "cancelled"
+        raise
+    except Exception as e:
+        current.error = current.error or str(e)
+        raise
+    finally:
+        _current.set(previous)
+        record = current.record()
+        root.set_attributes({"source": record["source"] or "", "total_ms": record["total_ms"],
+                             "input_tokens": record["input_tokens"], "output_tokens": record["output_tokens"]})
+        tracing.finish_span(root, record["error"])
+        get_sink().write(record)
+
+@contextmanager
+def stage(stage_name: str, name: Optional[str] = None, **attributes) -> Iterator[tracing.Span]:
+    """
+    Time a block as a span of the current turn (does nothing outside a turn)
+
+    Yields the block's trace span, so attributes known only at the end (like a
+    row count) can be added with span.set_attribute.
+    """
+    current = _current.get()
+    start = time.perf_counter()
+    span = tracing.begin_span(name or stage_name, {"stage": stage_name, **attributes})
+    error = None
+    try:
+        yield span
+    except BaseException as e:
+        error = "cancelled" if isinstance(e, GeneratorExit) else repr(e)
+        raise
+    finally:
+        tracing.finish_span(span, error)
+        if current is not None:
+            details = {key: value for key, value in span.attributes.items() if key != "stage"}
+            current.add_span(stage_name, name or stage_name, start, **details, **({"error": error} if error else {}))
+
+class RenderTimer:
+    """
+    Adds up the time a front end spends drawing one answer (streamed pieces included)
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.first_start_ns: Optional[int] = None
+
+    def wrap(self, function: Callable) -> Callable:
+        """
+        The function, timed (e.g. a Streamlit placeholder's markdown method)
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.time():
+                return function(*args, **kwargs)
+        return wrapper
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        if self.first_start_ns is None:
+            self.first_start_ns = time.time_ns()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def report(self, turn_id: Optional[str]) -> None:
+        """
+        Store the render time with the turn's record, and as a span of its trace
+        """
+        record_render(turn_id, self.seconds * 1000, self.first_start_ns)
+
+def record_render(turn_id: Optional[str], elapsed_ms: float, start_ns: Optional[int] = None) -> None:
+    """
+    Report how long the front end took to draw a turn's answer
+
+    Args:
+        turn_id: The "turn_id" of the answer's "done" event
+        elapsed_ms: Time spent drawing
+        start_ns: When drawing started (unix ns); the span then runs until now
+    """
+    if turn_id:
+        get_sink().add_render(turn_id, elapsed_ms)
+        end_ns = time.time_ns()
+        tracing.add_span("render", turn_id, start_ns or end_ns - int(elapsed_ms * 1e6), end_ns,
+                         {"stage": "render", "render.busy_ms": round(elapsed_ms, 2)})
+
+def load_turns(limit: int = 1000, app: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    The most recent turn records, newest first (for the Performance page)
+    """
+    return get_sink().load(limit, app)
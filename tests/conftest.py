@@ -0,0 +1,27 @@
+# Shared fixtures: the repository's modules live at the top level, and tests
+# run against a throwaway copy of the sales database.
+import os
+import sys
+
+# Telemetry, traces and the slow-query log are opt-in; keep them off even if
+# the shell turned them on
+os.environ["TELEMETRY_DB"] = ""
+os.environ["TRACE_FILE"] = ""
+os.environ["SQL_PROFILE"] = ""
+os.environ["SLOW_QUERY_LOG"] = ""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import database_tools
+
+@pytest.fixture
+def sales_db(tmp_path, monkeypatch):
+    """
+    A freshly initialized sales database in a temporary directory
+    """
+    path = str(tmp_path / "sales_data.db")
+    monkeypatch.setattr(database_tools, "DB_PATH", path)
+    database_tools.init_database()
+    return path
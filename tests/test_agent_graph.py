@@ -0,0 +1,38 @@
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+import agent_graph
+from agent_graph import ConcurrentToolNode
+
+@tool
+def wait(seconds: float) -> str:
+    """Sleep, then report the thread that ran the call."""
+    time.sleep(seconds)
+    return threading.current_thread().name
+
+def calls(count, seconds=0.05):
+    return AIMessage(content="", tool_calls=[{"name": "wait", "args": {"seconds": seconds}, "id": str(i), "type": "tool_call"}
+                                             for i in range(count)])
+
+def test_executors_are_keyed_by_size():
+    assert agent_graph._get_executor(2) is agent_graph._get_executor(2)
+    assert agent_graph._get_executor(2)._max_workers == 2
+    assert agent_graph._get_executor(6)._max_workers == 6
+
+def test_each_node_uses_its_own_pool_size():
+    # Whichever node runs first, the other still gets the concurrency it asked for
+    ConcurrentToolNode([wait], max_workers=1)({"messages": [calls(2, 0)]})
+    node = ConcurrentToolNode([wait], max_workers=4)
+    start = time.perf_counter()
+    outputs = node({"messages": [calls(4)]})["messages"]
+    assert time.perf_counter() - start < 0.15
+    assert all(output.content.startswith("tool-call-4") for output in outputs)
+    assert [output.tool_call_id for output in outputs] == ["0", "1", "2", "3"]
+
+def test_unknown_tool_is_reported_to_the_model():
+    message = AIMessage(content="", tool_calls=[{"name": "nope", "args": {}, "id": "x", "type": "tool_call"}])
+    output = ConcurrentToolNode([wait])({"messages": [message]})["messages"][0]
+    assert output.status == "error" and "Unknown tool" in output.content
@@ -0,0 +1,162 @@
+import asyncio
+import json
+from typing import List, Dict, Any
+
+import pytest
+
+import model_router
+from assistant_server import AssistantServer
+
+from test_assistant_service import agent_step, service_for
+
+async def _exchange(raw: bytes) -> str:
+    server = AssistantServer(workers=1, max_queue=1)
+    server.slots = asyncio.Semaphore(server.workers)
+    listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        status_line = (await asyncio.wait_for(reader.readline(), timeout=10)).decode()
+        writer.close()
+    return status_line
+
+def status_of(raw: bytes) -> int:
+    return int(asyncio.run(_exchange(raw)).split()[1])
+
+def test_healthz():
+    assert status_of(b"GET /healthz HTTP/1.1\r\nConnection: close\r\n\r\n") == 200
+
+@pytest.mark.parametrize("raw", [
+    b"garbage\r\n\r\n",
+    b"GET /healthz\r\n\r\n",
+    b"POST /v1/sql/reset HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+    b"POST /v1/sql/reset HTTP/1.1\r\nContent-Length: -5\r\n\r\n",
+    b"GET /v1/health/recommendations?user_id=abc HTTP/1.1\r\nConnection: close\r\n\r\n",
+    b"POST /v1/sql/reset HTTP/1.1\r\nContent-Length: 2\r\nConnection: close\r\n\r\n[]",
+])
+def test_malformed_requests_get_400(raw):
+    assert status_of(raw) == 400
+
+def test_oversized_body_gets_413():
+    assert status_of(b"POST /v1/sql/reset HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n") == 413
+
+def post(path: str, payload, key: str = "key-a") -> bytes:
+    body = json.dumps(payload).encode()
+    head = f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n"
+    if key:
+        head += f"X-Google-Api-Key: {key}\r\n"
+    return head.encode() + b"\r\n" + body
+
+async def _responses(server: AssistantServer, *requests: bytes) -> List[bytes]:
+    """
+    Send each request on its own connection and read the whole response
+    """
+    server.slots = asyncio.Semaphore(server.workers)
+    listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    responses = []
+    async with listener:
+        for raw in requests:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            await writer.drain()
+            responses.append(await asyncio.wait_for(reader.read(), timeout=30))
+            writer.close()
+    return responses
+
+def responses(server: AssistantServer, *requests: bytes) -> List[bytes]:
+    return asyncio.run(_responses(server, *requests))
+
+def stream_events(response: bytes) -> List[Dict[str, Any]]:
+    """
+    The NDJSON events of a chunked response
+    """
+    body = response.split(b"\r\n\r\n", 1)[1]
+    events = []
+    while True:
+        size, _, body = body.partition(b"\r\n")
+        if int(size, 16) == 0:
+            assert body == b"\r\n"
+            return events
+        events.append(json.loads(body[:int(size, 16)]))
+        body = body[int(size, 16) + 2:]
+
+@pytest.fixture
+def server(sales_db, monkeypatch):
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    server = AssistantServer(workers=1, max_queue=1)
+    server.sql = service_for(agent_step("SELECT COUNT(*) AS n FROM sales") * 10)
+    return server
+
+@pytest.mark.parametrize("payload", [
+    {"session_id": "s", "question": 123},
+    {"session_id": ["x"], "question": "How many sales are there?"},
+    {"session_id": {"a": 1}, "question": "How many sales are there?"},
+    {"session_id": "s", "question": "   "},
+    {"session_id": "", "question": "How many sales are there?"},
+    {"session_id": "s", "question": "How many sales are there?", "use_cache": "no"},
+    {"session_id": "s", "question": "How many sales are there?", "stream": 1},
+])
+@pytest.mark.parametrize("stream", [False, True])
+def test_invalid_fields_get_400_before_any_work(server, payload, stream):
+    payload = {"stream": stream, **payload}
+    server.sql.stream_ask = lambda *args: pytest.fail("the service was called")
+    [response] = responses(server, post("/v1/sql/ask", payload))
+    assert response.startswith(b"HTTP/1.1 400 ") and response.count(b"HTTP/1.1") == 1
+    assert "error" in json.loads(response.split(b"\r\n\r\n", 1)[1])
+    assert server.pending == 0
+
+@pytest.mark.parametrize("payload", [
+    {"session_id": "s", "message": "hi", "temperature": "hot"},
+    {"session_id": "s", "message": "hi", "temperature": True},
+    {"session_id": "s", "message": "hi", "profile": ["age", 30]},
+])
+def test_invalid_health_options_get_400(server, payload):
+    [response] = responses(server, post("/v1/health/ask", payload))
+    assert response.startswith(b"HTTP/1.1 400 ")
+
+def test_a_stream_that_fails_ends_with_an_error_event(server):
+    def failing_stream(*args):
+        yield {"event": "status", "text": "thinking"}
+        raise RuntimeError("boom")
+
+    server.sql.stream_ask = failing_stream
+    streamed, plain = responses(
+        server,
+        post("/v1/sql/ask", {"session_id": "s", "question": "How many sales?", "stream": True}),
+        post("/v1/sql/ask", {"session_id": "s", "question": "How many sales?"}))
+    assert streamed.startswith(b"HTTP/1.1 200 ") and streamed.count(b"HTTP/1.1") == 1
+    assert stream_events(streamed) == [{"event": "status", "text": "thinking"},
+                                       {"event": "done", "answer": None, "error": "boom"}]
+    assert plain.startswith(b"HTTP/1.1 500 ")
+
+def test_routing_errors_become_the_turns_error(server, monkeypatch):
+    monkeypatch.setattr(model_router, "route", lambda *args: 1 / 0)
+    [response] = responses(server, post("/v1/sql/ask", {"session_id": "s", "question": "How many sales?",
+                                                        "stream": True}))
+    done = stream_events(response)[-1]
+    assert done["event"] == "done" and "division by zero" in done["error"]
+
+def test_sessions_are_bound_to_their_api_key(server):
+    ask = {"session_id": "shared", "question": "How many sales are there?", "use_cache": False}
+    first, other_reset, other_hit, no_key = responses(
+        server, post("/v1/sql/ask", ask), post("/v1/sql/reset", {"session_id": "shared"}, key="key-b"),
+        post("/v1/sql/false-hit", {"session_id": "shared"}, key="key-b"),
+        post("/v1/sql/reset", {"session_id": "shared"}, key=""))
+    assert json.loads(first.split(b"\r\n\r\n", 1)[1])["source"] == "agent"
+    assert other_reset.startswith(b"HTTP/1.1 200 ") and no_key.startswith(b"HTTP/1.1 401 ")
+    assert json.loads(other_hit.split(b"\r\n\r\n", 1)[1]) == {"dropped": False}
+
+    def conversations():
+        return [session for session in server.sql.sessions._sessions.values() if session.agent_messages]
+
+    # Key b's "shared" is another session: key a's conversation is still there
+    assert len(conversations()) == 1
+    responses(server, post("/v1/sql/reset", {"session_id": "shared"}))
+    assert conversations() == []
+
+def test_init_needs_an_api_key(server):
+    no_key, with_key = responses(server, post("/v1/sql/init", {}, key=""), post("/v1/sql/init", {}))
+    assert no_key.startswith(b"HTTP/1.1 401 ") and with_key.startswith(b"HTTP/1.1 200 ")
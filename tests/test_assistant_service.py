@@ -0,0 +1,48 @@
+from assistant_service import SQLAssistantService
+from fake_llm import FakeChatModel
+
+TOP_CUSTOMERS = ("SELECT c.name, SUM(s.total_amount) AS total_spent FROM customers c "
+                 "JOIN sales s ON c.customer_id = s.customer_id GROUP BY c.name ORDER BY total_spent DESC LIMIT {n}")
+
+def agent_step(sql):
+    """
+    Two script steps: run one query, then answer
+    """
+    return [{"tool_calls": [{"name": "execute_sql", "args": {"sql_query": sql}}]}, "Here are the results."]
+
+def service_for(script):
+    model = FakeChatModel(script=script)
+    return SQLAssistantService(llm_factory=lambda api_key: model)
+
+def test_plan_cache_is_consulted_before_similarity_cache(sales_db):
+    service = service_for(agent_step(TOP_CUSTOMERS.format(n=5)))
+    first = service.ask("a", "Top 5 customers by total spent", "key", phrase_with_llm=False)
+    assert first["source"] == "agent"
+
+    # Near-identical wording, different limit: re-bound plan, not the cached top-5 answer
+    second = service.ask("b", "Top 3 customers by total spent", "key", phrase_with_llm=False)
+    assert second["source"] == "plan"
+    assert second["sql_query"].endswith("LIMIT 3")
+
+def test_follow_ups_are_not_cached_or_learned(sales_db):
+    script = agent_step(TOP_CUSTOMERS.format(n=5)) + agent_step(
+        "SELECT SUM(total_amount) FROM sales s JOIN customers c ON c.customer_id = s.customer_id "
+        "WHERE c.name LIKE '%Jane%' AND s.sale_date LIKE '%2023%'")
+    service = service_for(script)
+    service.ask("a", "Top 5 customers by total spent", "key", phrase_with_llm=False)
+    follow_up = service.ask("a", "What about Jane?", "key", phrase_with_llm=False)
+    assert follow_up["source"] == "agent"
+    assert service.plan_cache.stats()["learned"] == 1
+    assert service.semantic_cache.stats()["entries"] == 1
+
+    # Another session asking the same follow-up gets its own agent run, not session a's answer
+    other = service_for(script[2:])
+    other.plan_cache, other.semantic_cache = service.plan_cache, service.semantic_cache
+    assert other.ask("b", "What about Jane?", "key", phrase_with_llm=False)["source"] == "agent"
+
+def test_questions_after_earlier_turns_are_not_stored(sales_db):
+    script = agent_step(TOP_CUSTOMERS.format(n=5)) + agent_step("SELECT COUNT(*) AS n FROM products")
+    service = service_for(script)
+    service.ask("a", "Top 5 customers by total spent", "key", phrase_with_llm=False)
+    service.ask("a", "How many products are in the catalog", "key", phrase_with_llm=False)
+    assert service.semantic_cache.stats()["entries"] == 1
@@ -0,0 +1,42 @@
+import json
+
+from batch_runner import load_checkpoint, run_batch
+
+from test_assistant_service import service_for
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+def test_resumed_conversation_keeps_its_history(sales_db, tmp_path):
+    questions, answers = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    write_jsonl(questions, [
+        {"id": "q1", "question": "Who is our top customer?", "session_id": "s"},
+        {"id": "q2", "question": "What about their email?", "session_id": "s"},
+        {"id": "q3", "question": "How many products are there?"},
+    ])
+    # An earlier run answered q1 and stopped
+    write_jsonl(answers, [{"id": "q1", "question": "Who is our top customer?", "answer": "Charlie Davis.",
+                           "sql_query": "SELECT name FROM customers LIMIT 1", "error": None}])
+    seen = {}
+
+    def answer(messages):
+        contents = [str(message.content) for message in messages]
+        seen[contents[-1]] = contents
+        return "Answered."
+
+    summary = run_batch(str(questions), str(answers), "key", concurrency=1, rate=100,
+                        service=service_for([answer]))
+    assert summary["skipped"] == 1 and summary["answered"] == 2
+    history = seen["What about their email?"]
+    assert "Who is our top customer?" in history
+    assert any("Charlie Davis." in content and "SELECT name FROM customers" in content for content in history)
+    # Other conversations start empty
+    assert not any("Charlie" in content for content in seen["How many products are there?"])
+
+def test_latest_record_wins(tmp_path):
+    answers = tmp_path / "answers.jsonl"
+    write_jsonl(answers, [{"id": "a", "answer": None, "error": "boom"}, {"id": "a", "answer": "ok", "error": None},
+                          {"id": "b", "answer": None, "error": "boom"}])
+    assert set(load_checkpoint(str(answers))) == {"a", "b"}
+    assert set(load_checkpoint(str(answers), retry_errors=True)) == {"a"}
+    assert load_checkpoint(str(tmp_path / "missing.jsonl")) == {}
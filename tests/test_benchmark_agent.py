@@ -0,0 +1,15 @@
+import pytest
+
+import benchmark_agent
+
+@pytest.mark.parametrize("kind", ["prebuilt", "concurrent"])
+def test_every_scenario_runs_without_tool_errors(sales_db, kind):
+    result = benchmark_agent.run_benchmark(kind, turns=len(benchmark_agent.SCENARIOS), token_delay=0, latency=0)
+    assert result["turns"] == len(benchmark_agent.SCENARIOS)
+
+def test_tool_errors_fail_the_benchmark(sales_db, monkeypatch):
+    broken = {"question": "Revenue by category", "steps": [
+        {"tool_calls": [{"name": "execute_sql", "args": {"sql_query": "SELECT p.category FROM products p"}}]}, "Done."]}
+    monkeypatch.setattr(benchmark_agent, "SCENARIOS", [broken])
+    with pytest.raises(RuntimeError, match="category"):
+        benchmark_agent.run_benchmark("concurrent", turns=1, token_delay=0, latency=0, warmup=0)
@@ -0,0 +1,82 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+import chart_pipeline
+from chart_pipeline import lttb, _bar_data, _line_data, render_chart, ChartCache, CHART_TYPES
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(chart_pipeline, "_cache", ChartCache())
+
+def test_lttb_keeps_the_endpoints_and_the_extremes():
+    x = np.arange(10_000, dtype=np.float64)
+    y = np.sin(x / 500) + np.random.default_rng(0).normal(0, 0.01, len(x))
+    # Single-point spikes a stride-based sample would miss
+    y[3_333], y[7_777] = 25.0, -25.0
+    keep = lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert (np.diff(keep) > 0).all()
+    assert {3_333, 7_777} <= set(keep.tolist())
+    assert y[keep].max() == y.max() and y[keep].min() == y.min()
+
+@pytest.mark.parametrize("n, threshold", [(5, 10), (50, 50), (50, 2)])
+def test_lttb_keeps_everything_when_there_is_nothing_to_drop(n, threshold):
+    x = np.arange(n, dtype=np.float64)
+    assert lttb(x, x ** 2, threshold).tolist() == list(range(n))
+
+def test_line_data_reduces_every_series(monkeypatch):
+    monkeypatch.setattr(chart_pipeline, "MAX_LINE_POINTS", 100)
+    df = pd.DataFrame({"a": np.arange(5_000.0), "b": np.zeros(5_000), "c": list("xy") * 2_500})
+    df.loc[1_234, "b"] = 9.0
+    df.loc[10, "a"] = np.nan
+    data = _line_data(df, ["a", "b"])
+    assert list(data.columns) == ["a", "b"]
+    assert len(data) <= 200
+    assert 1_234 in data.index and data.index[0] == 0 and data.index[-1] == 4_999
+
+def test_bar_data_averages_runs_of_rows(monkeypatch):
+    monkeypatch.setattr(chart_pipeline, "MAX_BAR_POINTS", 4)
+    df = pd.DataFrame({"v": [1, None, 5, 7, 9, 11, 13, 15, 17, 19]}, index=range(100, 110))
+    data = _bar_data(df, "v")
+    # 10 rows into at most 4 bars: runs of 3, indexed by each run's first row; gaps are skipped
+    assert data.index.tolist() == [0, 3, 6, 9]
+    assert data["v"].tolist() == [3.0, 9.0, 15.0, 19.0]
+
+def test_bar_data_passes_small_frames_through():
+    df = pd.DataFrame({"v": [1, 2, 3], "w": [4, 5, 6]})
+    assert _bar_data(df, "v").equals(df[["v"]])
+
+def test_charts_are_cached_and_leave_no_figures(monkeypatch):
+    monkeypatch.setattr(chart_pipeline, "MAX_SCATTER_POINTS", 500)
+    df = pd.DataFrame({"a": np.random.default_rng(1).normal(size=3_000), "b": np.arange(3_000)})
+    figures = plt.get_fignums()
+    for chart_type in CHART_TYPES:
+        columns = ["a", "b"] if chart_type in ("Line Chart", "Scatter Plot") else ["a"]
+        chart = render_chart(df, "digest", chart_type, columns)
+        assert chart["rows"] == 3_000
+        assert render_chart(df, "digest", chart_type, columns) is chart
+        if chart["kind"] == "image":
+            assert chart["png"].startswith(b"\x89PNG")
+    assert plt.get_fignums() == figures
+    assert chart_pipeline.get_chart_cache().stats()["hits"] == len(CHART_TYPES)
+    with pytest.raises(ValueError):
+        render_chart(df, "digest", "Pie Chart", ["a"])
+
+def test_chart_cache_drops_the_least_recently_used():
+    cache = ChartCache(max_charts=2)
+    cache.put(("a",), {"n": 1})
+    cache.put(("b",), {"n": 2})
+    cache.get(("a",))
+    cache.put(("c",), {"n": 3})
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == {"n": 1} and cache.get(("c",)) == {"n": 3}
+
+def test_rerun_check_finds_no_open_figures(sales_db):
+    from chart_rerun_check import run_check
+    result = run_check(reruns=8, rows=3_000, every=4)
+    assert [sample["rerun"] for sample in result["samples"]] == [4, 8]
+    assert result["figures"] == [] and result["exceptions"] == [] and result["errors"] == []
+    assert result["cache"]["hits"] > 0
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+
+import database_tools
+from column_stats import get_column_stats
+from database_tools import get_database_version, get_schema_version, init_database
+
+def test_reading_stats_never_writes(sales_db):
+    schema_version, stat = get_schema_version(), os.stat(sales_db)
+    version = get_database_version()
+    stats = get_column_stats(sales_db)
+    assert stats["customers"]["customer_id"]["distinct"] == 5
+    assert get_schema_version() == schema_version
+    assert os.stat(sales_db).st_mtime_ns == stat.st_mtime_ns
+    assert get_database_version() == version
+
+def test_init_analyzes_once(sales_db):
+    with sqlite3.connect(sales_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    schema_version = get_schema_version()
+    init_database()
+    assert get_schema_version() == schema_version
+
+def test_version_follows_commits_not_mtime(sales_db):
+    version = get_database_version()
+    os.utime(sales_db, ns=(0, 0))
+    assert get_database_version() == version
+
+    # An in-place update changes neither row counts nor the file size
+    with sqlite3.connect(sales_db) as conn:
+        conn.execute("UPDATE customers SET phone = '555-0000' WHERE customer_id = 1")
+    changed = get_database_version()
+    assert changed != version
+    assert get_database_version() == changed
+
+def test_missing_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_tools, "DB_PATH", str(tmp_path / "none.db"))
+    assert get_database_version() == "missing"
+
+def test_distinct_nulls_and_top_values(sales_db):
+    with sqlite3.connect(sales_db) as conn:
+        conn.execute("UPDATE customers SET phone = NULL WHERE customer_id IN (1, 2)")
+    stats = get_column_stats(sales_db)
+    assert stats["sales"]["customer_id"]["distinct"] == 5
+    assert stats["sales"]["customer_id"]["top_values"][:2] == [[1, 2], [2, 2]]
+    assert (stats["sales"]["total_amount"]["min"], stats["sales"]["total_amount"]["max"]) == (150.0, 1550.0)
+    assert stats["customers"]["phone"]["null_fraction"] == 0.4
+    assert stats["customers"]["email"]["null_fraction"] == 0.0
+    # Unique columns have no top values
+    assert "top_values" not in stats["customers"]["email"]
+    assert stats["sale_items"]["product_id"]["top_values"][0] == [4, 4]
+
+def test_stats_refresh_after_an_in_place_update(sales_db):
+    assert get_column_stats(sales_db)["products"]["stock_quantity"]["max"] == 30
+    with sqlite3.connect(sales_db) as conn:
+        conn.execute("UPDATE products SET stock_quantity = 99 WHERE product_id = 1")
+    stats = get_column_stats(sales_db)
+    assert stats["products"]["stock_quantity"]["max"] == 99
+    assert get_column_stats(sales_db)["products"] is stats["products"]
+
+def test_version_watchers_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_tools, "MAX_VERSION_WATCHERS", 2)
+    paths, versions = [], []
+    for name in "abc":
+        paths.append(str(tmp_path / f"{name}.db"))
+        sqlite3.connect(paths[-1]).close()
+        versions.append(get_database_version(paths[-1]))
+    assert list(database_tools._version_watchers)[-2:] == paths[1:]
+    assert paths[0] not in database_tools._version_watchers
+    # A database that is watched again never repeats a version it had
+    assert get_database_version(paths[0]) != versions[0]
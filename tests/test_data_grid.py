@@ -0,0 +1,91 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_grid import sql_page, frame_page, table_columns
+
+def all_pages(db_path, table, key, keyset, **kwargs):
+    """
+    The key column of every row of a table, page by page, continuing by keyset
+    or jumping by offset
+    """
+    rows, page, after = [], 0, None
+    while True:
+        result = sql_page(db_path, table, page=page, after=after if keyset else None, **kwargs)
+        assert "error" not in result, result
+        assert result["method"] == ("keyset" if keyset and page else "offset")
+        rows += result["data"][key].tolist()
+        if page + 1 >= result["pages"]:
+            return rows
+        page, after = page + 1, result["last_key"]
+
+@pytest.fixture
+def orders_db(tmp_path):
+    """
+    A table with repeated INTEGER values and NULLs in its sort columns
+    """
+    path = str(tmp_path / "orders.db")
+    rng = np.random.default_rng(3)
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE orders (order_id INTEGER PRIMARY KEY, customer_id INTEGER, amount REAL, region TEXT)")
+        conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)", [
+            (i, None if i % 7 == 0 else int(rng.integers(1, 6)), None if i % 5 == 0 else float(rng.integers(0, 20)),
+             ["North", "South", None][i % 3])
+            for i in range(1, 104)
+        ])
+    return path
+
+@pytest.mark.parametrize("sort", [None, "sale_id", "customer_id", "total_amount", "sale_date"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_and_offset_pages_agree_on_the_sales_table(sales_db, sort, descending):
+    kwargs = dict(page_size=2, sort=sort, descending=descending)
+    offset = all_pages(sales_db, "sales", "sale_id", keyset=False, **kwargs)
+    assert sorted(offset) == list(range(1, 8))
+    assert all_pages(sales_db, "sales", "sale_id", keyset=True, **kwargs) == offset
+
+@pytest.mark.parametrize("sort", ["order_id", "customer_id", "amount", "region"])
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("filters", [[], [("region", "!=", "South")]])  # != skips NULLs, as in SQL
+def test_keyset_and_offset_pages_agree_with_ties_and_nulls(orders_db, sort, descending, filters):
+    kwargs = dict(page_size=10, sort=sort, descending=descending, filters=filters)
+    offset = all_pages(orders_db, "orders", "order_id", keyset=False, **kwargs)
+    assert all_pages(orders_db, "orders", "order_id", keyset=True, **kwargs) == offset
+    assert len(set(offset)) == len(offset) == (103 if not filters else 34)
+
+def test_last_key_holds_plain_python_values(sales_db):
+    result = sql_page(sales_db, "sales", page_size=3, sort="customer_id")
+    value, rowid = result["last_key"]
+    assert type(value) is int and type(rowid) is int
+
+def test_filters_sorting_and_errors(sales_db):
+    result = sql_page(sales_db, "sales", sort="total_amount", descending=True,
+                      filters=[("total_amount", ">=", "100"), ("sale_date", "starts with", "2023")])
+    amounts = result["data"]["total_amount"].tolist()
+    assert amounts == [1550.0, 1200.0, 950.0, 500.0, 350.0, 300.0, 150.0]
+    assert result["total_rows"] == 7
+    above = sql_page(sales_db, "sales", sort="total_amount", filters=[("total_amount", ">", "400")])
+    assert above["data"]["total_amount"].tolist() == [500.0, 950.0, 1200.0, 1550.0]
+    assert sql_page(sales_db, "sales", filters=[("sale_date", "starts with", "2024")])["total_rows"] == 0
+    assert "Unknown column" in sql_page(sales_db, "sales", sort="nope")["error"]
+    assert "Unknown filter operator" in sql_page(sales_db, "sales", filters=[("sale_id", "~", 1)])["error"]
+    assert "No such table" in sql_page(sales_db, "nope")["error"]
+    assert table_columns(sales_db, "customers")[:2] == ["customer_id", "name"]
+
+def test_page_numbers_and_sizes_are_clamped(sales_db):
+    result = sql_page(sales_db, "sales", page=99, page_size=3)
+    assert (result["page"], result["pages"], len(result["data"])) == (2, 3, 1)
+    assert sql_page(sales_db, "sales", page_size=0)["page_size"] == 1
+
+def test_frame_pages_match_the_sql_semantics():
+    df = pd.DataFrame({"n": [3, None, 1, 3, 2], "s": ["b", "a", None, "c", "a"]})
+    ascending = frame_page(df, "df", sort="n", page_size=10)["data"]
+    assert ascending.index.tolist() == [1, 2, 4, 0, 3]
+    descending = frame_page(df, "df", sort="n", descending=True, page_size=10)["data"]
+    assert descending.index.tolist() == [3, 0, 4, 2, 1]
+    filtered = frame_page(df, "df", filters=[("s", "!=", "a")], page_size=10)
+    assert filtered["data"].index.tolist() == [0, 3] and filtered["total_rows"] == 2
+    page = frame_page(df, "df", page=1, page_size=2)
+    assert page["method"] == "slice" and page["data"].index.tolist() == [2, 3]
+    assert "Unknown column" in frame_page(df, "df", sort="x")["error"]
@@ -0,0 +1,98 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_profile import DataProfiler, ColumnStats, profile_csv, read_csv_compact, profile_table, _smallest_int
+
+def profile_of(df: pd.DataFrame, chunk_rows: int = 1000, **kwargs):
+    profiler = DataProfiler(**kwargs)
+    for start in range(0, len(df), chunk_rows):
+        profiler.update(df.iloc[start:start + chunk_rows].copy())
+    return profiler.result()
+
+def stats_of(values) -> ColumnStats:
+    stats = ColumnStats()
+    stats.update(pd.Series(values))
+    return stats
+
+def test_float32_only_when_every_value_round_trips_exactly():
+    assert stats_of([0.5, 1.25, -3.0e9, 7.75]).compact_dtype() == "float32"
+    # 0.1 is not exactly representable in float32, and 16777217.5 loses its fraction
+    assert stats_of([0.5, 0.1]).compact_dtype() == "float64"
+    assert stats_of([16777217.5]).compact_dtype() == "float64"
+    # A relative error below 1e-6 is still a changed value
+    assert stats_of([1.0 + 2 ** -30]).compact_dtype() == "float64"
+
+def test_compact_float32_keeps_the_values(tmp_path):
+    path = tmp_path / "prices.csv"
+    pd.DataFrame({"price": [0.1, 19.99, 2.5] * 100}).to_csv(path, index=False)
+    profile = profile_csv(str(path))
+    df = read_csv_compact(str(path), profile)
+    assert df["price"].tolist() == pd.read_csv(path)["price"].tolist()
+
+@pytest.mark.parametrize("low, high, nullable, expected", [
+    (0, 255, False, "uint8"),
+    (-1, 100, False, "int8"),
+    (0, 70000, False, "uint32"),
+    (-40000, 5, True, "Int32"),
+    (0, 10, True, "UInt8"),
+    (-2 ** 40, 2 ** 40, False, "int64"),
+])
+def test_smallest_int(low, high, nullable, expected):
+    assert _smallest_int(low, high, nullable) == expected
+
+def test_mean_and_variance_merge_exactly_across_chunks():
+    values = np.random.default_rng(1).normal(50, 10, 5000)
+    column = profile_of(pd.DataFrame({"x": values}), chunk_rows=333)["columns"]["x"]
+    assert column["mean"] == pytest.approx(values.mean(), rel=1e-12)
+    assert column["std"] == pytest.approx(values.std(ddof=1), rel=1e-9)
+    assert (column["min"], column["max"]) == (values.min(), values.max())
+
+def test_compact_dtypes():
+    df = pd.DataFrame({
+        "id": np.arange(2000),
+        "qty": [1.0, None] * 1000,
+        "flag": [True, False] * 1000,
+        "region": ["North", "South", "East", "West"] * 500,
+        "note": [f"note {i}" for i in range(2000)],
+    })
+    profile = profile_of(df, chunk_rows=300)
+    assert profile["rows"] == 2000
+    assert profile["dtypes"] == {"id": "uint16", "qty": "UInt8", "flag": "bool", "region": "category"}
+    assert profile["columns"]["qty"]["nulls"] == 1000
+    assert profile["memory"]["compact_bytes"] < profile["memory"]["original_bytes"]
+
+def test_distinct_counts_are_exact_then_estimated():
+    small = profile_of(pd.DataFrame({"x": np.arange(500) % 100}))["columns"]["x"]
+    assert small["distinct"] == 100 and small["distinct_exact"]
+    large = profile_of(pd.DataFrame({"x": np.arange(50_000)}), chunk_rows=7000)["columns"]["x"]
+    assert not large["distinct_exact"]
+    assert large["distinct"] == pytest.approx(50_000, rel=0.1)
+
+def test_reservoir_sample_is_bounded_and_spans_the_file():
+    df = pd.DataFrame({"x": np.arange(20_000)})
+    profile = profile_of(df, chunk_rows=1500, reservoir_rows=1000)
+    assert profile["sample_rows"] == 1000
+    quantiles = profile["columns"]["x"]["quantiles"]
+    assert quantiles["p50"] == pytest.approx(10_000, rel=0.1)
+    assert profile["head"][0] == {"x": 0}
+
+def test_profile_table_and_compact_read_of_an_upload():
+    data = "region,amount,when\n" + "".join(f"{'NS'[i % 2]},{i},2024-01-{i % 28 + 1:02d}\n" for i in range(300))
+    profile = profile_csv(io.BytesIO(data.encode()), chunksize=64)
+    df = read_csv_compact(io.BytesIO(data.encode()), profile)
+    assert str(df["amount"].dtype) == "uint16"
+    assert isinstance(df["region"].dtype, pd.CategoricalDtype)
+    table = {row["column"]: row for row in profile_table(profile)}
+    assert table["amount"]["type"] == "uint16"
+    assert table["region"]["top"] == "N, S"
+
+def test_compact_read_falls_back_when_a_dtype_does_not_fit():
+    # Say the profile only saw numbers, but the file has a value that isn't one
+    data = b"n,m\n1,5\n2,6\nx,7\n"
+    profile = {"dtypes": {"n": "uint8", "m": "uint8"}}
+    df = read_csv_compact(io.BytesIO(data), profile)
+    assert df["n"].tolist() == ["1", "2", "x"]
+    assert str(df["m"].dtype) == "uint8"
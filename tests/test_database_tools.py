@@ -0,0 +1,114 @@
+import re
+import sqlite3
+
+import pytest
+
+import database_tools
+import sql_agent_tools
+from database_tools import get_schema_digest, get_cached_schema, init_database, execute_sql_batch
+
+def digest_lines():
+    return {line.split(" (")[0]: line for line in get_schema_digest().splitlines()}
+
+def test_digest_lists_tables_columns_and_keys(sales_db):
+    lines = digest_lines()
+    assert set(lines) == {"customers", "products", "sales", "sale_items"}
+    assert lines["sales"] == ("sales (7 rows): sale_id INTEGER PK, customer_id INTEGER -> customers.customer_id, "
+                              "sale_date TEXT NOT NULL, total_amount REAL NOT NULL")
+    assert lines["customers"].startswith("customers (5 rows): customer_id INTEGER PK, name TEXT NOT NULL")
+
+def test_digest_follows_schema_changes(sales_db):
+    get_schema_digest()
+    with sqlite3.connect(sales_db) as conn:
+        conn.execute("ALTER TABLE customers ADD COLUMN segment TEXT")
+        conn.execute("CREATE TABLE regions (region_id INTEGER PRIMARY KEY, name TEXT)")
+    lines = digest_lines()
+    assert lines["customers"].endswith("segment TEXT")
+    assert lines["regions"] == "regions (0 rows): region_id INTEGER PK, name TEXT"
+    assert [col["name"] for col in get_cached_schema()["customers"]][-1] == "segment"
+
+def test_digest_row_counts_follow_inserts(sales_db):
+    assert digest_lines()["sales"].startswith("sales (7 rows)")
+    with sqlite3.connect(sales_db) as conn:
+        conn.execute("INSERT INTO sales (customer_id, sale_date, total_amount) VALUES (1, '2024-01-01', 10)")
+    assert digest_lines()["sales"].startswith("sales (8 rows)")
+
+def test_caches_are_per_database(sales_db, tmp_path, monkeypatch):
+    with sqlite3.connect(sales_db) as conn:
+        conn.execute("CREATE TABLE scratch (x)")
+        conn.execute("DROP TABLE scratch")
+    version = database_tools.get_schema_version()
+    get_cached_schema()
+    get_schema_digest()
+    # A second database at the same schema version, with different tables
+    other = str(tmp_path / "other.db")
+    monkeypatch.setattr(database_tools, "DB_PATH", other)
+    init_database()
+    with sqlite3.connect(other) as conn:
+        conn.execute("DROP TABLE sale_items")
+        conn.execute("CREATE TABLE notes (note_id INTEGER PRIMARY KEY)")
+    assert database_tools.get_schema_version() == version
+    assert "sale_items" not in get_cached_schema() and "notes" in get_cached_schema()
+    assert "notes" in digest_lines() and "sale_items" not in digest_lines()
+
+@pytest.mark.parametrize("journal_mode", ["delete", "wal"])
+def test_batch_statements_share_one_snapshot(sales_db, monkeypatch, journal_mode):
+    with sqlite3.connect(sales_db) as conn:
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    run_read_query = database_tools._run_read_query
+    writes = []
+
+    def write_between_statements(conn, query):
+        results = run_read_query(conn, query)
+        if not writes:
+            # Another session writes after the first statement; with a rollback
+            # journal it has to wait for the batch, with WAL it commits at once
+            try:
+                with sqlite3.connect(sales_db, timeout=0) as other:
+                    other.execute("INSERT INTO sales (customer_id, sale_date, total_amount) VALUES (1, '2024-01-01', 5)")
+                writes.append("committed")
+            except sqlite3.OperationalError as e:
+                writes.append(str(e))
+        return results
+
+    monkeypatch.setattr(database_tools, "_run_read_query", write_between_statements)
+    batch = execute_sql_batch(["SELECT COUNT(*) AS n FROM sales", "SELECT COUNT(*) AS n FROM sales"])
+    assert writes == (["committed"] if journal_mode == "wal" else ["database is locked"])
+    assert [statement["results"] for statement in batch["statements"]] == [[{"n": 7}], [{"n": 7}]]
+    # The next batch sees the write
+    if journal_mode == "wal":
+        assert execute_sql_batch(["SELECT COUNT(*) AS n FROM sales"])["statements"][0]["results"] == [{"n": 8}]
+
+def test_batch_reports_timings_and_row_counts(sales_db):
+    batch = execute_sql_batch(["SELECT * FROM sales", "SELECT COUNT(*) AS n FROM customers",
+                               "SELECT * FROM sales WHERE sale_id > 100"], page_size=5)
+    statements = batch["statements"]
+    assert all(isinstance(statement["elapsed_ms"], float) and statement["elapsed_ms"] >= 0 for statement in statements)
+    assert batch["total_ms"] >= sum(statement["elapsed_ms"] for statement in statements)
+    assert [(len(s["results"]), s["total_rows"]) for s in statements] == [(5, 7), (1, 1), (0, 0)]
+    output = sql_agent_tools.execute_sql_batch.invoke({"sql_queries": ["SELECT * FROM customers", "SELECT 1 AS one"]})
+    assert re.findall(r"Statement \d \([\d.]+ ms\)", output) and len(re.findall(r"Statement \d", output)) == 2
+    assert "Query Results (5 rows):" in output and "Query Results (1 rows):" in output
+    assert re.search(r"Batch total: [\d.]+ ms$", output)
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM sales",
+    "UPDATE sales SET total_amount = 0",
+    "INSERT INTO sales (customer_id, sale_date, total_amount) VALUES (1, '2024-01-01', 5)",
+    "WITH t AS (SELECT 1) DELETE FROM sales",
+    "DROP TABLE sales",
+])
+def test_batch_rejects_writes(sales_db, sql):
+    batch = execute_sql_batch(["SELECT COUNT(*) AS n FROM sales", sql])
+    assert batch["statements"][0]["results"] == [{"n": 7}]
+    assert "Only read-only SELECT queries" in batch["statements"][1]["results"][0]["error"]
+    with sqlite3.connect(sales_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 7
+        assert conn.execute("SELECT MIN(total_amount) FROM sales").fetchone()[0] == 150.0
+
+def test_batch_connections_cannot_write(sales_db):
+    # query_only holds even for a write the gate let through
+    conn = database_tools._acquire_read_connection()
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        conn.execute("DELETE FROM sales")
+    database_tools._release_read_connection(conn)
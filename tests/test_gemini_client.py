@@ -0,0 +1,35 @@
+import threading
+
+import gemini_client
+from fake_llm import FakeGenaiClient
+from gemini_client import GeminiClient, TokenBucket
+
+def test_zero_rate_means_unlimited(monkeypatch):
+    bucket = TokenBucket(0, burst=1)
+    assert sum(bucket.acquire() for _ in range(100)) == 0.0
+    monkeypatch.setattr(gemini_client, "REQUESTS_PER_MINUTE", 0)
+    assert gemini_client.get_rate_limiter("unlimited-key", "model").acquire() == 0.0
+
+def test_rate_is_enforced():
+    bucket = TokenBucket(100, burst=1)
+    bucket.acquire()
+    assert bucket.acquire() > 0
+
+def test_coalesced_callers_get_their_own_copy():
+    client = GeminiClient("coalesce-key", raw=FakeGenaiClient(script=["Hello there"], latency=0.3))
+    responses = [None, None]
+
+    def ask(index):
+        responses[index] = client.models.generate_content(model="m", contents="same question")
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.raw.stats()["calls"] == 1
+    assert responses[0] is not responses[1]
+    assert responses[0].text == responses[1].text == "Hello there"
+    # Changing one caller's response leaves the other's alone
+    responses[0].candidates[0].content.parts[0].text = "changed"
+    assert responses[1].text == "Hello there"
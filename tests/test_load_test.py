@@ -0,0 +1,40 @@
+import sqlite3
+import sys
+
+import pytest
+import streamlit
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import app_test
+
+import load_test
+from assistant_service import get_sql_service
+
+def test_importing_patches_nothing(monkeypatch):
+    # The version check and the patches only happen when the harness runs
+    monkeypatch.setattr(streamlit, "__version__", "1.28.0")
+    monkeypatch.delitem(sys.modules, "load_test")
+    import load_test as reloaded
+    assert reloaded.TESTED_STREAMLIT == "1.66"
+    assert sqlite3.connect.__module__ in ("sqlite3", "_sqlite3")
+
+def test_refuses_other_streamlit_releases(monkeypatch):
+    load_test.check_streamlit_version()
+    monkeypatch.setattr(streamlit, "__version__", "1.28.0")
+    with pytest.raises(SystemExit, match="needs streamlit 1.66"):
+        load_test.check_streamlit_version()
+    monkeypatch.setattr(sys, "argv", ["load_test.py", "--levels", "1"])
+    with pytest.raises(SystemExit, match="requirements-dev.txt"):
+        load_test.main()
+
+def test_patches_are_undone_after_the_run(sales_db):
+    connect, service = sqlite3.connect, get_sql_service()
+    llm_factory, runtime, app_test_runtime = service.llm_factory, Runtime._instance, app_test.Runtime
+    with load_test.install_instrumentation(0, 0), load_test.share_app_test_runtime():
+        assert sqlite3.connect is not connect and service.llm_factory is not llm_factory
+        assert app_test.Runtime is load_test._RuntimeSlot and Runtime._instance is not runtime
+        with sqlite3.connect(sales_db) as conn:
+            conn.execute("SELECT 1")
+        assert load_test.lock_stats.statements >= 1
+    assert sqlite3.connect is connect and service.llm_factory is llm_factory
+    assert Runtime._instance is runtime and app_test.Runtime is app_test_runtime
+    assert streamlit.config.get_option("global.appTest") is False
@@ -0,0 +1,55 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+import model_router
+from model_router import classify, route, chat_messages, RouterStats, ROUTE_CHAT, ROUTE_AGENT
+
+@pytest.mark.parametrize("text", [
+    "hi", "Hello there!", "thanks, bye", "Thank you so much 🙏", "ok", "got it.", "who are you?", "  ",
+])
+def test_small_talk_goes_to_the_light_model(text):
+    assert classify(text)["route"] == ROUTE_CHAT
+
+@pytest.mark.parametrize("text", [
+    "hi, show me the top customers",
+    "thanks! what about 2024?",
+    "How many orders came from the North region?",
+    "can you plot it",
+    "what's the weather like",
+    "hello " * 20,
+])
+def test_anything_else_goes_to_the_agent(text):
+    assert classify(text)["route"] == ROUTE_AGENT
+
+def test_route_names_the_model_and_can_be_disabled():
+    assert route("hi")["model"] == model_router.LIGHT_MODEL
+    assert route("total sales")["model"] == model_router.AGENT_MODEL
+    assert route("hi", enabled=False) == {"route": ROUTE_AGENT, "reason": "router disabled",
+                                          "model": model_router.AGENT_MODEL}
+
+def test_chat_messages_leave_out_tool_traffic():
+    history = [HumanMessage(content=f"question {i}") for i in range(10)] + [
+        AIMessage(content="", tool_calls=[{"name": "text_to_sql", "args": {}, "id": "1"}]),
+        ToolMessage(content="rows", tool_call_id="1"),
+        AIMessage(content="the answer"),
+    ]
+    messages = chat_messages(history, "thanks")
+    assert isinstance(messages[0], SystemMessage)
+    assert [msg.content for msg in messages[1:]] == (
+        [f"question {i}" for i in range(5, 10)] + ["the answer", "thanks"])
+
+def test_stats_compare_chat_turns_with_the_average_agent_turn():
+    stats = RouterStats()
+    first_chat = stats.record(ROUTE_CHAT, 50, model_router.LIGHT_MODEL, 1000, 100)
+    # Before any agent turn only the price difference for the same tokens counts
+    assert first_chat["saved_ms"] is None and first_chat["saved_cost_usd"] >= 0
+    stats.record(ROUTE_AGENT, 3000, model_router.AGENT_MODEL, 5000, 500)
+    stats.record(ROUTE_AGENT, 1000, model_router.AGENT_MODEL, 5000, 500)
+    chat = stats.record(ROUTE_CHAT, 100, model_router.LIGHT_MODEL, 1000, 100)
+    assert chat["saved_ms"] == 1900.0
+    assert chat["saved_cost_usd"] > 0
+    summary = stats.stats()
+    assert summary["routes"][ROUTE_AGENT]["turns"] == 2
+    assert summary["routes"][ROUTE_AGENT]["mean_ms"] == 2000.0
+    assert summary["routes"][ROUTE_CHAT]["turns"] == 2
+    assert summary["saved_ms"] == 1900.0
@@ -0,0 +1,52 @@
+import pytest
+
+from database_tools import text_to_sql
+from result_format import encode_rows, estimate_tokens, format_query_result, summarize_numeric_columns, _format_value
+
+@pytest.mark.parametrize("value, expected", [
+    (0.0042, "0.0042"),
+    (0.005, "0.005"),
+    (-0.000123456789, "-0.000123457"),
+    (2.5e-9, "2.5e-09"),
+    (1 / 3, "0.333333"),
+    (1299.99, "1299.99"),
+    (12345.678, "12345.7"),
+    # Integer digits are never rounded away (up to the 17 a double holds)
+    (1234567.891, "1234568"),
+    (1.5e25, "1.5e+25"),
+    (150.0, "150"),
+    (-42.0, "-42"),
+    (2.0 ** 53 - 1, "9007199254740991"),
+    (10 ** 20, "100000000000000000000"),
+    (float("nan"), "nan"),
+    (None, "NULL"),
+    ("a\tb\nc", "a b c"),
+])
+def test_format_value(value, expected):
+    assert _format_value(value, 6) == expected
+
+def test_small_floats_survive_encoding():
+    rows = [{"rate": 0.0042, "share": 0.005, "n": 3}, {"rate": 0.00001, "share": 0.5, "n": 4}]
+    assert encode_rows(rows) == "rate\tshare\tn\n0.0042\t0.005\t3\n1e-05\t0.5\t4"
+
+def test_summary_keeps_small_and_large_values():
+    rows = [{"rate": 0.001 * (i + 1), "amount": 1_000_000.25 * (i + 1), "name": f"row {i}"} for i in range(30)]
+    summary = summarize_numeric_columns(rows)
+    assert list(summary) == ["rate", "amount"]
+    assert summary["rate"] == {"count": 30, "min": 0.001, "max": 0.03, "mean": 0.0155}
+    assert (summary["amount"]["min"], summary["amount"]["max"]) == (1_000_000.25, 30_000_007.5)
+    assert summary["amount"]["mean"] == 15500004.0
+    block = format_query_result({"query": "SELECT 1", "results": rows}).splitlines()[-1]
+    assert block == ("Summary: rate count=30 min=0.001 max=0.03 mean=0.0155; "
+                     "amount count=30 min=1000000 max=30000008 mean=15500004")
+
+def test_compact_output_is_smaller_than_the_old_repr(sales_db):
+    query = ("SELECT s.sale_id, c.name, s.sale_date, si.quantity, si.price_per_unit * 1.0825 AS price_with_tax "
+             "FROM sales s JOIN customers c ON c.customer_id = s.customer_id JOIN sale_items si ON si.sale_id = s.sale_id")
+    result = text_to_sql(query)
+    assert len(result["results"]) == 11
+    old = f"```sql\n{query}\n```\n\nQuery Results:\n{result}"
+    new = format_query_result(result)
+    assert "Query Results (11 rows):" in new and "1299" in new
+    assert len(new) < 0.6 * len(old)
+    assert estimate_tokens(new) < 0.6 * estimate_tokens(old)
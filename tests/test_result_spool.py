@@ -0,0 +1,65 @@
+import re
+
+import pytest
+
+import result_spool
+from result_spool import fetch_more, spool_results, spool_session
+
+from test_assistant_service import service_for
+
+ROWS = [{"i": i} for i in range(120)]
+
+@pytest.fixture(autouse=True)
+def spool_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_spool, "SPOOL_PATH", str(tmp_path / "spool.db"))
+    monkeypatch.setattr(result_spool, "_spool_ready", False)
+
+def test_small_results_are_not_spooled():
+    assert spool_results(ROWS[:10], page_size=50) == {"results": ROWS[:10], "total_rows": 10, "next_token": None}
+
+def test_pages_through_a_spool():
+    page = spool_results(ROWS, page_size=50)
+    assert page["results"] == ROWS[:50]
+    rows = list(page["results"])
+    while page["next_token"]:
+        page = fetch_more(page["next_token"], 50)
+        rows += page["results"]
+    assert rows == ROWS
+
+@pytest.mark.parametrize("n, expected", [(-1, 1), (0, 1), (10, 10), (10_000, result_spool.MAX_FETCH_ROWS), ("7", 7)])
+def test_row_count_is_clamped(n, expected):
+    token = spool_results(ROWS, page_size=5)["next_token"]
+    assert len(fetch_more(token, n)["results"]) == expected
+
+def test_invalid_token_or_count():
+    assert "error" in fetch_more("nonsense")
+    token = spool_results(ROWS, page_size=5)["next_token"]
+    assert "error" in fetch_more(token, "lots")
+
+def test_tokens_are_bound_to_their_session():
+    with spool_session("a"):
+        token = spool_results(ROWS, page_size=5)["next_token"]
+        assert fetch_more(token)["results"][0] == {"i": 5}
+    with spool_session("b"):
+        assert "error" in fetch_more(token)
+    assert "error" in fetch_more(token)
+
+def test_agent_fetches_rows_of_its_own_session(sales_db):
+    seen = []
+
+    def fetch_next(messages):
+        token = re.search(r'fetch_more\(token="([^"]+)"\)', messages[-1].content).group(1)
+        seen.append(token)
+        return {"tool_calls": [{"name": "fetch_more", "args": {"token": token, "n": 10}}]}
+
+    def answer(messages):
+        seen.append(messages[-1].content)
+        return "Done."
+
+    numbers = "SELECT i FROM (WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 120) SELECT i FROM n)"
+    service = service_for([{"tool_calls": [{"name": "execute_sql", "args": {"sql_query": numbers}}]}, fetch_next, answer])
+    service.ask("a", "List the numbers up to 120", "key", phrase_with_llm=False)
+    token, page = seen
+    assert "error" not in page.lower() and "51" in page
+    with spool_session("b"):
+        assert "error" in fetch_more(token)
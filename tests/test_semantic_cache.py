@@ -0,0 +1,81 @@
+import pytest
+
+from semantic_cache import SemanticCache, extract_literals, is_follow_up
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Show the top 5 customers by revenue", "Show the top 3 customers by revenue"),
+    ("What were total sales in 2024?", "What were total sales in 2023?"),
+    ("List sales with total_amount >100", "List sales with total_amount >500"),
+    ("Which products sold less than last year?", "Which products sold more than last year?"),
+    ("Show the top customers by revenue", "Show the bottom customers by revenue"),
+    ("How much did \"John Doe\" spend?", "How much did \"Jane Smith\" spend?"),
+])
+def test_different_literals_never_hit(stored, asked):
+    cache = SemanticCache()
+    cache.store(stored, "answer", "SELECT 1", "v1")
+    assert cache.lookup(asked, "v1") is None
+
+def test_paraphrase_with_same_literals_hits():
+    cache = SemanticCache()
+    cache.store("Show the top 5 customers by revenue", "answer", "SELECT 1", "v1")
+    hit = cache.lookup("show me the top 5 customers by revenue", "v1")
+    assert hit is not None and hit["kind"] == "answer"
+
+def test_changed_data_returns_sql_only():
+    cache = SemanticCache()
+    cache.store("Show the top 5 customers by revenue", "answer", "SELECT 1", "v1")
+    assert cache.lookup("Show the top 5 customers by revenue", "v2")["kind"] == "sql"
+
+def test_extract_literals():
+    assert extract_literals("Top 5 customers in 2024") == extract_literals("show the top 5 customers of 2024")
+    assert "op:>" in extract_literals("orders >100")
+    assert "name:jane" in extract_literals("Show sales for Jane")
+
+@pytest.mark.parametrize("asked", [
+    "Which customer spent the most?",
+    "who spent the most money",
+    "Who has spent the most?",
+])
+def test_paraphrases_of_a_ranking_hit(asked):
+    cache = SemanticCache()
+    cache.store("Who spent the most?", "answer", "SELECT 1", "v1")
+    assert cache.lookup(asked, "v1") is not None
+
+def test_superlatives_match_by_direction():
+    cache = SemanticCache()
+    cache.store("Show the top customers", "answer", "SELECT 1", "v1")
+    assert cache.lookup("Biggest customers", "v1") is not None
+    assert cache.lookup("Show the smallest customers", "v1") is None
+    assert extract_literals("most sales") == extract_literals("highest sales") != extract_literals("least sales")
+
+@pytest.mark.parametrize("asked, hit", [
+    ("show sales for jane", True),
+    ("Show sales for JANE", True),
+    ("Show sales for Bob", False),
+    ("show sales for bob", False),
+])
+def test_names_match_in_any_case(asked, hit):
+    cache = SemanticCache()
+    cache.store("Show sales for Jane", "answer", "SELECT 1", "v1")
+    assert (cache.lookup(asked, "v1") is not None) is hit
+
+def test_different_questions_with_the_same_direction_miss():
+    cache = SemanticCache()
+    cache.store("Who spent the most?", "answer", "SELECT 1", "v1")
+    assert cache.lookup("Which product sold the most?", "v1") is None
+    assert cache.lookup("Who spent the least?", "v1") is None
+
+@pytest.mark.parametrize("question, expected", [
+    ("What about Jane?", True),
+    ("And in 2023?", True),
+    ("and their emails?", True),
+    ("Same for 2023", True),
+    ("Show them by month", True),
+    ("What is their total?", True),
+    ("What were total sales in 2023?", False),
+    ("Top 5 customers by total spent", False),
+    ("List all customers and their emails", False),
+    ("Which products have their stock below 10?", False),
+])
+def test_is_follow_up(question, expected):
+    assert is_follow_up(question) is expected
@@ -0,0 +1,46 @@
+from sql_plan_cache import SQLPlanCache, is_empty_result
+
+from test_assistant_service import TOP_CUSTOMERS, agent_step, service_for
+
+def test_rebinds_a_literal_that_appears_once():
+    cache = SQLPlanCache()
+    cache.learn("Top 5 customers by total spent", TOP_CUSTOMERS.format(n=5))
+    plan = cache.match("Top 3 customers by total spent")
+    assert plan["sql"] == TOP_CUSTOMERS.format(n=3)
+
+def test_repeated_literals_are_not_slotted():
+    cache = SQLPlanCache()
+    # 5 plays two roles in the SQL, so re-binding it would change both
+    cache.learn("Top 5 products with more than 5 sales",
+                "SELECT product_id FROM sales GROUP BY product_id HAVING COUNT(*) > 5 LIMIT 5")
+    assert cache.match("Top 3 products with more than 5 sales") is None
+    assert cache.match("Top 3 products with more than 3 sales") is None
+
+    # Once in the question, twice in the SQL
+    cache.learn("Sales of quantity 2", "SELECT * FROM sales WHERE quantity = 2 LIMIT 2")
+    assert cache.match("Sales of quantity 4") is None
+
+def test_repeated_string_literal_is_not_slotted():
+    cache = SQLPlanCache()
+    cache.learn("Sales in North for North customers",
+                "SELECT * FROM sales WHERE region = 'North'")
+    assert cache.match("Sales in South for North customers") is None
+
+def test_follow_ups_are_not_learned():
+    cache = SQLPlanCache()
+    assert cache.learn("What about Jane?", "SELECT * FROM customers WHERE name LIKE '%Jane%'") is None
+    assert cache.stats()["plans"] == 0
+
+def test_is_empty_result():
+    assert is_empty_result([])
+    assert is_empty_result([{"total": None}])
+    assert not is_empty_result([{"total": 0}])
+    assert not is_empty_result([{"total": None, "n": 0}])
+
+def test_all_null_aggregate_falls_back_to_agent(sales_db):
+    total_for = "SELECT SUM(s.total_amount) AS total FROM sales s JOIN customers c ON c.customer_id = s.customer_id WHERE c.name = '{}'"
+    script = agent_step(total_for.format("John Doe")) + agent_step(total_for.format("Nobody"))
+    service = service_for(script)
+    assert service.ask("a", 'Total spent by "John Doe"', "key", phrase_with_llm=False)["source"] == "agent"
+    # The re-bound plan finds only a NULL sum: the agent answers instead
+    assert service.ask("b", 'Total spent by "Nobody"', "key", phrase_with_llm=False)["source"] == "agent"
@@ -0,0 +1,115 @@
+import importlib
+import os
+import sqlite3
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import database_tools
+import sql_profiler
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_comprehensive_chatbot.py")
+
+def profile_slow_statement(profiler):
+    conn = sqlite3.connect(":memory:")
+    with profiler.profile(conn, "SELECT 1") as profile:
+        profile.rows = len(conn.execute("SELECT 1").fetchall())
+    conn.close()
+
+def test_slow_query_log_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("SLOW_QUERY_LOG", raising=False)
+    try:
+        importlib.reload(sql_profiler)
+        assert sql_profiler.SLOW_QUERY_LOG is None
+        profile_slow_statement(sql_profiler.SQLProfiler(enabled=True, slow_ms=0))
+        assert os.listdir(tmp_path) == []
+        assert sql_profiler.load_slow_log() == []
+    finally:
+        monkeypatch.undo()
+        importlib.reload(sql_profiler)
+
+def test_slow_queries_are_logged_when_a_file_is_set(tmp_path):
+    path = str(tmp_path / "slow.jsonl")
+    profiler = sql_profiler.SQLProfiler(enabled=True, slow_ms=0, log_path=path)
+    profile_slow_statement(profiler)
+    entries = sql_profiler.load_slow_log(path)
+    assert [entry["fingerprint"] for entry in entries] == ["select ?"]
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_app_sessions_leave_the_profiler_alone(sales_db, enabled):
+    sql_profiler.enable() if enabled else sql_profiler.disable()
+    try:
+        at = AppTest.from_file(APP, default_timeout=60).run()
+        at.sidebar.text_input[0].input("test-key").run()
+        assert not at.exception
+        assert not [toggle for toggle in at.toggle if toggle.label == "Profile SQL statements"]
+        assert sql_profiler.is_enabled() is enabled
+    finally:
+        sql_profiler.disable()
+
+def record(profiler, conn, sql, elapsed_ms, rows=1):
+    profile = sql_profiler.StatementProfile(sql)
+    profile.elapsed_ms, profile.rows = elapsed_ms, rows
+    profiler._record(conn, profile)
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM sales WHERE id IN (1, 2) AND region = 'North'",
+     "select * from sales where id in (?+) and region = ?"),
+    ("select *  from sales\n where id in (7) and region = 'O''Brien';", "select * from sales where id in (?+) and region = ?"),
+    ("SELECT total_amount * 1.0825 FROM sales WHERE sale_date > '2023-01-01' LIMIT 10",
+     "select total_amount * ? from sales where sale_date > ? limit ?"),
+    # Digits inside identifiers stay
+    ("SELECT col2 FROM t1 WHERE x IN ('a','b' , 'c')", "select col2 from t1 where x in (?+)"),
+])
+def test_fingerprint_replaces_literals_and_in_lists(sql, expected):
+    assert sql_profiler.fingerprint(sql) == expected
+
+def test_statements_add_up_per_fingerprint():
+    profiler = sql_profiler.SQLProfiler(enabled=True, slow_ms=1000)
+    conn = sqlite3.connect(":memory:")
+    record(profiler, conn, "SELECT 1 WHERE 2 IN (3, 4)", 5.0)
+    record(profiler, conn, "SELECT 9 WHERE 8 IN (7)", 12.5, rows=0)
+    record(profiler, conn, "SELECT 5 WHERE 6 IN (7, 8, 9)", 2.5, rows=4)
+    [entry] = profiler.top_queries()
+    assert entry["fingerprint"] == "select ? where ? in (?+)"
+    assert (entry["calls"], entry["total_ms"], entry["max_ms"], entry["mean_ms"]) == (3, 20.0, 12.5, 6.667)
+    assert (entry["rows"], entry["slow"], entry["errors"]) == (5, 0, 0)
+    # The slowest variant is the example
+    assert entry["example"] == "SELECT 9 WHERE 8 IN (7)"
+    assert entry["plan"] is not None
+    record(profiler, conn, "SELECT 0 WHERE 0 IN (0)", 12.5)
+    assert profiler.top_queries()[0]["example"] == "SELECT 0 WHERE 0 IN (0)"
+
+def test_least_used_fingerprints_are_dropped(monkeypatch):
+    monkeypatch.setattr(sql_profiler, "MAX_FINGERPRINTS", 3)
+    profiler = sql_profiler.SQLProfiler(enabled=True, slow_ms=1000)
+    conn = sqlite3.connect(":memory:")
+    for sql, calls in [("SELECT 1 AS a", 2), ("SELECT 1 AS b", 1), ("SELECT 1 AS c", 3)]:
+        for _ in range(calls):
+            record(profiler, conn, sql, 1.0)
+    record(profiler, conn, "SELECT 1 AS d", 1.0)
+    assert sorted(entry["fingerprint"] for entry in profiler.top_queries()) == [
+        "select ? as a", "select ? as c", "select ? as d"]
+    assert [entry["calls"] for entry in profiler.top_queries(by="calls")] == [3, 2, 1]
+
+def test_hooks_are_removed_from_a_pooled_connection_after_an_error(sales_db):
+    profiler = sql_profiler.SQLProfiler(enabled=True, slow_ms=1000)
+    conn = database_tools._acquire_read_connection()
+    with pytest.raises(sqlite3.OperationalError):
+        with profiler.profile(conn, "SELECT nope FROM sales") as failed:
+            conn.execute("SELECT COUNT(*) FROM sales").fetchall()
+            conn.execute("SELECT nope FROM sales")
+    assert failed.error == "no such column: nope"
+    assert failed.traced == ["SELECT COUNT(*) FROM sales"] and failed.vm_steps == 0
+    database_tools._release_read_connection(conn)
+
+    # The next user of the pooled connection runs without the failed statement's hooks
+    again = database_tools._acquire_read_connection()
+    assert again is conn
+    again.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000) "
+                  "SELECT SUM(i) FROM n").fetchall()
+    assert failed.traced == ["SELECT COUNT(*) FROM sales"] and failed.vm_steps == 0
+    database_tools._release_read_connection(again)
+    [entry] = profiler.top_queries()
+    assert (entry["calls"], entry["errors"]) == (1, 1)
@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+import database_tools
+from database_tools import execute_sql_batch, get_cached_schema, text_to_sql
+from sql_repair import repair_query, is_read_only
+
+from test_assistant_service import agent_step, service_for
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM sale WHERE sale_id = 1",
+    "UPDATE sale SET total_amount = 0",
+    "INSERT INTO custmers (name) VALUES ('x')",
+])
+def test_writes_are_never_repaired(sales_db, sql):
+    result = text_to_sql(sql)
+    assert "repair" not in result
+    assert "error" in result["results"][0]
+    with sqlite3.connect(sales_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 7
+
+def test_batch_writes_are_never_repaired(sales_db):
+    batch = execute_sql_batch(["DELETE FROM sale"])
+    assert "repair" not in batch["statements"][0]
+
+def sales_count(sales_db):
+    with sqlite3.connect(sales_db) as conn:
+        return conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+
+@pytest.mark.parametrize("sql", [
+    "WITH t AS (SELECT 1) DELETE FROM sale",
+    "WITH t AS (SELECT 1) UPDATE sale SET total_amount = 0",
+    "/* SELECT */ WITH t AS (SELECT 1) INSERT INTO sale SELECT * FROM t",
+    "SELECT 1; DELETE FROM sale",
+])
+def test_writes_behind_a_with_clause_are_never_repaired(sales_db, sql):
+    assert not is_read_only(sql)
+    result = text_to_sql(sql)
+    assert "repair" not in result and "error" in result["results"][0]
+    assert "error" in execute_sql_batch([sql])["statements"][0]["results"][0]
+    assert sales_count(sales_db) == 7
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1",
+    "(SELECT 1)",
+    "-- count\nWITH t AS (SELECT 1) SELECT * FROM t",
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3) SELECT i FROM n;",
+    "WITH \"delete\" AS (SELECT 'x; DELETE FROM sales') SELECT * FROM \"delete\"",
+])
+def test_read_only_queries(sql):
+    assert is_read_only(sql)
+
+def test_repaired_queries_run_read_only(sales_db, monkeypatch):
+    # Whatever a repair comes up with, it cannot write
+    monkeypatch.setattr(database_tools, "repair_query",
+                        lambda sql, error, schema: {"query": "DELETE FROM sales", "changes": ["bad guess"]})
+    result = text_to_sql("SELECT * FROM sale")
+    assert "repair" not in result and "error" in result["results"][0]
+    assert sales_count(sales_db) == 7
+
+def test_misspelled_table_and_column_are_repaired(sales_db):
+    schema = get_cached_schema()
+    assert repair_query("SELECT * FROM sale", "no such table: sale", schema)["query"] == "SELECT * FROM sales"
+    fixed = repair_query("WITH t AS (SELECT custmer_id FROM sales) SELECT * FROM t", "no such column: custmer_id", schema)
+    assert "customer_id" in fixed["query"]
+
+def test_name_is_never_swapped_for_id(sales_db):
+    schema = get_cached_schema()
+    sql = "SELECT customer_name, total_amount FROM sales"
+    assert repair_query(sql, "no such column: customer_name", schema) is None
+    assert repair_query("SELECT s.total_amout FROM sales s", "no such column: s.total_amout", schema)["query"] == \
+        "SELECT s.total_amount FROM sales s"
+
+def test_ambiguous_candidates_are_not_guessed():
+    schema = {"t": [{"name": "price_a"}, {"name": "price_b"}]}
+    assert repair_query("SELECT price_c FROM t", "no such column: price_c", schema) is None
+
+def test_repaired_answers_are_not_cached(sales_db):
+    service = service_for(agent_step("SELECT COUNT(*) AS n FROM sale"))
+    result = service.ask("a", "How many sales are there", "key", phrase_with_llm=False)
+    assert result["sql_repaired"] and not result["sql_failed"]
+    assert service.plan_cache.stats()["plans"] == 0
+    assert service.semantic_cache.stats()["entries"] == 0
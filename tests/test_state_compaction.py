@@ -0,0 +1,45 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from state_compaction import compact_messages, digest_tool_output, state_stats
+
+def result_output(rows):
+    lines = ["```sql", "SELECT i FROM n", "```", f"Query Results ({rows} rows):", "i"]
+    return "\n".join(lines + [str(i) for i in range(rows)])
+
+def turn(question, rows):
+    call = AIMessage(content="", tool_calls=[{"name": "execute_sql", "args": {"sql_query": "SELECT i FROM n"},
+                                              "id": question, "type": "tool_call"}])
+    return [HumanMessage(content=question), call,
+            ToolMessage(content=result_output(rows), name="execute_sql", tool_call_id=question),
+            AIMessage(content="Here they are.")]
+
+def test_digest_keeps_sql_and_sample_rows():
+    digest = digest_tool_output(result_output(100), "execute_sql")
+    assert "SELECT i FROM n" in digest and "Query Results (100 rows):" in digest
+    assert "\n2\n" in digest and "\n50\n" not in digest
+
+def test_older_turns_are_digested():
+    messages = compact_messages(turn("first", 100) + turn("second", 100))
+    assert messages[2].additional_kwargs.get("compacted")
+    assert not messages[6].additional_kwargs.get("compacted")
+    assert messages[6].content == result_output(100)
+
+def test_oldest_turns_are_dropped_to_fit():
+    latest = state_stats(turn("second", 100))["chars"]
+    messages = compact_messages(turn("first", 100) + turn("second", 100), max_chars=latest + 10)
+    assert [msg.content for msg in messages if isinstance(msg, HumanMessage)] == ["second"]
+
+def test_latest_turn_is_compacted_to_fit():
+    messages = compact_messages(turn("only", 5000), max_chars=2000)
+    assert state_stats(messages)["chars"] <= 2000
+    assert messages[2].additional_kwargs.get("compacted")
+
+def test_latest_output_is_cut_when_its_digest_is_too_large():
+    huge = ToolMessage(content="x" * 50000, name="other_tool", tool_call_id="t")
+    messages = compact_messages([HumanMessage(content="q"), huge, AIMessage(content="a")], max_chars=1000)
+    assert state_stats(messages)["chars"] <= 1000
+    assert messages[0].content == "q" and messages[2].content == "a"
+
+def test_small_states_are_untouched():
+    messages = turn("only", 5)
+    assert compact_messages(messages) == messages
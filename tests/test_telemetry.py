@@ -0,0 +1,33 @@
+import os
+import time
+
+import pytest
+
+import telemetry
+import tracing
+from tracing import FileSpanExporter, Span, new_trace_id
+
+def test_telemetry_and_tracing_are_opt_in(tmp_path, monkeypatch):
+    assert tracing.TRACE_FILE is None and telemetry.TELEMETRY_DB is None
+    monkeypatch.chdir(tmp_path)
+    sink = telemetry.TelemetrySink()
+    sink.write({"turn_id": "t", "spans": []})
+    span = Span("turn", new_trace_id())
+    span.end_ns = time.time_ns()
+    FileSpanExporter().export(span)
+    assert os.listdir(tmp_path) == []
+
+@pytest.mark.parametrize("session_id, question", [(["x"], 123), (7, None), (None, {"q": "top customers"})])
+def test_turns_store_any_question_as_text(tmp_path, monkeypatch, session_id, question):
+    sink = telemetry.TelemetrySink(str(tmp_path / "telemetry.db"))
+    monkeypatch.setattr(telemetry, "_sink", sink)
+    with telemetry.turn("sql_assistant", session_id, question) as turn:
+        pass
+    [record] = sink.load()
+    assert record["turn_id"] == turn.turn_id
+    assert record["question"] == str(question)
+    assert record["session_id"] == (None if session_id is None else str(session_id))
+
+def test_long_questions_are_cut():
+    turn = telemetry.Turn("sql_assistant", "s", "x" * (telemetry.MAX_QUESTION_CHARS + 50))
+    assert turn.question == "x" * telemetry.MAX_QUESTION_CHARS
@@ -0,0 +1,111 @@
+import os
+import time
+
+import pytest
+
+import database_tools
+import telemetry
+import tracing
+from tracing import FileSpanExporter, Span, load_traces, new_trace_id
+from test_assistant_service import agent_step, service_for
+
+def finished_span(name, trace_id=None):
+    span = Span(name, trace_id or new_trace_id(), attributes={"question": "x" * 100})
+    span.end_ns = time.time_ns()
+    return span
+
+def test_trace_file_is_rotated(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = FileSpanExporter(path, max_bytes=4000)
+    for number in range(50):
+        exporter.export(finished_span(f"span {number}"))
+    exporter.close()
+    assert os.path.getsize(path) <= 4000
+    assert os.path.exists(path + ".1") and os.path.getsize(path + ".1") <= 4000
+
+def test_load_traces_tails_the_file(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = FileSpanExporter(path)
+    first = new_trace_id()
+    exporter.export(finished_span("turn", first))
+    assert [trace["trace_id"] for trace in load_traces(path)] == [first]
+    tail = tracing._tails[os.path.abspath(path)]
+
+    second = new_trace_id()
+    exporter.export(finished_span("turn", second))
+    assert [trace["trace_id"] for trace in load_traces(path)] == [second, first]
+    assert tail.offset == os.path.getsize(path)
+
+    # A half-written line waits for the next read
+    with open(path, "a") as f:
+        f.write('{"resourceSpans": [')
+    assert len(load_traces(path)) == 2
+    assert tail.offset < os.path.getsize(path)
+    exporter.close()
+
+def test_load_traces_starts_over_after_rotation(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = FileSpanExporter(path, max_bytes=600)
+    exporter.export(finished_span("old"))
+    assert load_traces(path)[0]["name"] == "old"
+    exporter.export(finished_span("new"))
+    assert [trace["name"] for trace in load_traces(path)] == ["new"]
+    exporter.close()
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+@pytest.fixture
+def exported(monkeypatch):
+    exporter = CollectingExporter()
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    return exporter.spans
+
+def test_a_turn_nests_steps_tools_and_sql(sales_db, exported):
+    service = service_for(agent_step("SELECT COUNT(*) AS n FROM sale") + agent_step("SELECT COUNT(*) AS n FROM sales"))
+    result = service.ask("s1", "How many sales are there", "key", phrase_with_llm=False)
+    assert result["error"] is None
+    spans = {span.name: span for span in exported}
+    root = spans["turn sql_assistant"]
+    assert {span.trace_id for span in exported} == {result["turn_id"]}
+    assert root.span_id == tracing.root_span_id(result["turn_id"]) and root.parent_span_id is None
+    assert root.attributes["session.id"] == "s1" and root.attributes["question"] == "How many sales are there"
+    assert root.attributes["source"] == "agent" and root.attributes["input_tokens"] > 0
+
+    def parent(span):
+        return next(other.name for other in exported if other.span_id == span.parent_span_id)
+
+    assert parent(spans["agent.invoke"]) == "turn sql_assistant"
+    assert parent(spans["agent step 2 (tools)"]) == "agent.invoke"
+    assert parent(spans["tool execute_sql"]) == "agent step 2 (tools)"
+    assert parent(spans["llm llm"]) in ("agent step 1 (agent)", "agent step 3 (agent)")
+    # The failed statement and the batch the agent retried with both hang off the tool call
+    failed, batch = spans["execute_sql_query"], spans["execute_sql_batch statement"]
+    assert parent(failed) == parent(batch) == "tool execute_sql"
+    assert failed.attributes["db.statement"] == "SELECT COUNT(*) AS n FROM sale"
+    assert failed.status_code == tracing.STATUS_ERROR and "no such table: sale" in failed.status_message
+    assert batch.attributes["db.rows"] == 1 and batch.status_code == tracing.STATUS_OK
+    assert {span.status_code for span in exported if span is not failed} == {tracing.STATUS_OK}
+    # Children end before their parents are exported
+    assert exported[-1] is root
+
+def test_a_raising_stage_marks_its_span_and_the_turn(exported):
+    with pytest.raises(ValueError):
+        with telemetry.turn("sql_assistant", "s1", "q") as current:
+            with telemetry.stage("tool", "tool broken"):
+                raise ValueError("bad input")
+    stage, root = exported
+    assert stage.parent_span_id == root.span_id == tracing.root_span_id(current.turn_id)
+    assert stage.status_code == tracing.STATUS_ERROR and stage.status_message == "ValueError('bad input')"
+    assert root.status_code == tracing.STATUS_ERROR
+    otlp = stage.to_otlp()
+    assert otlp["parentSpanId"] == root.span_id and otlp["status"]["code"] == tracing.STATUS_ERROR
+
+def test_spans_outside_a_turn_are_not_exported(sales_db, exported):
+    with telemetry.stage("tool", "tool execute_sql"):
+        database_tools.execute_sql_query("SELECT 1")
+    assert exported == []
@@ -0,0 +1,75 @@
+import threading
+
+import pandas as pd
+
+from upload_cache import UploadCache, content_hash
+
+CSV = b"region,amount\nNorth,10\nSouth,20\nNorth,30\nSouth,40\nNorth,50\nNorth,60\n"
+
+def test_put_stores_each_content_once():
+    cache = UploadCache()
+    digest = cache.put(CSV, "a.csv", "csv")
+    assert digest == content_hash(CSV)
+    assert cache.put(CSV, "b.csv", "csv") == digest
+    assert cache.stats()["files"] == 1
+    assert cache.info(digest)["name"] == "a.csv"
+    assert cache.get_bytes(digest) == CSV
+
+def test_parsed_forms_are_built_once():
+    cache = UploadCache()
+    calls = []
+    cache.register_parser("lines", lambda data: calls.append(1) or data.splitlines())
+    digest = cache.put(CSV)
+    assert cache.get(digest, "lines") is cache.get(digest, "lines")
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["parses"] == 1 and stats["parse_hits"] == 1
+    assert cache.info(digest)["parsed"] == ["lines"]
+
+def test_dataframe_uses_the_profile():
+    cache = UploadCache()
+    digest = cache.put(CSV, "a.csv", "csv")
+    df = cache.dataframe(digest)
+    assert df["amount"].tolist() == [10, 20, 30, 40, 50, 60]
+    assert isinstance(df["region"].dtype, pd.CategoricalDtype)
+    assert sorted(cache.info(digest)["parsed"]) == ["dataframe", "profile"]
+    assert cache.profile(digest)["rows"] == 6
+
+def test_concurrent_gets_parse_once():
+    cache = UploadCache()
+    calls = []
+    started = threading.Event()
+
+    def slow_parser(data):
+        calls.append(1)
+        started.wait(1)
+        return data.decode()
+
+    cache.register_parser("slow", slow_parser)
+    digest = cache.put(CSV)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(digest, "slow"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [CSV.decode()] * 4
+
+def test_least_recently_used_files_are_evicted():
+    cache = UploadCache(max_bytes=2 * len(CSV) + 10)
+    first = cache.put(CSV)
+    second = cache.put(CSV + b"x")
+    # Touch the first file so the second one is the least recently used
+    cache.get_bytes(first)
+    third = cache.put(CSV + b"y")
+    assert cache.contains(first) and cache.contains(third)
+    assert not cache.contains(second)
+    assert cache.get(second, "text") is None
+
+def test_newest_file_stays_even_over_the_limit():
+    cache = UploadCache(max_bytes=10)
+    digest = cache.put(CSV)
+    assert cache.contains(digest)
+    assert cache.text(digest) == CSV.decode()
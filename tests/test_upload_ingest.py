@@ -0,0 +1,69 @@
+import io
+import sqlite3
+
+import pytest
+
+import database_tools
+import upload_ingest
+from upload_ingest import ingest_csv, list_tables, table_name_for, column_names, get_upload_digest
+
+SALES = b"Order ID,Region,Amount\n1,North,10.5\n2,South,20\n3,North,\n"
+OTHER_SALES = b"Order ID,Region,Amount\n7,East,1\n"
+
+@pytest.fixture
+def upload_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_ingest, "UPLOAD_DB_DIR", str(tmp_path / "uploads"))
+    return upload_ingest.session_db_path("session 1")
+
+def rows(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f'SELECT * FROM "{table.split(".", 1)[1]}" ORDER BY 1').fetchall()
+
+def test_names_are_sql_friendly():
+    assert table_name_for("reports/Sales 2024.csv") == "sales_2024"
+    assert table_name_for("2024.csv") == "t_2024"
+    assert column_names(["Order ID", "a b", "a_b", "1st"]) == ["order_id", "a_b", "a_b_", "t_1st"]
+
+def test_taken_names_get_the_digest_then_a_counter():
+    assert table_name_for("sales.csv", "1a2b3c4d5e", {"sales"}) == "sales_1a2b3c4d"
+    assert table_name_for("sales.csv", "1a2b3c4d5e", {"sales", "sales_1a2b3c4d"}) == "sales_2"
+    assert table_name_for("sales.csv", None, {"sales", "sales_2"}) == "sales_3"
+
+def test_csv_is_loaded_in_chunks_with_types_and_indexes(upload_db):
+    loaded = ingest_csv(io.BytesIO(SALES), upload_db, "Sales.csv", "d1", chunksize=2)
+    assert loaded["table"] == "uploads.sales"
+    assert loaded["rows"] == 3 and not loaded["reused"]
+    assert loaded["columns"] == {"order_id": "INTEGER", "region": "TEXT", "amount": "REAL"}
+    assert "order_id" in loaded["indexes"]
+    assert rows(upload_db, loaded["table"]) == [(1, "North", 10.5), (2, "South", 20.0), (3, "North", None)]
+    assert "uploads.sales (3 rows, from Sales.csv)" in get_upload_digest(upload_db)
+
+def test_same_content_is_reused(upload_db):
+    first = ingest_csv(io.BytesIO(SALES), upload_db, "Sales.csv", "d1")
+    again = ingest_csv(io.BytesIO(SALES), upload_db, "copy of sales.csv", "d1")
+    assert again["reused"] and again["table"] == first["table"]
+    assert again["columns"] == first["columns"] and again["indexes"] == first["indexes"]
+    assert len(list_tables(upload_db)) == 1
+
+def test_same_named_files_keep_their_own_tables(upload_db):
+    first = ingest_csv(io.BytesIO(SALES), upload_db, "sales.csv", "aaaaaaaa11")
+    second = ingest_csv(io.BytesIO(OTHER_SALES), upload_db, "sales.csv", "bbbbbbbb22")
+    assert first["table"] == "uploads.sales"
+    assert second["table"] == "uploads.sales_bbbbbbbb"
+    assert len(rows(upload_db, first["table"])) == 3
+    assert rows(upload_db, second["table"]) == [(7, "East", 1)]
+    assert sorted(table["table"] for table in list_tables(upload_db)) == ["uploads.sales", "uploads.sales_bbbbbbbb"]
+    # Each digest keeps finding its own table
+    assert ingest_csv(io.BytesIO(SALES), upload_db, "sales.csv", "aaaaaaaa11")["table"] == "uploads.sales"
+    assert ingest_csv(io.BytesIO(OTHER_SALES), upload_db, "sales.csv", "bbbbbbbb22")["table"] == second["table"]
+
+def test_empty_file_is_an_error(upload_db):
+    assert "error" in ingest_csv(io.BytesIO(b""), upload_db, "empty.csv", "d0")
+    assert list_tables(upload_db) == []
+
+def test_sql_tools_query_the_attached_uploads(sales_db, upload_db):
+    ingest_csv(io.BytesIO(SALES), upload_db, "Sales.csv", "d1")
+    with database_tools.attach_databases({upload_ingest.UPLOAD_SCHEMA: upload_db}):
+        result = database_tools.text_to_sql(
+            "SELECT region, SUM(amount) AS total FROM uploads.sales GROUP BY region ORDER BY region")
+    assert result["results"] == [{"region": "North", "total": 10.5}, {"region": "South", "total": 20.0}]
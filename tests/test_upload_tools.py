@@ -0,0 +1,88 @@
+import io
+import json
+
+import pytest
+
+import upload_ingest
+from upload_cache import get_upload_cache
+from upload_ingest import ingest_csv, session_db_path
+from upload_registry import UploadRegistry, get_registry, use_session, describe_uploads, short_id
+from upload_tools import read_upload, analyze_upload, list_uploads, MAX_READ_ROWS
+
+CSV = "Order ID,Region,Amount\n" + "".join(f"{i},{'North' if i % 2 else 'South'},{i * 1.5}\n" for i in range(250))
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_ingest, "UPLOAD_DB_DIR", str(tmp_path / "uploads"))
+    yield "test-session"
+    get_registry().forget("test-session")
+
+def upload(session_id, data: bytes, name: str, file_type: str, to_sql: bool = False) -> str:
+    digest = get_upload_cache().put(data, name, file_type)
+    sql_table = ingest_csv(io.BytesIO(data), session_db_path(session_id), name, digest) if to_sql else None
+    return get_registry().register(session_id, digest, name, file_type, size=len(data), sql_table=sql_table)
+
+def test_ids_come_from_the_content_and_sessions_are_separate():
+    registry = UploadRegistry()
+    upload_id = registry.register("a", "1a2b3c4d5e6f", "x.csv", "csv", size=10)
+    assert upload_id == short_id("1a2b3c4d5e6f") == "f_1a2b3c4d"
+    assert registry.register("a", "1a2b3c4d5e6f", "copy.csv", "csv") == upload_id
+    assert [item["name"] for item in registry.list("a")] == ["copy.csv"]
+    assert registry.get("b", upload_id) is None
+    assert registry.get("a", f" {upload_id} ")["digest"] == "1a2b3c4d5e6f"
+
+def test_failed_sql_loads_are_not_registered_as_tables():
+    registry = UploadRegistry()
+    upload_id = registry.register("a", "ffff0000", "x.csv", "csv", sql_table={"error": "no rows"})
+    assert registry.get("a", upload_id)["sql_table"] is None
+
+def test_describe_uploads_lists_the_current_session(session):
+    upload_id = upload(session, CSV.encode(), "orders.csv", "csv", to_sql=True)
+    assert describe_uploads() == ""
+    with use_session(session):
+        description = describe_uploads()
+        assert list_uploads.invoke({}) == description
+    assert description.startswith(f"- {upload_id}: orders.csv (CSV;")
+    assert "250 rows, columns: order_id, region, amount" in description
+    assert "SQL table uploads.orders" in description
+
+@pytest.mark.parametrize("to_sql", [True, False])
+def test_read_upload_returns_only_the_requested_rows(session, to_sql):
+    upload_id = upload(session, CSV.encode(), "orders.csv", "csv", to_sql=to_sql)
+    amount = "amount" if to_sql else "Amount"
+    with use_session(session):
+        page = read_upload.invoke({"upload_id": upload_id, "start_row": 10, "end_row": 13, "columns": [amount]})
+        capped = read_upload.invoke({"upload_id": upload_id, "start_row": 0, "end_row": 1000})
+    assert page.split("\n")[1:] == [amount, "15", "16.5", "18"]
+    assert capped.startswith(f"orders.csv rows 0-{MAX_READ_ROWS} of 250:")
+
+def test_read_upload_reports_unknown_ids_and_columns(session):
+    upload_id = upload(session, CSV.encode(), "orders.csv", "csv")
+    with use_session(session):
+        unknown = read_upload.invoke({"upload_id": "f_00000000"})
+        bad_column = read_upload.invoke({"upload_id": upload_id, "columns": ["nope"]})
+    assert unknown.startswith("Error reading upload: Unknown upload ID")
+    assert upload_id in unknown
+    assert "Unknown columns ['nope']" in bad_column
+    # Another session doesn't see the upload
+    with use_session("someone-else"):
+        assert "Unknown upload ID" in read_upload.invoke({"upload_id": upload_id})
+
+def test_read_upload_pages_json_and_text(session):
+    json_id = upload(session, json.dumps([{"a": i, "b": -i} for i in range(5)]).encode(), "items.json", "json")
+    text_id = upload(session, b"one\ntwo\nthree", "notes.txt", "plain")
+    with use_session(session):
+        items = read_upload.invoke({"upload_id": json_id, "start_row": 3, "columns": ["a"]})
+        lines = read_upload.invoke({"upload_id": text_id, "start_row": 1, "end_row": 2})
+    assert items.startswith("items.json items 3-5 of 5:")
+    assert json.loads(items.split("\n", 1)[1]) == [{"a": 3}, {"a": 4}]
+    assert lines == "notes.txt lines 1-2 of 3:\ntwo"
+
+def test_analyze_upload_uses_the_profile(session):
+    upload_id = upload(session, CSV.encode(), "orders.csv", "csv", to_sql=True)
+    with use_session(session):
+        result = analyze_upload.invoke({"upload_id": upload_id, "columns": ["amount"]})
+    analysis = json.loads(result.split("\n", 1)[1])
+    assert analysis["shape"] == [250, 3]
+    assert list(analysis["summary"]) == ["Amount"]
+    assert analysis["sql_table"] == "uploads.orders"
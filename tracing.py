@@ -0,0 +1,464 @@
+# tracing.py
+# Lightweight span tracing for the assistants, with no collector to run.
+# Spans follow the OpenTelemetry data model (trace id, span id, parent span id,
+# name, start/end time in unix nanoseconds, attributes, status) and are written
+# to a local file (TRACE_FILE, off unless set) as OTLP/JSON lines: one
+# ExportTraceServiceRequest per line, the format of the OpenTelemetry
+# Collector's file exporter, so the traces can also be loaded into other
+# OpenTelemetry tools. The file is kept open while spans are exported and is
+# rotated to TRACE_FILE.1 when it reaches TRACE_MAX_BYTES; readers tail it,
+# parsing only the lines appended since their last read.
+#
+# A trace is one assistant turn: telemetry.turn() opens the root span (its trace
+# id is the turn id), and the telemetry hooks add the children:
+#   turn
+#   ├── agent.invoke
+#   │   ├── agent step N      (one per LangGraph node run: "agent" or "tools")
+#   │   │   ├── llm <model>   (tokens)
+#   │   │   └── tool <name>
+#   │   │       └── execute_sql_query   (db.statement, db.rows)
+#   └── render                (added by the front end after the answer is drawn)
+# Spans started outside a trace are not recorded.
+#
+# Usage: TRACE_FILE=traces.jsonl streamlit run streamlit_react_tools_app.py
+#        python tracing.py [--file traces.jsonl] [--limit 20] [--trace TRACE_ID]
+#   lists recent traces, or prints one trace as a text waterfall.
+#   The Traces page (pages/Traces.py) shows the same waterfall in Streamlit.
+import argparse
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator
+
+logger = logging.getLogger("tracing")
+
+# Where spans go (e.g. TRACE_FILE=traces.jsonl); nothing is exported unless set
+TRACE_FILE = os.environ.get("TRACE_FILE") or None
+
+# Size at which the trace file is rotated (the previous one is kept as TRACE_FILE.1)
+TRACE_MAX_BYTES = int(os.environ.get("TRACE_MAX_BYTES", 20 * 1024 * 1024))
+
+# Most recent traces load_traces keeps parsed between calls
+MAX_LOADED_TRACES = 2000
+
+# Resource and instrumentation scope reported with every span
+SERVICE_NAME = "sales-assistants"
+SCOPE_NAME = "tracing"
+
+# Longest attribute value kept (SQL text, questions)
+MAX_ATTRIBUTE_CHARS = 2000
+
+# OTLP span kind and status codes
+SPAN_KIND_INTERNAL = 1
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+def new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def root_span_id(trace_id: str) -> str:
+    """
+    Span id of a trace's root span (derived from the trace id, so spans added
+    after the root has ended, like render, can still name it as their parent)
+    """
+    return trace_id[:16]
+
+def _clip(value: Any) -> Any:
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    value = str(value)
+    return value if len(value) <= MAX_ATTRIBUTE_CHARS else value[:MAX_ATTRIBUTE_CHARS] + "…"
+
+class Span:
+    """
+    One timed operation in a trace
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None, span_id: Optional[str] = None,
+                 start_ns: Optional[int] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id or new_span_id()
+        self.parent_span_id = parent_span_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+        self.set_attributes(attributes or {})
+        # The span that was active before this one, and the context token to restore it
+        self._parent: Optional["Span"] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = _clip(value)
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: Any) -> None:
+        """
+        Mark the span as failed
+        """
+        self.status_code = STATUS_ERROR
+        self.status_message = _clip(error)
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        """
+        End the span and export it (only the first call counts)
+        """
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        get_exporter().export(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """
+        The span in OTLP/JSON form
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status_code, **({"message": self.status_message} if self.status_message else {})}
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+class NoopSpan(Span):
+    """
+    Stand-in returned outside a trace: attributes are kept, nothing is exported
+    """
+
+    def __init__(self, name: str = "", attributes: Optional[Dict[str, Any]] = None):
+        super().__init__(name, "", attributes=attributes)
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        self.end_ns = end_ns or time.time_ns()
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON writes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": "" if value is None else str(value)}
+
+def _from_otlp_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("boolValue", "doubleValue", "stringValue"):
+        if key in value:
+            return value[key]
+    return None
+
+# --- Export ---
+
+class FileSpanExporter:
+    """
+    Appends finished spans to a file as OTLP/JSON lines, rotating it at max_bytes
+    """
+
+    def __init__(self, path: Optional[str] = TRACE_FILE, service_name: str = SERVICE_NAME,
+                 max_bytes: int = TRACE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if not self.path:
+            return
+        line = (json.dumps({"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": [span.to_otlp()]}]
+        }]}) + "\n").encode("utf-8")
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, "ab")
+                if self.max_bytes and self._file.tell() and self._file.tell() + len(line) > self.max_bytes:
+                    self._rotate()
+                self._file.write(line)
+                # Whole lines only, so readers tailing the file never see half a span
+                self._file.flush()
+        except OSError:
+            logger.exception("Could not export span %s", span.name)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        os.replace(self.path, self.path + ".1")
+        self._file = open(self.path, "ab")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+_exporter: Optional[FileSpanExporter] = None
+_exporter_lock = threading.Lock()
+
+def get_exporter() -> FileSpanExporter:
+    """
+    The process-wide exporter, writing to TRACE_FILE
+    """
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = FileSpanExporter()
+        return _exporter
+
+# --- Context ---
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("tracing_span", default=None)
+
+def current_span() -> Optional[Span]:
+    """
+    The active span in this context, if any
+    """
+    return _current.get()
+
+def begin_span(name: str, attributes: Optional[Dict[str, Any]] = None, trace_id: Optional[str] = None,
+               activate: bool = True) -> Span:
+    """
+    Start a span as a child of the active span, or a root span when trace_id is given
+
+    For callers whose start and end happen in different functions (callbacks);
+    otherwise use start_span. Pair with finish_span.
+
+    Args:
+        name: Span name
+        attributes: Initial attributes
+        trace_id: Start a new trace with this id (the span becomes its root)
+        activate: Make the span the active one, so spans started inside it are its children
+
+    Returns:
+        The span (a NoopSpan when there is no trace to add it to)
+    """
+    parent = _current.get()
+    if trace_id:
+        span = Span(name, trace_id, attributes=attributes, span_id=root_span_id(trace_id))
+    elif parent is not None and not isinstance(parent, NoopSpan):
+        span = Span(name, parent.trace_id, parent.span_id, attributes)
+    else:
+        span = NoopSpan(name, attributes)
+    span._parent = parent
+    span._token = _current.set(span) if activate else None
+    return span
+
+def finish_span(span: Span, error: Any = None) -> None:
+    """
+    End a span from begin_span and restore the previously active span
+    """
+    if error is not None:
+        span.record_error(error)
+    elif span.status_code == STATUS_UNSET:
+        span.status_code = STATUS_OK
+    if span._token is not None:
+        try:
+            _current.reset(span._token)
+        except ValueError:
+            # Ended from another context (e.g. a generator closed elsewhere)
+            _current.set(span._parent)
+    span.end()
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, trace_id: Optional[str] = None) -> Iterator[Span]:
+    """
+    Run a block inside a span (see begin_span); exceptions mark it as failed
+    """
+    span = begin_span(name, attributes, trace_id)
+    try:
+        yield span
+    except BaseException as e:
+        finish_span(span, "cancelled" if isinstance(e, GeneratorExit) else repr(e))
+        raise
+    finish_span(span)
+
+def add_span(name: str, trace_id: str, start_ns: int, end_ns: int, attributes: Optional[Dict[str, Any]] = None,
+             parent_span_id: Optional[str] = None) -> None:
+    """
+    Export a span that was timed elsewhere (by default as a child of the trace's root)
+    """
+    span = Span(name, trace_id, parent_span_id or root_span_id(trace_id), attributes, start_ns=start_ns)
+    span.status_code = STATUS_OK
+    span.end(end_ns)
+
+# --- Reading traces back ---
+
+class _TraceTail:
+    """
+    Spans read so far from one trace file, by trace; each read only parses the
+    lines appended since the previous one
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        self.spans_by_trace: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def read(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self.inode, self.offset = None, 0
+                self.spans_by_trace.clear()
+                return {}
+            # A rotated or truncated file is read again from the start
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                self.inode, self.offset = stat.st_ino, 0
+                self.spans_by_trace.clear()
+            if stat.st_size > self.offset:
+                with open(self.path, "rb") as f:
+                    f.seek(self.offset)
+                    data = f.read(stat.st_size - self.offset)
+                # A line still being written is read next time
+                data = data[:data.rfind(b"\n") + 1]
+                self.offset += len(data)
+                for line in data.splitlines():
+                    self._add(line)
+                while len(self.spans_by_trace) > MAX_LOADED_TRACES:
+                    self.spans_by_trace.popitem(last=False)
+            return {trace_id: list(spans) for trace_id, spans in self.spans_by_trace.items()}
+
+    def _add(self, line: bytes) -> None:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return
+        for resource_spans in request.get("resourceSpans", []):
+            for scope_spans in resource_spans.get("scopeSpans", []):
+                for span in scope_spans.get("spans", []):
+                    self.spans_by_trace.setdefault(span["traceId"], []).append(span)
+
+_tails: Dict[str, _TraceTail] = {}
+_tails_lock = threading.Lock()
+
+def load_traces(path: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    The most recent traces in a trace file (at most MAX_LOADED_TRACES), newest first.
+    The file is tailed: repeated calls only parse what was appended in between.
+
+    Returns:
+        List of traces, each with "trace_id", "name" (of the root span), "start"
+        (unix seconds), "duration_ms", "attributes" (of the root span) and
+        "spans": every span with "span_id", "parent_span_id", "name", "depth",
+        "start_ms" (from the trace start), "duration_ms", "status", "error" and
+        "attributes", in waterfall order (depth first, by start time)
+    """
+    path = TRACE_FILE if path is None else path
+    if not path:
+        return []
+    with _tails_lock:
+        tail = _tails.setdefault(os.path.abspath(path), _TraceTail(path))
+    spans_by_trace = tail.read()
+
+    traces = [_build_trace(trace_id, spans) for trace_id, spans in spans_by_trace.items()]
+    traces.sort(key=lambda trace: trace["start"], reverse=True)
+    return traces[:limit]
+
+def _build_trace(trace_id: str, raw_spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    trace_start = min(int(span["startTimeUnixNano"]) for span in raw_spans)
+    trace_end = max(int(span["endTimeUnixNano"]) for span in raw_spans)
+    spans = {}
+    for raw in raw_spans:
+        spans[raw["spanId"]] = {
+            "span_id": raw["spanId"],
+            "parent_span_id": raw.get("parentSpanId"),
+            "name": raw["name"],
+            "start_ms": round((int(raw["startTimeUnixNano"]) - trace_start) / 1e6, 3),
+            "duration_ms": round((int(raw["endTimeUnixNano"]) - int(raw["startTimeUnixNano"])) / 1e6, 3),
+            "status": raw.get("status", {}).get("code", STATUS_UNSET),
+            "error": raw.get("status", {}).get("message"),
+            "attributes": {item["key"]: _from_otlp_value(item["value"]) for item in raw.get("attributes", [])}
+        }
+
+    # Depth-first order, children by start time; spans whose parent is missing count as roots
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in spans.values():
+        parent = span["parent_span_id"] if span["parent_span_id"] in spans else None
+        children.setdefault(parent, []).append(span)
+    ordered = []
+
+    def visit(parent: Optional[str], depth: int) -> None:
+        for span in sorted(children.get(parent, []), key=lambda s: s["start_ms"]):
+            span["depth"] = depth
+            ordered.append(span)
+            visit(span["span_id"], depth + 1)
+
+    visit(None, 0)
+    root = ordered[0] if ordered else {}
+    return {
+        "trace_id": trace_id,
+        "name": root.get("name", ""),
+        "start": trace_start / 1e9,
+        "duration_ms": round((trace_end - trace_start) / 1e6, 3),
+        "attributes": root.get("attributes", {}),
+        "spans": ordered
+    }
+
+def format_waterfall(trace: Dict[str, Any], width: int = 50) -> str:
+    """
+    A trace as a text waterfall: one line per span, indented by depth, with a bar
+    showing when it ran within the trace
+    """
+    total = trace["duration_ms"] or 1
+    lines = [f"Trace {trace['trace_id']}  {trace['name']}  {trace['duration_ms']:.1f} ms"]
+    label_width = max((len(span["name"]) + 2 * span["depth"] for span in trace["spans"]), default=0)
+    label_width = min(label_width, 48)
+    for span in trace["spans"]:
+        label = ("  " * span["depth"] + span["name"])[:label_width].ljust(label_width)
+        offset = int(span["start_ms"] / total * width)
+        length = max(1, int(span["duration_ms"] / total * width))
+        bar = (" " * offset + "█" * length)[:width].ljust(width)
+        detail = ""
+        if "db.statement" in span["attributes"]:
+            detail = f"  rows={span['attributes'].get('db.rows', '?')}  {span['attributes']['db.statement'][:60]}"
+        if span["error"]:
+            detail += f"  ERROR {span['error'][:60]}"
+        lines.append(f"{label} |{bar}| {span['duration_ms']:9.2f} ms{detail}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="List recent traces or print one as a waterfall")
+    parser.add_argument("--file", default=TRACE_FILE or "traces.jsonl", help="Trace file (default: TRACE_FILE or traces.jsonl)")
+    parser.add_argument("--limit", type=int, default=20, help="Traces to list")
+    parser.add_argument("--trace", help="Trace id (or a prefix) to print as a waterfall")
+    args = parser.parse_args()
+
+    traces = load_traces(args.file, limit=10 ** 9 if args.trace else args.limit)
+    if args.trace:
+        matches = [trace for trace in traces if trace["trace_id"].startswith(args.trace)]
+        if not matches:
+            parser.error(f"No trace {args.trace} in {args.file}")
+        print(format_waterfall(matches[0]))
+        return
+    for trace in traces:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(trace["start"]))
+        question = trace["attributes"].get("question", "")
+        print(f"{trace['trace_id']}  {started}  {trace['duration_ms']:10.1f} ms  {len(trace['spans']):3d} spans  {trace['name']}  {question[:60]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# upload_cache.py
+# Process-wide cache of uploaded files, keyed by the SHA-256 of their content.
+# The raw bytes of a file are stored once, however many sessions upload it,
+# and each parsed form (a DataFrame for CSV, the decoded objects for JSON, the
+# text) is built on first use and reused until the file changes - instead of
+# re-parsing the upload on every Streamlit rerun.
+#
+# The cache is bounded by UPLOAD_CACHE_MB: raw bytes plus the in-memory size of
+# the parsed forms. The least recently used files are dropped first; callers
+# keep the digest and put() the bytes again if get() comes back empty.
+#
+# CSV files are read into the compact dtypes found by their profile (a
+# one-pass approximate profile from data_profile.py, itself cached as the
+# "profile" form), so a cached DataFrame takes far less memory than a plain
+# read_csv.
+#
+# Parsed objects are shared between sessions, so treat them as read-only
+# (copy a DataFrame before changing it).
+#
+# Usage:
+#   digest = get_upload_cache().put(uploaded_file.getvalue(), uploaded_file.name, "csv")
+#   df = get_upload_cache().dataframe(digest)
+#   profile = get_upload_cache().profile(digest)
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable
+
+import pandas as pd
+
+from data_profile import profile_csv, read_csv_compact
+
+logger = logging.getLogger("upload_cache")
+
+# Total size of cached bytes and parsed objects
+UPLOAD_CACHE_MB = float(os.environ.get("UPLOAD_CACHE_MB", 512))
+
+def content_hash(data: bytes) -> str:
+    """
+    SHA-256 hex digest of a file's content
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def _size_of(value: Any) -> int:
+    """
+    Approximate memory held by a parsed form
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    # JSON objects: roughly twice their serialized size once they are Python objects
+    try:
+        return 2 * len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+def _parse_text(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+def _parse_profile(data: bytes) -> Dict[str, Any]:
+    return profile_csv(io.BytesIO(data))
+
+def _parse_json(data: bytes) -> Any:
+    return json.loads(data)
+
+# Parsers by form name; more can be registered with UploadCache.register_parser.
+# "dataframe" is built from the file's profile (see UploadCache._parse).
+PARSERS: Dict[str, Callable[[bytes], Any]] = {
+    "text": _parse_text,
+    "profile": _parse_profile,
+    "json": _parse_json,
+}
+
+class UploadCache:
+    """
+    Size-bounded LRU cache of uploaded files and their parsed forms
+    """
+
+    def __init__(self, max_bytes: int = int(UPLOAD_CACHE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        # digest -> {"name", "type", "data", "size", "parsed": {form: (object, size)}}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._parsers = dict(PARSERS)
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        # One lock per digest and form, so a big file is parsed once even when
+        # several sessions ask for it at the same time
+        self._parse_locks: Dict[tuple, threading.Lock] = {}
+
+    def register_parser(self, form: str, parser: Callable[[bytes], Any]) -> None:
+        """
+        Add a parsed form (parser takes the raw bytes)
+        """
+        self._parsers[form] = parser
+
+    def put(self, data: bytes, name: Optional[str] = None, file_type: Optional[str] = None) -> str:
+        """
+        Store a file's bytes (once per content) and return its digest
+        """
+        digest = content_hash(data)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                return digest
+            self._entries[digest] = {"name": name, "type": file_type, "data": data, "size": len(data), "parsed": {}}
+            self._bytes += len(data)
+            self._evict(keep=digest)
+        logger.info("Cached upload %s (%s, %.1f KB)", digest[:12], name, len(data) / 1024)
+        return digest
+
+    def contains(self, digest: Optional[str]) -> bool:
+        with self._lock:
+            return digest in self._entries
+
+    def info(self, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        Name, type and sizes of a cached file (None if it isn't cached)
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            return {"digest": digest, "name": entry["name"], "type": entry["type"], "size": len(entry["data"]),
+                    "cached_bytes": entry["size"], "parsed": sorted(entry["parsed"])}
+
+    def get_bytes(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            return entry["data"]
+
+    def get(self, digest: str, form: str) -> Any:
+        """
+        A parsed form of a cached file, parsed on first use
+
+        Args:
+            digest: Digest returned by put()
+            form: "text", "dataframe", "profile", "json" or a registered form
+
+        Returns:
+            The parsed object (shared, so read-only), or None if the file is no longer cached
+
+        Raises:
+            Whatever the parser raises for content it can't parse
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            if form in entry["parsed"]:
+                self._hits += 1
+                return entry["parsed"][form][0]
+            parse_lock = self._parse_locks.setdefault((digest, form), threading.Lock())
+
+        try:
+            with parse_lock:
+                with self._lock:
+                    entry = self._entries.get(digest)
+                    if entry is not None and form in entry["parsed"]:
+                        self._hits += 1
+                        return entry["parsed"][form][0]
+                    self._misses += 1
+                value = self._parse(digest, form, entry["data"]) if entry is not None else None
+                # Stored before the parse lock is released, so a later caller finds it
+                with self._lock:
+                    entry = self._entries.get(digest)
+                    if entry is None or value is None:
+                        return value
+                    size = _size_of(value)
+                    entry["parsed"][form] = (value, size)
+                    entry["size"] += size
+                    self._bytes += size
+                    self._evict(keep=digest)
+        finally:
+            with self._lock:
+                self._parse_locks.pop((digest, form), None)
+        return value
+
+    def _parse(self, digest: str, form: str, data: bytes) -> Any:
+        if form == "dataframe":
+            # Read straight into the compact dtypes of the (cached) profile
+            profile = self.get(digest, "profile")
+            if profile is None:
+                return pd.read_csv(io.BytesIO(data))
+            return read_csv_compact(io.BytesIO(data), profile)
+        return self._parsers[form](data)
+
+    def text(self, digest: str) -> Optional[str]:
+        return self.get(digest, "text")
+
+    def dataframe(self, digest: str) -> Optional[pd.DataFrame]:
+        return self.get(digest, "dataframe")
+
+    def profile(self, digest: str) -> Optional[Dict[str, Any]]:
+        return self.get(digest, "profile")
+
+    def json(self, digest: str) -> Any:
+        return self.get(digest, "json")
+
+    def _evict(self, keep: str) -> None:
+        # Called with the lock held; the newest entry stays even if it alone is over the limit
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            digest, entry = next(iter(self._entries.items()))
+            if digest == keep:
+                self._entries.move_to_end(digest)
+                continue
+            del self._entries[digest]
+            self._bytes -= entry["size"]
+            logger.info("Evicted upload %s (%s) from the cache", digest[:12], entry["name"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {"files": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "parse_hits": self._hits, "parses": self._misses,
+                    "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0}
+
+_cache: Optional[UploadCache] = None
+_cache_lock = threading.Lock()
+
+def get_upload_cache() -> UploadCache:
+    """
+    The upload cache shared by every session in the process
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UploadCache()
+        return _cache
@@ -0,0 +1,270 @@
+# upload_ingest.py
+# Loads uploaded CSV files into a per-session SQLite database, chunk by chunk,
+# so the SQL tools can query them with the same aggregations as the sales data
+# without the whole file ever being held in pandas.
+#
+# Each session gets its own database file under UPLOAD_DB_DIR. The SQL tools
+# attach it as the schema "uploads" (see database_tools.attach_databases), so
+# an uploaded "Sales 2024.csv" is queried as uploads.sales_2024.
+#
+# Ingestion reads CHUNK_ROWS rows at a time with pandas.read_csv(chunksize=...):
+#   - column types are inferred from the first chunk (INTEGER, REAL or TEXT);
+#     SQLite's type affinity keeps later values that don't fit as they are
+#   - every chunk is inserted with executemany in its own transaction
+#   - afterwards, id-like, date-like and low-cardinality text columns are
+#     indexed (at most MAX_INDEXES) and ANALYZE runs for the query planner
+# A file whose content was already loaded in the session is not loaded again,
+# and a different file with the same name gets its own table (the name plus a
+# short content digest) instead of replacing the first one.
+#
+# Usage:
+#   table = ingest_csv(io.BytesIO(data), session_db_path(session_id), "sales.csv", digest)
+#   with attach_databases({UPLOAD_SCHEMA: session_db_path(session_id)}):
+#       text_to_sql("SELECT region, SUM(amount) FROM uploads.sales GROUP BY region")
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from typing import List, Dict, Any, Optional, Union, IO, Collection
+
+import pandas as pd
+
+logger = logging.getLogger("upload_ingest")
+
+# Directory of the per-session upload databases
+UPLOAD_DB_DIR = os.environ.get("UPLOAD_DB_DIR", os.path.join(tempfile.gettempdir(), "chatbot_uploads"))
+
+# Rows read and inserted at a time
+CHUNK_ROWS = int(os.environ.get("UPLOAD_CHUNK_ROWS", 50_000))
+
+# Schema name the upload database is attached as
+UPLOAD_SCHEMA = "uploads"
+
+# Indexes created per table at most
+MAX_INDEXES = 4
+
+# Text columns with at most this share of distinct values among their non-null
+# values (in the first chunk) get an index
+INDEX_DISTINCT_RATIO = 0.2
+
+# Upload databases not written for this long are deleted
+UPLOAD_DB_TTL = 24 * 60 * 60
+
+_IDENTIFIER = re.compile(r"[^0-9a-zA-Z_]+")
+_INDEX_NAME_HINT = re.compile(r"(^id$|_id$|^date|date$|_at$|^time|time$|year|month)", re.IGNORECASE)
+
+def session_db_path(session_id: str) -> str:
+    """
+    Path of a session's upload database
+    """
+    os.makedirs(UPLOAD_DB_DIR, exist_ok=True)
+    return os.path.join(UPLOAD_DB_DIR, f"{_identifier(session_id)}.db")
+
+def _identifier(name: str) -> str:
+    """
+    A SQL-friendly name: lower case letters, digits and underscores, not starting with a digit
+    """
+    identifier = _IDENTIFIER.sub("_", name.strip()).strip("_").lower() or "column"
+    return f"t_{identifier}" if identifier[0].isdigit() else identifier
+
+def table_name_for(file_name: str, digest: Optional[str] = None, taken: Collection[str] = ()) -> str:
+    """
+    Table name for an uploaded file ("Sales 2024.csv" -> "sales_2024")
+
+    Args:
+        file_name: Original file name
+        digest: Content hash of the file, used to tell same-named files apart
+        taken: Table names already used by other uploads
+
+    Returns:
+        The name from the file name, or if that is taken, the name followed by
+        the first 8 characters of the digest ("sales_2024_1a2b3c4d"), or by a counter
+    """
+    base = _identifier(os.path.splitext(os.path.basename(file_name))[0])
+    suffix = _IDENTIFIER.sub("_", digest or "").lower()[:8]
+    candidates = [base] + ([f"{base}_{suffix}"] if suffix else [])
+    for name in candidates:
+        if name not in taken:
+            return name
+    counter = 2
+    while f"{base}_{counter}" in taken:
+        counter += 1
+    return f"{base}_{counter}"
+
+def column_names(columns: List[Any]) -> List[str]:
+    """
+    SQL-friendly, unique names for a file's columns ("Order ID" -> order_id)
+    """
+    names = []
+    for column in columns:
+        name = _identifier(str(column))
+        # Keep names unique ("a b" and "a_b" both become a_b)
+        while name in names:
+            name += "_"
+        names.append(name)
+    return names
+
+def _sqlite_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    # A scratch database that can be rebuilt from the upload: favour load speed over durability
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS _uploads (
+        table_name TEXT PRIMARY KEY,
+        file_name TEXT,
+        digest TEXT,
+        row_count INTEGER,
+        columns TEXT,
+        indexes TEXT,
+        ingested_at REAL
+    )
+    """)
+    return conn
+
+def _choose_indexes(chunk: pd.DataFrame, names: List[str], types: Dict[str, str]) -> List[str]:
+    """
+    Columns worth an index, judged from the first chunk: id- and date-like names
+    first, then text columns with few distinct values (likely filters and group-bys)
+    """
+    by_name = [name for name in names if _INDEX_NAME_HINT.search(name)]
+    categorical = []
+    for name in names:
+        if name in by_name or types[name] != "TEXT" or len(chunk) == 0:
+            continue
+        distinct = chunk[name].nunique(dropna=True)
+        if 1 < distinct <= chunk[name].count() * INDEX_DISTINCT_RATIO:
+            categorical.append((distinct, name))
+    return (by_name + [name for _, name in sorted(categorical)])[:MAX_INDEXES]
+
+def ingest_csv(source: Union[str, IO], db_path: str, file_name: str, digest: Optional[str] = None,
+               chunksize: int = CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Load a CSV file into a table of a session's upload database
+
+    Args:
+        source: Path or binary file object of the CSV file
+        db_path: The session's upload database (session_db_path)
+        file_name: Original file name, which gives the table its name
+        digest: Content hash of the file; an upload already loaded with the same
+            digest is not loaded again
+        chunksize: Rows read and inserted at a time
+
+    Returns:
+        Dictionary with "table" (qualified name, e.g. uploads.sales), "rows",
+        "columns" (name -> SQLite type), "indexes", "elapsed_ms" and "reused",
+        or {"error": ...} if the file couldn't be loaded
+    """
+    start = time.perf_counter()
+    _cleanup_stale()
+    try:
+        with closing(_connect(db_path)) as conn:
+            if digest:
+                existing = conn.execute(
+                    "SELECT table_name, row_count, columns, indexes FROM _uploads WHERE digest = ?", (digest,)
+                ).fetchone()
+                if existing:
+                    return {"table": f"{UPLOAD_SCHEMA}.{existing[0]}", "rows": existing[1],
+                            "columns": dict(item.split(" ", 1) for item in existing[2].split(", ") if item),
+                            "indexes": [name for name in existing[3].split(", ") if name],
+                            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2), "reused": True}
+
+            # Other uploads keep their tables; a leftover of a failed load is replaced
+            taken = {row[0] for row in conn.execute("SELECT table_name FROM _uploads")}
+            table = table_name_for(file_name, digest, taken)
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            rows = 0
+            names: List[str] = []
+            types: Dict[str, str] = {}
+            indexes: List[str] = []
+            insert = None
+            for chunk in pd.read_csv(source, chunksize=chunksize, low_memory=False):
+                if insert is None:
+                    # The first chunk decides the table's columns, types and indexes
+                    names = column_names(list(chunk.columns))
+                    chunk.columns = names
+                    types = {name: _sqlite_type(chunk[name].dtype) for name in names}
+                    column_sql = ", ".join(f'"{name}" {types[name]}' for name in names)
+                    conn.execute(f'CREATE TABLE "{table}" ({column_sql})')
+                    indexes = _choose_indexes(chunk, names, types)
+                    insert = f'INSERT INTO "{table}" VALUES ({", ".join("?" for _ in names)})'
+                else:
+                    chunk.columns = names
+                # NaN binds as NULL, so the chunk's rows can be inserted as they are
+                with conn:
+                    conn.executemany(insert, chunk.itertuples(index=False, name=None))
+                rows += len(chunk)
+                logger.debug("Loaded %d rows into %s", rows, table)
+
+            if insert is None:
+                return {"error": "The file has no rows"}
+
+            # Indexes are built once after loading, which is much faster than maintaining them per insert
+            for name in indexes:
+                conn.execute(f'CREATE INDEX "idx_{table}_{name}" ON "{table}" ("{name}")')
+            conn.execute(f'ANALYZE "{table}"')
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO _uploads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (table, file_name, digest, rows, ", ".join(f"{name} {types[name]}" for name in names),
+                     ", ".join(indexes), time.time())
+                )
+    except (sqlite3.Error, pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        logger.warning("Could not load %s: %s", file_name, e)
+        return {"error": str(e)}
+
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.info("Loaded %s into %s.%s: %d rows in %.0f ms, indexes on %s",
+                file_name, UPLOAD_SCHEMA, table, rows, elapsed_ms, indexes or "nothing")
+    return {"table": f"{UPLOAD_SCHEMA}.{table}", "rows": rows, "columns": types, "indexes": indexes,
+            "elapsed_ms": elapsed_ms, "reused": False}
+
+def list_tables(db_path: str) -> List[Dict[str, Any]]:
+    """
+    Tables loaded into a session's upload database, newest first
+    """
+    if not os.path.exists(db_path):
+        return []
+    try:
+        with closing(sqlite3.connect(db_path)) as conn:
+            rows = conn.execute(
+                "SELECT table_name, file_name, row_count, columns, indexes FROM _uploads ORDER BY ingested_at DESC"
+            ).fetchall()
+    except sqlite3.Error:
+        return []
+    return [{"table": f"{UPLOAD_SCHEMA}.{row[0]}", "file_name": row[1], "rows": row[2],
+             "columns": row[3], "indexes": row[4]} for row in rows]
+
+def get_upload_digest(db_path: str) -> str:
+    """
+    Prompt-ready description of the uploaded tables, in the same format as
+    database_tools.get_schema_digest (empty when nothing was uploaded)
+    """
+    return "\n".join(
+        f"{table['table']} ({table['rows']} rows, from {table['file_name']}): {table['columns']}"
+        for table in list_tables(db_path)
+    )
+
+def _cleanup_stale() -> None:
+    """
+    Delete upload databases of sessions that have been idle for UPLOAD_DB_TTL
+    """
+    if not os.path.isdir(UPLOAD_DB_DIR):
+        return
+    cutoff = time.time() - UPLOAD_DB_TTL
+    for entry in os.scandir(UPLOAD_DB_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            continue
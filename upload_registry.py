@@ -0,0 +1,138 @@
+# upload_registry.py
+# Server-side registry of each session's uploaded files under short IDs.
+# The agent never sees (or has to repeat) a file's content: its prompt lists the
+# IDs, and the upload tools (upload_tools.py) take an ID plus the rows and
+# columns they need. The content itself stays in the upload cache
+# (upload_cache.py) and, for CSV files, in the session's SQL table
+# (upload_ingest.py).
+#
+# IDs are derived from the content hash ("f_" + 8 hex digits), so uploading the
+# same file again gives the same ID.
+#
+# Usage:
+#   upload_id = get_registry().register(session_id, digest, "sales.csv", "csv", size=len(data))
+#   with use_session(session_id):
+#       agent.invoke(...)   # the upload tools look up IDs in this session
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Optional, Iterator
+
+# Uploads remembered per session (the oldest are forgotten first)
+MAX_UPLOADS_PER_SESSION = 20
+
+# Sessions without a new upload for this long are forgotten
+SESSION_TTL = 24 * 60 * 60
+
+# Session whose uploads the tools see in the current context
+_current_session: ContextVar[Optional[str]] = ContextVar("upload_session", default=None)
+
+def short_id(digest: str) -> str:
+    """
+    Short upload ID for a content hash
+    """
+    return f"f_{digest[:8]}"
+
+class UploadRegistry:
+    """
+    Upload IDs of every session: ID -> digest, file name, type, size and SQL table
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def register(self, session_id: str, digest: str, name: str, file_type: str, size: Optional[int] = None,
+                 sql_table: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Add (or refresh) an upload of a session
+
+        Args:
+            session_id: The session the upload belongs to
+            digest: Content hash of the file (its key in the upload cache)
+            name: Original file name
+            file_type: "csv", "json", "plain", ...
+            size: Size in bytes
+            sql_table: upload_ingest.ingest_csv result, if the file was loaded into SQL
+
+        Returns:
+            The upload ID
+        """
+        upload_id = short_id(digest)
+        with self._lock:
+            self._expire()
+            uploads = self._sessions.setdefault(session_id, OrderedDict())
+            uploads[upload_id] = {
+                "upload_id": upload_id, "digest": digest, "name": name, "type": file_type, "size": size,
+                "sql_table": sql_table if sql_table and "error" not in sql_table else None,
+                "uploaded_at": time.time()
+            }
+            uploads.move_to_end(upload_id)
+            while len(uploads) > MAX_UPLOADS_PER_SESSION:
+                uploads.popitem(last=False)
+            self._touched[session_id] = time.time()
+        return upload_id
+
+    def get(self, session_id: Optional[str], upload_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._sessions.get(session_id, {}).get(upload_id.strip())
+
+    def list(self, session_id: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        A session's uploads, newest first
+        """
+        with self._lock:
+            return list(reversed(self._sessions.get(session_id, {}).values()))
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._touched.pop(session_id, None)
+
+    def _expire(self) -> None:
+        # Called with the lock held
+        cutoff = time.time() - SESSION_TTL
+        for session_id in [session_id for session_id, touched in self._touched.items() if touched < cutoff]:
+            self._sessions.pop(session_id, None)
+            self._touched.pop(session_id, None)
+
+_registry = UploadRegistry()
+
+def get_registry() -> UploadRegistry:
+    return _registry
+
+@contextmanager
+def use_session(session_id: str) -> Iterator[None]:
+    """
+    Let the upload tools see a session's uploads within the block
+    (tools running in worker threads inherit the context)
+    """
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+def current_session() -> Optional[str]:
+    return _current_session.get()
+
+def describe_uploads(session_id: Optional[str] = None) -> str:
+    """
+    Prompt-ready list of a session's uploads (the current one by default),
+    one line per file; empty when there are none
+    """
+    session_id = current_session() if session_id is None else session_id
+    lines = []
+    for upload in _registry.list(session_id):
+        details = [upload["type"].upper()]
+        if upload["size"] is not None:
+            details.append(f"{upload['size'] / 1024:,.1f} KB" if upload["size"] >= 1024 else f"{upload['size']} bytes")
+        table = upload["sql_table"]
+        if table:
+            details.append(f"{table['rows']:,} rows, columns: {', '.join(table['columns'])}")
+            details.append(f"SQL table {table['table']}")
+        lines.append(f"- {upload['upload_id']}: {upload['name']} ({'; '.join(details)})")
+    return "\n".join(lines)
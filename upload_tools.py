@@ -0,0 +1,171 @@
+# upload_tools.py
+# LangChain tools that let an agent work with the user's uploaded files by ID
+# (see upload_registry.py) instead of receiving or repeating their content.
+# Each call returns only the rows and columns asked for, capped at MAX_READ_ROWS.
+# CSV rows are read from the session's SQL table when the file was loaded into
+# one, so a slice of a huge file never loads the whole file into pandas.
+#
+# The tools look up IDs in the session set with upload_registry.use_session().
+import json
+import sqlite3
+from contextlib import closing
+from typing import List, Dict, Any, Optional
+
+from langchain_core.tools import tool  # For creating tools
+
+from result_format import encode_rows
+from upload_cache import get_upload_cache
+from upload_ingest import session_db_path, column_names
+from upload_registry import get_registry, current_session, describe_uploads
+
+# Rows (or JSON items, or text lines) returned by one read_upload call at most
+MAX_READ_ROWS = 100
+
+# Characters of a text file returned by one read_upload call at most
+MAX_READ_CHARS = 20_000
+
+def _lookup(upload_id: str) -> Dict[str, Any]:
+    upload = get_registry().get(current_session(), upload_id)
+    if upload is None:
+        raise ValueError(f"Unknown upload ID {upload_id!r}; the available uploads are:\n{describe_uploads() or '(none)'}")
+    return upload
+
+def _row_range(start_row: int, end_row: Optional[int]) -> tuple:
+    start_row = max(start_row, 0)
+    end_row = start_row + MAX_READ_ROWS if end_row is None else min(end_row, start_row + MAX_READ_ROWS)
+    return start_row, max(end_row, start_row)
+
+def _pick_columns(available: List[str], columns: Optional[List[str]]) -> List[str]:
+    if not columns:
+        return available
+    missing = [column for column in columns if column not in available]
+    if missing:
+        raise ValueError(f"Unknown columns {missing}; the columns are: {', '.join(available)}")
+    return columns
+
+def _read_csv_rows(upload: Dict[str, Any], start_row: int, end_row: int,
+                   columns: Optional[List[str]]) -> tuple:
+    """
+    Rows [start_row, end_row) of a CSV upload and its total row count
+    """
+    table = upload["sql_table"]
+    if table:
+        # Straight from the session's SQL table: only the requested page is read
+        name = table["table"].split(".", 1)[1]
+        selected = _pick_columns(list(table["columns"]), columns)
+        column_sql = ", ".join(f'"{column}"' for column in selected)
+        with closing(sqlite3.connect(session_db_path(current_session()))) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f'SELECT {column_sql} FROM "{name}" LIMIT ? OFFSET ?',
+                                (end_row - start_row, start_row)).fetchall()
+        return [dict(row) for row in rows], table["rows"]
+
+    df = get_upload_cache().dataframe(upload["digest"])
+    if df is None:
+        raise ValueError(f"Upload {upload['upload_id']} is no longer available; ask the user to upload it again")
+    selected = _pick_columns([str(column) for column in df.columns], columns)
+    page = df.iloc[start_row:end_row][selected]
+    return page.astype(object).where(page.notna(), None).to_dict("records"), len(df)
+
+@tool
+def list_uploads():
+    """
+    List the files the user uploaded, with their IDs, types, sizes and (for CSV files) columns and SQL table.
+    """
+    return describe_uploads() or "No files have been uploaded."
+
+@tool
+def read_upload(upload_id: str, start_row: int = 0, end_row: Optional[int] = None, columns: Optional[List[str]] = None):
+    """
+    Read part of an uploaded file by its ID. Only read what you need to answer.
+
+    Args:
+        upload_id: ID of the upload, e.g. "f_1a2b3c4d" (see list_uploads)
+        start_row: First row to return (0-based). For JSON lists these are items, for text files lines.
+        end_row: Row to stop before; at most 100 rows are returned per call
+        columns: CSV columns (or JSON object keys) to return; all of them if omitted
+    """
+    try:
+        upload = _lookup(upload_id)
+        start_row, end_row = _row_range(start_row, end_row)
+        cache = get_upload_cache()
+
+        if upload["type"] == "csv":
+            rows, total = _read_csv_rows(upload, start_row, end_row, columns)
+            header = f"{upload['name']} rows {start_row}-{start_row + len(rows)} of {total}:"
+            return f"{header}\n{encode_rows(rows)}" if rows else f"{header} (no rows in this range)"
+
+        if upload["type"] == "json":
+            data = cache.json(upload["digest"])
+            if data is None:
+                raise ValueError(f"Upload {upload_id} is no longer available; ask the user to upload it again")
+            if isinstance(data, dict):
+                # Objects are read as a list of their entries
+                data = [{"key": key, "value": value} for key, value in data.items()]
+            items = data[start_row:end_row]
+            if columns:
+                items = [{key: item.get(key) for key in columns} if isinstance(item, dict) else item for item in items]
+            return (f"{upload['name']} items {start_row}-{start_row + len(items)} of {len(data)}:\n"
+                    f"{json.dumps(items, indent=1, default=str)[:MAX_READ_CHARS]}")
+
+        text = cache.text(upload["digest"])
+        if text is None:
+            raise ValueError(f"Upload {upload_id} is no longer available; ask the user to upload it again")
+        lines = text.split("\n")
+        page = "\n".join(lines[start_row:end_row])[:MAX_READ_CHARS]
+        return f"{upload['name']} lines {start_row}-{min(end_row, len(lines))} of {len(lines)}:\n{page}"
+    except Exception as e:
+        return f"Error reading upload: {str(e)}"
+
+@tool
+def analyze_upload(upload_id: str, columns: Optional[List[str]] = None):
+    """
+    Summarize an uploaded file by its ID: size, columns and types, the first rows and statistics.
+
+    Args:
+        upload_id: ID of the upload, e.g. "f_1a2b3c4d" (see list_uploads)
+        columns: CSV columns to compute statistics for; all of them if omitted
+    """
+    try:
+        upload = _lookup(upload_id)
+        cache = get_upload_cache()
+        if upload["type"] == "csv":
+            # Approximate statistics from the cached one-pass profile, not a describe() of the full file
+            profile = cache.profile(upload["digest"])
+            if profile is None:
+                raise ValueError(f"Upload {upload_id} is no longer available; ask the user to upload it again")
+            available = list(profile["columns"])
+            if columns and upload["sql_table"]:
+                # Accept the SQL table's column names too ("Order ID" is order_id there)
+                original = dict(zip(column_names(available), available))
+                columns = [original.get(column, column) for column in columns]
+            selected = _pick_columns(available, columns)
+            analysis = {
+                "shape": (profile["rows"], len(available)),
+                "columns": available,
+                "dtypes": {name: column["compact_dtype"] or column["kind"] for name, column in profile["columns"].items()},
+                "head": [{name: row.get(name) for name in selected} for row in profile["head"]],
+                "summary": {name: profile["columns"][name] for name in selected},
+                "note": f"quantiles and top values are estimated from a {profile['sample_rows']}-row sample"
+            }
+        elif upload["type"] == "json":
+            data = cache.json(upload["digest"])
+            analysis = {
+                "type": type(data).__name__,
+                "keys": list(data.keys()) if isinstance(data, dict) else f"List with {len(data)} items",
+                "sample": str(data)[:500] + "..." if len(str(data)) > 500 else str(data)
+            }
+        else:
+            text = cache.text(upload["digest"]) or ""
+            analysis = {
+                "content_length": len(text),
+                "lines": len(text.split('\n')),
+                "preview": text[:500] + "..." if len(text) > 500 else text
+            }
+        if upload["sql_table"]:
+            analysis["sql_table"] = upload["sql_table"]["table"]
+        return f"File Analysis ({upload['name']}):\n{json.dumps(analysis, indent=2, default=str)}"
+    except Exception as e:
+        return f"Error analyzing file: {str(e)}"
+
+UPLOAD_TOOLS = [list_uploads, read_upload, analyze_upload]